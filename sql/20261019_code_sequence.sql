@@ -0,0 +1,16 @@
+-- Numérotation des codes métier (postes PT, compétences C/CO, plans PL, formations FC) :
+-- dernier numéro attribué par (portée, préfixe), réservé par UPDATE ... RETURNING.
+-- Les lignes sont créées à la première attribution avec le plus grand code existant.
+-- Voir app/services/code_sequence.py.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.tbl_code_sequence (
+  scope text NOT NULL,
+  prefix text NOT NULL,
+  dernier_numero integer NOT NULL DEFAULT 0,
+  updated_at timestamp with time zone NOT NULL DEFAULT NOW(),
+  CONSTRAINT tbl_code_sequence_pkey PRIMARY KEY (scope, prefix)
+);
+
+COMMIT;
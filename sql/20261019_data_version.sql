@@ -0,0 +1,17 @@
+-- Versions de données par (entreprise / owner, domaine) : effectifs, postes, competences,
+-- audits, breaks, organigramme ; ligne ('*', '*') = génération globale.
+-- Incrémentée par UPSERT ... RETURNING puis diffusée par NOTIFY aux autres workers,
+-- relue en entier à chaque (re)connexion de leur écoute.
+-- Voir app/services/data_version.py.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.tbl_data_version (
+  id_scope text NOT NULL,
+  domaine text NOT NULL,
+  version bigint NOT NULL DEFAULT 0,
+  updated_at timestamp with time zone NOT NULL DEFAULT NOW(),
+  CONSTRAINT tbl_data_version_pkey PRIMARY KEY (id_scope, domaine)
+);
+
+COMMIT;
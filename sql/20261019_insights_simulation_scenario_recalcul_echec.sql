@@ -0,0 +1,13 @@
+-- Scénarios de simulation : échec du recalcul automatique, par empreinte de données.
+-- Un scénario dont le recalcul a échoué pour l'empreinte courante n'est plus relancé à chaque
+-- liste ; il le redevient dès que les données changent (ou sur demande explicite).
+-- Voir app/services/simulation_scenario_store.py.
+
+BEGIN;
+
+ALTER TABLE public.tbl_insights_simulation_scenario
+  ADD COLUMN IF NOT EXISTS recalcul_echec_version text,
+  ADD COLUMN IF NOT EXISTS recalcul_echec_at timestamp with time zone,
+  ADD COLUMN IF NOT EXISTS recalcul_echec text;
+
+COMMIT;
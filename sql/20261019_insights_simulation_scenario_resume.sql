@@ -0,0 +1,21 @@
+-- Scénarios de simulation : projection légère pour les listes, résultat compressé,
+-- empreinte des données du calcul (détection des scénarios périmés).
+-- Voir app/services/simulation_scenario_store.py.
+
+BEGIN;
+
+ALTER TABLE public.tbl_insights_simulation_scenario
+  ADD COLUMN IF NOT EXISTS resume_json jsonb,
+  ADD COLUMN IF NOT EXISTS resultat_gz bytea,
+  ADD COLUMN IF NOT EXISTS data_version text,
+  ADD COLUMN IF NOT EXISTS resultat_calcule_at timestamp with time zone;
+
+-- Le résultat complet est lu à l'ouverture du scénario uniquement : pas de recompression TOAST
+ALTER TABLE public.tbl_insights_simulation_scenario
+  ALTER COLUMN resultat_gz SET STORAGE EXTERNAL;
+
+-- Liste des scénarios actifs d'une entreprise (les plus récents d'abord)
+CREATE INDEX IF NOT EXISTS idx_insights_simulation_scenario_liste
+  ON public.tbl_insights_simulation_scenario (id_ent, created_at DESC);
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- File persistante des notifications (mails) des formulaires de formation.
+-- Les routers enregistrent l'intention dans la transaction métier ; le dispatcher
+-- (app/services/notification_queue.py) envoie, regroupe et trace la délivrance.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.tbl_notification_queue (
+  id_notification text PRIMARY KEY,
+  type_notification text NOT NULL,
+  cle_regroupement text,
+  payload jsonb NOT NULL DEFAULT '{}'::jsonb,
+  statut text NOT NULL DEFAULT 'a_envoyer',
+  nb_tentatives integer NOT NULL DEFAULT 0,
+  prochaine_tentative timestamp with time zone NOT NULL DEFAULT now(),
+  verrou_jusqua timestamp with time zone,
+  id_envoi text,
+  derniere_erreur text,
+  created_at timestamp with time zone NOT NULL DEFAULT now(),
+  updated_at timestamp with time zone NOT NULL DEFAULT now(),
+  date_envoi timestamp with time zone,
+  CONSTRAINT ck_notification_queue_statut
+    CHECK (statut IN ('a_envoyer', 'en_cours', 'envoye', 'echec', 'ignore'))
+);
+
+-- Sélection des notifications à traiter (partielle : les envoyées ne sont plus lues)
+CREATE INDEX IF NOT EXISTS idx_notification_queue_a_traiter
+  ON public.tbl_notification_queue (prochaine_tentative)
+  WHERE statut IN ('a_envoyer', 'en_cours');
+
+CREATE INDEX IF NOT EXISTS idx_notification_queue_groupe
+  ON public.tbl_notification_queue (type_notification, cle_regroupement, statut);
+
+COMMENT ON TABLE public.tbl_notification_queue IS
+  'Notifications sortantes (mails formulaires formation) : intention enregistrée avec l''écriture métier, envoi asynchrone avec regroupement et retries.';
+
+COMMIT;
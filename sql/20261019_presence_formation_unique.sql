@@ -0,0 +1,35 @@
+-- Présence stagiaire : une seule présence active par stagiaire / jour / période.
+-- (les signatures consultant, sans id_action_formation_effectif, ne sont pas concernées)
+-- Permet à /presence/validate d'être idempotent même en cas de validations simultanées
+-- (INSERT ... ON CONFLICT DO NOTHING).
+
+BEGIN;
+
+-- Doublons historiques : on garde la première validation, les suivantes sont archivées.
+WITH ranked AS (
+  SELECT
+    id_action_formation_presence,
+    row_number() OVER (
+      PARTITION BY id_action_formation_effectif, date_presence, periode
+      ORDER BY datetime_utc ASC NULLS LAST, id_action_formation_presence
+    ) AS rn
+  FROM public.tbl_action_formation_presence
+  WHERE archive = FALSE
+    AND id_action_formation_effectif IS NOT NULL
+)
+UPDATE public.tbl_action_formation_presence p
+SET archive = TRUE
+FROM ranked r
+WHERE r.id_action_formation_presence = p.id_action_formation_presence
+  AND r.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_action_formation_presence_periode
+  ON public.tbl_action_formation_presence (id_action_formation_effectif, date_presence, periode)
+  WHERE archive = FALSE
+    AND id_action_formation_effectif IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_action_formation_effectif_af
+  ON public.tbl_action_formation_effectif (id_action_formation)
+  WHERE archive = FALSE;
+
+COMMIT;
@@ -1,11 +1,52 @@
 import os
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import recueil_attentes, preparation_formation, presence_formation, presence_consultant, validation_acquis,satisfaction_formation_stagiaire, satisfaction_formation_responsable, satisfaction_formation_consultant, adaptation_formation, skills_portal,  studio_portal, people_portal, learn_portal, partner_portal
+from fastapi.responses import PlainTextResponse
+from app.routers.skills_portal_common import get_conn, _pool_stats
+from app.services.schema_catalog import preload_schema_catalog, schema_catalog_stats
+from app.services.notification_queue import start_notification_dispatcher, notification_queue_stats
+from app.services.metrics import MetricsMiddleware, register_metrics_source, render_metrics
+from app.services.sql_profiler import SqlProfilerMiddleware
+from app.services.http_client import integration_http_stats
+from app.services.calendar_suggestion_store import calendar_suggestion_store_stats
+from app.services.request_capture import capture_stats
+from app.services.admission_control import AdmissionControlMiddleware, admission_control_stats
+from app.services.bulk_write import bulk_write_stats
+from app.services.background_jobs import background_jobs_stats
+from app.services.cartographie_cache import cartographie_cache_stats
+from app.services.code_sequence import code_sequence_stats
+from app.services.compression import CompressionMiddleware, compression_stats
+from app.services.conditional_get import conditional_get_stats
+from app.services.data_version import DataVersionMiddleware, data_version_stats, start_data_version_listener
+from app.services.fast_json import fast_json_stats
+from app.services.organigramme_cache import organigramme_cache_stats
+from app.services.startup import LazyRouterMiddleware, RouterRegistry, RouterSpec, run_startup_warmup, startup_stats
 
 app = FastAPI()
 
+ROUTERS = [
+    RouterSpec("recueil_attentes", "app.routers.recueil_attentes"),
+    RouterSpec("preparation_formation", "app.routers.preparation_formation"),
+    RouterSpec("presence_formation", "app.routers.presence_formation"),
+    RouterSpec("presence_consultant", "app.routers.presence_consultant"),
+    RouterSpec("validation_acquis", "app.routers.validation_acquis"),
+    RouterSpec("satisfaction_formation_stagiaire", "app.routers.satisfaction_formation_stagiaire"),
+    RouterSpec("satisfaction_formation_responsable", "app.routers.satisfaction_formation_responsable"),
+    RouterSpec("satisfaction_formation_consultant", "app.routers.satisfaction_formation_consultant"),
+    RouterSpec("adaptation_formation", "app.routers.adaptation_formation"),
+    RouterSpec("skills_portal", "app.routers.skills_portal", prefixes=("/skills/",)),
+    RouterSpec("studio_portal", "app.routers.studio_portal", prefixes=("/studio/",)),
+    RouterSpec("people_portal", "app.routers.people_portal", prefixes=("/people/",)),
+    RouterSpec("learn_portal", "app.routers.learn_portal", prefixes=("/learn/",)),
+    RouterSpec("partner_portal", "app.routers.partner_portal", prefixes=("/partner/",)),
+]
+router_registry = RouterRegistry(app, ROUTERS)
+
+# Contrôle d'admission des routes lourdes (analyses, PDF, IA, écritures de masse)
+# - ajouté avant CORS = sous CORS : les 429 portent les en-têtes CORS
+app.add_middleware(AdmissionControlMiddleware)
+
 # CORS autorisés
 app.add_middleware(
     CORSMiddleware,
@@ -17,9 +58,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression gzip / brotli (seuil + types) et versions de données des ETags / caches
+# (écriture réussie non attribuée à une entreprise : génération globale, cf. services/data_version.py)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(DataVersionMiddleware)
+
+# Métriques (latence par route, SQL, attente pool) + profilage SQL à la demande
+# - ajoutés après CORS = middlewares les plus externes
+# - chargement lazy des routers juste avant (temps d'import compté dans les métriques)
+app.add_middleware(LazyRouterMiddleware, registry=router_registry)
+app.add_middleware(SqlProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Injection manuelle des endpoints
 app.get("/")(lambda: {"status": "ok", "service": "skillboard unified backend"})
 
+
+# ======================================================
+# Catalogue schéma DB
+# - chargé paresseusement au premier appel des routers
+# - SCHEMA_CATALOG_PRELOAD=1 : chargement dès le démarrage
+# ======================================================
+@app.on_event("startup")
+def preload_schema_catalog_on_startup():
+    if (os.getenv("SCHEMA_CATALOG_PRELOAD", "") or "").strip().lower() not in ("1", "true", "yes"):
+        return
+    try:
+        with get_conn() as conn:
+            preload_schema_catalog(conn)
+    except Exception:
+        pass
+
+
+# ======================================================
+# Notifications formulaires formation (mails)
+# - dispatcher en tâche de fond (NOTIFICATION_DISPATCHER_ENABLED=0 pour le couper)
+# ======================================================
+@app.on_event("startup")
+def start_notification_dispatcher_on_startup():
+    start_notification_dispatcher()
+
+
+# ======================================================
+# Versions de données partagées entre workers (LISTEN / NOTIFY)
+# - DATA_VERSION_LISTENER_ENABLED=0 : versions locales au worker
+# ======================================================
+@app.on_event("startup")
+def start_data_version_listener_on_startup():
+    start_data_version_listener()
+
+# ======================================================
+# Métriques (format texte Prometheus)
+# - METRICS_TOKEN défini : Authorization: Bearer <token> obligatoire
+# - Sans token : fermé (404), sauf ouverture explicite METRICS_PUBLIC=1 (poste local, test de charge)
+# ======================================================
+register_metrics_source("db_pool", _pool_stats)
+register_metrics_source("schema_catalog", schema_catalog_stats)
+register_metrics_source("integration_http", integration_http_stats)
+register_metrics_source("calendar_suggestions", calendar_suggestion_store_stats)
+register_metrics_source("request_capture", capture_stats)
+register_metrics_source("notification_queue", notification_queue_stats)
+register_metrics_source("bulk_write", bulk_write_stats)
+register_metrics_source("background_jobs", background_jobs_stats)
+register_metrics_source("organigramme_cache", organigramme_cache_stats)
+register_metrics_source("cartographie_cache", cartographie_cache_stats)
+register_metrics_source("code_sequence", code_sequence_stats)
+register_metrics_source("fast_json", fast_json_stats)
+register_metrics_source("compression", compression_stats)
+register_metrics_source("conditional_get", conditional_get_stats)
+register_metrics_source("data_version", data_version_stats)
+register_metrics_source("admission_control", admission_control_stats)
+register_metrics_source("startup", startup_stats)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    token = (os.getenv("METRICS_TOKEN", "") or "").strip()
+    if not token:
+        if (os.getenv("METRICS_PUBLIC", "") or "").strip().lower() not in ("1", "true", "yes"):
+            raise HTTPException(status_code=404, detail="Not Found")
+    elif request.headers.get("Authorization", "") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Token métriques invalide.")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 # ======================================================
 # Config portail (par espace)
 # - Retourne Supabase URL + ANON key
@@ -112,45 +234,15 @@ def get_portal_config(space: str):
     raise HTTPException(status_code=404, detail="Espace portail inconnu.")
 
 
-# Enregistrement manuel des routers (sans include_router)
-for route in recueil_attentes.router.routes:
-    app.router.routes.append(route)
-
-for route in preparation_formation.router.routes:
-    app.router.routes.append(route)
-
-for route in presence_formation.router.routes:
-    app.router.routes.append(route)
-
-for route in presence_consultant.router.routes:
-    app.router.routes.append(route)
-
-for route in validation_acquis.router.routes:
-    app.router.routes.append(route)
-
-for route in satisfaction_formation_stagiaire.router.routes:
-    app.router.routes.append(route)
-
-for route in satisfaction_formation_responsable.router.routes:  
-    app.router.routes.append(route)
-
-for route in satisfaction_formation_consultant.router.routes:
-    app.router.routes.append(route)
-
-for route in adaptation_formation.router.routes:
-    app.router.routes.append(route)
-
-for route in skills_portal.router.routes:
-    app.router.routes.append(route)
-
-for route in studio_portal.router.routes:
-    app.router.routes.append(route)
-
-for route in people_portal.router.routes:
-    app.router.routes.append(route)
+# ======================================================
+# Enregistrement des routers (sans include_router)
+# - déclaratif : (nom, module, préfixes) ; ROUTER_LOADING=lazy pour importer
+#   les portails à la première requête sur leur préfixe (cf. services/startup.py)
+# - formulaires formation : légers, toujours chargés au démarrage
+# ======================================================
+router_registry.register()
 
-for route in learn_portal.router.routes:
-    app.router.routes.append(route)
 
-for route in partner_portal.router.routes:
-    app.router.routes.append(route)
\ No newline at end of file
+@app.on_event("startup")
+def warm_up_on_startup():
+    run_startup_warmup()
@@ -1,11 +1,13 @@
 import os
 import smtplib
 import ssl
-import requests
 from email.message import EmailMessage
 from email.utils import formataddr
 from html import escape
 
+from app.services.http_client import integration_post
+from app.services.notification_queue import NotificationSkipped, register_notification_handler
+
 MJ_APIKEY_PUBLIC = os.getenv("MJ_APIKEY_PUBLIC")
 MJ_APIKEY_PRIVATE = os.getenv("MJ_APIKEY_PRIVATE")
 MAIL_ALERT_DEST = os.getenv("MAIL_ALERT_DEST")
@@ -26,18 +28,18 @@ NOVOSKILL_SMTP_SSL = (os.getenv("NOVOSKILL_SMTP_SSL") or "true").strip().lower()
 MAILJET_URL = "https://api.mailjet.com/v3.1/send"
 
 
-def send_absent_mail(code_formation: str, titre: str, absents: list[str]):
+def send_absent_mail(code_formation: str, titre: str, absents: list[str]) -> bool:
     """
     Envoie le mail via l'API Mailjet pour la gestion des absences.
     """
 
     if not MJ_APIKEY_PUBLIC or not MJ_APIKEY_PRIVATE:
         print("Mailjet non configuré. Envoi annulé.")
-        return
+        return False
 
     if not MAIL_ALERT_DEST:
         print("MAIL_ALERT_DEST non défini")
-        return
+        return False
 
     sujet = f"Gestion des absences – formation {code_formation}"
 
@@ -60,19 +62,23 @@ def send_absent_mail(code_formation: str, titre: str, absents: list[str]):
     }
 
     try:
-        r = requests.post(
+        r = integration_post(
+            "mailjet",
             MAILJET_URL,
             auth=(MJ_APIKEY_PUBLIC, MJ_APIKEY_PRIVATE),
-            json=payload
+            json=payload,
         )
 
         if 200 <= r.status_code < 300:
             print("Mail envoyé via Mailjet OK")
+            return True
         else:
             print("Erreur Mailjet:", r.status_code, r.text)
+            return False
 
     except Exception as e:
         print("Erreur appel Mailjet:", e)
+        return False
 
 
 def send_satisfaction_stagiaire_mail(
@@ -83,7 +89,7 @@ def send_satisfaction_stagiaire_mail(
     id_action_formation_effectif: str,
     mode: str,
     code_action_formation: str | None = None,    
-):
+) -> bool:
     """
     Envoie un mail d'info pour une enquête de satisfaction stagiaire.
     mode = 'insert' ou 'update'
@@ -91,11 +97,11 @@ def send_satisfaction_stagiaire_mail(
 
     if not MJ_APIKEY_PUBLIC or not MJ_APIKEY_PRIVATE:
         print("Mailjet non configuré. Envoi satisfaction annulé.")
-        return
+        return False
 
     if not MAIL_ALERT_DEST:
         print("MAIL_ALERT_DEST non défini pour la satisfaction")
-        return
+        return False
 
     suffix = "nouvelle réponse" if mode == "insert" else "mise à jour"
     sujet = "Satisfaction stagiaire – "
@@ -138,19 +144,23 @@ def send_satisfaction_stagiaire_mail(
     }
 
     try:
-        r = requests.post(
+        r = integration_post(
+            "mailjet",
             MAILJET_URL,
             auth=(MJ_APIKEY_PUBLIC, MJ_APIKEY_PRIVATE),
-            json=payload
+            json=payload,
         )
 
         if 200 <= r.status_code < 300:
             print("Mail satisfaction stagiaire envoyé via Mailjet OK")
+            return True
         else:
             print("Erreur Mailjet (satisfaction):", r.status_code, r.text)
+            return False
 
     except Exception as e:
         print("Erreur appel Mailjet (satisfaction):", e)
+        return False
 
 def send_satisfaction_responsable_mail(
     code_formation: str | None,
@@ -160,7 +170,7 @@ def send_satisfaction_responsable_mail(
     id_action_formation_entreprise: str,
     mode: str,
     code_action_formation: str | None = None,
-):
+) -> bool:
     """
     Envoie un mail d'info pour une enquête de satisfaction responsable administratif.
     mode = 'insert' ou 'update'
@@ -168,11 +178,11 @@ def send_satisfaction_responsable_mail(
 
     if not MJ_APIKEY_PUBLIC or not MJ_APIKEY_PRIVATE:
         print("Mailjet non configuré. Envoi satisfaction responsable annulé.")
-        return
+        return False
 
     if not MAIL_ALERT_DEST:
         print("MAIL_ALERT_DEST non défini pour la satisfaction responsable")
-        return
+        return False
 
     suffix = "nouvelle réponse" if mode == "insert" else "mise à jour"
 
@@ -216,19 +226,23 @@ def send_satisfaction_responsable_mail(
     }
 
     try:
-        r = requests.post(
+        r = integration_post(
+            "mailjet",
             MAILJET_URL,
             auth=(MJ_APIKEY_PUBLIC, MJ_APIKEY_PRIVATE),
-            json=payload
+            json=payload,
         )
 
         if 200 <= r.status_code < 300:
             print("Mail satisfaction responsable envoyé via Mailjet OK")
+            return True
         else:
             print("Erreur Mailjet (satisfaction responsable):", r.status_code, r.text)
+            return False
 
     except Exception as e:
         print("Erreur appel Mailjet (satisfaction responsable):", e)
+        return False
 
 def send_satisfaction_consultant_mail(
     code_formation: str | None,
@@ -238,7 +252,7 @@ def send_satisfaction_consultant_mail(
     id_action_formation: str,
     mode: str,
     code_action_formation: str | None = None,
-):
+) -> bool:
     """
     Envoie un mail d'info pour une enquête de satisfaction consultant.
     mode = 'insert' ou 'update'
@@ -246,11 +260,11 @@ def send_satisfaction_consultant_mail(
 
     if not MJ_APIKEY_PUBLIC or not MJ_APIKEY_PRIVATE:
         print("Mailjet non configuré. Envoi satisfaction consultant annulé.")
-        return
+        return False
 
     if not MAIL_ALERT_DEST:
         print("MAIL_ALERT_DEST non défini pour la satisfaction consultant")
-        return
+        return False
 
     suffix = "nouvelle réponse" if mode == "insert" else "mise à jour"
 
@@ -296,19 +310,113 @@ def send_satisfaction_consultant_mail(
     }
 
     try:
-        r = requests.post(
+        r = integration_post(
+            "mailjet",
             MAILJET_URL,
             auth=(MJ_APIKEY_PUBLIC, MJ_APIKEY_PRIVATE),
-            json=payload
+            json=payload,
         )
 
         if 200 <= r.status_code < 300:
             print("Mail satisfaction consultant envoyé via Mailjet OK")
+            return True
         else:
             print("Erreur Mailjet (satisfaction consultant):", r.status_code, r.text)
+            return False
 
     except Exception as e:
         print("Erreur appel Mailjet (satisfaction consultant):", e)
+        return False
+
+def send_satisfaction_digest_mail(
+    profil: str,
+    code_formation: str | None,
+    titre_formation: str,
+    code_action_formation: str | None,
+    reponses: list[dict],
+) -> bool:
+    """
+    Mail récapitulatif : plusieurs réponses de satisfaction d'une même action de formation.
+    reponses = [{"prenom", "nom", "mode", "ref_label", "ref"}]
+    """
+
+    if not MJ_APIKEY_PUBLIC or not MJ_APIKEY_PRIVATE:
+        print(f"Mailjet non configuré. Envoi récapitulatif satisfaction {profil} annulé.")
+        return False
+
+    if not MAIL_ALERT_DEST:
+        print(f"MAIL_ALERT_DEST non défini pour la satisfaction {profil}")
+        return False
+
+    sujet = f"Satisfaction {profil} – "
+    if code_action_formation:
+        sujet += f"{code_action_formation} – "
+    sujet += f"{len(reponses)} réponses"
+
+    lignes = []
+    lignes_html = []
+    for rep in reponses:
+        suffix = "nouvelle réponse" if rep.get("mode") == "insert" else "mise à jour"
+        lignes.append(f"- {rep.get('prenom') or ''} {rep.get('nom') or ''} ({suffix}) – {rep.get('ref_label')} : {rep.get('ref')}")
+        lignes_html.append(
+            f"<li>{escape(str(rep.get('prenom') or ''))} {escape(str(rep.get('nom') or ''))} ({suffix})"
+            f" – {escape(str(rep.get('ref_label') or ''))} : {escape(str(rep.get('ref') or ''))}</li>"
+        )
+
+    formation = f"{(code_formation + ' - ') if code_formation else ''}{titre_formation}"
+
+    texte = (
+        f"{len(reponses)} enquêtes de satisfaction {profil} ont été enregistrées.\n\n"
+        f"Formation : {formation}\n"
+        f"Code action de formation : {code_action_formation or 'Non renseigné'}\n\n"
+        + "\n".join(lignes)
+        + "\n\nVous pouvez consulter cette action de formation dans Skillboard pour analyser ces réponses."
+    )
+
+    html = f"""
+    <h3>Enquêtes de satisfaction {escape(profil)} ({len(reponses)} réponses)</h3>
+    <p>
+      <strong>Formation :</strong> {escape(formation)}<br>
+      <strong>Code action de formation :</strong> {escape(code_action_formation or "Non renseigné")}
+    </p>
+    <ul>
+      {"".join(lignes_html)}
+    </ul>
+    <p>
+      Vous pouvez consulter cette action de formation dans Skillboard pour analyser ces réponses.
+    </p>
+    """
+
+    payload = {
+        "Messages": [
+            {
+                "From": {"Email": MAIL_FROM, "Name": "Skillboard"},
+                "To": [{"Email": MAIL_ALERT_DEST}],
+                "Subject": sujet,
+                "TextPart": texte,
+                "HTMLPart": html,
+            }
+        ]
+    }
+
+    try:
+        r = integration_post(
+            "mailjet",
+            MAILJET_URL,
+            auth=(MJ_APIKEY_PUBLIC, MJ_APIKEY_PRIVATE),
+            json=payload,
+        )
+
+        if 200 <= r.status_code < 300:
+            print(f"Mail récapitulatif satisfaction {profil} envoyé via Mailjet OK")
+            return True
+        else:
+            print(f"Erreur Mailjet (récapitulatif satisfaction {profil}):", r.status_code, r.text)
+            return False
+
+    except Exception as e:
+        print(f"Erreur appel Mailjet (récapitulatif satisfaction {profil}):", e)
+        return False
 
 def _mailjet_ready() -> bool:
     return bool(MJ_APIKEY_PUBLIC and MJ_APIKEY_PRIVATE and MAIL_FROM)
@@ -423,11 +531,11 @@ def _send_mailjet_email(
     }
 
     try:
-        r = requests.post(
+        r = integration_post(
+            "mailjet",
             MAILJET_URL,
             auth=(MJ_APIKEY_PUBLIC, MJ_APIKEY_PRIVATE),
             json=payload,
-            timeout=20,
         )
 
         if 200 <= r.status_code < 300:
@@ -615,3 +723,81 @@ def send_novoskill_access_mail(
         text_part=text_part,
         html_part=html_part,
     )
+
+
+# ======================================================
+# File de notifications (formulaires formation)
+# - les routers enregistrent l'intention (enqueue_notification) dans leur transaction
+# - le dispatcher appelle ces handlers avec les payloads regroupés par action de formation
+# ======================================================
+def _alert_mail_ready():
+    if not MJ_APIKEY_PUBLIC or not MJ_APIKEY_PRIVATE:
+        raise NotificationSkipped("Mailjet non configuré")
+    if not MAIL_ALERT_DEST:
+        raise NotificationSkipped("MAIL_ALERT_DEST non défini")
+
+
+def _notify_absences(payloads: list[dict]) -> bool:
+    _alert_mail_ready()
+    absents: list[str] = []
+    for p in payloads:
+        for a in p.get("absents") or []:
+            if a not in absents:
+                absents.append(a)
+    if not absents:
+        return True
+    last = payloads[-1]
+    return send_absent_mail(last.get("code_formation") or "", last.get("titre") or "", absents)
+
+
+def _satisfaction_handler(profil: str, send_single, ref_param: str, ref_label: str):
+    def _handler(payloads: list[dict]) -> bool:
+        _alert_mail_ready()
+
+        # Une réponse par répondant (la plus récente), 'insert' si au moins une création
+        by_ref: dict = {}
+        for p in payloads:
+            ref = p.get("ref")
+            prev = by_ref.get(ref)
+            item = dict(p)
+            if prev and prev.get("mode") == "insert":
+                item["mode"] = "insert"
+            by_ref[ref] = item
+        reponses = list(by_ref.values())
+        last = reponses[-1]
+
+        if len(reponses) == 1:
+            return send_single(
+                code_formation=last.get("code_formation"),
+                titre_formation=last.get("titre_formation") or "",
+                prenom=last.get("prenom") or "",
+                nom=last.get("nom") or "",
+                mode=last.get("mode") or "insert",
+                code_action_formation=last.get("code_action_formation"),
+                **{ref_param: last.get("ref")},
+            )
+
+        return send_satisfaction_digest_mail(
+            profil=profil,
+            code_formation=last.get("code_formation"),
+            titre_formation=last.get("titre_formation") or "",
+            code_action_formation=last.get("code_action_formation"),
+            reponses=[{**r, "ref_label": ref_label} for r in reponses],
+        )
+
+    return _handler
+
+
+register_notification_handler("absences", _notify_absences)
+register_notification_handler(
+    "satisfaction_stagiaire",
+    _satisfaction_handler("stagiaire", send_satisfaction_stagiaire_mail, "id_action_formation_effectif", "id_action_formation_effectif"),
+)
+register_notification_handler(
+    "satisfaction_responsable",
+    _satisfaction_handler("responsable", send_satisfaction_responsable_mail, "id_action_formation_entreprise", "id_action_formation_entreprise"),
+)
+register_notification_handler(
+    "satisfaction_consultant",
+    _satisfaction_handler("consultant", send_satisfaction_consultant_mail, "id_action_formation", "id_action_formation"),
+)
@@ -4,14 +4,14 @@ from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
 import os
-import json
 import uuid
-from pathlib import Path
 
 import psycopg
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
 
+from app.services.request_capture import capture_request
+
 # ======================================================
 # ENV
 # ======================================================
@@ -143,25 +143,6 @@ def get_conn():
         raise HTTPException(status_code=500, detail=f"Erreur connexion DB: {e}")
 
 
-# ======================================================
-# Cache local (debug / audit)
-# ======================================================
-
-CACHE_DIR = Path(__file__).parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def save_cache(payload: AdaptationInput):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname = CACHE_DIR / f"adaptation_formation_{payload.id_action_formation}_{ts}.json"
-
-    # IMPORTANT : convertir les datetime au format JSON
-    data = payload.model_dump(mode="json")  # Pydantic v2 => datetime → str ISO
-
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
 # ======================================================
 # Endpoints
 # ======================================================
@@ -516,7 +497,7 @@ def save_adaptation(payload: AdaptationInput):
                     mode = "insert"
 
                 conn.commit()
-                save_cache(payload)
+                capture_request("adaptation_formation", payload, ref=payload.id_action_formation)
 
         return AdaptationSaveResponse(
             id_adaptation=id_adaptation,
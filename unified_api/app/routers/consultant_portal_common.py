@@ -2,10 +2,10 @@ from fastapi import HTTPException
 from typing import Optional
 import os
 import pathlib
-import requests
 
 import psycopg
 from dotenv import load_dotenv
+from app.services.sharepoint_client import get_sharepoint_client
 
 # ======================================================
 # ENV
@@ -84,28 +84,10 @@ def _ensure_sharepoint_env():
 
 def get_sp_token() -> str:
     """
-    Récupère un token d'accès Graph pour SharePoint.
+    Récupère un token d'accès Graph pour SharePoint (mis en cache jusqu'à peu avant expiration).
     """
     _ensure_sharepoint_env()
-    url = f"https://login.microsoftonline.com/{SP_TENANT_ID}/oauth2/v2.0/token"
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": SP_CLIENT_ID,
-        "client_secret": SP_CLIENT_SECRET,
-        "scope": "https://graph.microsoft.com/.default",
-    }
-    try:
-        r = requests.post(url, data=data, timeout=20)
-        r.raise_for_status()
-        js = r.json()
-        token = js.get("access_token")
-        if not token:
-            raise HTTPException(status_code=500, detail="Token SharePoint manquant")
-        return token
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur token SharePoint : {e}")
+    return get_sharepoint_client().token()
 
 
 def build_consultant_root_path(
@@ -172,28 +154,8 @@ def upload_consultant_document_to_sharepoint(
 
     remote_path = f"{root}/{logical_name}{ext}"
 
-    token = get_sp_token()
-    base = "https://graph.microsoft.com/v1.0"
-    upload_url = f"{base}/sites/{SP_SITE_ID}/drive/root:/{remote_path}:/content"
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": content_type or "application/octet-stream",
-    }
-
-    try:
-        r = requests.put(upload_url, headers=headers, data=data, timeout=60)
-        if r.status_code >= 400:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur upload SharePoint : {r.status_code} {r.text}",
-            )
-        js = r.json()
-        return js.get("@microsoft.graph.downloadUrl") or js.get("webUrl") or remote_path
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur upload SharePoint : {e}")
+    js = get_sharepoint_client().upload(remote_path, data, content_type=content_type)
+    return js.get("@microsoft.graph.downloadUrl") or js.get("webUrl") or remote_path
 
 
 # ======================================================
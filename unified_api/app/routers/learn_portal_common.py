@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 import os
-import requests
+
+from app.services.http_client import integration_get
 
 # Learn réutilise pour l’instant la même auth Supabase que Skills
 # avec possibilité d’avoir ensuite une config dédiée.
@@ -37,7 +38,7 @@ def learn_get_supabase_user(access_token: str) -> dict:
     }
 
     try:
-        r = requests.get(url, headers=headers, timeout=15)
+        r = integration_get("supabase_auth", url, headers=headers)
         if r.status_code in (401, 403):
           raise HTTPException(status_code=401, detail="Session invalide ou expirée.")
         if r.status_code >= 400:
@@ -19,21 +19,15 @@ from app.routers.skills_portal_pdf_common import (
     build_pdf_document,
     build_competence_pdf_story,
 )
+from app.services.cartographie_cache import invalidate_cartographie
+from app.services.code_sequence import COMPETENCE_CODES, allocate_codes
+from app.services.data_version import DOMAIN_COMPETENCES, bump_owner_data_version
+from app.services.startup import lazy_attr
 
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
-
-try:
-    from docx import Document as DocxDocument
-except Exception:
-    DocxDocument = None
-
-try:
-    from pypdf import PdfReader
-except Exception:
-    PdfReader = None
+# Dépendances lourdes (IA, parsing documents) : importées au premier usage
+OpenAI = lazy_attr("openai", "OpenAI")
+DocxDocument = lazy_attr("docx", "Document")
+PdfReader = lazy_attr("pypdf", "PdfReader")
 
 router = APIRouter()
 
@@ -94,30 +88,7 @@ def _competence_exists_owner(cur, oid: str, id_comp: str) -> bool:
 
 
 def _next_comp_code(cur, oid: str) -> str:
-    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"learn_comp_code:{oid}:CO",))
-
-    cur.execute(
-        """
-        SELECT COALESCE(
-          MAX((regexp_match(code, '^CO([0-9]{5})$'))[1]::int),
-          0
-        ) AS max_n
-        FROM public.tbl_competence
-        WHERE id_owner = %s
-          AND code ~ '^CO[0-9]{5}$'
-        """,
-        (oid,),
-    )
-
-    r = cur.fetchone() or {}
-    max_n_raw = r.get("max_n")
-    max_n = int(max_n_raw) if max_n_raw is not None else 0
-    nxt = max_n + 1
-
-    if nxt > 99999:
-        raise HTTPException(status_code=400, detail="Limite de numérotation atteinte (CO99999).")
-
-    return f"CO{nxt:05d}"
+    return allocate_codes(cur, COMPETENCE_CODES, (oid,), prefix="CO")[0]
 
 
 def _level_score(txt: Optional[str]) -> int:
@@ -235,7 +206,7 @@ async def _extract_document_text(upload: UploadFile) -> str:
         raise HTTPException(status_code=400, detail="Impossible de lire le document TXT.")
 
     if ext == "pdf":
-        if PdfReader is None:
+        if not PdfReader:
             raise HTTPException(status_code=500, detail="Lecture PDF indisponible côté serveur.")
 
         try:
@@ -259,7 +230,7 @@ async def _extract_document_text(upload: UploadFile) -> str:
             raise HTTPException(status_code=400, detail="Impossible de lire le document PDF.")
 
     if ext == "docx":
-        if DocxDocument is None:
+        if not DocxDocument:
             raise HTTPException(status_code=500, detail="Lecture DOCX indisponible côté serveur.")
 
         try:
@@ -469,7 +440,7 @@ def _build_ai_schema() -> dict:
 
 
 def _run_ai_draft(cur, oid: str, payload: AiDraftCompetencePayload) -> dict:
-    if OpenAI is None:
+    if not OpenAI:
         raise HTTPException(status_code=500, detail="Lib OpenAI manquante (pip install openai).")
 
     objectif = (payload.objectif or "").strip()
@@ -891,6 +862,8 @@ def learn_competence_create(id_effectif: str, payload: CreateCompetencePayload,
                 )
 
                 conn.commit()
+                invalidate_cartographie(oid)
+                bump_owner_data_version(cur, oid, domains=(DOMAIN_COMPETENCES,))
 
         return {"id_comp": cid, "code": code}
 
@@ -1118,6 +1091,8 @@ def learn_competence_update(id_effectif: str, id_comp: str, payload: UpdateCompe
                     outdated_publications = _mark_lms_publications_outdated_for_competence(cur, oid, cid)
 
                     conn.commit()
+                    invalidate_cartographie(oid)
+                    bump_owner_data_version(cur, oid, domains=(DOMAIN_COMPETENCES,))
 
         return {
             "ok": True,
@@ -1159,6 +1134,8 @@ def learn_competence_archive(id_effectif: str, id_comp: str, request: Request):
                 )
 
                 conn.commit()
+                invalidate_cartographie(oid)
+                bump_owner_data_version(cur, oid, domains=(DOMAIN_COMPETENCES,))
 
         return {"ok": True}
 
@@ -24,25 +24,16 @@ from reportlab.lib.styles import ParagraphStyle
 from app.routers.skills_portal_common import get_conn
 from app.routers.learn_portal_common import learn_require_user, learn_fetch_profile
 from app.routers.skills_portal_pdf_common import build_pdf_document, build_pdf_styles
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
-
-try:
-    from docx import Document as DocxDocument
-except Exception:
-    DocxDocument = None
-
-try:
-    from pypdf import PdfReader
-except Exception:
-    PdfReader = None
-
-try:
-    from pptx import Presentation as PptxPresentation
-except Exception:
-    PptxPresentation = None
+from app.services.bulk_write import execute_unnest
+from app.services.code_sequence import FORMATION_CODES, PLAN_CODES, allocate_codes
+from app.services.conditional_get import not_modified
+from app.services.startup import lazy_attr
+
+# Dépendances lourdes (IA, parsing documents) : importées au premier usage
+OpenAI = lazy_attr("openai", "OpenAI")
+DocxDocument = lazy_attr("docx", "Document")
+PdfReader = lazy_attr("pypdf", "PdfReader")
+PptxPresentation = lazy_attr("pptx", "Presentation")
 
 router = APIRouter()
 
@@ -203,56 +194,10 @@ def _duration_text(value: Any) -> Optional[str]:
 
 
 def _next_plan_code(cur, oid: str) -> str:
-    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"learn_plan_code:{oid}:PL",))
-
-    cur.execute(
-        """
-        SELECT COALESCE(
-          MAX((regexp_match(codification, '^PL([0-9]{5})$'))[1]::int),
-          0
-        ) AS max_n
-        FROM public.tbl_plan_pedagogique
-        WHERE id_owner = %s
-          AND codification ~ '^PL[0-9]{5}$'
-        """,
-        (oid,),
-    )
-
-    r = cur.fetchone() or {}
-    max_n_raw = r.get("max_n")
-    max_n = int(max_n_raw) if max_n_raw is not None else 0
-    nxt = max_n + 1
-
-    if nxt > 99999:
-        raise HTTPException(status_code=400, detail="Limite de numérotation atteinte (PL99999).")
-
-    return f"PL{nxt:05d}"
+    return allocate_codes(cur, PLAN_CODES, (oid,))[0]
 
 def _next_form_code(cur, oid: str) -> str:
-    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"learn_form_code:{oid}:FC",))
-
-    cur.execute(
-        """
-        SELECT COALESCE(
-          MAX((regexp_match(code, '^FC([0-9]{5})$'))[1]::int),
-          0
-        ) AS max_n
-        FROM public.tbl_fiche_formation
-        WHERE id_owner = %s
-          AND code ~ '^FC[0-9]{5}$'
-        """,
-        (oid,),
-    )
-
-    r = cur.fetchone() or {}
-    max_n_raw = r.get("max_n")
-    max_n = int(max_n_raw) if max_n_raw is not None else 0
-    nxt = max_n + 1
-
-    if nxt > 99999:
-        raise HTTPException(status_code=400, detail="Limite de numérotation atteinte (FC99999).")
-
-    return f"FC{nxt:05d}"
+    return allocate_codes(cur, FORMATION_CODES, (oid,))[0]
 
 
 def _formation_exists_owner(cur, oid: str, id_form: str) -> bool:
@@ -676,33 +621,28 @@ def _fetch_contenu_row(cur, oid: str, id_form: str, id_ligne_contenu: str) -> di
 
 
 def _renumber_contenus(cur, oid: str, id_form: str) -> None:
+    # Renumérotation en une requête (ordre courant, puis titre de séquence)
     cur.execute(
         """
-        SELECT id_ligne_contenu
-        FROM public.tbl_contenu_ligne
-        WHERE id_owner = %s
-          AND id_form = %s
-          AND COALESCE(archive, FALSE) = FALSE
-        ORDER BY COALESCE(position, 999999), titre_sequence
+        UPDATE public.tbl_contenu_ligne cl
+        SET position = r.rn,
+            date_modification = NOW()
+        FROM (
+          SELECT
+            id_ligne_contenu,
+            row_number() OVER (ORDER BY COALESCE(position, 999999), titre_sequence) AS rn
+          FROM public.tbl_contenu_ligne
+          WHERE id_owner = %s
+            AND id_form = %s
+            AND COALESCE(archive, FALSE) = FALSE
+        ) r
+        WHERE cl.id_owner = %s
+          AND cl.id_form = %s
+          AND cl.id_ligne_contenu = r.id_ligne_contenu
         """,
-        (oid, id_form),
+        (oid, id_form, oid, id_form),
     )
 
-    rows = cur.fetchall() or []
-
-    for idx, r in enumerate(rows, start=1):
-        cur.execute(
-            """
-            UPDATE public.tbl_contenu_ligne
-            SET position = %s,
-                date_modification = NOW()
-            WHERE id_owner = %s
-              AND id_form = %s
-              AND id_ligne_contenu = %s
-            """,
-            (idx, oid, id_form, r.get("id_ligne_contenu")),
-        )
-
 def _ensure_contenus_owner(cur, oid: str, id_form: str, ids: list) -> list:
     clean_ids = [str(x or "").strip() for x in (ids or []) if str(x or "").strip()]
     if not clean_ids:
@@ -1321,7 +1261,7 @@ async def _extract_training_document_text(upload: UploadFile) -> str:
         raise HTTPException(status_code=400, detail="Impossible de lire le document TXT.")
 
     if ext == "pdf":
-        if PdfReader is None:
+        if not PdfReader:
             raise HTTPException(status_code=500, detail="Lecture PDF indisponible côté serveur.")
 
         try:
@@ -1347,7 +1287,7 @@ async def _extract_training_document_text(upload: UploadFile) -> str:
             raise HTTPException(status_code=400, detail="Impossible de lire le document PDF.")
 
     if ext == "docx":
-        if DocxDocument is None:
+        if not DocxDocument:
             raise HTTPException(status_code=500, detail="Lecture DOCX indisponible côté serveur.")
 
         try:
@@ -1614,7 +1554,7 @@ def _cosine_similarity(vec_a: list, vec_b: list) -> float:
 
 
 def _embedding_vectors(texts: list[str]) -> list[list[float]]:
-    if OpenAI is None:
+    if not OpenAI:
         raise RuntimeError("Lib OpenAI manquante pour le matching sémantique.")
 
     api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
@@ -1713,7 +1653,7 @@ def _semantic_competence_match_with_ai(candidates: list[dict], catalogue: list[d
             "options_catalogue_autorisees": options,
         })
 
-    if OpenAI is None:
+    if not OpenAI:
         raise RuntimeError("Lib OpenAI manquante pour la validation sémantique.")
 
     api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
@@ -2274,7 +2214,7 @@ def _build_import_ai_schema() -> dict:
 
 
 def _analyse_import_document_with_ai(doc_text: str, filename: str) -> dict:
-    if OpenAI is None:
+    if not OpenAI:
         raise HTTPException(status_code=500, detail="Lib OpenAI manquante côté serveur.")
 
     api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
@@ -2741,7 +2681,7 @@ def _analyse_generate_formation_with_ai(
     production_attendue: str = "",
     duree_mode: str = "indicative",
 ) -> dict:
-    if OpenAI is None:
+    if not OpenAI:
         raise HTTPException(status_code=500, detail="Lib OpenAI manquante côté serveur.")
 
     api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
@@ -3395,6 +3335,7 @@ def learn_formations_referentiels(id_effectif: str, request: Request):
 def learn_formations_list(
     id_effectif: str,
     request: Request,
+    response: Response,
     q: str = "",
     show: str = "active",
     domaine: str = "",
@@ -3411,6 +3352,9 @@ def learn_formations_list(
             with conn.cursor(row_factory=dict_row) as cur:
                 profile = _learn_require_profile(cur, u, id_effectif)
                 oid = (profile.get("id_owner") or "").strip()
+                nm = not_modified(request, response, oid)
+                if nm is not None:
+                    return nm
 
                 where = ["ff.id_owner = %s"]
                 params = [oid]
@@ -4050,19 +3994,23 @@ def learn_formation_contenu_reorder(
                 if not _formation_exists_owner(cur, oid, fid):
                     raise HTTPException(status_code=404, detail="Formation introuvable.")
 
-                for idx, lid in enumerate(ids, start=1):
-                    cur.execute(
-                        """
-                        UPDATE public.tbl_contenu_ligne
-                        SET position = %s,
-                            date_modification = NOW()
-                        WHERE id_owner = %s
-                          AND id_form = %s
-                          AND id_ligne_contenu = %s
-                          AND COALESCE(archive, FALSE) = FALSE
-                        """,
-                        (idx, oid, fid, lid),
-                    )
+                # Une seule requête pour toutes les lignes (un id répété garde sa dernière position)
+                positions = {lid: idx for idx, lid in enumerate(ids, start=1)}
+                execute_unnest(
+                    cur,
+                    """
+                    UPDATE public.tbl_contenu_ligne cl
+                    SET position = u.position,
+                        date_modification = NOW()
+                    FROM UNNEST(%s::text[], %s::int[]) AS u(id_ligne_contenu, position)
+                    WHERE cl.id_owner = %s
+                      AND cl.id_form = %s
+                      AND cl.id_ligne_contenu = u.id_ligne_contenu
+                      AND COALESCE(cl.archive, FALSE) = FALSE
+                    """,
+                    list(positions.items()),
+                    extra_params=(oid, fid),
+                )
 
                 conn.commit()
 
@@ -6,11 +6,10 @@ import json
 import os
 import re
 import time
-import urllib.request
-import urllib.error
 
 from app.routers.skills_portal_common import get_conn
 from app.routers.learn_portal_common import learn_require_user, learn_fetch_profile
+from app.services.http_client import integration_post
 
 router = APIRouter()
 
@@ -285,26 +284,22 @@ def learn_lms_api_post(api_base: str, api_id: str, path: str, payload: Optional[
     url = base_url.rstrip("/") + "/" + str(path or "").strip("/")
     body = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8")
 
-    req = urllib.request.Request(
-        url=url,
-        data=body,
-        method="POST",
-        headers={
-            "Content-Type": "application/json; charset=utf-8",
-            "Accept": "application/json",
-            "ApiID": key,
-        },
-    )
-
     started = time.time()
 
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-            status = getattr(resp, "status", 200)
-    except urllib.error.HTTPError as e:
-        raw = e.read().decode("utf-8", errors="replace")
-        status = e.code
+        resp = integration_post(
+            "lms",
+            url,
+            data=body,
+            headers={
+                "Content-Type": "application/json; charset=utf-8",
+                "Accept": "application/json",
+                "ApiID": key,
+            },
+            timeout=timeout,
+        )
+        raw = resp.content.decode("utf-8", errors="replace")
+        status = resp.status_code
     except Exception as e:
         return {
             "ok": False,
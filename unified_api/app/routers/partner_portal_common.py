@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 import os
-import requests
+
+from app.services.http_client import integration_get
 
 # Partner utilise le même principe que les autres consoles :
 # - auth Supabase
@@ -39,7 +40,7 @@ def partner_get_supabase_user(access_token: str) -> dict:
     }
 
     try:
-        r = requests.get(url, headers=headers, timeout=15)
+        r = integration_get("supabase_auth", url, headers=headers)
 
         if r.status_code in (401, 403):
             raise HTTPException(status_code=401, detail="Session invalide ou expirée.")
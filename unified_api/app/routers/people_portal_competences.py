@@ -8,6 +8,7 @@ from app.routers.people_portal_common import (
     people_clean,
     people_fetch_profile_context,
 )
+from app.services.calendar_suggestion_store import invalidate_calendar_suggestions
 router = APIRouter()
 
 class PeopleAddCompetencePayload(BaseModel):
@@ -222,6 +223,7 @@ def people_competences_add(id_effectif: str, payload: PeopleAddCompetencePayload
                     )
                     row = cur.fetchone() or {}
             conn.commit()
+        invalidate_calendar_suggestions(id_owner, "evaluation")
         return {"added": row}
     except HTTPException:
         raise
@@ -3,7 +3,6 @@ from datetime import date
 from typing import Optional
 from urllib.parse import quote
 
-import requests
 from fastapi import APIRouter, File, HTTPException, Request, Response, UploadFile
 from pydantic import BaseModel
 from psycopg.rows import dict_row
@@ -13,6 +12,7 @@ from app.routers.people_portal_common import (
     people_clean,
     people_fetch_profile_context,
 )
+from app.services.http_client import integration_delete, integration_get, integration_post
 
 router = APIRouter()
 
@@ -309,11 +309,12 @@ async def people_upload_photo(id_effectif: str, request: Request, photo: UploadF
                 previous_path = _read_photo_path(cur, profile)
                 path = _photo_path(profile, content_type)
 
-                response = requests.post(
+                response = integration_post(
+                    "supabase_storage",
                     _storage_url(path),
                     headers={**_storage_headers(content_type), "x-upsert": "true"},
                     data=content,
-                    timeout=30,
+                    idempotent=True,
                 )
                 if response.status_code >= 400:
                     raise HTTPException(status_code=500, detail="Impossible d’enregistrer la photo de profil.")
@@ -322,7 +323,7 @@ async def people_upload_photo(id_effectif: str, request: Request, photo: UploadF
             conn.commit()
 
         if previous_path and previous_path != path:
-            requests.delete(_storage_url(previous_path), headers=_storage_headers(), timeout=15)
+            integration_delete("supabase_storage", _storage_url(previous_path), headers=_storage_headers())
 
         return {"saved": True, "has_photo": True}
     except HTTPException:
@@ -341,7 +342,7 @@ def people_get_photo(id_effectif: str, request: Request):
         if not path:
             raise HTTPException(status_code=404, detail="Aucune photo de profil.")
 
-        response = requests.get(_storage_url(path), headers=_storage_headers(), timeout=20)
+        response = integration_get("supabase_storage", _storage_url(path), headers=_storage_headers())
         if response.status_code == 404:
             raise HTTPException(status_code=404, detail="Aucune photo de profil.")
         if response.status_code >= 400:
@@ -8,7 +8,7 @@ import uuid
 import json
 from dotenv import load_dotenv
 
-from app.routers.MailManager import send_absent_mail
+from app.services.notification_queue import enqueue_notification
 
 # ---------------------------------------------------
 # ENV
@@ -228,9 +228,14 @@ def validate_consultant(
                     json.dumps(payload.absents)
                 ))
 
-                # Envoi du mail si absents
+                # Mail absents : envoyé par le dispatcher de notifications (un mail par formation)
                 if payload.absents and len(payload.absents) > 0:
-                    send_absent_mail(code_form, titre_form, payload.absents)
+                    enqueue_notification(
+                        cur,
+                        "absences",
+                        {"code_formation": code_form, "titre": titre_form, "absents": payload.absents},
+                        cle_regroupement=payload.id_action_formation,
+                    )
 
                 conn.commit()
                 return {"ok": True, "id_presence": id_presence}
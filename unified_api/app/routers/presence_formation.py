@@ -1,32 +1,23 @@
 from fastapi import APIRouter, HTTPException, Request
 from datetime import datetime
-from typing import Optional, Annotated
+from typing import Any, Dict, List, Optional, Annotated
 from pydantic import BaseModel, Field
-import os
-import json
+import threading
+import time
+import unicodedata
 import uuid
-from pathlib import Path
 
-import psycopg
 from psycopg.rows import dict_row
-from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
 
+from app.routers.skills_portal_common import get_conn
+from app.services.request_capture import capture_request
+
 # ======================================================
 # Router (prefix /presence)
 # ======================================================
 router = APIRouter(prefix="/presence", tags=["presence"])
 
-# ======================================================
-# Charger ENV
-# ======================================================
-load_dotenv()
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
 # ======================================================
 # Modèles
 # ======================================================
@@ -49,50 +40,6 @@ class PresenceInput(BaseModel):
     prenom_saisi: PrenomStr
 
 
-# ======================================================
-# Connexion DB
-# ======================================================
-def _missing_env():
-    return [k for k, v in {
-        "DB_HOST": DB_HOST,
-        "DB_PORT": DB_PORT,
-        "DB_NAME": DB_NAME,
-        "DB_USER": DB_USER,
-        "DB_PASSWORD": DB_PASSWORD,
-    }.items() if not v]
-
-
-def get_conn():
-    missing = _missing_env()
-    if missing:
-        raise HTTPException(status_code=500, detail=f"Variables manquantes: {', '.join(missing)}")
-    try:
-        return psycopg.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            sslmode="require"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur connexion DB: {e}")
-
-
-# ======================================================
-# Cache debug
-# ======================================================
-CACHE_DIR = Path(__file__).parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def save_cache(name: str, payload: dict):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname = CACHE_DIR / f"{name}_{ts}.json"
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-
-
 # ======================================================
 # SQL HELPERS
 # ======================================================
@@ -130,51 +77,30 @@ def get_action_formation_info(cur, id_af: str):
     }
 
 
-def find_participants(cur, id_af, nom, prenom):
+def fetch_participants(cur, id_af: str) -> List[Dict[str, Any]]:
     cur.execute("""
-        SELECT 
+        SELECT
             afe.id_action_formation_effectif,
-            ent.id_ent,
-            ent.nom_ent
+            eff.id_ent,
+            ent.nom_ent,
+            eff.nom_effectif,
+            eff.prenom_effectif
         FROM public.tbl_action_formation_effectif afe
         JOIN public.tbl_effectif_client eff ON eff.id_effectif = afe.id_effectif
         JOIN public.tbl_entreprise ent ON ent.id_ent = eff.id_ent
         WHERE afe.id_action_formation = %s
-          AND eff.nom_effectif ILIKE %s
-          AND eff.prenom_effectif ILIKE %s
-          AND afe.archive = FALSE
-    """, (id_af, f"%{nom}%", f"%{prenom}%"))
-    return cur.fetchall()
-
-
-def resolve_homonyme(cur, id_af, nom, prenom, id_ent):
-    cur.execute("""
-        SELECT 
-            afe.id_action_formation_effectif
-        FROM public.tbl_action_formation_effectif afe
-        JOIN public.tbl_effectif_client eff ON eff.id_effectif = afe.id_effectif
-        WHERE afe.id_action_formation = %s
-          AND eff.nom_effectif ILIKE %s
-          AND eff.prenom_effectif ILIKE %s
-          AND eff.id_ent = %s
           AND afe.archive = FALSE
-    """, (id_af, nom, prenom, id_ent))
-    return cur.fetchone()
-
-
-def check_duplicate(cur, id_afe, periode):
-    cur.execute("""
-        SELECT COUNT(*) AS count
-        FROM public.tbl_action_formation_presence
-        WHERE id_action_formation_effectif = %s
-          AND date_presence = CURRENT_DATE
-          AND periode = %s
-          AND archive = FALSE
-    """, (id_afe, periode))
-    return cur.fetchone()["count"] > 0
+    """, (id_af,))
+    return cur.fetchall() or []
 
 
-def insert_presence(cur, payload, ip, ua, periode):
+def insert_presence(cur, payload, ip, ua, periode) -> Optional[str]:
+    """
+    Insert idempotent en une instruction : aucune ligne insérée (None) si une présence
+    active existe déjà pour ce stagiaire / jour / période.
+    L'index unique partiel (sql/20261019_presence_formation_unique.sql) couvre les
+    validations simultanées ; sans lui, ON CONFLICT est sans effet.
+    """
     id_presence = str(uuid.uuid4())
     cur.execute("""
         INSERT INTO public.tbl_action_formation_presence
@@ -182,10 +108,20 @@ def insert_presence(cur, payload, ip, ua, periode):
          date_presence, periode, heure_presence, datetime_utc,
          ip_client, user_agent, source_validation,
          nom_saisi, prenom_saisi)
-        VALUES (%s, %s, CURRENT_DATE, %s,
-                (NOW() AT TIME ZONE 'Europe/Paris')::time,
-                NOW(), %s, %s, 'stagiaire',
-                %s, %s)
+        SELECT %s, %s, CURRENT_DATE, %s,
+               (NOW() AT TIME ZONE 'Europe/Paris')::time,
+               NOW(), %s, %s, 'stagiaire',
+               %s, %s
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM public.tbl_action_formation_presence p
+            WHERE p.id_action_formation_effectif = %s
+              AND p.date_presence = CURRENT_DATE
+              AND p.periode = %s
+              AND p.archive = FALSE
+        )
+        ON CONFLICT DO NOTHING
+        RETURNING id_action_formation_presence
     """, (
         id_presence,
         payload.id_action_formation_effectif,
@@ -194,8 +130,87 @@ def insert_presence(cur, payload, ip, ua, periode):
         ua,
         payload.nom_saisi,
         payload.prenom_saisi,
+        payload.id_action_formation_effectif,
+        periode,
     ))
-    return id_presence
+    row = cur.fetchone()
+    return id_presence if row else None
+
+
+# ======================================================
+# Roster de session (cache par action de formation)
+# - Chargé une fois (3 requêtes) et partagé par tous les stagiaires de la session
+# - Noms repliés (casse, accents, espaces) pour l'identification sans requête
+# - Participant introuvable : rechargement au plus une fois par _ROSTER_MISS_RELOAD_SECONDS
+#   (stagiaire ajouté en cours de journée)
+# - Chargements sérialisés par verrous répartis (_ROSTER_LOAD_STRIPES, taille fixe) : les
+#   identifiants inconnus des routes publiques ne créent aucun état
+# ======================================================
+_ROSTER_TTL_SECONDS = 300
+_ROSTER_MISS_RELOAD_SECONDS = 30
+_ROSTER_MAX_ITEMS = 64
+_ROSTER_CACHE: Dict[str, Dict[str, Any]] = {}
+_ROSTER_LOAD_STRIPES = 32
+_roster_lock = threading.Lock()
+_roster_load_locks = [threading.Lock() for _ in range(_ROSTER_LOAD_STRIPES)]
+
+
+def _fold(value: Any) -> str:
+    v = unicodedata.normalize("NFKD", str(value or ""))
+    v = "".join(c for c in v if not unicodedata.combining(c))
+    return " ".join(v.casefold().split())
+
+
+def _load_roster(id_af: str) -> Dict[str, Any]:
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            info = get_action_formation_info(cur, id_af)
+            rows = fetch_participants(cur, id_af)
+
+    participants = [
+        {
+            "id_action_formation_effectif": r["id_action_formation_effectif"],
+            "id_ent": r["id_ent"],
+            "nom_ent": r["nom_ent"],
+            "nom_f": _fold(r.get("nom_effectif")),
+            "prenom_f": _fold(r.get("prenom_effectif")),
+        }
+        for r in rows
+    ]
+    return {"ts": time.time(), "info": info, "participants": participants}
+
+
+def get_roster(id_af: str, max_age: float = _ROSTER_TTL_SECONDS) -> Dict[str, Any]:
+    entry = _ROSTER_CACHE.get(id_af)
+    if entry and time.time() - entry["ts"] <= max_age:
+        return entry
+
+    # Un seul chargement par action de formation : les requêtes simultanées attendent le résultat.
+    with _roster_load_locks[hash(id_af) % _ROSTER_LOAD_STRIPES]:
+        entry = _ROSTER_CACHE.get(id_af)
+        if entry and time.time() - entry["ts"] <= max_age:
+            return entry
+        entry = _load_roster(id_af)
+        with _roster_lock:
+            if len(_ROSTER_CACHE) >= _ROSTER_MAX_ITEMS and id_af not in _ROSTER_CACHE:
+                oldest = min(_ROSTER_CACHE.items(), key=lambda kv: kv[1]["ts"])[0]
+                _ROSTER_CACHE.pop(oldest, None)
+            _ROSTER_CACHE[id_af] = entry
+        return entry
+
+
+def find_participants(roster: Dict[str, Any], nom: str, prenom: str) -> List[Dict[str, Any]]:
+    # Même règle que l'ancien ILIKE '%nom%' / '%prenom%', sur les noms repliés
+    n, p = _fold(nom), _fold(prenom)
+    return [r for r in roster["participants"] if n in r["nom_f"] and p in r["prenom_f"]]
+
+
+def resolve_homonyme(roster: Dict[str, Any], nom: str, prenom: str, id_ent: str) -> Optional[Dict[str, Any]]:
+    n, p = _fold(nom), _fold(prenom)
+    for r in roster["participants"]:
+        if r["nom_f"] == n and r["prenom_f"] == p and r["id_ent"] == id_ent:
+            return r
+    return None
 
 
 # ======================================================
@@ -208,54 +223,60 @@ def healthz():
 
 @router.get("/init")
 def init_presence(id_action_formation: IdAFStr):
-    with get_conn() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            info = get_action_formation_info(cur, id_action_formation)
-            return {"ok": True, "formation": info}
+    roster = get_roster(id_action_formation)
+    return {"ok": True, "formation": roster["info"]}
 
 
 @router.post("/check")
 def check_participant(id_action_formation: IdAFStr, payload: IdentificationInput):
-    save_cache("check_in", payload.model_dump())
+    capture_request("presence_check_in", payload, ref=id_action_formation)
 
-    with get_conn() as conn:
-        with conn.cursor(row_factory=dict_row) as cur:
-            results = find_participants(cur, id_action_formation, payload.nom, payload.prenom)
-
-            if not results:
-                raise HTTPException(status_code=404, detail="Participant introuvable.")
-
-            if len(results) == 1:
-                return {
-                    "ok": True,
-                    "id_action_formation_effectif": results[0]["id_action_formation_effectif"],
-                    "entreprise": results[0]["nom_ent"],
-                }
-
-            if not payload.id_ent:
-                entreprises = [
-                    {"id_ent": r["id_ent"], "nom_ent": r["nom_ent"]}
-                    for r in results
-                ]
-                return {"ok": False, "ambiguous": True, "entreprises": entreprises}
-
-            resolved = resolve_homonyme(cur, id_action_formation, payload.nom, payload.prenom, payload.id_ent)
-
-            if not resolved:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Aucun participant ne correspond à cette entreprise."
-                )
+    try:
+        roster = get_roster(id_action_formation)
+    except HTTPException as e:
+        # Action inconnue : même réponse qu'avant le cache (aucun participant trouvé)
+        if e.status_code == 404:
+            raise HTTPException(status_code=404, detail="Participant introuvable.")
+        raise
+    results = find_participants(roster, payload.nom, payload.prenom)
+    if not results and time.time() - roster["ts"] > _ROSTER_MISS_RELOAD_SECONDS:
+        roster = get_roster(id_action_formation, max_age=_ROSTER_MISS_RELOAD_SECONDS)
+        results = find_participants(roster, payload.nom, payload.prenom)
+
+    if not results:
+        raise HTTPException(status_code=404, detail="Participant introuvable.")
+
+    if len(results) == 1:
+        return {
+            "ok": True,
+            "id_action_formation_effectif": results[0]["id_action_formation_effectif"],
+            "entreprise": results[0]["nom_ent"],
+        }
+
+    if not payload.id_ent:
+        entreprises = [
+            {"id_ent": r["id_ent"], "nom_ent": r["nom_ent"]}
+            for r in results
+        ]
+        return {"ok": False, "ambiguous": True, "entreprises": entreprises}
+
+    resolved = resolve_homonyme(roster, payload.nom, payload.prenom, payload.id_ent)
+
+    if not resolved:
+        raise HTTPException(
+            status_code=404,
+            detail="Aucun participant ne correspond à cette entreprise."
+        )
 
-            return {
-                "ok": True,
-                "id_action_formation_effectif": resolved["id_action_formation_effectif"],
-            }
+    return {
+        "ok": True,
+        "id_action_formation_effectif": resolved["id_action_formation_effectif"],
+    }
 
 
 @router.post("/validate")
 def validate_presence(payload: PresenceInput, request: Request):
-    save_cache("validate_in", payload.model_dump())
+    capture_request("presence_validate_in", payload, ref=payload.id_action_formation_effectif)
 
     ip_client = request.client.host
     user_agent = request.headers.get("User-Agent", "")
@@ -265,13 +286,13 @@ def validate_presence(payload: PresenceInput, request: Request):
 
     with get_conn() as conn:
         with conn.cursor(row_factory=dict_row) as cur:
-            if check_duplicate(cur, payload.id_action_formation_effectif, periode):
-                raise HTTPException(
-                    status_code=409,
-                    detail="Présence déjà validée pour cette période."
-                )
-
             id_p = insert_presence(cur, payload, ip_client, user_agent, periode)
             conn.commit()
 
-            return {"ok": True, "id_presence": id_p}
+    if not id_p:
+        raise HTTPException(
+            status_code=409,
+            detail="Présence déjà validée pour cette période."
+        )
+
+    return {"ok": True, "id_presence": id_p}
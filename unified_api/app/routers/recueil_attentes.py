@@ -1,17 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
 from typing import List, Optional, Annotated
 from pydantic import BaseModel, Field
 import os
 import json
 import uuid
-from pathlib import Path
 
 import psycopg
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
 
+from app.services.request_capture import capture_request
+
 # ======================================================
 # ENV
 # ======================================================
@@ -166,20 +166,6 @@ def insert_recueil_attentes(cur, payload: RecueilInput) -> str:
     return id_recueil
 
 
-# ======================================================
-# Cache local (debug / audit)
-# ======================================================
-CACHE_DIR = Path(__file__).parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def save_cache(payload: RecueilInput):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname = CACHE_DIR / f"recueil_attentes_{payload.id_action_formation_effectif}_{ts}.json"
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(payload.model_dump(), f, ensure_ascii=False, indent=2)
-
-
 # ======================================================
 # Endpoints
 # ======================================================
@@ -199,7 +185,7 @@ def submit_recueil(payload: RecueilInput):
             with conn.cursor(row_factory=dict_row) as cur:
                 id_recueil = insert_recueil_attentes(cur, payload)
                 conn.commit()
-                save_cache(payload)
+                capture_request("recueil_attentes", payload, ref=payload.id_action_formation_effectif)
 
         return {"ok": True, "id_recueil_attentes": id_recueil}
 
@@ -1,18 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
 import os
 import json
 import uuid
-from pathlib import Path
 
 import psycopg
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
 
-from app.routers.MailManager import send_satisfaction_consultant_mail
+from app.services.notification_queue import enqueue_notification
+from app.services.request_capture import capture_request
+
 # ======================================================
 # ENV
 # ======================================================
@@ -161,21 +161,6 @@ def get_conn():
         raise HTTPException(status_code=500, detail=f"Erreur connexion DB: {e}")
 
 
-# ======================================================
-# Cache local (debug / audit)
-# ======================================================
-
-CACHE_DIR = Path(__file__).parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def save_cache(payload: SatisfactionConsultInput):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname = CACHE_DIR / f"satisfaction_consultant_{payload.id_action_formation}_{ts}.json"
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(payload.model_dump(), f, ensure_ascii=False, indent=2)
-
-
 # ======================================================
 # Helpers internes
 # ======================================================
@@ -669,19 +654,24 @@ def save_satisfaction_consultant(payload: SatisfactionConsultInput):
 
                     mode = "insert"
 
+                # Mail d'information : envoyé par le dispatcher de notifications
+                enqueue_notification(
+                    cur,
+                    "satisfaction_consultant",
+                    {
+                        "code_formation": code_formation,
+                        "titre_formation": titre_formation,
+                        "prenom": prenom_consultant,
+                        "nom": nom_consultant,
+                        "ref": id_action_formation,
+                        "mode": mode,
+                        "code_action_formation": code_action_formation,
+                    },
+                    cle_regroupement=id_action_formation,
+                )
+
                 conn.commit()
-                save_cache(payload)
-
-        # Envoi mail hors transaction
-        send_satisfaction_consultant_mail(
-            code_formation=code_formation,
-            titre_formation=titre_formation,
-            prenom=prenom_consultant,
-            nom=nom_consultant,
-            id_action_formation=id_action_formation,
-            mode=mode,
-            code_action_formation=code_action_formation,
-        )
+                capture_request("satisfaction_consultant", payload, ref=payload.id_action_formation)
 
         return SatisfactionConsultSaveResponse(
             id_satisfaction_consultant=id_satis,
@@ -1,18 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field
 import os
 import json
 import uuid
-from pathlib import Path
 
 import psycopg
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
 
-from app.routers.MailManager import send_satisfaction_responsable_mail
+from app.services.notification_queue import enqueue_notification
+from app.services.request_capture import capture_request
+
 # ======================================================
 # ENV
 # ======================================================
@@ -158,21 +158,6 @@ def get_conn():
         raise HTTPException(status_code=500, detail=f"Erreur connexion DB: {e}")
 
 
-# ======================================================
-# Cache local (debug / audit)
-# ======================================================
-
-CACHE_DIR = Path(__file__).parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def save_cache(payload: SatisfactionRespInput):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname = CACHE_DIR / f"satisfaction_responsable_{payload.id_action_formation_entreprise}_{ts}.json"
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(payload.model_dump(), f, ensure_ascii=False, indent=2)
-
-
 # ======================================================
 # Helpers internes
 # ======================================================
@@ -636,20 +621,25 @@ def save_satisfaction_responsable(payload: SatisfactionRespInput):
                     )
                     mode = "insert"
 
-                conn.commit()
-                save_cache(payload)
-
-                # Envoi mail hors transaction
-                send_satisfaction_responsable_mail(
-                    code_formation=code_formation,
-                    titre_formation=titre_formation,
-                    prenom=prenom_contact,
-                    nom=nom_contact,
-                    id_action_formation_entreprise=payload.id_action_formation_entreprise,
-                    mode=mode,
-                    code_action_formation=code_action_formation,
+                # Mail d'information : envoyé par le dispatcher de notifications
+                enqueue_notification(
+                    cur,
+                    "satisfaction_responsable",
+                    {
+                        "code_formation": code_formation,
+                        "titre_formation": titre_formation,
+                        "prenom": prenom_contact,
+                        "nom": nom_contact,
+                        "ref": payload.id_action_formation_entreprise,
+                        "mode": mode,
+                        "code_action_formation": code_action_formation,
+                    },
+                    cle_regroupement=id_action_formation,
                 )
 
+                conn.commit()
+                capture_request("satisfaction_responsable", payload, ref=payload.id_action_formation_entreprise)
+
                 return SatisfactionRespSaveResponse(
                     id_satisfaction_responsable=id_satis,
                     mode=mode,
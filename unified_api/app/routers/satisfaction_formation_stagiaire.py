@@ -1,18 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field
 import os
 import json
 import uuid
-from pathlib import Path
 
 import psycopg
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
 
-from app.routers.MailManager import send_satisfaction_stagiaire_mail
+from app.services.notification_queue import enqueue_notification
+from app.services.request_capture import capture_request
+
 # ======================================================
 # ENV
 # ======================================================
@@ -162,21 +162,6 @@ def get_conn():
         raise HTTPException(status_code=500, detail=f"Erreur connexion DB: {e}")
 
 
-# ======================================================
-# Cache local (debug / audit)
-# ======================================================
-
-CACHE_DIR = Path(__file__).parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def save_cache(payload: SatisfactionInput):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname = CACHE_DIR / f"satisfaction_stagiaire_{payload.id_action_formation_effectif}_{ts}.json"
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(payload.model_dump(), f, ensure_ascii=False, indent=2)
-
-
 # ======================================================
 # Helpers
 # ======================================================
@@ -577,20 +562,24 @@ def save_satisfaction(payload: SatisfactionInput):
                     )
                     mode = "insert"
 
-                conn.commit()
-                save_cache(payload)
-
-                 # Envoi mail hors transaction
-                send_satisfaction_stagiaire_mail(
-                    code_formation=code_formation,
-                    titre_formation=titre_formation,
-                    prenom=prenom_effectif,
-                    nom=nom_effectif,
-                    id_action_formation_effectif=payload.id_action_formation_effectif,
-                    mode=mode,
-                    code_action_formation=code_action_formation,
+                # Mail d'information : envoyé par le dispatcher de notifications
+                enqueue_notification(
+                    cur,
+                    "satisfaction_stagiaire",
+                    {
+                        "code_formation": code_formation,
+                        "titre_formation": titre_formation,
+                        "prenom": prenom_effectif,
+                        "nom": nom_effectif,
+                        "ref": payload.id_action_formation_effectif,
+                        "mode": mode,
+                        "code_action_formation": code_action_formation,
+                    },
+                    cle_regroupement=id_action_formation,
                 )
 
+                conn.commit()
+                capture_request("satisfaction_stagiaire", payload, ref=payload.id_action_formation_effectif)
 
                 return SatisfactionSaveResponse(
                     id_satisfaction_stagiaire=id_satis,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Tuple
 from collections import defaultdict
@@ -13,6 +13,8 @@ from app.routers.skills_portal_common import (
     resolve_insights_id_ent_for_request,
 )
 
+from app.services.conditional_get import not_modified
+from app.services.fast_json import fast_json_response
 from app.services.skills_analyse_engine import (
     CRITICITE_MIN_DEFAULT,
     CRITICITE_MIN_MAX,
@@ -300,7 +302,7 @@ def get_analyse_summary(
 
                 CRITICITE_MIN = int(criticite_min)
 
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 postes_fragiles_records = _fetch_postes_fragility_records(
                     cur,
@@ -989,6 +991,141 @@ class AnalysePrevisionsSortiesDetailResponse(BaseModel):
 # Endpoint: Détail Prévisions - Sorties (liste nominative)
 # ======================================================
 
+def _analyse_previsions_sorties_detail_data(cur, id_ent: str, horizon_years: int, id_service: Optional[str], limit: int) -> AnalysePrevisionsSortiesDetailResponse:
+    scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
+
+    sql = f"""
+    WITH
+    {cte_sql},
+    effectifs_valid AS (
+            SELECT
+                e.id_effectif,
+                e.prenom_effectif,
+                e.nom_effectif,
+                e.id_service,
+                e.id_poste_actuel,
+
+                e.date_sortie_prevue,
+                COALESCE(e.havedatefin, FALSE) AS havedatefin,
+                e.motif_sortie,
+
+                e.retraite_estimee::int AS retraite_annee,
+                COALESCE(EXTRACT(MONTH FROM e.date_entree_entreprise_effectif)::int, 6) AS m_entree,
+                COALESCE(EXTRACT(DAY FROM e.date_entree_entreprise_effectif)::int, 15) AS d_entree
+            FROM public.tbl_effectif_client e
+            JOIN effectifs_scope es ON es.id_effectif = e.id_effectif
+            WHERE COALESCE(e.archive, FALSE) = FALSE
+            AND COALESCE(e.is_temp, FALSE) = FALSE
+            AND COALESCE(e.statut_actif, TRUE) = TRUE
+        ),
+        effectifs_exit AS (
+            SELECT
+                ev.*,
+                CASE
+                    WHEN ev.date_sortie_prevue IS NOT NULL THEN ev.date_sortie_prevue
+                    WHEN ev.retraite_annee IS NOT NULL THEN
+                        (
+                            make_date(ev.retraite_annee, ev.m_entree, 1)
+                            + (
+                                (
+                                    LEAST(
+                                        ev.d_entree,
+                                        EXTRACT(
+                                            DAY
+                                            FROM (
+                                                date_trunc('month', make_date(ev.retraite_annee, ev.m_entree, 1))
+                                                + interval '1 month - 1 day'
+                                            )
+                                        )::int
+                                    ) - 1
+                                )::text || ' days'
+                            )::interval
+                        )::date
+                    ELSE NULL
+                END AS exit_date,
+
+                -- "Raison de la sortie" (UI)
+                CASE
+                    WHEN ev.date_sortie_prevue IS NOT NULL THEN COALESCE(
+                        NULLIF(BTRIM(COALESCE(ev.motif_sortie, '')), ''),
+                        CASE WHEN COALESCE(ev.havedatefin, FALSE) THEN 'Fin de contrat / sortie prévue' ELSE 'Sortie prévue' END
+                    )
+                    WHEN ev.retraite_annee IS NOT NULL THEN 'Retraite estimée'
+                    ELSE NULL
+                END AS raison_sortie
+            FROM effectifs_valid ev
+        )
+        SELECT
+            ee.id_effectif,
+            ee.prenom_effectif,
+            ee.nom_effectif,
+            ee.id_service,
+            COALESCE(o.nom_service, '') AS nom_service,
+            ee.id_poste_actuel,
+            COALESCE(p.intitule_poste, '') AS intitule_poste,
+            COALESCE(p.codif_poste, '') AS codif_poste,
+            COALESCE(p.codif_client, '') AS codif_client,
+            ee.exit_date,
+            ee.havedatefin,
+            ee.motif_sortie,
+            ee.raison_sortie,
+            (ee.exit_date - CURRENT_DATE)::int AS days_left
+        FROM effectifs_exit ee
+        LEFT JOIN public.tbl_entreprise_organigramme o
+        ON o.id_ent = %s
+        AND o.id_service = ee.id_service
+        AND o.archive = FALSE
+        LEFT JOIN public.tbl_fiche_poste p
+        ON p.id_poste = ee.id_poste_actuel
+        WHERE ee.exit_date IS NOT NULL
+        AND ee.exit_date >= CURRENT_DATE
+        AND ee.exit_date <= make_date(EXTRACT(YEAR FROM CURRENT_DATE)::int + %s::int, 12, 31)::date
+        ORDER BY ee.exit_date ASC, ee.nom_effectif ASC, ee.prenom_effectif ASC
+        LIMIT %s
+        """
+
+    cur.execute(sql, tuple(cte_params + [id_ent, horizon_years, limit]))
+    rows = cur.fetchall() or []
+
+    items: List[AnalysePrevisionSortieItem] = []
+    for r in rows:
+        prenom = (r.get("prenom_effectif") or "").strip()
+        nom = (r.get("nom_effectif") or "").strip()
+        full = (prenom + " " + nom).strip() or "—"
+
+        exit_date = r.get("exit_date")
+        if hasattr(exit_date, "isoformat"):
+            exit_date = exit_date.isoformat()
+
+        items.append(
+            AnalysePrevisionSortieItem(
+                id_effectif=r.get("id_effectif"),
+                prenom_effectif=prenom or None,
+                nom_effectif=nom or None,
+                full=full,
+                id_service=r.get("id_service"),
+                nom_service=(r.get("nom_service") or "").strip() or "—",
+                id_poste_actuel=r.get("id_poste_actuel"),
+                intitule_poste=(r.get("intitule_poste") or "").strip() or None,
+                exit_date=exit_date,                            
+                days_left=int(r.get("days_left") or 0) if r.get("days_left") is not None else None,
+                codif_poste=(r.get("codif_poste") or "").strip() or None,
+                codif_client=(r.get("codif_client") or "").strip() or None,
+                havedatefin=bool(r.get("havedatefin")),
+                motif_sortie=(r.get("motif_sortie") or "").strip() or None,
+                raison_sortie=(r.get("raison_sortie") or "").strip() or None,
+            )
+        )
+
+    return AnalysePrevisionsSortiesDetailResponse(
+        scope=scope,
+        horizon_years=int(horizon_years),
+        updated_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        items=items,
+    )
+
+
 @router.get(
     "/skills/analyse/previsions/sorties/detail/{id_contact}",
     response_model=AnalysePrevisionsSortiesDetailResponse,
@@ -996,6 +1133,7 @@ class AnalysePrevisionsSortiesDetailResponse(BaseModel):
 def get_analyse_previsions_sorties_detail(
     id_contact: str,
     request: Request,
+    response: Response,
     horizon_years: int = Query(default=1, ge=1, le=5),
     id_service: Optional[str] = Query(default=None),
     limit: int = Query(default=200, ge=1, le=2000),
@@ -1004,141 +1142,13 @@ def get_analyse_previsions_sorties_detail(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
-
-
-                scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
-
-                sql = f"""
-                WITH
-                {cte_sql},
-                effectifs_valid AS (
-                        SELECT
-                            e.id_effectif,
-                            e.prenom_effectif,
-                            e.nom_effectif,
-                            e.id_service,
-                            e.id_poste_actuel,
-
-                            e.date_sortie_prevue,
-                            COALESCE(e.havedatefin, FALSE) AS havedatefin,
-                            e.motif_sortie,
-
-                            e.retraite_estimee::int AS retraite_annee,
-                            COALESCE(EXTRACT(MONTH FROM e.date_entree_entreprise_effectif)::int, 6) AS m_entree,
-                            COALESCE(EXTRACT(DAY FROM e.date_entree_entreprise_effectif)::int, 15) AS d_entree
-                        FROM public.tbl_effectif_client e
-                        JOIN effectifs_scope es ON es.id_effectif = e.id_effectif
-                        WHERE COALESCE(e.archive, FALSE) = FALSE
-                        AND COALESCE(e.is_temp, FALSE) = FALSE
-                        AND COALESCE(e.statut_actif, TRUE) = TRUE
-                    ),
-                    effectifs_exit AS (
-                        SELECT
-                            ev.*,
-                            CASE
-                                WHEN ev.date_sortie_prevue IS NOT NULL THEN ev.date_sortie_prevue
-                                WHEN ev.retraite_annee IS NOT NULL THEN
-                                    (
-                                        make_date(ev.retraite_annee, ev.m_entree, 1)
-                                        + (
-                                            (
-                                                LEAST(
-                                                    ev.d_entree,
-                                                    EXTRACT(
-                                                        DAY
-                                                        FROM (
-                                                            date_trunc('month', make_date(ev.retraite_annee, ev.m_entree, 1))
-                                                            + interval '1 month - 1 day'
-                                                        )
-                                                    )::int
-                                                ) - 1
-                                            )::text || ' days'
-                                        )::interval
-                                    )::date
-                                ELSE NULL
-                            END AS exit_date,
-
-                            -- "Raison de la sortie" (UI)
-                            CASE
-                                WHEN ev.date_sortie_prevue IS NOT NULL THEN COALESCE(
-                                    NULLIF(BTRIM(COALESCE(ev.motif_sortie, '')), ''),
-                                    CASE WHEN COALESCE(ev.havedatefin, FALSE) THEN 'Fin de contrat / sortie prévue' ELSE 'Sortie prévue' END
-                                )
-                                WHEN ev.retraite_annee IS NOT NULL THEN 'Retraite estimée'
-                                ELSE NULL
-                            END AS raison_sortie
-                        FROM effectifs_valid ev
-                    )
-                    SELECT
-                        ee.id_effectif,
-                        ee.prenom_effectif,
-                        ee.nom_effectif,
-                        ee.id_service,
-                        COALESCE(o.nom_service, '') AS nom_service,
-                        ee.id_poste_actuel,
-                        COALESCE(p.intitule_poste, '') AS intitule_poste,
-                        COALESCE(p.codif_poste, '') AS codif_poste,
-                        COALESCE(p.codif_client, '') AS codif_client,
-                        ee.exit_date,
-                        ee.havedatefin,
-                        ee.motif_sortie,
-                        ee.raison_sortie,
-                        (ee.exit_date - CURRENT_DATE)::int AS days_left
-                    FROM effectifs_exit ee
-                    LEFT JOIN public.tbl_entreprise_organigramme o
-                    ON o.id_ent = %s
-                    AND o.id_service = ee.id_service
-                    AND o.archive = FALSE
-                    LEFT JOIN public.tbl_fiche_poste p
-                    ON p.id_poste = ee.id_poste_actuel
-                    WHERE ee.exit_date IS NOT NULL
-                    AND ee.exit_date >= CURRENT_DATE
-                    AND ee.exit_date <= make_date(EXTRACT(YEAR FROM CURRENT_DATE)::int + %s::int, 12, 31)::date
-                    ORDER BY ee.exit_date ASC, ee.nom_effectif ASC, ee.prenom_effectif ASC
-                    LIMIT %s
-                    """
-
-                cur.execute(sql, tuple(cte_params + [id_ent, horizon_years, limit]))
-                rows = cur.fetchall() or []
-
-                items: List[AnalysePrevisionSortieItem] = []
-                for r in rows:
-                    prenom = (r.get("prenom_effectif") or "").strip()
-                    nom = (r.get("nom_effectif") or "").strip()
-                    full = (prenom + " " + nom).strip() or "—"
-
-                    exit_date = r.get("exit_date")
-                    if hasattr(exit_date, "isoformat"):
-                        exit_date = exit_date.isoformat()
-
-                    items.append(
-                        AnalysePrevisionSortieItem(
-                            id_effectif=r.get("id_effectif"),
-                            prenom_effectif=prenom or None,
-                            nom_effectif=nom or None,
-                            full=full,
-                            id_service=r.get("id_service"),
-                            nom_service=(r.get("nom_service") or "").strip() or "—",
-                            id_poste_actuel=r.get("id_poste_actuel"),
-                            intitule_poste=(r.get("intitule_poste") or "").strip() or None,
-                            exit_date=exit_date,                            
-                            days_left=int(r.get("days_left") or 0) if r.get("days_left") is not None else None,
-                            codif_poste=(r.get("codif_poste") or "").strip() or None,
-                            codif_client=(r.get("codif_client") or "").strip() or None,
-                            havedatefin=bool(r.get("havedatefin")),
-                            motif_sortie=(r.get("motif_sortie") or "").strip() or None,
-                            raison_sortie=(r.get("raison_sortie") or "").strip() or None,
-                        )
-                    )
-
-                return AnalysePrevisionsSortiesDetailResponse(
-                    scope=scope,
-                    horizon_years=int(horizon_years),
-                    updated_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
-                    items=items,
+                nm = not_modified(request, response, id_ent)
+                if nm is not None:
+                    return nm
+                return fast_json_response(
+                    _analyse_previsions_sorties_detail_data(cur, id_ent, horizon_years, id_service, limit),
+                    response=response,
                 )
-
     except HTTPException:
         raise
     except Exception as e:
@@ -1187,6 +1197,49 @@ class AnalysePrevisionsCritiquesImpacteesDetailResponse(BaseModel):
 # ======================================================
 # Endpoint : Prevision- critiques impactees
 # ======================================================
+def _analyse_previsions_critiques_impactees_detail_data(cur, id_ent: str, horizon_years: int, id_service: Optional[str], criticite_min: int, limit: int) -> AnalysePrevisionsCritiquesImpacteesDetailResponse:
+    scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
+    impacts = _fetch_prevision_competence_impacts(
+        cur,
+        id_ent,
+        scope.id_service,
+        int(horizon_years),
+        int(criticite_min),
+        int(limit),
+    )
+
+    items: List[AnalysePrevisionCritiqueImpacteeItem] = []
+    for r in impacts:
+        items.append(
+            AnalysePrevisionCritiqueImpacteeItem(
+                id_comp=r.get("id_comp"),
+                code=(r.get("code") or None),
+                intitule=(r.get("intitule") or None),
+                id_domaine_competence=r.get("id_domaine_competence"),
+                domaine_titre_court=(r.get("domaine_titre_court") or None),
+                domaine_couleur=(r.get("domaine_couleur") or None),
+                nb_postes_impactes=int(r.get("nb_postes_impactes") or 0),
+                max_criticite=int(r.get("max_criticite") or 0),
+                nb_porteurs_now=int(r.get("nb_porteurs_now") or 0),
+                nb_porteurs_sortants=int(r.get("nb_porteurs_sortants") or 0),
+                nb_porteurs_restants=int(r.get("nb_porteurs_restants") or 0),
+                last_exit_date=r.get("last_exit_date"),
+                indice_fragilite_horizon=int(r.get("indice_fragilite_horizon") or 0),
+                delta_fragilite=int(r.get("delta_fragilite") or 0),
+                priorite=(r.get("priorite") or None),
+                priorite_score=int(r.get("priorite_score") or 0),
+            )
+        )
+
+    return AnalysePrevisionsCritiquesImpacteesDetailResponse(
+        scope=scope,
+        horizon_years=int(horizon_years),
+        criticite_min=int(criticite_min),
+        updated_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        items=items,
+    )
+
+
 @router.get(
     "/skills/analyse/previsions/critiques/detail/{id_contact}",
     response_model=AnalysePrevisionsCritiquesImpacteesDetailResponse,
@@ -1194,6 +1247,7 @@ class AnalysePrevisionsCritiquesImpacteesDetailResponse(BaseModel):
 def get_analyse_previsions_critiques_impactees_detail(
     id_contact: str,
     request: Request,
+    response: Response,
     horizon_years: int = Query(default=1, ge=1, le=5),
     id_service: Optional[str] = Query(default=None),
     criticite_min: int = Query(default=CRITICITE_MIN_DEFAULT, ge=CRITICITE_MIN_MIN, le=CRITICITE_MIN_MAX),
@@ -1203,47 +1257,13 @@ def get_analyse_previsions_critiques_impactees_detail(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
-                scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                impacts = _fetch_prevision_competence_impacts(
-                    cur,
-                    id_ent,
-                    scope.id_service,
-                    int(horizon_years),
-                    int(criticite_min),
-                    int(limit),
-                )
-
-                items: List[AnalysePrevisionCritiqueImpacteeItem] = []
-                for r in impacts:
-                    items.append(
-                        AnalysePrevisionCritiqueImpacteeItem(
-                            id_comp=r.get("id_comp"),
-                            code=(r.get("code") or None),
-                            intitule=(r.get("intitule") or None),
-                            id_domaine_competence=r.get("id_domaine_competence"),
-                            domaine_titre_court=(r.get("domaine_titre_court") or None),
-                            domaine_couleur=(r.get("domaine_couleur") or None),
-                            nb_postes_impactes=int(r.get("nb_postes_impactes") or 0),
-                            max_criticite=int(r.get("max_criticite") or 0),
-                            nb_porteurs_now=int(r.get("nb_porteurs_now") or 0),
-                            nb_porteurs_sortants=int(r.get("nb_porteurs_sortants") or 0),
-                            nb_porteurs_restants=int(r.get("nb_porteurs_restants") or 0),
-                            last_exit_date=r.get("last_exit_date"),
-                            indice_fragilite_horizon=int(r.get("indice_fragilite_horizon") or 0),
-                            delta_fragilite=int(r.get("delta_fragilite") or 0),
-                            priorite=(r.get("priorite") or None),
-                            priorite_score=int(r.get("priorite_score") or 0),
-                        )
-                    )
-
-                return AnalysePrevisionsCritiquesImpacteesDetailResponse(
-                    scope=scope,
-                    horizon_years=int(horizon_years),
-                    criticite_min=int(criticite_min),
-                    updated_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
-                    items=items,
+                nm = not_modified(request, response, id_ent)
+                if nm is not None:
+                    return nm
+                return fast_json_response(
+                    _analyse_previsions_critiques_impactees_detail_data(cur, id_ent, horizon_years, id_service, criticite_min, limit),
+                    response=response,
                 )
-
     except HTTPException:
         raise
     except Exception as e:
@@ -1272,7 +1292,7 @@ def get_analyse_previsions_critiques_modal(
 
 
                 scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 # Resolve comp_key => id_competence
                 cur.execute(
@@ -1693,10 +1713,25 @@ def get_analyse_previsions_postes_rouges_detail(
 # ======================================================
 # Endpoints Prévisions RH - transitions / transmissions
 # ======================================================
+def _analyse_previsions_sorties_confirmees_detail_data(cur, id_ent: str, horizon_years: int, id_service: Optional[str], criticite_min: int, limit: int) -> Dict[str, Any]:
+    scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
+    items = _fetch_prevision_transition_events(
+        cur, id_ent, scope.id_service, int(horizon_years), int(criticite_min), "confirmed", int(limit)
+    )
+    return {
+        "scope": scope.model_dump() if hasattr(scope, "model_dump") else scope,
+        "horizon_years": int(horizon_years),
+        "criticite_min": int(criticite_min),
+        "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "items": items,
+    }
+
+
 @router.get("/skills/analyse/previsions/sorties-confirmees/detail/{id_contact}")
 def get_analyse_previsions_sorties_confirmees_detail(
     id_contact: str,
     request: Request,
+    response: Response,
     horizon_years: int = Query(default=1, ge=1, le=5),
     id_service: Optional[str] = Query(default=None),
     criticite_min: int = Query(default=CRITICITE_MIN_DEFAULT, ge=CRITICITE_MIN_MIN, le=CRITICITE_MIN_MAX),
@@ -1706,27 +1741,35 @@ def get_analyse_previsions_sorties_confirmees_detail(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
-                scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                items = _fetch_prevision_transition_events(
-                    cur, id_ent, scope.id_service, int(horizon_years), int(criticite_min), "confirmed", int(limit)
-                )
-                return {
-                    "scope": scope.model_dump() if hasattr(scope, "model_dump") else scope,
-                    "horizon_years": int(horizon_years),
-                    "criticite_min": int(criticite_min),
-                    "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-                    "items": items,
-                }
+                nm = not_modified(request, response, id_ent)
+                if nm is not None:
+                    return nm
+                return _analyse_previsions_sorties_confirmees_detail_data(cur, id_ent, horizon_years, id_service, criticite_min, limit)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur serveur : {e}")
 
 
+def _analyse_previsions_sorties_potentielles_detail_data(cur, id_ent: str, horizon_years: int, id_service: Optional[str], criticite_min: int, limit: int) -> Dict[str, Any]:
+    scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
+    items = _fetch_prevision_transition_events(
+        cur, id_ent, scope.id_service, int(horizon_years), int(criticite_min), "potential", int(limit)
+    )
+    return {
+        "scope": scope.model_dump() if hasattr(scope, "model_dump") else scope,
+        "horizon_years": int(horizon_years),
+        "criticite_min": int(criticite_min),
+        "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "items": items,
+    }
+
+
 @router.get("/skills/analyse/previsions/sorties-potentielles/detail/{id_contact}")
 def get_analyse_previsions_sorties_potentielles_detail(
     id_contact: str,
     request: Request,
+    response: Response,
     horizon_years: int = Query(default=1, ge=1, le=5),
     id_service: Optional[str] = Query(default=None),
     criticite_min: int = Query(default=CRITICITE_MIN_DEFAULT, ge=CRITICITE_MIN_MIN, le=CRITICITE_MIN_MAX),
@@ -1736,17 +1779,10 @@ def get_analyse_previsions_sorties_potentielles_detail(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
-                scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                items = _fetch_prevision_transition_events(
-                    cur, id_ent, scope.id_service, int(horizon_years), int(criticite_min), "potential", int(limit)
-                )
-                return {
-                    "scope": scope.model_dump() if hasattr(scope, "model_dump") else scope,
-                    "horizon_years": int(horizon_years),
-                    "criticite_min": int(criticite_min),
-                    "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-                    "items": items,
-                }
+                nm = not_modified(request, response, id_ent)
+                if nm is not None:
+                    return nm
+                return _analyse_previsions_sorties_potentielles_detail_data(cur, id_ent, horizon_years, id_service, criticite_min, limit)
     except HTTPException:
         raise
     except Exception as e:
@@ -1989,26 +2025,25 @@ def get_analyse_previsions_detail_pdf(
         if k not in ("sorties-confirmees", "sorties-potentielles", "transmissions", "sorties", "critiques", "postes-rouges"):
             raise HTTPException(status_code=400, detail="Table prévisionnelle non imprimable.")
 
+        def _load(builder, *args):
+            # Données brutes (sans ETag ni FastJSONResponse) des routes de détail
+            with get_conn() as conn:
+                with conn.cursor(row_factory=dict_row) as cur:
+                    id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                    return builder(cur, id_ent, *args)
+
         if k == "sorties-confirmees":
-            detail = get_analyse_previsions_sorties_confirmees_detail(
-                id_contact=id_contact,
-                request=request,
-                horizon_years=horizon_years,
-                id_service=id_service,
-                criticite_min=criticite_min,
-                limit=limit,
+            detail = _load(
+                _analyse_previsions_sorties_confirmees_detail_data,
+                horizon_years, id_service, criticite_min, limit,
             )
             items = detail.get("items") or [] if isinstance(detail, dict) else []
             table_title = "Sorties confirmées"
             filename = "previsions_sorties_confirmees.pdf"
         elif k == "sorties-potentielles":
-            detail = get_analyse_previsions_sorties_potentielles_detail(
-                id_contact=id_contact,
-                request=request,
-                horizon_years=horizon_years,
-                id_service=id_service,
-                criticite_min=criticite_min,
-                limit=limit,
+            detail = _load(
+                _analyse_previsions_sorties_potentielles_detail_data,
+                horizon_years, id_service, criticite_min, limit,
             )
             items = detail.get("items") or [] if isinstance(detail, dict) else []
             table_title = "Sorties potentielles"
@@ -2026,24 +2061,17 @@ def get_analyse_previsions_detail_pdf(
             table_title = "Transmissions à préparer"
             filename = "previsions_transmissions.pdf"
         elif k == "sorties":
-            detail = get_analyse_previsions_sorties_detail(
-                id_contact=id_contact,
-                request=request,
-                horizon_years=horizon_years,
-                id_service=id_service,
-                limit=limit,
+            detail = _load(
+                _analyse_previsions_sorties_detail_data,
+                horizon_years, id_service, limit,
             )
             items = detail.items or []
             table_title = "Effectifs sortants"
             filename = "previsions_sorties.pdf"
         elif k == "critiques":
-            detail = get_analyse_previsions_critiques_impactees_detail(
-                id_contact=id_contact,
-                request=request,
-                horizon_years=horizon_years,
-                id_service=id_service,
-                criticite_min=criticite_min,
-                limit=limit,
+            detail = _load(
+                _analyse_previsions_critiques_impactees_detail_data,
+                horizon_years, id_service, criticite_min, limit,
             )
             items = detail.items or []
             table_title = "Évolution fragilité compétences"
@@ -2126,7 +2154,7 @@ def get_analyse_previsions_postes_rouges_modal(
                     raise HTTPException(status_code=400, detail="id_poste manquant.")
 
                 scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 cur.execute(
                     """
@@ -2878,7 +2906,7 @@ def get_analyse_risques_detail(
 
                 scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
 
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 # Base: compétences requises + porteurs (dans le scope)
                 base_cte = f"""
@@ -3424,7 +3452,7 @@ def _analyse_poste_titulaires_mastery_items(
     La maîtrise actuelle est calculée par niveau A/B/C/D atteint, pas par moyenne de notes.
     100% = toutes les compétences retenues atteignent au moins le niveau requis.
     """
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
     cur.execute(
         f"""
         WITH
@@ -3529,7 +3557,7 @@ def _analyse_poste_sorties_approchantes_cause(
     id_service: Optional[str],
     id_poste: str,
 ) -> Optional[AnalysePosteSortieApprochanteCause]:
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
     horizon = _analyse_add_months(date.today(), 3)
     cur.execute(
         f"""
@@ -3676,7 +3704,7 @@ def get_analyse_risques_poste_detail(
 
                 scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
 
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 # 1) Vérifier que le poste est dans le scope
                 cur.execute(
@@ -3921,7 +3949,7 @@ def get_analyse_risques_poste_diagnostic(
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
 
                 scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 # 1) Poste + paramètres RH + contraintes formation
                 cur.execute(
@@ -5027,22 +5055,18 @@ def get_analyse_risques_competence_pdf(
         if not comp_key:
             raise HTTPException(status_code=400, detail="id_comp manquant.")
 
-        detail = get_risque_competence_detail(
-            id_contact=id_contact,
-            request=request,
-            id_comp=comp_key,
-            id_service=id_service,
-            criticite_min=criticite_min,
-            limit_postes=200,
-            limit_porteurs=300,
-        )
-
-        if not isinstance(detail, dict):
-            raise HTTPException(status_code=500, detail="Réponse détail compétence inexploitable.")
-
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                detail = _risque_competence_detail_data(
+                    cur,
+                    id_ent,
+                    comp_key,
+                    id_service,
+                    criticite_min,
+                    200,
+                    300,
+                )
                 company_name = _analyse_pdf_company_name(cur, id_ent)
                 logo_bytes = _analyse_pdf_logo_bytes_for_ent(cur, id_ent)
 
@@ -5140,7 +5164,7 @@ def get_analyse_matching_poste(
 
                 scope = _fetch_service_label(cur, id_ent, id_service)
 
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 # 1) Poste (sécurisation: doit être dans postes_scope)
                 cur.execute(
@@ -5719,7 +5743,7 @@ def get_analyse_matching_effectif_detail(
 
 
                 scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
 
                 # --- Poste (doit être dans le scope)
                 cur.execute(
@@ -6093,938 +6117,946 @@ def get_analyse_matching_effectif_detail(
 # - Drilldown depuis "Critiques sans porteur" / "Porteur unique"
 # - Renvoie: infos compétence + postes impactés + porteurs (niveau_actuel)
 # ======================================================
-@router.get("/skills/analyse/risques/competence/{id_contact}")
-def get_risque_competence_detail(
-    id_contact: str,
-    request: Request,
-    id_comp: str = Query(..., description="id_comp OU code compétence"),
-    id_service: Optional[str] = Query(default=None),
-    criticite_min: int = Query(default=CRITICITE_MIN_DEFAULT, ge=CRITICITE_MIN_MIN, le=CRITICITE_MIN_MAX),
-    limit_postes: int = Query(default=200, ge=1, le=2000),
-    limit_porteurs: int = Query(default=300, ge=1, le=2000),
-):
-    try:
-        NON_LIE_ID_LOCAL = "__NON_LIE__"
+def _risque_competence_detail_data(cur, id_ent: str, id_comp: str, id_service: Optional[str], criticite_min: int, limit_postes: int, limit_porteurs: int) -> Dict[str, Any]:
+    NON_LIE_ID_LOCAL = "__NON_LIE__"
+
+    # --- scope label
+    scope = {"id_service": None, "nom_service": "Tous les services"}
+    svc = (id_service or "").strip()
+    if svc:
+        if svc == NON_LIE_ID_LOCAL:
+            scope = {"id_service": NON_LIE_ID_LOCAL, "nom_service": "Non liés (sans service)"}
+        else:
+            cur.execute(
+                """
+                SELECT id_service, COALESCE(nom_service, 'Service') AS nom_service
+                FROM public.tbl_entreprise_organigramme
+                WHERE id_ent = %s
+                  AND id_service = %s
+                  AND archive = FALSE
+                LIMIT 1
+                """,
+                (id_ent, svc)
+            )
+            srow = cur.fetchone()
+            if not srow:
+                raise HTTPException(status_code=404, detail="Service introuvable (ou archivé).")
+            scope = {"id_service": srow["id_service"], "nom_service": srow["nom_service"]}
 
-        with get_conn() as conn:
-            with conn.cursor(row_factory=dict_row) as cur:
+    # --- compétence (on accepte id_comp OU code)
+    cur.execute(
+        """
+        SELECT
+            c.id_comp,
+            c.code,
+            c.intitule,
+            c.description,
+            c.domaine AS id_domaine_competence,
+            c.etat,
+            c.masque,
+            d.titre,
+            d.titre_court,
+            d.couleur
+        FROM public.tbl_competence c
+        LEFT JOIN public.tbl_domaine_competence d
+          ON d.id_domaine_competence = c.domaine
+        WHERE (c.id_comp = %s OR c.code = %s)
+        LIMIT 1
+        """,
+        (id_comp, id_comp)
+    )
+    comp = cur.fetchone()
+    if not comp:
+        raise HTTPException(status_code=404, detail="Compétence introuvable.")
+
+    comp_id = comp["id_comp"]
+
+    # --- CTE service (descendants) si service ciblé
+    services_cte_sql = ""
+    services_cte_params: List[Any] = []
+    svc_filter_poste = "TRUE"
+    svc_filter_eff = "TRUE"
+    extra_poste_params: List[Any] = []
+    extra_eff_params: List[Any] = []
+
+    if scope["id_service"]:
+        if scope["id_service"] == NON_LIE_ID_LOCAL:
+            # Non liés = NULL/'' ou service hors organigramme actif
+            svc_filter_poste = """
+                (
+                    p.id_service IS NULL OR p.id_service = ''
+                    OR p.id_service NOT IN (
+                        SELECT o.id_service
+                        FROM public.tbl_entreprise_organigramme o
+                        WHERE o.id_ent = %s
+                          AND o.archive = FALSE
+                    )
+                )
+            """
+            svc_filter_eff = """
+                (
+                    e.id_service IS NULL OR e.id_service = ''
+                    OR e.id_service NOT IN (
+                        SELECT o.id_service
+                        FROM public.tbl_entreprise_organigramme o
+                        WHERE o.id_ent = %s
+                          AND o.archive = FALSE
+                    )
+                )
+            """
+            extra_poste_params.append(id_ent)
+            extra_eff_params.append(id_ent)
+        else:
+            services_cte_sql = """
+            services_scope AS (
+                WITH RECURSIVE s AS (
+                    SELECT o.id_service
+                    FROM public.tbl_entreprise_organigramme o
+                    WHERE o.id_ent = %s
+                      AND o.archive = FALSE
+                      AND o.id_service = %s
+                    UNION ALL
+                    SELECT o2.id_service
+                    FROM public.tbl_entreprise_organigramme o2
+                    JOIN s ON s.id_service = o2.id_service_parent
+                    WHERE o2.id_ent = %s
+                      AND o2.archive = FALSE
+                )
+                SELECT id_service FROM s
+            )
+            """
+            services_cte_params = [id_ent, scope["id_service"], id_ent]
+            svc_filter_poste = "p.id_service IN (SELECT id_service FROM services_scope)"
+            svc_filter_eff = "e.id_service IN (SELECT id_service FROM services_scope)"
 
-                id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+    with_clause = f"WITH {services_cte_sql}" if services_cte_sql else ""
 
+    # --- Postes impactés (requièrent la compétence) + nb porteurs (sur poste actuel)
+    sql_postes = f"""
+    {with_clause}
+    SELECT
+        p.id_poste,
+        p.codif_poste,
+        COALESCE(p.codif_client,'') AS codif_client,
+        p.intitule_poste,
+        p.id_service,
+        COALESCE(o.nom_service,'') AS nom_service,
 
-                # --- scope label
-                scope = {"id_service": None, "nom_service": "Tous les services"}
-                svc = (id_service or "").strip()
-                if svc:
-                    if svc == NON_LIE_ID_LOCAL:
-                        scope = {"id_service": NON_LIE_ID_LOCAL, "nom_service": "Non liés (sans service)"}
-                    else:
-                        cur.execute(
-                            """
-                            SELECT id_service, COALESCE(nom_service, 'Service') AS nom_service
-                            FROM public.tbl_entreprise_organigramme
-                            WHERE id_ent = %s
-                              AND id_service = %s
-                              AND archive = FALSE
-                            LIMIT 1
-                            """,
-                            (id_ent, svc)
-                        )
-                        srow = cur.fetchone()
-                        if not srow:
-                            raise HTTPException(status_code=404, detail="Service introuvable (ou archivé).")
-                        scope = {"id_service": srow["id_service"], "nom_service": srow["nom_service"]}
+        fpc.niveau_requis,
+        fpc.poids_criticite,
 
-                # --- compétence (on accepte id_comp OU code)
-                cur.execute(
-                    """
-                    SELECT
-                        c.id_comp,
-                        c.code,
-                        c.intitule,
-                        c.description,
-                        c.domaine AS id_domaine_competence,
-                        c.etat,
-                        c.masque,
-                        d.titre,
-                        d.titre_court,
-                        d.couleur
-                    FROM public.tbl_competence c
-                    LEFT JOIN public.tbl_domaine_competence d
-                      ON d.id_domaine_competence = c.domaine
-                    WHERE (c.id_comp = %s OR c.code = %s)
-                    LIMIT 1
-                    """,
-                    (id_comp, id_comp)
-                )
-                comp = cur.fetchone()
-                if not comp:
-                    raise HTTPException(status_code=404, detail="Compétence introuvable.")
-
-                comp_id = comp["id_comp"]
-
-                # --- CTE service (descendants) si service ciblé
-                services_cte_sql = ""
-                services_cte_params: List[Any] = []
-                svc_filter_poste = "TRUE"
-                svc_filter_eff = "TRUE"
-                extra_poste_params: List[Any] = []
-                extra_eff_params: List[Any] = []
-
-                if scope["id_service"]:
-                    if scope["id_service"] == NON_LIE_ID_LOCAL:
-                        # Non liés = NULL/'' ou service hors organigramme actif
-                        svc_filter_poste = """
-                            (
-                                p.id_service IS NULL OR p.id_service = ''
-                                OR p.id_service NOT IN (
-                                    SELECT o.id_service
-                                    FROM public.tbl_entreprise_organigramme o
-                                    WHERE o.id_ent = %s
-                                      AND o.archive = FALSE
-                                )
-                            )
-                        """
-                        svc_filter_eff = """
-                            (
-                                e.id_service IS NULL OR e.id_service = ''
-                                OR e.id_service NOT IN (
-                                    SELECT o.id_service
-                                    FROM public.tbl_entreprise_organigramme o
-                                    WHERE o.id_ent = %s
-                                      AND o.archive = FALSE
-                                )
-                            )
-                        """
-                        extra_poste_params.append(id_ent)
-                        extra_eff_params.append(id_ent)
-                    else:
-                        services_cte_sql = """
-                        services_scope AS (
-                            WITH RECURSIVE s AS (
-                                SELECT o.id_service
-                                FROM public.tbl_entreprise_organigramme o
-                                WHERE o.id_ent = %s
-                                  AND o.archive = FALSE
-                                  AND o.id_service = %s
-                                UNION ALL
-                                SELECT o2.id_service
-                                FROM public.tbl_entreprise_organigramme o2
-                                JOIN s ON s.id_service = o2.id_service_parent
-                                WHERE o2.id_ent = %s
-                                  AND o2.archive = FALSE
-                            )
-                            SELECT id_service FROM s
-                        )
-                        """
-                        services_cte_params = [id_ent, scope["id_service"], id_ent]
-                        svc_filter_poste = "p.id_service IN (SELECT id_service FROM services_scope)"
-                        svc_filter_eff = "e.id_service IN (SELECT id_service FROM services_scope)"
-
-                with_clause = f"WITH {services_cte_sql}" if services_cte_sql else ""
-
-                # --- Postes impactés (requièrent la compétence) + nb porteurs (sur poste actuel)
-                sql_postes = f"""
-                {with_clause}
-                SELECT
-                    p.id_poste,
-                    p.codif_poste,
-                    COALESCE(p.codif_client,'') AS codif_client,
-                    p.intitule_poste,
-                    p.id_service,
-                    COALESCE(o.nom_service,'') AS nom_service,
-
-                    fpc.niveau_requis,
-                    fpc.poids_criticite,
-
-                    COALESCE(pc.nb_porteurs,0)::int AS nb_porteurs,
-
-                    1::int AS besoin_poste
-
-                FROM public.tbl_fiche_poste_competence fpc
-                JOIN public.tbl_fiche_poste p
-                  ON p.id_poste = fpc.id_poste
-
-                LEFT JOIN public.tbl_entreprise_organigramme o
-                  ON o.id_ent = p.id_ent
-                 AND o.id_service = p.id_service
-                 AND o.archive = FALSE
+        COALESCE(pc.nb_porteurs,0)::int AS nb_porteurs,
 
-                JOIN public.tbl_competence c
-                  ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
+        1::int AS besoin_poste
 
-                LEFT JOIN (
-                    SELECT
-                        e.id_poste_actuel AS id_poste,
-                        COUNT(DISTINCT e.id_effectif)::int AS nb_porteurs
-                    FROM public.tbl_effectif_client_competence ec
-                    JOIN public.tbl_effectif_client e
-                      ON e.id_effectif = ec.id_effectif_client
-                    WHERE e.id_ent = %s
-                        AND COALESCE(e.archive,FALSE) = FALSE
-                        AND ec.id_comp = %s
-                        AND COALESCE(ec.actif, TRUE) = TRUE
-                        AND COALESCE(ec.archive, FALSE) = FALSE
-                        AND {svc_filter_eff}
-                    GROUP BY e.id_poste_actuel
-                ) pc
-                  ON pc.id_poste = p.id_poste
-
-                WHERE
-                    p.id_ent = %s
-                    AND COALESCE(p.actif, TRUE) = TRUE
-                    AND {svc_filter_poste}
-                    AND c.id_comp = %s
-                    AND COALESCE(fpc.masque, FALSE) = FALSE
-                    AND COALESCE(fpc.poids_criticite, 0) >= %s
-                ORDER BY
-                    COALESCE(pc.nb_porteurs,0) ASC,
-                    COALESCE(fpc.poids_criticite,0) DESC,
-                    p.codif_poste,
-                    p.intitule_poste
-                LIMIT %s
-                """
-                params_postes: List[Any] = []
-                params_postes.extend(services_cte_params)
-                params_postes.extend([id_ent, comp_id])
-                params_postes.extend(extra_eff_params)
-                params_postes.extend([id_ent])
-                params_postes.extend(extra_poste_params)
-                params_postes.extend([comp_id, criticite_min, limit_postes])
-
-                cur.execute(sql_postes, tuple(params_postes))
-                postes = [dict(r) for r in (cur.fetchall() or [])]
-
-                # --- Porteurs (tous porteurs dans le périmètre)
-                sql_porteurs = f"""
-                {with_clause}
-                SELECT
-                    e.id_effectif,
-                    e.prenom_effectif,
-                    e.nom_effectif,
-                    ec.id_effectif_competence,
-                    ec.niveau_actuel,
-                    ec.date_derniere_eval,
-                    ec.id_dernier_audit,
-                    ac.id_audit_competence,
-                    ac.date_audit,
-                    ac.resultat_eval,
-                    CASE
-                        WHEN ec.date_derniere_eval IS NOT NULL THEN TRUE
-                        WHEN ac.id_audit_competence IS NOT NULL THEN TRUE
-                        ELSE FALSE
-                    END AS is_evaluee,
-
-                    CASE WHEN br.date_fin_indispo IS NULL THEN FALSE ELSE TRUE END AS is_indispo,
-                    br.date_fin_indispo,
-
-                    e.id_service,
-                    COALESCE(o.nom_service,'') AS nom_service,
-
-                    e.id_poste_actuel,
-                    COALESCE(p.codif_poste,'') AS codif_poste,
-                    COALESCE(p.intitule_poste,'') AS intitule_poste
-                FROM public.tbl_effectif_client_competence ec
-                JOIN public.tbl_effectif_client e
-                  ON e.id_effectif = ec.id_effectif_client
-                LEFT JOIN public.tbl_effectif_client_audit_competence ac
-                  ON ac.id_audit_competence = ec.id_dernier_audit
-                 AND ac.id_effectif_competence = ec.id_effectif_competence
-                LEFT JOIN public.tbl_entreprise_organigramme o
-                  ON o.id_ent = e.id_ent
-                 AND o.id_service = e.id_service
-                 AND o.archive = FALSE
-                LEFT JOIN public.tbl_fiche_poste p
-                  ON p.id_poste = e.id_poste_actuel
-                LEFT JOIN (
-                    SELECT
-                        id_effectif,
-                        MAX(date_fin) AS date_fin_indispo
-                    FROM public.tbl_effectif_client_break
-                    WHERE archive = FALSE
-                      AND date_debut <= CURRENT_DATE
-                      AND date_fin >= CURRENT_DATE
-                    GROUP BY id_effectif
-                ) br
-                  ON br.id_effectif = e.id_effectif
-                WHERE
-                    e.id_ent = %s
-                    AND COALESCE(e.archive,FALSE) = FALSE
-                    AND ec.id_comp = %s
-                    AND COALESCE(ec.actif, TRUE) = TRUE
-                    AND COALESCE(ec.archive, FALSE) = FALSE
-                    AND {svc_filter_eff}
-                ORDER BY e.nom_effectif, e.prenom_effectif
-                LIMIT %s
-                """
+    FROM public.tbl_fiche_poste_competence fpc
+    JOIN public.tbl_fiche_poste p
+      ON p.id_poste = fpc.id_poste
 
-                params_porteurs: List[Any] = []
-                params_porteurs.extend(services_cte_params)
-                params_porteurs.extend([id_ent, comp_id])
-                params_porteurs.extend(extra_eff_params)
-                params_porteurs.append(limit_porteurs)
-
-                cur.execute(sql_porteurs, tuple(params_porteurs))
-                porteurs = [dict(r) for r in (cur.fetchall() or [])]
-
-                # --- Niveaux et états RH (calculés côté backend, le front affiche seulement)
-                def _niv_key(v: Any) -> str:
-                    s = str(v or "").strip().upper()
-                    s = (
-                        s.replace("É", "E").replace("È", "E").replace("Ê", "E").replace("Ë", "E")
-                         .replace("À", "A").replace("Â", "A").replace("Ä", "A")
-                         .replace("Î", "I").replace("Ï", "I")
-                         .replace("Ô", "O").replace("Ö", "O")
-                         .replace("Û", "U").replace("Ü", "U")
-                         .replace("Ç", "C")
-                    )
-                    if not s:
-                        return ""
-                    if "-" in s:
-                        last = s.split("-")[-1].strip()
-                        if last in ("A", "B", "C", "D"):
-                            return last
-                    if s in ("A", "B", "C", "D"):
-                        return s
-                    if "EXPERT" in s:
-                        return "D"
-                    if "AVANCE" in s:
-                        return "C"
-                    if "INTER" in s:
-                        return "B"
-                    if "DEBUT" in s or "INITIAL" in s or "INIT" in s:
-                        return "A"
-                    return ""
-
-                def _niv_rank_local(v: Any) -> int:
-                    k = _niv_key(v)
-                    if k == "A":
-                        return 1
-                    if k == "B":
-                        return 2
-                    if k == "C":
-                        return 3
-                    if k == "D":
-                        return 4
-                    return 0
-
-                def _truthy(v: Any) -> bool:
-                    return v is True or v == 1 or str(v or "").strip().lower() in ("t", "true", "1", "oui", "yes")
-
-                def _is_evaluee_row(r: Dict[str, Any]) -> bool:
-                    return bool(r.get("date_derniere_eval") or r.get("id_audit_competence") or r.get("date_audit") or _truthy(r.get("is_evaluee")))
-
-                def _is_indispo_row(r: Dict[str, Any]) -> bool:
-                    return bool(r.get("date_fin_indispo") or _truthy(r.get("is_indispo")))
-
-                def _coverage_state_label(etat: str) -> str:
-                    return {
-                        "COUVERTURE_ABSENTE": "Aucun porteur déclaré",
-                        "COUVERTURE_NON_CONFIRMEE": "À évaluer",
-                        "NIVEAU_INSUFFISANT": "Niveau insuffisant",
-                        "DEPENDANCE": "Dépendance",
-                        "COUVERTURE_VALIDEE": "Couverture validée",
-                    }.get(etat or "", "À qualifier")
-
-                def _coverage_action_label(etat: str) -> str:
-                    return {
-                        "COUVERTURE_ABSENTE": "Identifier un porteur ou recruter",
-                        "COUVERTURE_NON_CONFIRMEE": "Évaluer en priorité",
-                        "NIVEAU_INSUFFISANT": "Former / accompagner",
-                        "DEPENDANCE": "Organiser une doublure",
-                        "COUVERTURE_VALIDEE": "Surveiller",
-                    }.get(etat or "", "Analyser")
-
-                porteurs_by_poste: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-                for r in porteurs:
-                    pid = str(r.get("id_poste_actuel") or "").strip()
-                    if pid:
-                        porteurs_by_poste[pid].append(r)
-
-                    rang = _niv_rank_local(r.get("niveau_actuel"))
-                    is_eval = _is_evaluee_row(r)
-                    is_indispo = _is_indispo_row(r)
-                    if is_indispo:
-                        statut_rh = "INDISPONIBLE"
-                        statut_rh_label = "Indisponible"
-                    elif not is_eval:
-                        statut_rh = "A_EVALUER"
-                        statut_rh_label = "À évaluer"
-                    elif rang <= 0:
-                        statut_rh = "EVALUATION_INEXPLOITABLE"
-                        statut_rh_label = "Évaluation inexploitable"
-                    else:
-                        statut_rh = "EVALUE"
-                        statut_rh_label = "Évalué"
-
-                    r["niveau_code"] = _niv_key(r.get("niveau_actuel"))
-                    r["niveau_rank"] = rang
-                    r["is_evaluee"] = is_eval
-                    r["is_indispo"] = is_indispo
-                    r["statut_rh"] = statut_rh
-                    r["statut_rh_label"] = statut_rh_label
-
-                besoin = {"A": 0, "B": 0, "C": 0, "D": 0}
-                porteurs_niv = {"A": 0, "B": 0, "C": 0, "D": 0}
-
-                nb_postes_absent = 0
-                nb_postes_non_confirme = 0
-                nb_postes_insuffisant = 0
-                nb_postes_dependance = 0
-                nb_postes_valides = 0
-                nb_valides_total = 0
-
-                for p in postes:
-                    pid = str(p.get("id_poste") or "").strip()
-                    req_rank = _niv_rank_local(p.get("niveau_requis"))
-                    req_key = _niv_key(p.get("niveau_requis"))
-                    besoin_poste = max(_safe_int(p.get("besoin_poste"), 1), 1)
-                    if req_key:
-                        besoin[req_key] += besoin_poste
-
-                    related = porteurs_by_poste.get(pid, [])
-                    nb_declares = len(related)
-                    nb_evalues = sum(1 for r in related if r.get("is_evaluee") and not r.get("is_indispo"))
-                    nb_valides = sum(
-                        1 for r in related
-                        if r.get("is_evaluee") and not r.get("is_indispo") and req_rank > 0 and _safe_int(r.get("niveau_rank"), 0) >= req_rank
-                    )
-                    nb_non_evalues = sum(1 for r in related if not r.get("is_evaluee"))
-                    nb_insuffisants = sum(
-                        1 for r in related
-                        if r.get("is_evaluee") and not r.get("is_indispo") and req_rank > 0 and 0 < _safe_int(r.get("niveau_rank"), 0) < req_rank
-                    )
+    LEFT JOIN public.tbl_entreprise_organigramme o
+      ON o.id_ent = p.id_ent
+     AND o.id_service = p.id_service
+     AND o.archive = FALSE
 
-                    if nb_declares <= 0:
-                        etat = "COUVERTURE_ABSENTE"
-                        nb_postes_absent += 1
-                    elif nb_valides >= besoin_poste:
-                        if nb_valides == 1:
-                            etat = "DEPENDANCE"
-                            nb_postes_dependance += 1
-                        else:
-                            etat = "COUVERTURE_VALIDEE"
-                            nb_postes_valides += 1
-                    elif nb_non_evalues > 0:
-                        etat = "COUVERTURE_NON_CONFIRMEE"
-                        nb_postes_non_confirme += 1
-                    elif nb_insuffisants > 0:
-                        etat = "NIVEAU_INSUFFISANT"
-                        nb_postes_insuffisant += 1
-                    else:
-                        etat = "COUVERTURE_ABSENTE"
-                        nb_postes_absent += 1
-
-                    p["besoin_poste"] = besoin_poste
-                    p["nb_porteurs_declares"] = nb_declares
-                    p["nb_porteurs_evalues"] = nb_evalues
-                    p["nb_porteurs_valides"] = nb_valides
-                    p["nb_porteurs_non_evalues"] = nb_non_evalues
-                    p["nb_porteurs_insuffisants"] = nb_insuffisants
-                    p["etat_couverture"] = etat
-                    p["etat_couverture_label"] = _coverage_state_label(etat)
-                    p["action_rh"] = _coverage_action_label(etat)
-
-                    nb_valides_total += nb_valides
-
-                for r in porteurs:
-                    if not r.get("is_evaluee") or r.get("is_indispo"):
-                        continue
-                    k = r.get("niveau_code") or ""
-                    if k in porteurs_niv:
-                        porteurs_niv[k] += 1
-
-                porteurs_ge = {
-                    "A": porteurs_niv["A"] + porteurs_niv["B"] + porteurs_niv["C"] + porteurs_niv["D"],
-                    "B": porteurs_niv["B"] + porteurs_niv["C"] + porteurs_niv["D"],
-                    "C": porteurs_niv["C"] + porteurs_niv["D"],
-                    "D": porteurs_niv["D"],
-                }
+    JOIN public.tbl_competence c
+      ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
 
-                niveaux = {"besoin": besoin, "porteurs": porteurs_niv, "porteurs_ge": porteurs_ge}
-
-                causes = [
-                    {
-                        "code": "COUVERTURE_ABSENTE",
-                        "titre": "Couverture absente",
-                        "count": nb_postes_absent,
-                        "lecture": "Aucun porteur déclaré ne couvre cette compétence sur les postes concernés.",
-                        "action": "Identifier un porteur interne ou préparer un recrutement ciblé.",
-                    },
-                    {
-                        "code": "COUVERTURE_NON_CONFIRMEE",
-                        "titre": "Couverture non confirmée",
-                        "count": nb_postes_non_confirme,
-                        "lecture": "La compétence est déclarée, mais aucune évaluation exploitable ne confirme le niveau attendu.",
-                        "action": "Planifier une évaluation avant de considérer le poste sécurisé.",
-                    },
-                    {
-                        "code": "NIVEAU_INSUFFISANT",
-                        "titre": "Écart de maîtrise",
-                        "count": nb_postes_insuffisant,
-                        "lecture": "La compétence est évaluée, mais le niveau constaté ne couvre pas le niveau requis.",
-                        "action": "Prévoir formation, accompagnement ou montée en compétence ciblée.",
-                    },
-                    {
-                        "code": "DEPENDANCE",
-                        "titre": "Dépendance / transmission",
-                        "count": nb_postes_dependance,
-                        "lecture": "La compétence est validée, mais repose sur un seul porteur confirmé.",
-                        "action": "Organiser une doublure ou un transfert de savoir-faire.",
-                    },
-                ]
-
-                nb_postes_total_detail = len(postes)
-                nb_postes_fragiles_detail = nb_postes_absent + nb_postes_non_confirme + nb_postes_insuffisant + nb_postes_dependance
-                indice_detail = _calc_fragility_score(nb_postes_absent, nb_postes_dependance, nb_postes_fragiles_detail)
-                if nb_postes_non_confirme > 0:
-                    indice_detail = max(indice_detail, min(90, 30 + (10 * nb_postes_non_confirme)))
-                if nb_postes_insuffisant > 0:
-                    indice_detail = max(indice_detail, min(92, 45 + (10 * nb_postes_insuffisant)))
-                indice_detail = _clamp_int(indice_detail, 0, 100)
-
-                priorite_detail = "P1" if indice_detail >= 75 else "P2" if indice_detail >= 50 else "P3"
-
-                competence_detail_stats = {
-                    "nb_postes_impactes": nb_postes_total_detail,
-                    "nb_postes_couverture_absente": nb_postes_absent,
-                    "nb_postes_non_confirmee": nb_postes_non_confirme,
-                    "nb_postes_niveau_insuffisant": nb_postes_insuffisant,
-                    "nb_postes_dependance": nb_postes_dependance,
-                    "nb_postes_valides": nb_postes_valides,
-                    "nb_porteurs_declares": len(porteurs),
-                    "nb_porteurs_evalues": sum(1 for r in porteurs if r.get("is_evaluee")),
-                    "nb_porteurs_non_evalues": sum(1 for r in porteurs if not r.get("is_evaluee")),
-                    "nb_porteurs_valides": nb_valides_total,
-                    "besoin_total": sum(max(_safe_int(p.get("besoin_poste"), 1), 1) for p in postes),
-                    "criticite_max": max([_safe_int(p.get("poids_criticite"), 0) for p in postes] or [0]),
-                    "indice_fragilite": indice_detail,
-                    "priorite": priorite_detail,
-                }
-
-                # --- Diagnostic DRH fiable (indépendant des LIMIT) + Indice/Priorité
-                other_ctes = f"""
-                postes_impactes AS (
-                    SELECT DISTINCT
-                        p.id_poste,
-                        COALESCE(fpc.poids_criticite, 0)::int AS poids_criticite
-                    FROM public.tbl_fiche_poste_competence fpc
-                    JOIN public.tbl_fiche_poste p
-                      ON p.id_poste = fpc.id_poste
-                    JOIN public.tbl_competence c
-                      ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
-                    WHERE p.id_ent = %s
-                      AND COALESCE(p.actif, TRUE) = TRUE
-                      AND {svc_filter_poste}
-                      AND c.id_comp = %s
-                      AND COALESCE(fpc.poids_criticite, 0) >= %s
-                ),
-                titulaires AS (
-                    SELECT
-                        e.id_poste_actuel AS id_poste,
-                        COUNT(DISTINCT e.id_effectif)::int AS nb_titulaires
-                    FROM public.tbl_effectif_client e
-                    WHERE e.id_ent = %s
-                      AND COALESCE(e.archive, FALSE) = FALSE
-                      AND COALESCE(e.id_poste_actuel, '') <> ''
-                      AND {svc_filter_eff}
-                    GROUP BY e.id_poste_actuel
-                ),
-                poste_need AS (
-                    SELECT
-                        pi.id_poste,
-                        CASE
-                            WHEN prh.nb_titulaires_cible IS NOT NULL AND prh.nb_titulaires_cible::int > 0
-                                THEN prh.nb_titulaires_cible::int
-                            WHEN COALESCE(t.nb_titulaires, 0)::int > 0
-                                THEN COALESCE(t.nb_titulaires, 0)::int
-                            ELSE 1
-                        END AS besoin_poste
-                    FROM postes_impactes pi
-                    LEFT JOIN public.tbl_fiche_poste_param_rh prh ON prh.id_poste = pi.id_poste
-                    LEFT JOIN titulaires t ON t.id_poste = pi.id_poste
-                ),
-                porteurs_poste AS (
-                    SELECT
-                        e.id_poste_actuel AS id_poste,
-                        COUNT(DISTINCT e.id_effectif)::int AS nb_porteurs_poste
-                    FROM public.tbl_effectif_client_competence ec
-                    JOIN public.tbl_effectif_client e
-                      ON e.id_effectif = ec.id_effectif_client
-                    WHERE e.id_ent = %s
-                      AND COALESCE(e.archive, FALSE) = FALSE
-                      AND ec.id_comp = %s
-                      AND COALESCE(ec.actif, TRUE) = TRUE
-                      AND COALESCE(ec.archive, FALSE) = FALSE
-                      AND {svc_filter_eff}
-                    GROUP BY e.id_poste_actuel
-                ),
-                postes_enrichis AS (
-                    SELECT
-                        pi.id_poste,
-                        pi.poids_criticite,
-                        pn.besoin_poste,
-                        COALESCE(pp.nb_porteurs_poste, 0)::int AS nb_porteurs_poste
-                    FROM postes_impactes pi
-                    JOIN poste_need pn ON pn.id_poste = pi.id_poste
-                    LEFT JOIN porteurs_poste pp ON pp.id_poste = pi.id_poste
-                ),
-                need_agg AS (
-                    SELECT
-                        COUNT(DISTINCT id_poste)::int AS nb_postes_impactes,
-                        COALESCE(MAX(poids_criticite), 0)::int AS criticite_max,
-                        COALESCE(SUM(CASE WHEN poids_criticite >= 80 THEN 1 ELSE 0 END), 0)::int AS nb_postes_crit_80,
-                        COALESCE(SUM(besoin_poste), 0)::int AS besoin_total,
-                        COALESCE(SUM(CASE WHEN nb_porteurs_poste = 0 THEN 1 ELSE 0 END), 0)::int AS nb_postes_sans_porteur,
-                        COALESCE(SUM(CASE WHEN nb_porteurs_poste = 1 THEN 1 ELSE 0 END), 0)::int AS nb_postes_porteur_unique
-                    FROM postes_enrichis
-                ),
-                effectifs_scope AS (
-                    SELECT e.id_effectif
-                    FROM public.tbl_effectif_client e
-                    WHERE e.id_ent = %s
-                      AND COALESCE(e.archive, FALSE) = FALSE
-                      AND {svc_filter_eff}
-                ),
-                effectifs_dispo AS (
-                    SELECT es.id_effectif
-                    FROM effectifs_scope es
-                    JOIN public.tbl_effectif_client e ON e.id_effectif = es.id_effectif
-                    WHERE NOT EXISTS (
-                        SELECT 1
-                        FROM public.tbl_effectif_client_break b
-                        WHERE b.id_effectif = e.id_effectif
-                          AND b.archive = FALSE
-                          AND b.date_debut <= CURRENT_DATE
-                          AND b.date_fin >= CURRENT_DATE
-                    )
-                ),
-                porteurs_nominal AS (
-                    SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_porteurs
-                    FROM public.tbl_effectif_client_competence ec
-                    JOIN effectifs_scope es ON es.id_effectif = ec.id_effectif_client
-                    WHERE ec.id_comp = %s
-                      AND COALESCE(ec.actif, TRUE) = TRUE
-                      AND COALESCE(ec.archive, FALSE) = FALSE
-                ),
-                porteurs_dispo AS (
-                    SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_porteurs
-                    FROM public.tbl_effectif_client_competence ec
-                    JOIN effectifs_dispo es ON es.id_effectif = ec.id_effectif_client
-                    LEFT JOIN public.tbl_effectif_client_audit_competence a
-                      ON a.id_audit_competence = ec.id_dernier_audit
-                     AND a.id_effectif_competence = ec.id_effectif_competence
-                    WHERE ec.id_comp = %s
-                      AND COALESCE(ec.actif, TRUE) = TRUE
-                      AND COALESCE(ec.archive, FALSE) = FALSE
-                      AND a.resultat_eval IS NOT NULL
-                      AND (a.date_audit IS NOT NULL OR ec.date_derniere_eval IS NOT NULL OR a.id_audit_competence IS NOT NULL)
-                ),
-                experts_nominal AS (
-                    SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_experts
-                    FROM public.tbl_effectif_client_competence ec
-                    JOIN effectifs_scope es ON es.id_effectif = ec.id_effectif_client
-                    WHERE ec.id_comp = %s
-                      AND COALESCE(ec.actif, TRUE) = TRUE
-                      AND COALESCE(ec.archive, FALSE) = FALSE
-                      AND (
-                        CASE
-                          WHEN trim(COALESCE(ec.niveau_actuel, '')) ~ '^[0-9]+$'
-                            THEN trim(ec.niveau_actuel)::int
-                          WHEN UPPER(TRIM(ec.niveau_actuel)) = 'D' THEN 4
-                          WHEN ec.niveau_actuel ILIKE '%%expert%%' THEN 4
-                              WHEN UPPER(TRIM(ec.niveau_actuel)) = 'C' THEN 3
-                          ELSE 0
-                        END
-                      ) >= 4
-                ),
-                experts_dispo AS (
-                    SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_experts
-                    FROM public.tbl_effectif_client_competence ec
-                    JOIN effectifs_dispo es ON es.id_effectif = ec.id_effectif_client
-                    WHERE ec.id_comp = %s
-                      AND COALESCE(ec.actif, TRUE) = TRUE
-                      AND COALESCE(ec.archive, FALSE) = FALSE
-                      AND (
-                        CASE
-                          WHEN trim(COALESCE(ec.niveau_actuel, '')) ~ '^[0-9]+$'
-                            THEN trim(ec.niveau_actuel)::int
-                          WHEN UPPER(TRIM(ec.niveau_actuel)) = 'D' THEN 4
-                          WHEN ec.niveau_actuel ILIKE '%%expert%%' THEN 4
-                              WHEN UPPER(TRIM(ec.niveau_actuel)) = 'C' THEN 3
-                          ELSE 0
-                        END
-                      ) >= 4
-                )
-                """
-
-                if services_cte_sql:
-                    sql_diag = "WITH " + services_cte_sql + ",\n" + other_ctes + """
-                    SELECT
-                        na.nb_postes_impactes,
-                        na.criticite_max,
-                        na.nb_postes_crit_80,
-                        na.besoin_total,
-                        na.nb_postes_sans_porteur,
-                        na.nb_postes_porteur_unique,
-                        pn.nb_porteurs AS nb_porteurs,
-                        pd.nb_porteurs AS nb_porteurs_dispo,
-                        en.nb_experts AS nb_experts,
-                        ed.nb_experts AS nb_experts_dispo
-                    FROM need_agg na
-                    CROSS JOIN porteurs_nominal pn
-                    CROSS JOIN porteurs_dispo pd
-                    CROSS JOIN experts_nominal en
-                    CROSS JOIN experts_dispo ed
-                    """
-                else:
-                    sql_diag = "WITH " + other_ctes + """
-                    SELECT
-                        na.nb_postes_impactes,
-                        na.criticite_max,
-                        na.nb_postes_crit_80,
-                        na.besoin_total,
-                        na.nb_postes_sans_porteur,
-                        na.nb_postes_porteur_unique,
-                        pn.nb_porteurs AS nb_porteurs,
-                        pd.nb_porteurs AS nb_porteurs_dispo,
-                        en.nb_experts AS nb_experts,
-                        ed.nb_experts AS nb_experts_dispo
-                    FROM need_agg na
-                    CROSS JOIN porteurs_nominal pn
-                    CROSS JOIN porteurs_dispo pd
-                    CROSS JOIN experts_nominal en
-                    CROSS JOIN experts_dispo ed
-                    """
+    LEFT JOIN (
+        SELECT
+            e.id_poste_actuel AS id_poste,
+            COUNT(DISTINCT e.id_effectif)::int AS nb_porteurs
+        FROM public.tbl_effectif_client_competence ec
+        JOIN public.tbl_effectif_client e
+          ON e.id_effectif = ec.id_effectif_client
+        WHERE e.id_ent = %s
+            AND COALESCE(e.archive,FALSE) = FALSE
+            AND ec.id_comp = %s
+            AND COALESCE(ec.actif, TRUE) = TRUE
+            AND COALESCE(ec.archive, FALSE) = FALSE
+            AND {svc_filter_eff}
+        GROUP BY e.id_poste_actuel
+    ) pc
+      ON pc.id_poste = p.id_poste
+
+    WHERE
+        p.id_ent = %s
+        AND COALESCE(p.actif, TRUE) = TRUE
+        AND {svc_filter_poste}
+        AND c.id_comp = %s
+        AND COALESCE(fpc.masque, FALSE) = FALSE
+        AND COALESCE(fpc.poids_criticite, 0) >= %s
+    ORDER BY
+        COALESCE(pc.nb_porteurs,0) ASC,
+        COALESCE(fpc.poids_criticite,0) DESC,
+        p.codif_poste,
+        p.intitule_poste
+    LIMIT %s
+    """
+    params_postes: List[Any] = []
+    params_postes.extend(services_cte_params)
+    params_postes.extend([id_ent, comp_id])
+    params_postes.extend(extra_eff_params)
+    params_postes.extend([id_ent])
+    params_postes.extend(extra_poste_params)
+    params_postes.extend([comp_id, criticite_min, limit_postes])
+
+    cur.execute(sql_postes, tuple(params_postes))
+    postes = [dict(r) for r in (cur.fetchall() or [])]
 
-                params_diag: List[Any] = []
-                params_diag.extend(services_cte_params)
+    # --- Porteurs (tous porteurs dans le périmètre)
+    sql_porteurs = f"""
+    {with_clause}
+    SELECT
+        e.id_effectif,
+        e.prenom_effectif,
+        e.nom_effectif,
+        ec.id_effectif_competence,
+        ec.niveau_actuel,
+        ec.date_derniere_eval,
+        ec.id_dernier_audit,
+        ac.id_audit_competence,
+        ac.date_audit,
+        ac.resultat_eval,
+        CASE
+            WHEN ec.date_derniere_eval IS NOT NULL THEN TRUE
+            WHEN ac.id_audit_competence IS NOT NULL THEN TRUE
+            ELSE FALSE
+        END AS is_evaluee,
+
+        CASE WHEN br.date_fin_indispo IS NULL THEN FALSE ELSE TRUE END AS is_indispo,
+        br.date_fin_indispo,
+
+        e.id_service,
+        COALESCE(o.nom_service,'') AS nom_service,
+
+        e.id_poste_actuel,
+        COALESCE(p.codif_poste,'') AS codif_poste,
+        COALESCE(p.intitule_poste,'') AS intitule_poste
+    FROM public.tbl_effectif_client_competence ec
+    JOIN public.tbl_effectif_client e
+      ON e.id_effectif = ec.id_effectif_client
+    LEFT JOIN public.tbl_effectif_client_audit_competence ac
+      ON ac.id_audit_competence = ec.id_dernier_audit
+     AND ac.id_effectif_competence = ec.id_effectif_competence
+    LEFT JOIN public.tbl_entreprise_organigramme o
+      ON o.id_ent = e.id_ent
+     AND o.id_service = e.id_service
+     AND o.archive = FALSE
+    LEFT JOIN public.tbl_fiche_poste p
+      ON p.id_poste = e.id_poste_actuel
+    LEFT JOIN (
+        SELECT
+            id_effectif,
+            MAX(date_fin) AS date_fin_indispo
+        FROM public.tbl_effectif_client_break
+        WHERE archive = FALSE
+          AND date_debut <= CURRENT_DATE
+          AND date_fin >= CURRENT_DATE
+        GROUP BY id_effectif
+    ) br
+      ON br.id_effectif = e.id_effectif
+    WHERE
+        e.id_ent = %s
+        AND COALESCE(e.archive,FALSE) = FALSE
+        AND ec.id_comp = %s
+        AND COALESCE(ec.actif, TRUE) = TRUE
+        AND COALESCE(ec.archive, FALSE) = FALSE
+        AND {svc_filter_eff}
+    ORDER BY e.nom_effectif, e.prenom_effectif
+    LIMIT %s
+    """
 
-                # postes_impactes
-                params_diag.extend([id_ent])
-                params_diag.extend(extra_poste_params)
-                params_diag.extend([comp_id, criticite_min])
+    params_porteurs: List[Any] = []
+    params_porteurs.extend(services_cte_params)
+    params_porteurs.extend([id_ent, comp_id])
+    params_porteurs.extend(extra_eff_params)
+    params_porteurs.append(limit_porteurs)
+
+    cur.execute(sql_porteurs, tuple(params_porteurs))
+    porteurs = [dict(r) for r in (cur.fetchall() or [])]
+
+    # --- Niveaux et états RH (calculés côté backend, le front affiche seulement)
+    def _niv_key(v: Any) -> str:
+        s = str(v or "").strip().upper()
+        s = (
+            s.replace("É", "E").replace("È", "E").replace("Ê", "E").replace("Ë", "E")
+             .replace("À", "A").replace("Â", "A").replace("Ä", "A")
+             .replace("Î", "I").replace("Ï", "I")
+             .replace("Ô", "O").replace("Ö", "O")
+             .replace("Û", "U").replace("Ü", "U")
+             .replace("Ç", "C")
+        )
+        if not s:
+            return ""
+        if "-" in s:
+            last = s.split("-")[-1].strip()
+            if last in ("A", "B", "C", "D"):
+                return last
+        if s in ("A", "B", "C", "D"):
+            return s
+        if "EXPERT" in s:
+            return "D"
+        if "AVANCE" in s:
+            return "C"
+        if "INTER" in s:
+            return "B"
+        if "DEBUT" in s or "INITIAL" in s or "INIT" in s:
+            return "A"
+        return ""
+
+    def _niv_rank_local(v: Any) -> int:
+        k = _niv_key(v)
+        if k == "A":
+            return 1
+        if k == "B":
+            return 2
+        if k == "C":
+            return 3
+        if k == "D":
+            return 4
+        return 0
 
-                # titulaires
-                params_diag.append(id_ent)
-                params_diag.extend(extra_eff_params)
+    def _truthy(v: Any) -> bool:
+        return v is True or v == 1 or str(v or "").strip().lower() in ("t", "true", "1", "oui", "yes")
 
-                # porteurs_poste
-                params_diag.append(id_ent)
-                params_diag.append(comp_id)
-                params_diag.extend(extra_eff_params)
+    def _is_evaluee_row(r: Dict[str, Any]) -> bool:
+        return bool(r.get("date_derniere_eval") or r.get("id_audit_competence") or r.get("date_audit") or _truthy(r.get("is_evaluee")))
 
-                # effectifs_scope
-                params_diag.append(id_ent)
-                params_diag.extend(extra_eff_params)
+    def _is_indispo_row(r: Dict[str, Any]) -> bool:
+        return bool(r.get("date_fin_indispo") or _truthy(r.get("is_indispo")))
 
-                # porteurs/experts (4x comp_id)
-                params_diag.extend([comp_id, comp_id, comp_id, comp_id])
+    def _coverage_state_label(etat: str) -> str:
+        return {
+            "COUVERTURE_ABSENTE": "Aucun porteur déclaré",
+            "COUVERTURE_NON_CONFIRMEE": "À évaluer",
+            "NIVEAU_INSUFFISANT": "Niveau insuffisant",
+            "DEPENDANCE": "Dépendance",
+            "COUVERTURE_VALIDEE": "Couverture validée",
+        }.get(etat or "", "À qualifier")
+
+    def _coverage_action_label(etat: str) -> str:
+        return {
+            "COUVERTURE_ABSENTE": "Identifier un porteur ou recruter",
+            "COUVERTURE_NON_CONFIRMEE": "Évaluer en priorité",
+            "NIVEAU_INSUFFISANT": "Former / accompagner",
+            "DEPENDANCE": "Organiser une doublure",
+            "COUVERTURE_VALIDEE": "Surveiller",
+        }.get(etat or "", "Analyser")
+
+    porteurs_by_poste: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in porteurs:
+        pid = str(r.get("id_poste_actuel") or "").strip()
+        if pid:
+            porteurs_by_poste[pid].append(r)
+
+        rang = _niv_rank_local(r.get("niveau_actuel"))
+        is_eval = _is_evaluee_row(r)
+        is_indispo = _is_indispo_row(r)
+        if is_indispo:
+            statut_rh = "INDISPONIBLE"
+            statut_rh_label = "Indisponible"
+        elif not is_eval:
+            statut_rh = "A_EVALUER"
+            statut_rh_label = "À évaluer"
+        elif rang <= 0:
+            statut_rh = "EVALUATION_INEXPLOITABLE"
+            statut_rh_label = "Évaluation inexploitable"
+        else:
+            statut_rh = "EVALUE"
+            statut_rh_label = "Évalué"
+
+        r["niveau_code"] = _niv_key(r.get("niveau_actuel"))
+        r["niveau_rank"] = rang
+        r["is_evaluee"] = is_eval
+        r["is_indispo"] = is_indispo
+        r["statut_rh"] = statut_rh
+        r["statut_rh_label"] = statut_rh_label
+
+    besoin = {"A": 0, "B": 0, "C": 0, "D": 0}
+    porteurs_niv = {"A": 0, "B": 0, "C": 0, "D": 0}
+
+    nb_postes_absent = 0
+    nb_postes_non_confirme = 0
+    nb_postes_insuffisant = 0
+    nb_postes_dependance = 0
+    nb_postes_valides = 0
+    nb_valides_total = 0
+
+    for p in postes:
+        pid = str(p.get("id_poste") or "").strip()
+        req_rank = _niv_rank_local(p.get("niveau_requis"))
+        req_key = _niv_key(p.get("niveau_requis"))
+        besoin_poste = max(_safe_int(p.get("besoin_poste"), 1), 1)
+        if req_key:
+            besoin[req_key] += besoin_poste
+
+        related = porteurs_by_poste.get(pid, [])
+        nb_declares = len(related)
+        nb_evalues = sum(1 for r in related if r.get("is_evaluee") and not r.get("is_indispo"))
+        nb_valides = sum(
+            1 for r in related
+            if r.get("is_evaluee") and not r.get("is_indispo") and req_rank > 0 and _safe_int(r.get("niveau_rank"), 0) >= req_rank
+        )
+        nb_non_evalues = sum(1 for r in related if not r.get("is_evaluee"))
+        nb_insuffisants = sum(
+            1 for r in related
+            if r.get("is_evaluee") and not r.get("is_indispo") and req_rank > 0 and 0 < _safe_int(r.get("niveau_rank"), 0) < req_rank
+        )
 
-                cur.execute(sql_diag, tuple(params_diag))
-                diag = cur.fetchone() or {}
+        if nb_declares <= 0:
+            etat = "COUVERTURE_ABSENTE"
+            nb_postes_absent += 1
+        elif nb_valides >= besoin_poste:
+            if nb_valides == 1:
+                etat = "DEPENDANCE"
+                nb_postes_dependance += 1
+            else:
+                etat = "COUVERTURE_VALIDEE"
+                nb_postes_valides += 1
+        elif nb_non_evalues > 0:
+            etat = "COUVERTURE_NON_CONFIRMEE"
+            nb_postes_non_confirme += 1
+        elif nb_insuffisants > 0:
+            etat = "NIVEAU_INSUFFISANT"
+            nb_postes_insuffisant += 1
+        else:
+            etat = "COUVERTURE_ABSENTE"
+            nb_postes_absent += 1
+
+        p["besoin_poste"] = besoin_poste
+        p["nb_porteurs_declares"] = nb_declares
+        p["nb_porteurs_evalues"] = nb_evalues
+        p["nb_porteurs_valides"] = nb_valides
+        p["nb_porteurs_non_evalues"] = nb_non_evalues
+        p["nb_porteurs_insuffisants"] = nb_insuffisants
+        p["etat_couverture"] = etat
+        p["etat_couverture_label"] = _coverage_state_label(etat)
+        p["action_rh"] = _coverage_action_label(etat)
+
+        nb_valides_total += nb_valides
+
+    for r in porteurs:
+        if not r.get("is_evaluee") or r.get("is_indispo"):
+            continue
+        k = r.get("niveau_code") or ""
+        if k in porteurs_niv:
+            porteurs_niv[k] += 1
+
+    porteurs_ge = {
+        "A": porteurs_niv["A"] + porteurs_niv["B"] + porteurs_niv["C"] + porteurs_niv["D"],
+        "B": porteurs_niv["B"] + porteurs_niv["C"] + porteurs_niv["D"],
+        "C": porteurs_niv["C"] + porteurs_niv["D"],
+        "D": porteurs_niv["D"],
+    }
 
-                def _clamp(v: float, lo: float, hi: float) -> float:
-                    return max(lo, min(hi, v))
+    niveaux = {"besoin": besoin, "porteurs": porteurs_niv, "porteurs_ge": porteurs_ge}
+
+    causes = [
+        {
+            "code": "COUVERTURE_ABSENTE",
+            "titre": "Couverture absente",
+            "count": nb_postes_absent,
+            "lecture": "Aucun porteur déclaré ne couvre cette compétence sur les postes concernés.",
+            "action": "Identifier un porteur interne ou préparer un recrutement ciblé.",
+        },
+        {
+            "code": "COUVERTURE_NON_CONFIRMEE",
+            "titre": "Couverture non confirmée",
+            "count": nb_postes_non_confirme,
+            "lecture": "La compétence est déclarée, mais aucune évaluation exploitable ne confirme le niveau attendu.",
+            "action": "Planifier une évaluation avant de considérer le poste sécurisé.",
+        },
+        {
+            "code": "NIVEAU_INSUFFISANT",
+            "titre": "Écart de maîtrise",
+            "count": nb_postes_insuffisant,
+            "lecture": "La compétence est évaluée, mais le niveau constaté ne couvre pas le niveau requis.",
+            "action": "Prévoir formation, accompagnement ou montée en compétence ciblée.",
+        },
+        {
+            "code": "DEPENDANCE",
+            "titre": "Dépendance / transmission",
+            "count": nb_postes_dependance,
+            "lecture": "La compétence est validée, mais repose sur un seul porteur confirmé.",
+            "action": "Organiser une doublure ou un transfert de savoir-faire.",
+        },
+    ]
 
-                B = int(diag.get("bessOIN_TOTAL".lower()) or diag.get("besoin_total") or 0)
-                B = B if B > 0 else 1
+    nb_postes_total_detail = len(postes)
+    nb_postes_fragiles_detail = nb_postes_absent + nb_postes_non_confirme + nb_postes_insuffisant + nb_postes_dependance
+    indice_detail = _calc_fragility_score(nb_postes_absent, nb_postes_dependance, nb_postes_fragiles_detail)
+    if nb_postes_non_confirme > 0:
+        indice_detail = max(indice_detail, min(90, 30 + (10 * nb_postes_non_confirme)))
+    if nb_postes_insuffisant > 0:
+        indice_detail = max(indice_detail, min(92, 45 + (10 * nb_postes_insuffisant)))
+    indice_detail = _clamp_int(indice_detail, 0, 100)
+
+    priorite_detail = "P1" if indice_detail >= 75 else "P2" if indice_detail >= 50 else "P3"
+
+    competence_detail_stats = {
+        "nb_postes_impactes": nb_postes_total_detail,
+        "nb_postes_couverture_absente": nb_postes_absent,
+        "nb_postes_non_confirmee": nb_postes_non_confirme,
+        "nb_postes_niveau_insuffisant": nb_postes_insuffisant,
+        "nb_postes_dependance": nb_postes_dependance,
+        "nb_postes_valides": nb_postes_valides,
+        "nb_porteurs_declares": len(porteurs),
+        "nb_porteurs_evalues": sum(1 for r in porteurs if r.get("is_evaluee")),
+        "nb_porteurs_non_evalues": sum(1 for r in porteurs if not r.get("is_evaluee")),
+        "nb_porteurs_valides": nb_valides_total,
+        "besoin_total": sum(max(_safe_int(p.get("besoin_poste"), 1), 1) for p in postes),
+        "criticite_max": max([_safe_int(p.get("poids_criticite"), 0) for p in postes] or [0]),
+        "indice_fragilite": indice_detail,
+        "priorite": priorite_detail,
+    }
 
-                P = int(diag.get("nb_porteurs") or 0)
-                Pd = int(diag.get("nb_porteurs_dispo") or 0)
+    # --- Diagnostic DRH fiable (indépendant des LIMIT) + Indice/Priorité
+    other_ctes = f"""
+    postes_impactes AS (
+        SELECT DISTINCT
+            p.id_poste,
+            COALESCE(fpc.poids_criticite, 0)::int AS poids_criticite
+        FROM public.tbl_fiche_poste_competence fpc
+        JOIN public.tbl_fiche_poste p
+          ON p.id_poste = fpc.id_poste
+        JOIN public.tbl_competence c
+          ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
+        WHERE p.id_ent = %s
+          AND COALESCE(p.actif, TRUE) = TRUE
+          AND {svc_filter_poste}
+          AND c.id_comp = %s
+          AND COALESCE(fpc.poids_criticite, 0) >= %s
+    ),
+    titulaires AS (
+        SELECT
+            e.id_poste_actuel AS id_poste,
+            COUNT(DISTINCT e.id_effectif)::int AS nb_titulaires
+        FROM public.tbl_effectif_client e
+        WHERE e.id_ent = %s
+          AND COALESCE(e.archive, FALSE) = FALSE
+          AND COALESCE(e.id_poste_actuel, '') <> ''
+          AND {svc_filter_eff}
+        GROUP BY e.id_poste_actuel
+    ),
+    poste_need AS (
+        SELECT
+            pi.id_poste,
+            CASE
+                WHEN prh.nb_titulaires_cible IS NOT NULL AND prh.nb_titulaires_cible::int > 0
+                    THEN prh.nb_titulaires_cible::int
+                WHEN COALESCE(t.nb_titulaires, 0)::int > 0
+                    THEN COALESCE(t.nb_titulaires, 0)::int
+                ELSE 1
+            END AS besoin_poste
+        FROM postes_impactes pi
+        LEFT JOIN public.tbl_fiche_poste_param_rh prh ON prh.id_poste = pi.id_poste
+        LEFT JOIN titulaires t ON t.id_poste = pi.id_poste
+    ),
+    porteurs_poste AS (
+        SELECT
+            e.id_poste_actuel AS id_poste,
+            COUNT(DISTINCT e.id_effectif)::int AS nb_porteurs_poste
+        FROM public.tbl_effectif_client_competence ec
+        JOIN public.tbl_effectif_client e
+          ON e.id_effectif = ec.id_effectif_client
+        WHERE e.id_ent = %s
+          AND COALESCE(e.archive, FALSE) = FALSE
+          AND ec.id_comp = %s
+          AND COALESCE(ec.actif, TRUE) = TRUE
+          AND COALESCE(ec.archive, FALSE) = FALSE
+          AND {svc_filter_eff}
+        GROUP BY e.id_poste_actuel
+    ),
+    postes_enrichis AS (
+        SELECT
+            pi.id_poste,
+            pi.poids_criticite,
+            pn.besoin_poste,
+            COALESCE(pp.nb_porteurs_poste, 0)::int AS nb_porteurs_poste
+        FROM postes_impactes pi
+        JOIN poste_need pn ON pn.id_poste = pi.id_poste
+        LEFT JOIN porteurs_poste pp ON pp.id_poste = pi.id_poste
+    ),
+    need_agg AS (
+        SELECT
+            COUNT(DISTINCT id_poste)::int AS nb_postes_impactes,
+            COALESCE(MAX(poids_criticite), 0)::int AS criticite_max,
+            COALESCE(SUM(CASE WHEN poids_criticite >= 80 THEN 1 ELSE 0 END), 0)::int AS nb_postes_crit_80,
+            COALESCE(SUM(besoin_poste), 0)::int AS besoin_total,
+            COALESCE(SUM(CASE WHEN nb_porteurs_poste = 0 THEN 1 ELSE 0 END), 0)::int AS nb_postes_sans_porteur,
+            COALESCE(SUM(CASE WHEN nb_porteurs_poste = 1 THEN 1 ELSE 0 END), 0)::int AS nb_postes_porteur_unique
+        FROM postes_enrichis
+    ),
+    effectifs_scope AS (
+        SELECT e.id_effectif
+        FROM public.tbl_effectif_client e
+        WHERE e.id_ent = %s
+          AND COALESCE(e.archive, FALSE) = FALSE
+          AND {svc_filter_eff}
+    ),
+    effectifs_dispo AS (
+        SELECT es.id_effectif
+        FROM effectifs_scope es
+        JOIN public.tbl_effectif_client e ON e.id_effectif = es.id_effectif
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM public.tbl_effectif_client_break b
+            WHERE b.id_effectif = e.id_effectif
+              AND b.archive = FALSE
+              AND b.date_debut <= CURRENT_DATE
+              AND b.date_fin >= CURRENT_DATE
+        )
+    ),
+    porteurs_nominal AS (
+        SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_porteurs
+        FROM public.tbl_effectif_client_competence ec
+        JOIN effectifs_scope es ON es.id_effectif = ec.id_effectif_client
+        WHERE ec.id_comp = %s
+          AND COALESCE(ec.actif, TRUE) = TRUE
+          AND COALESCE(ec.archive, FALSE) = FALSE
+    ),
+    porteurs_dispo AS (
+        SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_porteurs
+        FROM public.tbl_effectif_client_competence ec
+        JOIN effectifs_dispo es ON es.id_effectif = ec.id_effectif_client
+        LEFT JOIN public.tbl_effectif_client_audit_competence a
+          ON a.id_audit_competence = ec.id_dernier_audit
+         AND a.id_effectif_competence = ec.id_effectif_competence
+        WHERE ec.id_comp = %s
+          AND COALESCE(ec.actif, TRUE) = TRUE
+          AND COALESCE(ec.archive, FALSE) = FALSE
+          AND a.resultat_eval IS NOT NULL
+          AND (a.date_audit IS NOT NULL OR ec.date_derniere_eval IS NOT NULL OR a.id_audit_competence IS NOT NULL)
+    ),
+    experts_nominal AS (
+        SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_experts
+        FROM public.tbl_effectif_client_competence ec
+        JOIN effectifs_scope es ON es.id_effectif = ec.id_effectif_client
+        WHERE ec.id_comp = %s
+          AND COALESCE(ec.actif, TRUE) = TRUE
+          AND COALESCE(ec.archive, FALSE) = FALSE
+          AND (
+            CASE
+              WHEN trim(COALESCE(ec.niveau_actuel, '')) ~ '^[0-9]+$'
+                THEN trim(ec.niveau_actuel)::int
+              WHEN UPPER(TRIM(ec.niveau_actuel)) = 'D' THEN 4
+              WHEN ec.niveau_actuel ILIKE '%%expert%%' THEN 4
+                  WHEN UPPER(TRIM(ec.niveau_actuel)) = 'C' THEN 3
+              ELSE 0
+            END
+          ) >= 4
+    ),
+    experts_dispo AS (
+        SELECT COUNT(DISTINCT ec.id_effectif_client)::int AS nb_experts
+        FROM public.tbl_effectif_client_competence ec
+        JOIN effectifs_dispo es ON es.id_effectif = ec.id_effectif_client
+        WHERE ec.id_comp = %s
+          AND COALESCE(ec.actif, TRUE) = TRUE
+          AND COALESCE(ec.archive, FALSE) = FALSE
+          AND (
+            CASE
+              WHEN trim(COALESCE(ec.niveau_actuel, '')) ~ '^[0-9]+$'
+                THEN trim(ec.niveau_actuel)::int
+              WHEN UPPER(TRIM(ec.niveau_actuel)) = 'D' THEN 4
+              WHEN ec.niveau_actuel ILIKE '%%expert%%' THEN 4
+                  WHEN UPPER(TRIM(ec.niveau_actuel)) = 'C' THEN 3
+              ELSE 0
+            END
+          ) >= 4
+    )
+    """
 
-                Pe = int(diag.get("nb_experts") or 0)
-                Ped = int(diag.get("nb_experts_dispo") or 0)
+    if services_cte_sql:
+        sql_diag = "WITH " + services_cte_sql + ",\n" + other_ctes + """
+        SELECT
+            na.nb_postes_impactes,
+            na.criticite_max,
+            na.nb_postes_crit_80,
+            na.besoin_total,
+            na.nb_postes_sans_porteur,
+            na.nb_postes_porteur_unique,
+            pn.nb_porteurs AS nb_porteurs,
+            pd.nb_porteurs AS nb_porteurs_dispo,
+            en.nb_experts AS nb_experts,
+            ed.nb_experts AS nb_experts_dispo
+        FROM need_agg na
+        CROSS JOIN porteurs_nominal pn
+        CROSS JOIN porteurs_dispo pd
+        CROSS JOIN experts_nominal en
+        CROSS JOIN experts_dispo ed
+        """
+    else:
+        sql_diag = "WITH " + other_ctes + """
+        SELECT
+            na.nb_postes_impactes,
+            na.criticite_max,
+            na.nb_postes_crit_80,
+            na.besoin_total,
+            na.nb_postes_sans_porteur,
+            na.nb_postes_porteur_unique,
+            pn.nb_porteurs AS nb_porteurs,
+            pd.nb_porteurs AS nb_porteurs_dispo,
+            en.nb_experts AS nb_experts,
+            ed.nb_experts AS nb_experts_dispo
+        FROM need_agg na
+        CROSS JOIN porteurs_nominal pn
+        CROSS JOIN porteurs_dispo pd
+        CROSS JOIN experts_nominal en
+        CROSS JOIN experts_dispo ed
+        """
+
+    params_diag: List[Any] = []
+    params_diag.extend(services_cte_params)
+
+    # postes_impactes
+    params_diag.extend([id_ent])
+    params_diag.extend(extra_poste_params)
+    params_diag.extend([comp_id, criticite_min])
+
+    # titulaires
+    params_diag.append(id_ent)
+    params_diag.extend(extra_eff_params)
+
+    # porteurs_poste
+    params_diag.append(id_ent)
+    params_diag.append(comp_id)
+    params_diag.extend(extra_eff_params)
+
+    # effectifs_scope
+    params_diag.append(id_ent)
+    params_diag.extend(extra_eff_params)
+
+    # porteurs/experts (4x comp_id)
+    params_diag.extend([comp_id, comp_id, comp_id, comp_id])
+
+    cur.execute(sql_diag, tuple(params_diag))
+    diag = cur.fetchone() or {}
+
+    def _clamp(v: float, lo: float, hi: float) -> float:
+        return max(lo, min(hi, v))
+
+    B = int(diag.get("bessOIN_TOTAL".lower()) or diag.get("besoin_total") or 0)
+    B = B if B > 0 else 1
+
+    P = int(diag.get("nb_porteurs") or 0)
+    Pd = int(diag.get("nb_porteurs_dispo") or 0)
+
+    Pe = int(diag.get("nb_experts") or 0)
+    Ped = int(diag.get("nb_experts_dispo") or 0)
+
+    N = int(diag.get("nb_postes_impactes") or 0)
+    Cmax = int(diag.get("criticite_max") or 0)
+    N80 = int(diag.get("nb_postes_crit_80") or 0)
+
+    nb_postes = N
+    nb_porteurs = P
+    nb_postes_sans_porteur = int(diag.get("nb_postes_sans_porteur") or 0)
+    nb_postes_porteur_unique = int(diag.get("nb_postes_porteur_unique") or 0)
+
+    # Sous-scores (0..1)
+    S_cov = _clamp(1.0 - (P / float(B)), 0.0, 1.0)
+
+    if P == 0:
+        S_dep = 1.00
+    elif P == 1:
+        S_dep = 0.80
+    elif P == 2:
+        S_dep = 0.50
+    elif P == 3:
+        S_dep = 0.25
+    else:
+        S_dep = 0.00
 
-                N = int(diag.get("nb_postes_impactes") or 0)
-                Cmax = int(diag.get("criticite_max") or 0)
-                N80 = int(diag.get("nb_postes_crit_80") or 0)
+    if Pe == 0:
+        S_exp = 1.00
+    elif Pe == 1:
+        S_exp = 0.70
+    else:
+        S_exp = 0.00
 
-                nb_postes = N
-                nb_porteurs = P
-                nb_postes_sans_porteur = int(diag.get("nb_postes_sans_porteur") or 0)
-                nb_postes_porteur_unique = int(diag.get("nb_postes_porteur_unique") or 0)
+    S_expo = min(1.0, N / 5.0)
+    S_sev = 0.7 * (Cmax / 100.0) + 0.3 * min(1.0, N80 / 3.0)
 
-                # Sous-scores (0..1)
-                S_cov = _clamp(1.0 - (P / float(B)), 0.0, 1.0)
+    base = 100.0 * (
+        0.35 * S_cov
+        + 0.15 * S_dep
+        + 0.15 * S_exp
+        + 0.10 * S_expo
+        + 0.25 * S_sev
+    )
 
-                if P == 0:
-                    S_dep = 1.00
-                elif P == 1:
-                    S_dep = 0.80
-                elif P == 2:
-                    S_dep = 0.50
-                elif P == 3:
-                    S_dep = 0.25
-                else:
-                    S_dep = 0.00
+    bonus = 0.0
+    if P > 0 and Pd == 0:
+        bonus += 20.0
+    if Pe > 0 and Ped == 0:
+        bonus += 10.0
 
-                if Pe == 0:
-                    S_exp = 1.00
-                elif Pe == 1:
-                    S_exp = 0.70
-                else:
-                    S_exp = 0.00
+    indice = int(round(_clamp(base + bonus, 0.0, 100.0)))
 
-                S_expo = min(1.0, N / 5.0)
-                S_sev = 0.7 * (Cmax / 100.0) + 0.3 * min(1.0, N80 / 3.0)
+    if indice >= 75:
+        priorite = "P1"
+    elif indice >= 50:
+        priorite = "P2"
+    else:
+        priorite = "P3"
+
+    # Alignement final modal <-> table : même source que /risques/detail?kpi=critiques-fragiles.
+    comp_records_modal = _fetch_competence_fragility_records(
+        cur,
+        id_ent,
+        scope.get("id_service") if isinstance(scope, dict) else None,
+        criticite_min,
+        comp_id=comp_id,
+        limit=1,
+    )
+    if comp_records_modal:
+        cr = comp_records_modal[0]
+        indice = int(cr.get("indice_fragilite") or 0)
+        priorite = cr.get("priorite") or _competence_priorite_from_score(indice)
+        causes = cr.get("causes") or _build_competence_causes_from_counts({})
+        nb_postes = int(cr.get("nb_postes_impactes") or 0)
+        nb_porteurs = int(cr.get("nb_porteurs") or 0)
+        B = int(cr.get("besoin_total") or 0) or 1
+        Pd = int(cr.get("nb_porteurs_dispo") or 0)
+        Pe = int(cr.get("nb_experts") or 0)
+        Ped = int(cr.get("nb_experts_dispo") or 0)
+        Cmax = int(cr.get("criticite_max") or 0)
+        N80 = int(cr.get("nb_postes_crit_80") or 0)
+        nb_postes_sans_porteur = int(cr.get("nb_postes_couverture_absente") or 0)
+        nb_postes_porteur_unique = int(cr.get("nb_postes_dependance") or 0)
+
+        competence_detail_stats.update({
+            "nb_postes_impactes": int(cr.get("nb_postes_impactes") or 0),
+            "nb_postes_couverture_absente": int(cr.get("nb_postes_couverture_absente") or 0),
+            "nb_postes_non_confirmee": int(cr.get("nb_postes_non_confirmee") or 0),
+            "nb_postes_niveau_insuffisant": int(cr.get("nb_postes_niveau_insuffisant") or 0),
+            "nb_postes_dependance": int(cr.get("nb_postes_dependance") or 0),
+            "nb_postes_valides": int(cr.get("nb_postes_valides") or 0),
+            "nb_porteurs_declares": int(cr.get("nb_porteurs_declares") or 0),
+            "nb_porteurs_evalues": int(cr.get("nb_porteurs_evalues") or 0),
+            "nb_porteurs_non_evalues": max(int(cr.get("nb_porteurs_declares") or 0) - int(cr.get("nb_porteurs_evalues") or 0), 0),
+            "nb_porteurs_valides": int(cr.get("nb_porteurs_valides") or 0),
+            "besoin_total": int(cr.get("besoin_total") or 0),
+            "criticite_max": int(cr.get("criticite_max") or 0),
+            "indice_fragilite": indice,
+            "priorite": priorite,
+            "score_maitrise": int(cr.get("score_maitrise") or 0),
+            "score_concentration": int(cr.get("score_concentration") or 0),
+            "score_transmission": int(cr.get("score_transmission") or 0),
+            "score_evenements": int(cr.get("score_evenements") or 0),
+            "score_donnees": int(cr.get("score_donnees") or 0),
+        })
 
-                base = 100.0 * (
-                    0.35 * S_cov
-                    + 0.15 * S_dep
-                    + 0.15 * S_exp
-                    + 0.10 * S_expo
-                    + 0.25 * S_sev
-                )
+        postes_state = {str(p.get("id_poste") or ""): p for p in (cr.get("postes") or [])}
+        for p in postes:
+            st = postes_state.get(str(p.get("id_poste") or ""))
+            if st:
+                p.update({
+                    "besoin_poste": st.get("besoin_poste"),
+                    "nb_porteurs_declares": st.get("nb_porteurs_declares"),
+                    "nb_porteurs_evalues": st.get("nb_porteurs_evalues"),
+                    "nb_porteurs_valides": st.get("nb_porteurs_valides"),
+                    "nb_porteurs_non_evalues": st.get("nb_porteurs_non_evalues"),
+                    "nb_porteurs_insuffisants": st.get("nb_porteurs_insuffisants"),
+                    "etat_couverture": st.get("etat_couverture"),
+                    "etat_couverture_label": st.get("etat_couverture_label"),
+                    "action_rh": st.get("action_rh"),
+                })
+
+    # IMPORTANT : l'indice affiché dans la table "Compétences critiques"
+    # est calculé par la requête de détail risques (formule DRH historique :
+    # besoin total, porteurs nominaux, disponibilité, exposition, sévérité).
+    # Le bloc competence_detail_stats sert uniquement à enrichir le modal
+    # avec la lecture RH par poste (absente / non confirmée / insuffisante / dépendance).
+    # Il ne doit jamais écraser indice/priorité, sinon la table et le modal
+    # racontent deux vérités différentes. Oui, on a déjà donné, c'était pénible.
 
-                bonus = 0.0
-                if P > 0 and Pd == 0:
-                    bonus += 20.0
-                if Pe > 0 and Ped == 0:
-                    bonus += 10.0
+    return {
+        "scope": scope,
+        "criticite_min": criticite_min,
+        "competence": {
+            "id_comp": comp.get("id_comp"),
+            "code": comp.get("code"),
+            "intitule": comp.get("intitule"),
+            "description": comp.get("description"),
+            "id_domaine_competence": comp.get("id_domaine_competence"),
+            "etat": comp.get("etat"),
+            "masque": comp.get("masque"),
+            "domaine": {
+                "id_domaine_competence": comp.get("id_domaine_competence"),
+                "titre": comp.get("titre"),
+                "titre_court": comp.get("titre_court"),
+                "couleur": comp.get("couleur"),
+            }
+        },
+        "niveaux": niveaux,
+        "stats": {
+            "nb_postes_impactes": nb_postes,
+            "nb_porteurs": nb_porteurs,
+            "nb_postes_sans_porteur": nb_postes_sans_porteur,
+            "nb_postes_porteur_unique": nb_postes_porteur_unique,
+
+            "besoin_total": B,
+            "nb_porteurs_dispo": Pd,
+
+            "nb_experts": Pe,
+            "nb_experts_dispo": Ped,
+
+            "criticite_max": Cmax,
+            "nb_postes_crit_80": N80,
+
+            "indice_fragilite": indice,
+            "priorite": priorite,
+            "score_maitrise": competence_detail_stats.get("score_maitrise", 0),
+            "score_concentration": competence_detail_stats.get("score_concentration", 0),
+            "score_transmission": competence_detail_stats.get("score_transmission", 0),
+            "score_evenements": competence_detail_stats.get("score_evenements", 0),
+            "score_donnees": competence_detail_stats.get("score_donnees", 0),
+            "nb_postes_couverture_absente": competence_detail_stats.get("nb_postes_couverture_absente", 0),
+            "nb_postes_non_confirmee": competence_detail_stats.get("nb_postes_non_confirmee", 0),
+            "nb_postes_niveau_insuffisant": competence_detail_stats.get("nb_postes_niveau_insuffisant", 0),
+            "nb_postes_dependance": competence_detail_stats.get("nb_postes_dependance", 0),
+            "nb_postes_valides": competence_detail_stats.get("nb_postes_valides", 0),
+            "nb_porteurs_declares": competence_detail_stats.get("nb_porteurs_declares", 0),
+            "nb_porteurs_evalues": competence_detail_stats.get("nb_porteurs_evalues", 0),
+            "nb_porteurs_non_evalues": competence_detail_stats.get("nb_porteurs_non_evalues", 0),
+            "nb_porteurs_valides": competence_detail_stats.get("nb_porteurs_valides", 0),
+
+            # Score informatif calculé depuis les états RH du modal.
+            # Ne pilote pas l'indice affiché, qui reste aligné avec la table.
+            "indice_fragilite_detail_rh": competence_detail_stats.get("indice_fragilite", 0),
+            "priorite_detail_rh": competence_detail_stats.get("priorite", None),
+        },
+
+        "causes": causes,
+        "postes": postes,
+        "porteurs": porteurs,
+    }
 
-                indice = int(round(_clamp(base + bonus, 0.0, 100.0)))
 
-                if indice >= 75:
-                    priorite = "P1"
-                elif indice >= 50:
-                    priorite = "P2"
-                else:
-                    priorite = "P3"
+@router.get("/skills/analyse/risques/competence/{id_contact}")
+def get_risque_competence_detail(
+    id_contact: str,
+    request: Request,
+    response: Response,
+    id_comp: str = Query(..., description="id_comp OU code compétence"),
+    id_service: Optional[str] = Query(default=None),
+    criticite_min: int = Query(default=CRITICITE_MIN_DEFAULT, ge=CRITICITE_MIN_MIN, le=CRITICITE_MIN_MAX),
+    limit_postes: int = Query(default=200, ge=1, le=2000),
+    limit_porteurs: int = Query(default=300, ge=1, le=2000),
+):
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
 
-                # Alignement final modal <-> table : même source que /risques/detail?kpi=critiques-fragiles.
-                comp_records_modal = _fetch_competence_fragility_records(
-                    cur,
-                    id_ent,
-                    scope.get("id_service") if isinstance(scope, dict) else None,
-                    criticite_min,
-                    comp_id=comp_id,
-                    limit=1,
+                id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                nm = not_modified(request, response, id_ent)
+                if nm is not None:
+                    return nm
+                return fast_json_response(
+                    _risque_competence_detail_data(cur, id_ent, id_comp, id_service, criticite_min, limit_postes, limit_porteurs),
+                    response=response,
                 )
-                if comp_records_modal:
-                    cr = comp_records_modal[0]
-                    indice = int(cr.get("indice_fragilite") or 0)
-                    priorite = cr.get("priorite") or _competence_priorite_from_score(indice)
-                    causes = cr.get("causes") or _build_competence_causes_from_counts({})
-                    nb_postes = int(cr.get("nb_postes_impactes") or 0)
-                    nb_porteurs = int(cr.get("nb_porteurs") or 0)
-                    B = int(cr.get("besoin_total") or 0) or 1
-                    Pd = int(cr.get("nb_porteurs_dispo") or 0)
-                    Pe = int(cr.get("nb_experts") or 0)
-                    Ped = int(cr.get("nb_experts_dispo") or 0)
-                    Cmax = int(cr.get("criticite_max") or 0)
-                    N80 = int(cr.get("nb_postes_crit_80") or 0)
-                    nb_postes_sans_porteur = int(cr.get("nb_postes_couverture_absente") or 0)
-                    nb_postes_porteur_unique = int(cr.get("nb_postes_dependance") or 0)
-
-                    competence_detail_stats.update({
-                        "nb_postes_impactes": int(cr.get("nb_postes_impactes") or 0),
-                        "nb_postes_couverture_absente": int(cr.get("nb_postes_couverture_absente") or 0),
-                        "nb_postes_non_confirmee": int(cr.get("nb_postes_non_confirmee") or 0),
-                        "nb_postes_niveau_insuffisant": int(cr.get("nb_postes_niveau_insuffisant") or 0),
-                        "nb_postes_dependance": int(cr.get("nb_postes_dependance") or 0),
-                        "nb_postes_valides": int(cr.get("nb_postes_valides") or 0),
-                        "nb_porteurs_declares": int(cr.get("nb_porteurs_declares") or 0),
-                        "nb_porteurs_evalues": int(cr.get("nb_porteurs_evalues") or 0),
-                        "nb_porteurs_non_evalues": max(int(cr.get("nb_porteurs_declares") or 0) - int(cr.get("nb_porteurs_evalues") or 0), 0),
-                        "nb_porteurs_valides": int(cr.get("nb_porteurs_valides") or 0),
-                        "besoin_total": int(cr.get("besoin_total") or 0),
-                        "criticite_max": int(cr.get("criticite_max") or 0),
-                        "indice_fragilite": indice,
-                        "priorite": priorite,
-                        "score_maitrise": int(cr.get("score_maitrise") or 0),
-                        "score_concentration": int(cr.get("score_concentration") or 0),
-                        "score_transmission": int(cr.get("score_transmission") or 0),
-                        "score_evenements": int(cr.get("score_evenements") or 0),
-                        "score_donnees": int(cr.get("score_donnees") or 0),
-                    })
-
-                    postes_state = {str(p.get("id_poste") or ""): p for p in (cr.get("postes") or [])}
-                    for p in postes:
-                        st = postes_state.get(str(p.get("id_poste") or ""))
-                        if st:
-                            p.update({
-                                "besoin_poste": st.get("besoin_poste"),
-                                "nb_porteurs_declares": st.get("nb_porteurs_declares"),
-                                "nb_porteurs_evalues": st.get("nb_porteurs_evalues"),
-                                "nb_porteurs_valides": st.get("nb_porteurs_valides"),
-                                "nb_porteurs_non_evalues": st.get("nb_porteurs_non_evalues"),
-                                "nb_porteurs_insuffisants": st.get("nb_porteurs_insuffisants"),
-                                "etat_couverture": st.get("etat_couverture"),
-                                "etat_couverture_label": st.get("etat_couverture_label"),
-                                "action_rh": st.get("action_rh"),
-                            })
-
-                # IMPORTANT : l'indice affiché dans la table "Compétences critiques"
-                # est calculé par la requête de détail risques (formule DRH historique :
-                # besoin total, porteurs nominaux, disponibilité, exposition, sévérité).
-                # Le bloc competence_detail_stats sert uniquement à enrichir le modal
-                # avec la lecture RH par poste (absente / non confirmée / insuffisante / dépendance).
-                # Il ne doit jamais écraser indice/priorité, sinon la table et le modal
-                # racontent deux vérités différentes. Oui, on a déjà donné, c'était pénible.
-
-                return {
-                    "scope": scope,
-                    "criticite_min": criticite_min,
-                    "competence": {
-                        "id_comp": comp.get("id_comp"),
-                        "code": comp.get("code"),
-                        "intitule": comp.get("intitule"),
-                        "description": comp.get("description"),
-                        "id_domaine_competence": comp.get("id_domaine_competence"),
-                        "etat": comp.get("etat"),
-                        "masque": comp.get("masque"),
-                        "domaine": {
-                            "id_domaine_competence": comp.get("id_domaine_competence"),
-                            "titre": comp.get("titre"),
-                            "titre_court": comp.get("titre_court"),
-                            "couleur": comp.get("couleur"),
-                        }
-                    },
-                    "niveaux": niveaux,
-                    "stats": {
-                        "nb_postes_impactes": nb_postes,
-                        "nb_porteurs": nb_porteurs,
-                        "nb_postes_sans_porteur": nb_postes_sans_porteur,
-                        "nb_postes_porteur_unique": nb_postes_porteur_unique,
-
-                        "besoin_total": B,
-                        "nb_porteurs_dispo": Pd,
-
-                        "nb_experts": Pe,
-                        "nb_experts_dispo": Ped,
-
-                        "criticite_max": Cmax,
-                        "nb_postes_crit_80": N80,
-
-                        "indice_fragilite": indice,
-                        "priorite": priorite,
-                        "score_maitrise": competence_detail_stats.get("score_maitrise", 0),
-                        "score_concentration": competence_detail_stats.get("score_concentration", 0),
-                        "score_transmission": competence_detail_stats.get("score_transmission", 0),
-                        "score_evenements": competence_detail_stats.get("score_evenements", 0),
-                        "score_donnees": competence_detail_stats.get("score_donnees", 0),
-                        "nb_postes_couverture_absente": competence_detail_stats.get("nb_postes_couverture_absente", 0),
-                        "nb_postes_non_confirmee": competence_detail_stats.get("nb_postes_non_confirmee", 0),
-                        "nb_postes_niveau_insuffisant": competence_detail_stats.get("nb_postes_niveau_insuffisant", 0),
-                        "nb_postes_dependance": competence_detail_stats.get("nb_postes_dependance", 0),
-                        "nb_postes_valides": competence_detail_stats.get("nb_postes_valides", 0),
-                        "nb_porteurs_declares": competence_detail_stats.get("nb_porteurs_declares", 0),
-                        "nb_porteurs_evalues": competence_detail_stats.get("nb_porteurs_evalues", 0),
-                        "nb_porteurs_non_evalues": competence_detail_stats.get("nb_porteurs_non_evalues", 0),
-                        "nb_porteurs_valides": competence_detail_stats.get("nb_porteurs_valides", 0),
-
-                        # Score informatif calculé depuis les états RH du modal.
-                        # Ne pilote pas l'indice affiché, qui reste aligné avec la table.
-                        "indice_fragilite_detail_rh": competence_detail_stats.get("indice_fragilite", 0),
-                        "priorite_detail_rh": competence_detail_stats.get("priorite", None),
-                    },
-
-                    "causes": causes,
-                    "postes": postes,
-                    "porteurs": porteurs,
-                }
-
     except HTTPException:
         raise
     except Exception as e:
@@ -7729,7 +7761,7 @@ def _analyse_last_eval_map(cur, id_ent: str, id_service: Optional[str], comp_ids
     ids = [str(v or "").strip() for v in (comp_ids or []) if str(v or "").strip()]
     if not ids:
         return {}
-    cte_sql, cte_params = _build_scope_cte(id_ent, (id_service or "").strip() or None)
+    cte_sql, cte_params = _build_scope_cte(id_ent, (id_service or "").strip() or None, cur)
     cur.execute(
         f"""
         WITH {cte_sql}
@@ -7759,7 +7791,7 @@ def _analyse_last_eval_map(cur, id_ent: str, id_service: Optional[str], comp_ids
 
 def _analyse_matching_summary_by_poste(cur, id_ent: str, id_service: Optional[str], criticite_min: int, min_score: int = 65) -> Dict[str, Dict[str, Any]]:
     scope_id = (id_service or "").strip() or None
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
 
     cur.execute(
         f"""
@@ -8059,6 +8091,166 @@ def get_analyse_ishikawa_pdf(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur génération Ishikawa analyse: {e}")
 
+def _analyse_risques_report_load(cur, id_ent: str, id_service: Optional[str], criticite_min: int) -> Dict[str, Any]:
+    """
+    Données du rapport d'analyse des risques (lecture DB uniquement).
+    """
+    company_name = _analyse_pdf_company_name(cur, id_ent)
+    logo_bytes = _analyse_pdf_logo_bytes_for_ent(cur, id_ent)
+    scope, comp_records, poste_records = _analyse_build_context_data(cur, id_ent, id_service, int(criticite_min))
+    comp_ids = [str(r.get("id_comp") or "").strip() for r in comp_records if str(r.get("id_comp") or "").strip()]
+    return {
+        "company_name": company_name,
+        "logo_bytes": logo_bytes,
+        "scope": scope,
+        "comp_records": comp_records,
+        "poste_records": poste_records,
+        "last_eval_map": _analyse_last_eval_map(cur, id_ent, scope.id_service, comp_ids),
+    }
+
+
+def _analyse_risques_report_render(data: Dict[str, Any], criticite_min: int, horizon_years: int, query_params: Any = None) -> bytes:
+    """
+    Rendu PDF du rapport (sans connexion DB). query_params : surcharges risk_level_/risk_score_/risk_count_ de la modale.
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.platypus import PageBreak, Paragraph, Table, TableStyle
+    from app.routers.skills_portal_pdf_common import build_pdf_document, build_pdf_styles, make_spacer
+
+    company_name = data["company_name"]
+    logo_bytes = data["logo_bytes"]
+    scope = data["scope"]
+    comp_records = data["comp_records"]
+    poste_records = data["poste_records"]
+    last_eval_map = data["last_eval_map"]
+    renfort_by_poste = {}
+
+    raw_effects = _analyse_build_effect_metrics(comp_records, poste_records, horizon_years, renfort_by_poste, None)
+    effects = []
+    family_counts: Dict[str, int] = {}
+    query_params = query_params or {}
+    valid_levels = {"Risque faible", "Risque modéré", "Risque moyen", "Risque élevé", "Risque critique"}
+
+    for effect in (raw_effects or []):
+        key = str(effect.get("key") or "").strip()
+        level = str(effect.get("level") or _analyse_effect_level(effect.get("score"), effect.get("count"))).strip()
+        modal_level = str(query_params.get(f"risk_level_{key}") or "").strip()
+        if modal_level in valid_levels:
+            level = "Risque modéré" if modal_level == "Risque moyen" else modal_level
+
+        effect_item = {**effect, "level": level}
+
+        modal_score = query_params.get(f"risk_score_{key}")
+        if modal_score is not None:
+            effect_item["score"] = max(0, min(100, _analyse_pdf_safe_int(modal_score)))
+
+        modal_count = query_params.get(f"risk_count_{key}")
+        if modal_count is not None:
+            effect_item["count"] = max(0, _analyse_pdf_safe_int(modal_count))
+
+        effects.append(effect_item)
+        rows = _analyse_ishikawa_rows_for_effect(comp_records, poste_records, last_eval_map, renfort_by_poste, key)
+        grouped = _analyse_ishikawa_group_rows(rows, _analyse_effect_definitions().get(key, {}).get("families") or [])
+        for family, fam_rows in grouped.items():
+            if not fam_rows:
+                continue
+            family_label = _analyse_ishikawa_family_display_label(family)
+            family_counts[family_label] = family_counts.get(family_label, 0) + len(fam_rows)
+
+    styles = build_pdf_styles()
+    title_style = styles["title"]
+
+    nb_postes = len(poste_records or [])
+    nb_comps = len(comp_records or [])
+    frag_postes = _analyse_fragility_average(poste_records) if nb_postes else 0
+    frag_comps = _analyse_fragility_average([r for r in (comp_records or []) if _analyse_pdf_safe_int(r.get("indice_fragilite")) > 0]) if nb_comps else 0
+    effects_detected = sum(1 for e in effects if _analyse_pdf_safe_int(e.get("count")) > 0)
+    risk_global_score = max(frag_postes, frag_comps)
+    risk_global_level = _analyse_report_effect_level(risk_global_score, effects_detected)
+
+    effect_palette = ["#2563EB", "#7C3AED", "#06B6D4", "#10B981", "#F97316", "#EC4899", "#4F46E5", "#22C55E"]
+    family_items = [{"family": k, "count": v} for k, v in sorted(family_counts.items(), key=lambda kv: (-kv[1], kv[0]))]
+    top_postes = [
+        {
+            "label": f"{(p.get('codif_poste') or p.get('codif_client') or '').strip()} - {(p.get('intitule_poste') or 'Poste').strip()}",
+            "value": _analyse_pdf_safe_int(p.get('indice_fragilite')),
+        }
+        for p in sorted(poste_records or [], key=lambda r: -_analyse_pdf_safe_int(r.get("indice_fragilite")))[:5]
+    ]
+    top_competences = [
+        {
+            "label": f"{(c.get('code') or '').strip()} - {(c.get('intitule') or 'Compétence').strip()}",
+            "value": _analyse_pdf_safe_int(c.get('indice_fragilite')),
+        }
+        for c in sorted(comp_records or [], key=lambda r: -_analyse_pdf_safe_int(r.get("indice_fragilite")))[:5]
+    ]
+
+    story = []
+    story.append(Paragraph("Rapport d’analyse des risques compétences", title_style))
+    story.append(make_spacer(3))
+
+    story.append(_analyse_report_scope_label_panel(scope, nb_postes, nb_comps, horizon_years, criticite_min, 270, 6))
+    story.append(make_spacer(4))
+    top_cards = Table([[
+        _analyse_pdf_kpi_card("Postes analysés", str(nb_postes), "Périmètre lu", 62, 22),
+        _analyse_pdf_kpi_card("Compétences analysées", str(nb_comps), "Compétences critiques retenues", 62, 22),
+        _analyse_pdf_kpi_card("Effets détectés", str(effects_detected), "Effets terrain suivis", 62, 22),
+        _analyse_pdf_kpi_card("Analyse", "Risques actuels", "Situation à date", 62, 22),
+    ]], colWidths=[65 * mm, 65 * mm, 65 * mm, 65 * mm])
+    top_cards.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
+    story.append(top_cards)
+    story.append(make_spacer(5))
+
+    row_2 = Table([[
+        _analyse_report_ring_like("Fragilité moyenne des postes", frag_postes, width_mm=64, height_mm=42),
+        _analyse_report_ring_like("Fragilité moyenne des compétences", frag_comps, width_mm=64, height_mm=42),
+        _analyse_report_pie_panel(
+            "Effets terrain détectés",
+            [str(e.get("title") or "Effet") for e in effects],
+            [_analyse_pdf_safe_int(e.get("count")) for e in effects],
+            effect_palette,
+            width_mm=132,
+            height_mm=62,
+        ),
+    ]], colWidths=[67 * mm, 67 * mm, 138 * mm])
+    row_2.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
+    story.append(row_2)
+    story.append(make_spacer(5))
+
+    row_3 = Table([[
+        _analyse_pdf_risk_gauge_card(risk_global_score, risk_global_level, 74, 22, "Niveau de risque global"),
+        _analyse_report_family_bars_panel("Familles de causes les plus présentes", family_items, 194, 44),
+    ]], colWidths=[77 * mm, 195 * mm])
+    row_3.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
+    story.append(row_3)
+    story.append(make_spacer(5))
+
+    story.append(_analyse_report_hbars_panel("Postes les plus fragiles", top_postes, "label", "value", 270, 74))
+    story.append(make_spacer(4))
+    story.append(_analyse_report_hbars_panel("Compétences les plus fragiles", top_competences, "label", "value", 270, 74))
+
+    for effect in effects:
+        if _analyse_pdf_safe_int(effect.get("count")) <= 0:
+            continue
+        story.append(PageBreak())
+        story.append(Paragraph(f"Ishikawa • {effect.get('title')}", title_style))
+        story.append(make_spacer(2))
+        rows = _analyse_ishikawa_rows_for_effect(comp_records, poste_records, last_eval_map, renfort_by_poste, effect.get("key"))
+        story.append(_analyse_ishikawa_visual(_analyse_effect_definitions().get(effect.get("key")), rows, effect, 270.0, 96.0))
+        story.append(make_spacer(2))
+
+    pdf = build_pdf_document(story, {
+        "title": "Rapport d’analyse des risques compétences",
+        "footer_left": "Novoskill Insights • Rapport d’analyse des risques compétences",
+        "header_right": company_name,
+        "header_right_font_name": "Helvetica-Bold",
+        "header_right_font_size": 11,
+        "logo_bytes": logo_bytes,
+    }, page_size=landscape(A4))
+    return pdf
+
+
 @router.get("/skills/analyse/rapport/{id_contact}")
 def get_analyse_risques_report_pdf(
     id_contact: str,
@@ -8069,143 +8261,13 @@ def get_analyse_risques_report_pdf(
 ):
     try:
         from fastapi import Response
-        from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.lib.units import mm
-        from reportlab.platypus import PageBreak, Paragraph, Table, TableStyle
-        from app.routers.skills_portal_pdf_common import build_pdf_document, build_pdf_styles, make_spacer
 
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
-                company_name = _analyse_pdf_company_name(cur, id_ent)
-                logo_bytes = _analyse_pdf_logo_bytes_for_ent(cur, id_ent)
-                scope, comp_records, poste_records = _analyse_build_context_data(cur, id_ent, id_service, int(criticite_min))
-                comp_ids = [str(r.get("id_comp") or "").strip() for r in comp_records if str(r.get("id_comp") or "").strip()]
-                last_eval_map = _analyse_last_eval_map(cur, id_ent, scope.id_service, comp_ids)
-                renfort_by_poste = {}
-
-        raw_effects = _analyse_build_effect_metrics(comp_records, poste_records, int(horizon_years), renfort_by_poste, None)
-        effects = []
-        family_counts: Dict[str, int] = {}
-        query_params = request.query_params
-        valid_levels = {"Risque faible", "Risque modéré", "Risque moyen", "Risque élevé", "Risque critique"}
-
-        for effect in (raw_effects or []):
-            key = str(effect.get("key") or "").strip()
-            level = str(effect.get("level") or _analyse_effect_level(effect.get("score"), effect.get("count"))).strip()
-            modal_level = str(query_params.get(f"risk_level_{key}") or "").strip()
-            if modal_level in valid_levels:
-                level = "Risque modéré" if modal_level == "Risque moyen" else modal_level
-
-            effect_item = {**effect, "level": level}
-
-            modal_score = query_params.get(f"risk_score_{key}")
-            if modal_score is not None:
-                effect_item["score"] = max(0, min(100, _analyse_pdf_safe_int(modal_score)))
-
-            modal_count = query_params.get(f"risk_count_{key}")
-            if modal_count is not None:
-                effect_item["count"] = max(0, _analyse_pdf_safe_int(modal_count))
-
-            effects.append(effect_item)
-            rows = _analyse_ishikawa_rows_for_effect(comp_records, poste_records, last_eval_map, renfort_by_poste, key)
-            grouped = _analyse_ishikawa_group_rows(rows, _analyse_effect_definitions().get(key, {}).get("families") or [])
-            for family, fam_rows in grouped.items():
-                if not fam_rows:
-                    continue
-                family_label = _analyse_ishikawa_family_display_label(family)
-                family_counts[family_label] = family_counts.get(family_label, 0) + len(fam_rows)
-
-        styles = build_pdf_styles()
-        title_style = styles["title"]
-
-        nb_postes = len(poste_records or [])
-        nb_comps = len(comp_records or [])
-        frag_postes = _analyse_fragility_average(poste_records) if nb_postes else 0
-        frag_comps = _analyse_fragility_average([r for r in (comp_records or []) if _analyse_pdf_safe_int(r.get("indice_fragilite")) > 0]) if nb_comps else 0
-        effects_detected = sum(1 for e in effects if _analyse_pdf_safe_int(e.get("count")) > 0)
-        risk_global_score = max(frag_postes, frag_comps)
-        risk_global_level = _analyse_report_effect_level(risk_global_score, effects_detected)
-
-        effect_palette = ["#2563EB", "#7C3AED", "#06B6D4", "#10B981", "#F97316", "#EC4899", "#4F46E5", "#22C55E"]
-        family_items = [{"family": k, "count": v} for k, v in sorted(family_counts.items(), key=lambda kv: (-kv[1], kv[0]))]
-        top_postes = [
-            {
-                "label": f"{(p.get('codif_poste') or p.get('codif_client') or '').strip()} - {(p.get('intitule_poste') or 'Poste').strip()}",
-                "value": _analyse_pdf_safe_int(p.get('indice_fragilite')),
-            }
-            for p in sorted(poste_records or [], key=lambda r: -_analyse_pdf_safe_int(r.get("indice_fragilite")))[:5]
-        ]
-        top_competences = [
-            {
-                "label": f"{(c.get('code') or '').strip()} - {(c.get('intitule') or 'Compétence').strip()}",
-                "value": _analyse_pdf_safe_int(c.get('indice_fragilite')),
-            }
-            for c in sorted(comp_records or [], key=lambda r: -_analyse_pdf_safe_int(r.get("indice_fragilite")))[:5]
-        ]
-
-        story = []
-        story.append(Paragraph("Rapport d’analyse des risques compétences", title_style))
-        story.append(make_spacer(3))
+                data = _analyse_risques_report_load(cur, id_ent, id_service, int(criticite_min))
 
-        story.append(_analyse_report_scope_label_panel(scope, nb_postes, nb_comps, horizon_years, criticite_min, 270, 6))
-        story.append(make_spacer(4))
-        top_cards = Table([[
-            _analyse_pdf_kpi_card("Postes analysés", str(nb_postes), "Périmètre lu", 62, 22),
-            _analyse_pdf_kpi_card("Compétences analysées", str(nb_comps), "Compétences critiques retenues", 62, 22),
-            _analyse_pdf_kpi_card("Effets détectés", str(effects_detected), "Effets terrain suivis", 62, 22),
-            _analyse_pdf_kpi_card("Analyse", "Risques actuels", "Situation à date", 62, 22),
-        ]], colWidths=[65 * mm, 65 * mm, 65 * mm, 65 * mm])
-        top_cards.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
-        story.append(top_cards)
-        story.append(make_spacer(5))
-
-        row_2 = Table([[
-            _analyse_report_ring_like("Fragilité moyenne des postes", frag_postes, width_mm=64, height_mm=42),
-            _analyse_report_ring_like("Fragilité moyenne des compétences", frag_comps, width_mm=64, height_mm=42),
-            _analyse_report_pie_panel(
-                "Effets terrain détectés",
-                [str(e.get("title") or "Effet") for e in effects],
-                [_analyse_pdf_safe_int(e.get("count")) for e in effects],
-                effect_palette,
-                width_mm=132,
-                height_mm=62,
-            ),
-        ]], colWidths=[67 * mm, 67 * mm, 138 * mm])
-        row_2.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
-        story.append(row_2)
-        story.append(make_spacer(5))
-
-        row_3 = Table([[
-            _analyse_pdf_risk_gauge_card(risk_global_score, risk_global_level, 74, 22, "Niveau de risque global"),
-            _analyse_report_family_bars_panel("Familles de causes les plus présentes", family_items, 194, 44),
-        ]], colWidths=[77 * mm, 195 * mm])
-        row_3.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP")]))
-        story.append(row_3)
-        story.append(make_spacer(5))
-
-        story.append(_analyse_report_hbars_panel("Postes les plus fragiles", top_postes, "label", "value", 270, 74))
-        story.append(make_spacer(4))
-        story.append(_analyse_report_hbars_panel("Compétences les plus fragiles", top_competences, "label", "value", 270, 74))
-
-        for effect in effects:
-            if _analyse_pdf_safe_int(effect.get("count")) <= 0:
-                continue
-            story.append(PageBreak())
-            story.append(Paragraph(f"Ishikawa • {effect.get('title')}", title_style))
-            story.append(make_spacer(2))
-            rows = _analyse_ishikawa_rows_for_effect(comp_records, poste_records, last_eval_map, renfort_by_poste, effect.get("key"))
-            story.append(_analyse_ishikawa_visual(_analyse_effect_definitions().get(effect.get("key")), rows, effect, 270.0, 96.0))
-            story.append(make_spacer(2))
-
-        pdf = build_pdf_document(story, {
-            "title": "Rapport d’analyse des risques compétences",
-            "footer_left": "Novoskill Insights • Rapport d’analyse des risques compétences",
-            "header_right": company_name,
-            "header_right_font_name": "Helvetica-Bold",
-            "header_right_font_size": 11,
-            "logo_bytes": logo_bytes,
-        }, page_size=landscape(A4))
+        pdf = _analyse_risques_report_render(data, int(criticite_min), int(horizon_years), request.query_params)
         return Response(content=pdf, media_type="application/pdf", headers={"Content-Disposition": 'inline; filename="rapport_analyse_risques_competences.pdf"'})
     except HTTPException:
         raise
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
@@ -13,6 +13,8 @@ from app.services.skills_analyse_engine import (
     _build_scope_cte,
     CRITICITE_MIN_DEFAULT,
 )
+from app.services.pagination import PAGE_SIZE_MAX, apply_page_headers, page_request, paginate_items
+from app.services.schema_catalog import table_exists
 
 router = APIRouter()
 
@@ -315,8 +317,7 @@ def _date_or_none(value: Any):
 
 
 def _demande_table_exists(cur) -> bool:
-    cur.execute("SELECT to_regclass('public.tbl_insights_demande_rh') AS tbl")
-    return bool((cur.fetchone() or {}).get("tbl"))
+    return table_exists(cur, "tbl_insights_demande_rh")
 
 
 def _scope_dict(scope) -> Dict[str, Any]:
@@ -427,7 +428,7 @@ def _fetch_current(
     id_owner_dest: str,
     limit: int,
 ) -> List[Dict[str, Any]]:
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
 
     sql = f"""
     WITH
@@ -978,7 +979,7 @@ def _demande_from_legacy_besoin(row: Dict[str, Any]) -> Dict[str, Any]:
 def _fetch_demandes_rh(cur, id_ent: str, id_service: Optional[str]) -> List[Dict[str, Any]]:
     if not _demande_table_exists(cur):
         return []
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
     sql = f"""
     WITH
     {cte_sql}
@@ -1295,7 +1296,7 @@ def get_demandes_rh_refs(
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
                 scope = _fetch_service_label(cur, id_ent, _s(id_service) or None)
-                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service)
+                cte_sql, cte_params = _build_scope_cte(id_ent, scope.id_service, cur)
                 cur.execute(
                     f"""
                     WITH
@@ -1639,11 +1640,14 @@ def transmettre_demande_rh_studio(id_contact: str, id_demande: str, request: Req
 def get_besoins_formations(
     id_contact: str,
     request: Request,
+    response: Response,
     id_service: Optional[str] = Query(default=None),
     criticite_min: int = Query(default=CRITICITE_MIN_DEFAULT, ge=0, le=100),
     fragilite_min: int = Query(default=0, ge=0, le=100),
     statut: str = Query(default="tous"),
     limit: int = Query(default=300, ge=1, le=800),
+    page_size: Optional[int] = Query(default=None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
 ):
     try:
         with get_conn() as conn:
@@ -1653,11 +1657,23 @@ def get_besoins_formations(
                 dest = _resolve_destination(cur, id_ent)
                 id_owner_dest = _s(dest.get("id_owner"))
 
+                page_req = page_request(
+                    page_size,
+                    cursor,
+                    ["besoins_formations", id_ent, scope.id_service, criticite_min, fragilite_min, _filter_statut(statut), limit],
+                )
+
                 current = _fetch_current(cur, id_ent, scope.id_service, criticite_min, id_owner_dest, limit)
                 demandes = _fetch_demandes(cur, id_ent, id_owner_dest)
                 items, kpis = _merge(current, demandes, _filter_statut(statut), fragilite_min)
 
-                return {
+                page = None
+                if page_req is not None:
+                    # Liste calculée (scores + fusion demandes) : curseur par décalage dans le tri métier.
+                    items, page = paginate_items(items, page_req)
+                    apply_page_headers(response, page)
+
+                out = {
                     "scope": _scope_dict(scope),
                     "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
                     "filters": {
@@ -1670,6 +1686,9 @@ def get_besoins_formations(
                     "kpis": kpis,
                     "items": items,
                 }
+                if page is not None:
+                    out["page"] = page
+                return out
     except HTTPException:
         raise
     except Exception as e:
@@ -12,6 +12,14 @@ from app.routers.skills_portal_common import (
     get_conn,
     resolve_insights_effectif_for_request,
 )
+from app.services.calendar_suggestion_store import (
+    FAMILY_STATUTS,
+    SUGGESTION_FAMILIES,
+    calendar_suggestion_snapshot,
+    find_calendar_suggestion,
+    invalidate_calendar_suggestions,
+)
+from app.services.schema_catalog import table_exists
 
 router = APIRouter()
 
@@ -102,17 +110,7 @@ def _parse_datetime_param(label: str, value: Optional[str]) -> datetime:
 
 
 def _calendar_table_exists(cur, table_name: str) -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-          AND table_name = %s
-        LIMIT 1
-        """,
-        (table_name,),
-    )
-    return cur.fetchone() is not None
+    return table_exists(cur, table_name)
 
 
 def _ensure_calendar_tables(cur):
@@ -1016,39 +1014,73 @@ def _fetch_competence_evaluation_suggestions(cur, ctx: Dict[str, Any]) -> List[D
     return out
 
 
+def _suggestion_loaders(cur, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "entretien_annuel": lambda: _fetch_annual_interview_suggestions(cur, ctx),
+        "preparation_entretien": lambda: _fetch_preparation_suggestions(cur, ctx),
+        "signature": lambda: _fetch_signature_suggestions(cur, ctx),
+        "evaluation_competence": lambda: _fetch_competence_evaluation_suggestions(cur, ctx),
+        FAMILY_STATUTS: lambda: _fetch_suggestion_statuses(cur, ctx),
+    }
+
+
+def _suggestion_scope(ctx: Dict[str, Any]) -> str:
+    return _clean(ctx.get("effective_service"))
+
+
+def _suggestion_store_bypass(request: Request) -> bool:
+    v = (request.query_params.get("refresh") or request.query_params.get("no_cache") or "").strip().lower()
+    return v in ("1", "true", "yes", "oui")
+
+
+def _suggestion_sort_key(row: Dict[str, Any]):
+    return (-_priority_rank(row.get("priorite")), row.get("date_echeance") or date.max, _clean(row.get("titre")).lower())
+
+
+def _suggestion_for_ctx(row: Dict[str, Any], ctx: Dict[str, Any]) -> Dict[str, Any]:
+    # Le store est partagé entre managers d'une même entreprise : id_manager vient du contexte courant.
+    out = _row_to_suggestion(row)
+    out["id_manager"] = ctx["id_manager"]
+    return out
+
+
 def _computed_suggestions(cur, ctx: Dict[str, Any], type_filter: Optional[str] = None, priorite_filter: Optional[str] = None) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
     requested_type = _clean(type_filter)
+    families = [f for f in SUGGESTION_FAMILIES if not requested_type or requested_type == f]
 
-    if not requested_type or requested_type == "entretien_annuel":
-        rows.extend(_fetch_annual_interview_suggestions(cur, ctx))
-    if not requested_type or requested_type == "preparation_entretien":
-        rows.extend(_fetch_preparation_suggestions(cur, ctx))
-    if not requested_type or requested_type == "signature":
-        rows.extend(_fetch_signature_suggestions(cur, ctx))
-    if not requested_type or requested_type == "evaluation_competence":
-        rows.extend(_fetch_competence_evaluation_suggestions(cur, ctx))
+    snapshot = calendar_suggestion_snapshot(
+        ctx["id_ent"],
+        _suggestion_scope(ctx),
+        _suggestion_loaders(cur, ctx),
+        families + [FAMILY_STATUTS],
+    )
+
+    rows: List[Dict[str, Any]] = []
+    for fam in families:
+        rows.extend(snapshot.get(fam) or [])
 
-    statuses = _fetch_suggestion_statuses(cur, ctx)
-    rows = _apply_suggestion_status_filter(rows, statuses)
+    rows = _apply_suggestion_status_filter(rows, snapshot.get(FAMILY_STATUTS) or {})
 
     prio = _clean(priorite_filter).lower()
     if prio:
         rows = [r for r in rows if _clean(r.get("priorite")).lower() == prio]
 
-    rows.sort(key=lambda r: (-_priority_rank(r.get("priorite")), r.get("date_echeance") or date.max, _clean(r.get("titre")).lower()))
-    return [_row_to_suggestion(r) for r in rows]
+    rows.sort(key=_suggestion_sort_key)
+    return [_suggestion_for_ctx(r, ctx) for r in rows]
 
 
 def _find_computed_suggestion(cur, ctx: Dict[str, Any], id_suggestion: str) -> Optional[Dict[str, Any]]:
     wanted = _clean(id_suggestion)
     if not wanted:
         return None
-    rows = _computed_suggestions(cur, ctx)
-    for row in rows:
-        if _clean(row.get("id_suggestion")) == wanted:
-            return row
-    return None
+    loaders = _suggestion_loaders(cur, ctx)
+    row = find_calendar_suggestion(ctx["id_ent"], _suggestion_scope(ctx), wanted, loaders)
+    if row is None:
+        return None
+    statuses = calendar_suggestion_snapshot(ctx["id_ent"], _suggestion_scope(ctx), loaders, [FAMILY_STATUTS]).get(FAMILY_STATUTS) or {}
+    if not _apply_suggestion_status_filter([row], statuses):
+        return None
+    return _suggestion_for_ctx(row, ctx)
 
 
 # ======================================================
@@ -1219,6 +1251,8 @@ def calendrier_suggestions(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 ctx = _resolve_context(cur, id_contact, request, id_service)
+                if _suggestion_store_bypass(request):
+                    invalidate_calendar_suggestions(ctx["id_ent"])
                 return _computed_suggestions(cur, ctx, type, priorite)
     except HTTPException:
         raise
@@ -1294,6 +1328,7 @@ def calendrier_create_event(id_contact: str, payload: CalendrierEventPayload, re
                 )
                 row = cur.fetchone()
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "evenement", "entretien")
 
                 return _row_to_event(dict(row or {}))
     except HTTPException:
@@ -1424,6 +1459,7 @@ def calendrier_create_event_from_suggestion(id_contact: str, payload: Calendrier
                     ),
                 )
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "evenement", "entretien", "suggestion")
 
                 return _row_to_event(dict(row or {}))
     except HTTPException:
@@ -1513,6 +1549,7 @@ def calendrier_patch_event(id_contact: str, id_evenement: str, payload: Calendri
                 row = dict(cur.fetchone() or {})
                 row = _sync_annual_entretien_from_event_row(cur, ctx, row)
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "evenement", "entretien")
                 return _row_to_event(row)
     except HTTPException:
         raise
@@ -1584,6 +1621,7 @@ def calendrier_ignore_suggestion(id_contact: str, id_suggestion: str, request: R
                     ),
                 )
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "suggestion")
 
         return {"ok": True, "id_suggestion": _clean(id_suggestion), "statut": "ignoree"}
     except HTTPException:
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import date, datetime
+import csv
+import io
 import unicodedata
 
 from psycopg.rows import dict_row
@@ -21,6 +23,9 @@ from app.routers.skills_portal_pdf_common import (
     build_pdf_document,
     build_pdf_styles,
 )
+from app.services.cartographie_cache import KIND_ENT, CartographieModel, get_cartographie
+from app.services.fast_json import fast_json_response
+from app.services.organigramme_cache import get_organigramme
 
 
 router = APIRouter()
@@ -449,9 +454,163 @@ def _build_postes_scope_cte(id_service: Optional[str]) -> Tuple[str, Tuple[Any,
     return cte, params
 
 
+def _scope_poste_ids(cur, id_ent: str, model: CartographieModel, id_service: Optional[str]) -> set:
+    """
+    Postes actifs du périmètre (mêmes règles que l'analyse) :
+    - id_service None/"" => tous les postes de l'entreprise
+    - id_service == NON_LIE_ID => postes non liés à un service valide
+    - sinon => service + sous-services
+    """
+    if not id_service:
+        return set(model.poste_index)
+    org = get_organigramme(cur, id_ent)
+    if id_service == NON_LIE_ID:
+        return {p["id_poste"] for p in model.postes if not org.is_linked(p.get("id_service"))}
+    services = org.descendants(id_service)
+    return {p["id_poste"] for p in model.postes if p.get("id_service") in services}
+
+
+def _link_filter(etat_norm: Optional[str], include_masque: bool):
+    def accept(link: Dict[str, Any]) -> bool:
+        if etat_norm and link.get("etat") != etat_norm:
+            return False
+        return include_masque or not link.get("masque")
+    return accept
+
+
 # ======================================================
 # Endpoint: Matrice postes x domaines
 # ======================================================
+def _cartographie_matrice_data(
+    cur,
+    id_ent: str,
+    id_service: Optional[str],
+    etat: Optional[str],
+    include_masque: bool,
+) -> CartographieMatriceResponse:
+    """
+    Matrice "Postes x Domaines" (modèle) : partagée par la route JSON et l'export CSV.
+    """
+    # scope label
+    scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
+
+    model = get_cartographie(cur, KIND_ENT, id_ent)
+    poste_ids = _scope_poste_ids(cur, id_ent, model, scope.id_service)
+
+    etat_norm = _normalize_etat(etat)
+
+    # 1) Postes du scope
+    postes: List[PosteItem] = [
+        PosteItem(
+            id_poste=r["id_poste"],
+            codif_poste=r.get("codif_poste") or "",
+            codif_client=r.get("codif_client"),
+            intitule_poste=r.get("intitule_poste") or "",
+            id_service=r.get("id_service"),
+            nom_service=r.get("nom_service"),
+            total_competences=0,
+        )
+        for r in sorted(
+            (p for p in model.postes if p["id_poste"] in poste_ids),
+            key=lambda p: (p.get("codif_poste") or "", p.get("intitule_poste") or ""),
+        )
+    ]
+
+    if not postes:
+        return CartographieMatriceResponse(
+            service=scope,
+            domaines=[],
+            postes=[],
+            matrix=[],
+            totaux_domaines=[],
+            total_postes=0,
+            total_competences=0,
+        )
+
+    # 2) Cellules matrice (compétences distinctes par poste x domaine), depuis le modèle en mémoire
+    cells = model.cell_competences(("insights", etat_norm, bool(include_masque)), _link_filter(etat_norm, include_masque))
+    rows = []
+    for (pid, did), comps in cells.items():
+        if pid not in poste_ids:
+            continue
+        d = model.domaines.get(did) or {}
+        rows.append({
+            "id_poste": pid,
+            "id_domaine_competence": did,
+            "nb_competences": len(comps),
+            "titre": d.get("titre"),
+            "titre_court": d.get("titre_court"),
+            "ordre_affichage": d.get("ordre_affichage"),
+            "couleur": d.get("couleur"),
+        })
+
+    domaines_map: Dict[str, DomaineItem] = {}
+    matrix: List[MatrixCell] = []
+    tot_poste: Dict[str, int] = {}
+    tot_dom: Dict[str, int] = {}
+
+    for r in rows:
+        did = r.get("id_domaine_competence")
+        if not did:
+            # compétence sans domaine => on ignore dans la matrice V1 (sinon ça fait une colonne "vide")
+            continue
+
+        if did not in domaines_map:
+            domaines_map[did] = DomaineItem(
+                id_domaine_competence=did,
+                titre=r.get("titre"),
+                titre_court=r.get("titre_court"),
+                ordre_affichage=r.get("ordre_affichage"),
+                couleur=r.get("couleur"),
+            )
+
+        nb = int(r.get("nb_competences") or 0)
+        pid = r["id_poste"]
+
+        matrix.append(
+            MatrixCell(
+                id_poste=pid,
+                id_domaine_competence=did,
+                nb_competences=nb,
+            )
+        )
+
+        tot_poste[pid] = tot_poste.get(pid, 0) + nb
+        tot_dom[did] = tot_dom.get(did, 0) + nb
+
+    # compléter total par poste
+    for p in postes:
+        p.total_competences = int(tot_poste.get(p.id_poste, 0))
+
+    # tri domaines
+    domaines = sorted(
+        domaines_map.values(),
+        key=lambda d: (
+            d.ordre_affichage if d.ordre_affichage is not None else 999999,
+            (d.titre_court or d.titre or d.id_domaine_competence).lower(),
+        ),
+    )
+
+    totaux_domaines = [
+        DomaineTotal(id_domaine_competence=did, total_competences=int(total))
+        for did, total in tot_dom.items()
+        if did in domaines_map
+    ]
+    totaux_domaines.sort(key=lambda x: x.total_competences, reverse=True)
+
+    total_competences = sum(tot_poste.values()) if tot_poste else 0
+
+    return CartographieMatriceResponse(
+        service=scope,
+        domaines=domaines,
+        postes=postes,
+        matrix=matrix,
+        totaux_domaines=totaux_domaines,
+        total_postes=len(postes),
+        total_competences=int(total_competences),
+    )
+
+
 @router.get(
     "/skills/cartographie/matrice/{id_contact}",
     response_model=CartographieMatriceResponse,
@@ -473,202 +632,63 @@ def get_cartographie_matrice(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
-
-
-                # scope label
-                scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-
-                # CTE scope postes
-                cte_sql, _ = _build_postes_scope_cte(scope.id_service)
-
-                # WHERE compétences
-                where_parts: List[str] = []
-                params_where: List[Any] = []
-
-                etat_norm = _normalize_etat(etat)
-                if etat_norm:
-                    where_parts.append("c.etat = %s")
-                    params_where.append(etat_norm)
-
-                if not include_masque:
-                    where_parts.append("COALESCE(c.masque, FALSE) = FALSE")
-
-                where_sql = ("WHERE " + " AND ".join(where_parts)) if where_parts else ""
-
-                # 1) Postes du scope
-                # (on garde le nom_service pour affichage; left join organigramme)
-                sql_postes = f"""
-                    WITH
-                    {cte_sql}
-                    SELECT
-                        fp.id_poste,
-                        fp.codif_poste,
-                        fp.codif_client,
-                        fp.intitule_poste,
-                        fp.id_service,
-                        o.nom_service
-                    FROM postes_scope ps
-                    JOIN public.tbl_fiche_poste fp ON fp.id_poste = ps.id_poste
-                    LEFT JOIN public.tbl_entreprise_organigramme o
-                      ON o.id_ent = %s
-                     AND o.id_service = fp.id_service
-                     AND o.archive = FALSE
-                    ORDER BY fp.codif_poste, fp.intitule_poste
-                """
-
-                # params CTE (suivant cas)
-                params_postes: List[Any] = []
-                if not scope.id_service:
-                    # postes_scope(id_ent)
-                    params_postes.extend([id_ent, id_ent])
-                elif scope.id_service == NON_LIE_ID:
-                    # postes_scope(id_ent, id_ent) + join organigramme(id_ent)
-                    params_postes.extend([id_ent, id_ent, id_ent])
-                else:
-                    # services_scope(id_ent, id_service, id_ent) + postes_scope(id_ent) + join organigramme(id_ent)
-                    params_postes.extend([id_ent, scope.id_service, id_ent, id_ent, id_ent])
-
-                cur.execute(sql_postes, tuple(params_postes))
-                postes_rows = cur.fetchall() or []
-
-                postes: List[PosteItem] = [
-                    PosteItem(
-                        id_poste=r["id_poste"],
-                        codif_poste=r.get("codif_poste") or "",
-                        codif_client=r.get("codif_client"),
-                        intitule_poste=r.get("intitule_poste") or "",
-                        id_service=r.get("id_service"),
-                        nom_service=r.get("nom_service"),
-                        total_competences=0,
-                    )
-                    for r in postes_rows
-                ]
-
-                if not postes:
-                    return CartographieMatriceResponse(
-                        service=scope,
-                        domaines=[],
-                        postes=[],
-                        matrix=[],
-                        totaux_domaines=[],
-                        total_postes=0,
-                        total_competences=0,
-                    )
-
-                # 2) Cellules matrice + domaines (distinct)
-                sql_matrix = f"""
-                    WITH
-                    {cte_sql}
-                    SELECT
-                        fp.id_poste,
-                        c.domaine AS id_domaine_competence,
-                        COUNT(DISTINCT c.id_comp)::int AS nb_competences,
-                        d.titre,
-                        d.titre_court,
-                        d.ordre_affichage,
-                        d.couleur
-                    FROM postes_scope ps
-                    JOIN public.tbl_fiche_poste fp ON fp.id_poste = ps.id_poste
-                    JOIN public.tbl_fiche_poste_competence fpc ON fpc.id_poste = fp.id_poste
-                    JOIN public.tbl_competence c
-                      ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
-                    LEFT JOIN public.tbl_domaine_competence d
-                      ON d.id_domaine_competence = c.domaine
-                    {where_sql}
-                    GROUP BY
-                        fp.id_poste,
-                        c.domaine,
-                        d.titre,
-                        d.titre_court,
-                        d.ordre_affichage,
-                        d.couleur
-                """
-
-                # params CTE + where
-                params_matrix: List[Any] = []
-                if not scope.id_service:
-                    params_matrix.extend([id_ent])
-                elif scope.id_service == NON_LIE_ID:
-                    params_matrix.extend([id_ent, id_ent])
-                else:
-                    params_matrix.extend([id_ent, scope.id_service, id_ent, id_ent])
-
-                params_matrix.extend(params_where)
-
-                cur.execute(sql_matrix, tuple(params_matrix))
-                rows = cur.fetchall() or []
-
-                domaines_map: Dict[str, DomaineItem] = {}
-                matrix: List[MatrixCell] = []
-                tot_poste: Dict[str, int] = {}
-                tot_dom: Dict[str, int] = {}
-
-                for r in rows:
-                    did = r.get("id_domaine_competence")
-                    if not did:
-                        # compétence sans domaine => on ignore dans la matrice V1 (sinon ça fait une colonne "vide")
-                        continue
-
-                    if did not in domaines_map:
-                        domaines_map[did] = DomaineItem(
-                            id_domaine_competence=did,
-                            titre=r.get("titre"),
-                            titre_court=r.get("titre_court"),
-                            ordre_affichage=r.get("ordre_affichage"),
-                            couleur=r.get("couleur"),
-                        )
-
-                    nb = int(r.get("nb_competences") or 0)
-                    pid = r["id_poste"]
-
-                    matrix.append(
-                        MatrixCell(
-                            id_poste=pid,
-                            id_domaine_competence=did,
-                            nb_competences=nb,
-                        )
-                    )
-
-                    tot_poste[pid] = tot_poste.get(pid, 0) + nb
-                    tot_dom[did] = tot_dom.get(did, 0) + nb
-
-                # compléter total par poste
-                for p in postes:
-                    p.total_competences = int(tot_poste.get(p.id_poste, 0))
-
-                # tri domaines
-                domaines = sorted(
-                    domaines_map.values(),
-                    key=lambda d: (
-                        d.ordre_affichage if d.ordre_affichage is not None else 999999,
-                        (d.titre_court or d.titre or d.id_domaine_competence).lower(),
-                    ),
+                return fast_json_response(
+                    _cartographie_matrice_data(cur, id_ent, id_service, etat, include_masque)
                 )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur serveur : {e}")
 
-                totaux_domaines = [
-                    DomaineTotal(id_domaine_competence=did, total_competences=int(total))
-                    for did, total in tot_dom.items()
-                    if did in domaines_map
-                ]
-                totaux_domaines.sort(key=lambda x: x.total_competences, reverse=True)
-
-                total_competences = sum(tot_poste.values()) if tot_poste else 0
-
-                return CartographieMatriceResponse(
-                    service=scope,
-                    domaines=domaines,
-                    postes=postes,
-                    matrix=matrix,
-                    totaux_domaines=totaux_domaines,
-                    total_postes=len(postes),
-                    total_competences=int(total_competences),
-                )
 
+@router.get("/skills/cartographie/matrice_csv/{id_contact}")
+def export_cartographie_matrice_csv(
+    id_contact: str,
+    request: Request,
+    id_service: Optional[str] = Query(default=None),
+    etat: Optional[str] = Query(default=ETAT_ACTIVE),
+    include_masque: bool = Query(default=False),
+):
+    """
+    Export CSV (séparateur ;) de la matrice : une ligne par poste, une colonne par domaine.
+    Construit depuis la cartographie en mémoire, sans requête supplémentaire.
+    """
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                data = _cartographie_matrice_data(cur, id_ent, id_service, etat, include_masque)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur serveur : {e}")
 
+    cells = {(c.id_poste, c.id_domaine_competence): c.nb_competences for c in data.matrix}
+
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=";")
+    writer.writerow(
+        ["Code poste", "Intitulé", "Service"]
+        + [d.titre_court or d.titre or d.id_domaine_competence for d in data.domaines]
+        + ["Total"]
+    )
+    for p in data.postes:
+        writer.writerow(
+            [p.codif_client or p.codif_poste, p.intitule_poste, p.nom_service or ""]
+            + [cells.get((p.id_poste, d.id_domaine_competence), 0) for d in data.domaines]
+            + [p.total_competences]
+        )
+
+    return Response(
+        # BOM : ouverture directe dans Excel avec les accents
+        content="\ufeff" + out.getvalue(),
+        media_type="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": 'attachment; filename="cartographie_matrice.csv"',
+            "Cache-Control": "no-store",
+        },
+    )
+
 
 @router.get("/skills/cartographie/recherche_avancee/{id_contact}")
 def get_cartographie_recherche_avancee(
@@ -1220,50 +1240,19 @@ def get_cartographie_cell_detail(
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
 
 
-                # --- scope postes (cohérent avec ton filtre service)
-                svc_where = "TRUE"
-                svc_params: List[Any] = []
+                # --- scope postes (cohérent avec ton filtre service : service direct, sans descendants)
+                model = get_cartographie(cur, KIND_ENT, id_ent)
 
-                if id_service:
+                def _in_service(p: Dict[str, Any]) -> bool:
+                    if not id_service:
+                        return True
                     if id_service == "__NON_LIE__":
-                        svc_where = "(p.id_service IS NULL OR p.id_service = '')"
-                    else:
-                        svc_where = "p.id_service = %s"
-                        svc_params.append(id_service)
-
-                postes_cte = f"""
-                postes_scope AS (
-                    SELECT
-                        p.id_poste,
-                        p.codif_poste,
-                        p.codif_client,
-                        p.intitule_poste,
-                        p.id_service,
-                        COALESCE(o.nom_service, '') AS nom_service
-                    FROM public.tbl_fiche_poste p
-                    LEFT JOIN public.tbl_entreprise_organigramme o
-                        ON o.id_ent = p.id_ent
-                       AND o.id_service = p.id_service
-                    WHERE
-                        p.id_ent = %s
-                        AND COALESCE(p.actif, TRUE) = TRUE
-                        AND {svc_where}
-                )
-                """
+                        return not p.get("id_service")
+                    return p.get("id_service") == id_service
 
                 # --- check poste dans le scope
-                cur.execute(
-                    f"""
-                    WITH {postes_cte}
-                    SELECT *
-                    FROM postes_scope
-                    WHERE id_poste = %s
-                    LIMIT 1
-                    """,
-                    tuple([id_ent] + svc_params + [id_poste])
-                )
-                poste = cur.fetchone()
-                if not poste:
+                poste = model.poste(id_poste)
+                if not poste or not _in_service(poste):
                     raise HTTPException(status_code=404, detail="Poste hors périmètre (service) ou introuvable")
                 
                 # --- Paramétrage RH (titulaires cible + pause)
@@ -1291,64 +1280,18 @@ def get_cartographie_cell_detail(
                         pause_active = True
 
 
-                # --- filtres compétence
-                where_parts: List[str] = ["fpc.id_poste = %s"]
-                params: List[Any] = [id_poste]
-
-                if id_domaine:
-                    where_parts.append("c.domaine = %s")
-                    params.append(id_domaine)
-
+                # --- liste des compétences (drilldown), depuis le modèle en mémoire
                 etat_norm = (etat or "").strip().lower()
-                if etat_norm:
-                    where_parts.append("c.etat = %s")
-                    params.append(etat_norm)
-
-                if not include_masque:
-                    where_parts.append("COALESCE(c.masque, FALSE) = FALSE")
-
-                where_sql = " AND ".join(where_parts)
-
-                # --- liste des compétences (drilldown)
-                sql = f"""
-                WITH {postes_cte}
-                SELECT
-                    c.id_comp,
-                    c.code,
-                    c.intitule,
-                    c.description,
-                    c.domaine AS id_domaine_competence,
-                    c.etat,
-                    c.masque,
-
-                    fpc.niveau_requis,
-                    fpc.poids_criticite,
-                    fpc.freq_usage,
-                    fpc.impact_resultat,
-                    fpc.dependance,
-                    fpc.date_valorisation,
-
-                    d.titre,
-                    d.titre_court,
-                    d.couleur
-                FROM public.tbl_fiche_poste_competence fpc
-                JOIN postes_scope ps
-                  ON ps.id_poste = fpc.id_poste
-                JOIN public.tbl_competence c
-                  ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
-                LEFT JOIN public.tbl_domaine_competence d
-                  ON d.id_domaine_competence = c.domaine
-                WHERE {where_sql}
-                ORDER BY
-                    COALESCE(d.titre_court, d.titre, ''),
-                    c.code
-                """
-
-                cur.execute(
-                    sql,
-                    tuple([id_ent] + svc_params + params)
-                )
-                rows = cur.fetchall() or []
+                accept = _link_filter(etat_norm or None, include_masque)
+                rows = []
+                for link in model.poste_links(id_poste):
+                    if id_domaine and link["domaine"] != id_domaine:
+                        continue
+                    if not accept(link):
+                        continue
+                    d = model.domaines.get(link["domaine"]) or {}
+                    rows.append({**link, "id_domaine_competence": link["domaine"] or None, "titre": d.get("titre"), "titre_court": d.get("titre_court"), "couleur": d.get("couleur")})
+                rows.sort(key=lambda r: (r.get("titre_court") or r.get("titre") or "", r.get("code") or ""))
 
                 # Domaine (si demandé)
                 domaine_obj = None
@@ -1368,25 +1311,16 @@ def get_cartographie_cell_detail(
                 # --- nombre de postes concernés par le domaine sélectionné (pour les cartes du modal)
                 nb_postes_concernes = 1
                 if id_domaine:
-                    sql_postes_concernes = f"""
-                    WITH {postes_cte}
-                    SELECT COUNT(DISTINCT ps.id_poste)::int AS nb_postes
-                    FROM postes_scope ps
-                    JOIN public.tbl_fiche_poste_competence fpc
-                      ON fpc.id_poste = ps.id_poste
-                    JOIN public.tbl_competence c
-                      ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
-                    WHERE c.domaine = %s
-                      AND c.etat = %s
-                      AND COALESCE(c.masque, FALSE) = FALSE
-                      AND COALESCE(fpc.masque, FALSE) = FALSE
-                    """
-                    cur.execute(
-                        sql_postes_concernes,
-                        tuple([id_ent] + svc_params + [id_domaine, (etat_norm or "active")])
+                    etat_concernes = etat_norm or "active"
+                    cells = model.cell_competences(
+                        ("insights_concernes", etat_concernes),
+                        lambda link: link.get("etat") == etat_concernes and not link.get("masque") and not link.get("fpc_masque"),
+                    )
+                    nb_postes_concernes = sum(
+                        1
+                        for (pid, did) in cells
+                        if did == id_domaine and _in_service(model.poste(pid) or {})
                     )
-                    row_nb = cur.fetchone() or {}
-                    nb_postes_concernes = int(row_nb.get("nb_postes") or 0)
 
                 # --- construction competences (modifiable / enrichissable)
                 competences = []
@@ -1605,7 +1539,7 @@ def get_cartographie_cell_detail(
                         "codif_client": poste.get("codif_client"),
                         "intitule_poste": poste.get("intitule_poste"),
                         "id_service": poste.get("id_service"),
-                        "nom_service": poste.get("nom_service"),
+                        "nom_service": poste.get("nom_service") or "",
                         "param_rh": {
                             "statut_poste": statut_poste,
                             "date_debut_validite": date_debut_validite,
@@ -18,6 +18,8 @@ from app.routers.skills_portal_pdf_common import (
     build_pdf_document,
     build_competence_pdf_story,
 )
+from app.services.data_version import DOMAIN_BREAKS, DOMAIN_EFFECTIFS, bump_data_version
+from app.services.schema_catalog import list_tables, table_columns
 
 router = APIRouter()
 
@@ -568,37 +570,18 @@ def _normalize_hex_color(v: Optional[str]) -> Optional[str]:
 def _resolve_domaine_competence_meta(cur) -> Optional[Tuple[str, str, str]]:
     """
     Trouve la table des domaines de compétences + colonnes (id, titre, couleur).
-    On évite de supposer un schéma figé, on détecte via information_schema.
+    On évite de supposer un schéma figé, on détecte via le catalogue schéma (mémoire).
     """
-    cur.execute(
-        """
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-          AND table_type = 'BASE TABLE'
-          AND table_name ILIKE 'tbl_domaine%comp%'
-        ORDER BY
-          CASE WHEN table_name = 'tbl_domaine_competence' THEN 0 ELSE 1 END,
-          table_name
-        LIMIT 1
-        """
-    )
-    t = cur.fetchone()
-    if not t or not t.get("table_name"):
+    candidates = [
+        t for t in list_tables(cur, base_tables_only=True)
+        if re.match(r"^tbl_domaine.*comp", t, flags=re.IGNORECASE)
+    ]
+    if not candidates:
         return None
 
-    table_name = t["table_name"]
-
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-          AND table_name = %s
-        """,
-        (table_name,),
-    )
-    cols = {r["column_name"] for r in (cur.fetchall() or [])}
+    candidates.sort(key=lambda t: (0 if t == "tbl_domaine_competence" else 1, t))
+    table_name = candidates[0]
+    cols = table_columns(cur, table_name)
 
     id_candidates = [
         "id_domaine_competence",
@@ -1216,6 +1199,7 @@ def update_collaborateur_identification_identity(
                 if not row:
                     raise HTTPException(status_code=500, detail="Aucune ligne mise à jour.")
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_EFFECTIFS,))
 
         return JSONResponse({"ok": True, "section": "identite"}, headers=_cors_headers_for_request(request))
 
@@ -1268,6 +1252,7 @@ def update_collaborateur_identification_company(
                 if not row:
                     raise HTTPException(status_code=500, detail="Aucune ligne mise à jour.")
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_EFFECTIFS,))
 
         return JSONResponse({"ok": True, "section": "situation"}, headers=_cors_headers_for_request(request))
 
@@ -1321,6 +1306,7 @@ def update_collaborateur_identification_projection(
                 if not row:
                     raise HTTPException(status_code=500, detail="Aucune ligne mise à jour.")
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_EFFECTIFS,))
 
         return JSONResponse({"ok": True, "section": "parcours"}, headers=_cors_headers_for_request(request))
 
@@ -1367,6 +1353,7 @@ def update_collaborateur_identification_roles(
                 if not row:
                     raise HTTPException(status_code=500, detail="Aucune ligne mise à jour.")
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_EFFECTIFS,))
 
         return JSONResponse({"ok": True, "section": "roles", **row}, headers=_cors_headers_for_request(request))
 
@@ -1409,6 +1396,7 @@ def update_collaborateur_identification_comment(
                 if not row:
                     raise HTTPException(status_code=500, detail="Aucune ligne mise à jour.")
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_EFFECTIFS,))
 
         return JSONResponse({"ok": True, "section": "commentaire"}, headers=_cors_headers_for_request(request))
 
@@ -2252,6 +2240,7 @@ def create_collaborateur_breaks_batch(
                     )
 
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_BREAKS,))
 
         return JSONResponse(
             {"ok": True, "created": len(ranges)},
@@ -2323,6 +2312,7 @@ def edit_break(
                         (id_ent, id_break),
                     )
                     conn.commit()
+                    bump_data_version(id_ent, domains=(DOMAIN_BREAKS,))
                     return JSONResponse({"ok": True, "action": "archive"}, headers=_cors_headers_for_request(request))
 
                 # action == "update"
@@ -2347,6 +2337,7 @@ def edit_break(
                     (d1, d2, id_ent, id_break),
                 )
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_BREAKS,))
 
                 return JSONResponse({"ok": True, "action": "update"}, headers=_cors_headers_for_request(request))
 
@@ -2387,6 +2378,7 @@ def archive_break(
                     raise HTTPException(status_code=404, detail="Indisponibilité introuvable (ou déjà archivée).")
 
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_BREAKS,))
 
         return JSONResponse(
             {"ok": True, "id_break": row["id_break"], "id_effectif": row["id_effectif"]},
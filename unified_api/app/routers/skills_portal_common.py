@@ -1,8 +1,7 @@
 from fastapi import HTTPException
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, BinaryIO, Union
 import os
 import pathlib
-import requests
 
 import psycopg
 from dotenv import load_dotenv
@@ -11,11 +10,20 @@ import queue
 import time
 
 import logging
-import contextvars
 
-_log = logging.getLogger("skills_pool")
+from app.services.admission_control import (
+    ALL_PRIORITIES,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    current_db_priority,
+    remember_tenant,
+)
+from app.services.http_client import integration_get
+from app.services.metrics import InstrumentedCursor, current_endpoint as _current_endpoint, record_pool_wait
+from app.services.sharepoint_client import get_sharepoint_client
+from app.services.schema_catalog import table_columns
 
-_current_endpoint = contextvars.ContextVar("current_endpoint", default="?")
+_log = logging.getLogger("skills_pool")
 
 _db_in_use = 0
 _db_waits = 0
@@ -73,20 +81,32 @@ def _missing_env():
 # Pool DB (simple, fiable, sans dépendance externe)
 # - Evite de saturer Supabase pooler (session mode)
 # - Limite strictement le nb de connexions ouvertes
+# - Deux priorités (admission_control.current_db_priority) : interactive / batch (analyses
+#   lourdes, PDF, IA, traitements de masse, jobs de fond). Le batch ne peut pas occuper les
+#   DB_POOL_INTERACTIVE_RESERVED dernières connexions et passe après les requêtes
+#   interactives en attente : un /skills/context n'attend plus derrière un rapport PDF.
 # ======================================================
 _DB_POOL_MAX = int(os.getenv("DB_POOL_SIZE", "3") or 3)
 _DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10") or 10)
+_DB_POOL_BATCH_TIMEOUT = float(os.getenv("DB_POOL_BATCH_TIMEOUT", "") or _DB_POOL_TIMEOUT)
+_DB_POOL_INTERACTIVE_RESERVED = max(0, min(_DB_POOL_MAX - 1, int(os.getenv("DB_POOL_INTERACTIVE_RESERVED", "1") or 0)))
 
 _db_pool = queue.LifoQueue(maxsize=_DB_POOL_MAX)
 _db_pool_lock = threading.Lock()
+_db_pool_cond = threading.Condition(_db_pool_lock)
 _db_pool_created = 0
 
+# Par priorité (sous _db_pool_lock)
+_db_in_use_by = {p: 0 for p in ALL_PRIORITIES}
+_db_waiting_by = {p: 0 for p in ALL_PRIORITIES}
+_db_wait_stats = {p: {"acquired": 0, "waits": 0, "wait_ms": 0.0, "wait_max_ms": 0.0, "timeouts": 0} for p in ALL_PRIORITIES}
+
 def _pool_stats() -> dict:
     try:
         avail = _db_pool.qsize()
     except Exception:
         avail = -1
-    return {
+    out = {
         "max": _DB_POOL_MAX,
         "created": _db_pool_created,
         "in_use": _db_in_use,
@@ -94,8 +114,15 @@ def _pool_stats() -> dict:
         "waits": _db_waits,
         "timeouts": _db_timeouts,
         "discarded": _db_discarded,
+        "interactive_reserved": _DB_POOL_INTERACTIVE_RESERVED,
         "endpoint": _current_endpoint.get(),
     }
+    for p in ALL_PRIORITIES:
+        out[f"{p}_in_use"] = _db_in_use_by[p]
+        out[f"{p}_waiting"] = _db_waiting_by[p]
+        for k, v in _db_wait_stats[p].items():
+            out[f"{p}_{k}"] = round(v, 1) if isinstance(v, float) else v
+    return out
 
 def _discard_conn(conn, reason: str):
     global _db_pool_created, _db_discarded
@@ -110,6 +137,8 @@ def _discard_conn(conn, reason: str):
             if _db_pool_created > 0:
                 _db_pool_created -= 1
             _db_discarded += 1
+            # Place libérée : une requête en attente peut créer une connexion
+            _db_pool_cond.notify_all()
         try:
             _log.error(f"[DB_POOL] DISCARD reason={reason} stats={_pool_stats()}")
         except Exception:
@@ -138,6 +167,7 @@ def _create_conn():
                 password=DB_PASSWORD,
                 sslmode="require",
                 connect_timeout=10,
+                cursor_factory=InstrumentedCursor,
             )
         except Exception as e:
             last_err = e
@@ -147,118 +177,176 @@ def _create_conn():
     raise HTTPException(status_code=503, detail=f"DB saturée (pooler). Réessaie. {last_err}")
 
 
+def warm_pool(count: int = None) -> int:
+    """
+    Ouvre à l'avance des connexions (jusqu'à count, plafonné à DB_POOL_SIZE) et les place
+    dans le pool. Retourne le nombre de connexions ouvertes.
+    """
+    global _db_pool_created
 
-class _ConnCtx:
-    def __init__(self):
-        self.conn = None
-
-    def __enter__(self):
-        global _db_pool_created
-        global _db_in_use, _db_waits, _db_timeouts
-
-        t0 = time.time()
-
-
-        missing = _missing_env()
-        if missing:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Variables manquantes: {', '.join(missing)}",
-            )
-
-        # 1) Récupérer une connexion disponible (et vérifier qu'elle est vivante)
+    if _missing_env():
+        return 0
+    target = _DB_POOL_MAX if count is None else max(0, min(int(count), _DB_POOL_MAX))
+    opened = 0
+    while True:
+        with _db_pool_lock:
+            if _db_pool_created >= target:
+                break
+            conn = _create_conn()
+            _db_pool_created += 1
         try:
-            self.conn = _db_pool.get_nowait()
+            _db_pool.put_nowait(conn)
         except Exception:
-            self.conn = None
+            _discard_conn(conn, "warm_pool_full")
+            break
+        opened += 1
+    return opened
 
-        if self.conn is not None:
-            try:
-                # Conn déjà fermée ?
-                if getattr(self.conn, "closed", False):
-                    _discard_conn(self.conn, "already_closed")
-                    self.conn = None
 
-                else:
-                    # Ping minimal
-                    with self.conn.cursor() as cur:
-                        cur.execute("select 1;")
-
-                    with _db_pool_lock:
-                        _db_in_use += 1
-
-                    waited_ms = int((time.time() - t0) * 1000)
-                    if waited_ms >= 200:
-                        _log.error(f"[DB_POOL] ACQUIRE waited_ms={waited_ms} stats={_pool_stats()}")                    
-
-                    return self.conn
-            except Exception:
-                # Conn morte -> on la jette (et on décrémente created)
-                _discard_conn(self.conn, "ping_failed")
-                self.conn = None
 
+def _may_take(priority: str) -> bool:
+    # Sous _db_pool_lock
+    if priority != PRIORITY_BATCH:
+        return True
+    if _db_waiting_by[PRIORITY_INTERACTIVE] > 0:
+        return False
+    return _db_in_use_by[PRIORITY_BATCH] < _DB_POOL_MAX - _DB_POOL_INTERACTIVE_RESERVED
 
-        # 2) Sinon, en créer une si on n’a pas atteint la limite
-        with _db_pool_lock:
-            if _db_pool_created < _DB_POOL_MAX:
-                self.conn = _create_conn()
-                _db_pool_created += 1
-                _db_in_use += 1
 
-                waited_ms = int((time.time() - t0) * 1000)
-                if waited_ms >= 200:
-                    _log.error(f"[DB_POOL] ACQUIRE waited_ms={waited_ms} stats={_pool_stats()}")
+def _release_slot(priority: str):
+    global _db_in_use
+    with _db_pool_lock:
+        if _db_in_use > 0:
+            _db_in_use -= 1
+        if _db_in_use_by[priority] > 0:
+            _db_in_use_by[priority] -= 1
+        _db_pool_cond.notify_all()
 
-                return self.conn
 
+def _ping_ok(conn) -> bool:
+    try:
+        if getattr(conn, "closed", False):
+            return False
+        with conn.cursor() as cur:
+            cur.execute("select 1;")
+        return True
+    except Exception:
+        return False
 
 
-        # 3) Sinon, attendre qu’une connexion se libère
-        try:
-            with _db_pool_lock:
-                _db_waits += 1
+class _ConnCtx:
+    def __init__(self, priority: Optional[str] = None):
+        self.conn = None
+        self.priority = priority
 
-            self.conn = _db_pool.get(timeout=_DB_POOL_TIMEOUT)
+    def _reserve(self, deadline: float, waited: bool):
+        """
+        Réserve une place dans le pool : (connexion libre | None, à créer, a attendu).
+        Lève 503 si rien ne s'est libéré avant deadline.
+        """
+        global _db_pool_created, _db_in_use, _db_waits, _db_timeouts
 
-            # Conn récupérée: vérifier qu'elle est vivante (sinon discard + continuer à attendre)
+        p = self.priority
+        with _db_pool_cond:
+            _db_waiting_by[p] += 1
             try:
-                if getattr(self.conn, "closed", False):
-                    _discard_conn(self.conn, "wait_got_closed")
-                    self.conn = None
-                    raise Exception("wait_got_closed")
-
-                with self.conn.cursor() as cur:
-                    cur.execute("select 1;")
-            except Exception:
-                _discard_conn(self.conn, "wait_ping_failed")
-                self.conn = None
-                raise Exception("wait_ping_failed")
-
-            with _db_pool_lock:
-                _db_in_use += 1
+                while True:
+                    if _may_take(p):
+                        try:
+                            conn = _db_pool.get_nowait()
+                        except queue.Empty:
+                            conn = None
+                        if conn is not None or _db_pool_created < _DB_POOL_MAX:
+                            create = conn is None
+                            if create:
+                                _db_pool_created += 1
+                            _db_in_use += 1
+                            _db_in_use_by[p] += 1
+                            return conn, create, waited
+
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    if not waited:
+                        waited = True
+                        _db_waits += 1
+                        _db_wait_stats[p]["waits"] += 1
+                    _db_pool_cond.wait(remaining)
+            finally:
+                _db_waiting_by[p] -= 1
+                if p == PRIORITY_INTERACTIVE and _db_waiting_by[p] == 0:
+                    # Le batch retenu par cette attente peut repasser
+                    _db_pool_cond.notify_all()
+
+            _db_timeouts += 1
+            _db_wait_stats[p]["timeouts"] += 1
+
+        return None, False, waited
 
-            waited_ms = int((time.time() - t0) * 1000)
-            if waited_ms >= 200:
-                _log.error(f"[DB_POOL] ACQUIRE waited_ms={waited_ms} stats={_pool_stats()}")
-
-            return self.conn
+    def __enter__(self):
+        global _db_pool_created
 
-        except Exception:
-            with _db_pool_lock:
-                _db_timeouts += 1
-            _log.error(f"[DB_POOL] TIMEOUT wait_s={_DB_POOL_TIMEOUT} stats={_pool_stats()}")
+        t0 = time.time()
 
+        missing = _missing_env()
+        if missing:
             raise HTTPException(
-                status_code=503,
-                detail="DB saturée (pool complet). Réessaie dans quelques secondes.",
+                status_code=500,
+                detail=f"Variables manquantes: {', '.join(missing)}",
             )
 
+        if self.priority not in ALL_PRIORITIES:
+            self.priority = current_db_priority.get()
+            if self.priority not in ALL_PRIORITIES:
+                self.priority = PRIORITY_INTERACTIVE
+        timeout = _DB_POOL_BATCH_TIMEOUT if self.priority == PRIORITY_BATCH else _DB_POOL_TIMEOUT
+        deadline = t0 + timeout
+
+        waited = False
+        while self.conn is None:
+            conn, create, waited = self._reserve(deadline, waited)
+
+            if conn is None and not create:
+                record_pool_wait((time.time() - t0) * 1000, self.priority)
+                _log.error(f"[DB_POOL] TIMEOUT priority={self.priority} wait_s={timeout} stats={_pool_stats()}")
+                raise HTTPException(
+                    status_code=503,
+                    detail="DB saturée (pool complet). Réessaie dans quelques secondes.",
+                )
+
+            if create:
+                try:
+                    conn = _create_conn()
+                except Exception:
+                    with _db_pool_lock:
+                        if _db_pool_created > 0:
+                            _db_pool_created -= 1
+                    _release_slot(self.priority)
+                    raise
+            elif not _ping_ok(conn):
+                # Conn morte -> on la jette (et on décrémente created), puis nouvelle tentative
+                _discard_conn(conn, "ping_failed")
+                _release_slot(self.priority)
+                continue
+
+            self.conn = conn
+
+        waited_ms = (time.time() - t0) * 1000
+        record_pool_wait(waited_ms, self.priority)
+        with _db_pool_lock:
+            st = _db_wait_stats[self.priority]
+            st["acquired"] += 1
+            st["wait_ms"] += waited_ms
+            st["wait_max_ms"] = max(st["wait_max_ms"], waited_ms)
+        if waited_ms >= 200:
+            _log.error(f"[DB_POOL] ACQUIRE priority={self.priority} waited_ms={int(waited_ms)} stats={_pool_stats()}")
+
+        return self.conn
+
 
     def __exit__(self, exc_type, exc, tb):
         # On remet la connexion dans le pool si elle est saine
         try:
-            global _db_in_use
-
             if self.conn is None:
                 return False
 
@@ -286,21 +374,18 @@ class _ConnCtx:
 
 
         finally:
-            try:
-                with _db_pool_lock:
-                    if _db_in_use > 0:
-                        _db_in_use -= 1
-            except Exception:
-                pass
+            if self.conn is not None:
+                _release_slot(self.priority)
 
             self.conn = None
 
         return False
 
 
-def get_conn():
+def get_conn(priority: Optional[str] = None):
     # Conserve l’API existante: "with get_conn() as conn:"
-    return _ConnCtx()
+    # priority : force "interactive" / "batch" (sinon celle de la requête en cours)
+    return _ConnCtx(priority)
 
 
 
@@ -327,28 +412,10 @@ def _ensure_sharepoint_env():
 
 def get_sp_token() -> str:
     """
-    Récupère un token d'accès Graph pour SharePoint.
+    Récupère un token d'accès Graph pour SharePoint (mis en cache jusqu'à peu avant expiration).
     """
     _ensure_sharepoint_env()
-    url = f"https://login.microsoftonline.com/{SP_TENANT_ID}/oauth2/v2.0/token"
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": SP_CLIENT_ID,
-        "client_secret": SP_CLIENT_SECRET,
-        "scope": "https://graph.microsoft.com/.default",
-    }
-    try:
-        r = requests.post(url, data=data, timeout=20)
-        r.raise_for_status()
-        js = r.json()
-        token = js.get("access_token")
-        if not token:
-            raise HTTPException(status_code=500, detail="Token SharePoint manquant")
-        return token
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur token SharePoint : {e}")
+    return get_sharepoint_client().token()
 
 
 def _sp_safe_name(value: Optional[str]) -> str:
@@ -399,29 +466,10 @@ def build_skills_ent_root_path(
 def sp_list_children(remote_folder_path: str) -> List[Dict[str, Any]]:
     """
     Liste les enfants d'un dossier SharePoint (drive/root:/path:/children).
-    Retourne la liste brute des items Graph.
+    Retourne la liste brute des items Graph (toutes les pages).
     """
     _ensure_sharepoint_env()
-    token = get_sp_token()
-
-    base = "https://graph.microsoft.com/v1.0"
-    url = f"{base}/sites/{SP_SITE_ID}/drive/root:/{remote_folder_path}:/children"
-
-    headers = {"Authorization": f"Bearer {token}"}
-
-    try:
-        r = requests.get(url, headers=headers, timeout=30)
-        if r.status_code >= 400:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur liste dossier SharePoint : {r.status_code} {r.text}",
-            )
-        js = r.json()
-        return js.get("value", [])
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur liste SharePoint : {e}")
+    return get_sharepoint_client().list_children(remote_folder_path)
 
 
 def sp_get_item(remote_path: str) -> Dict[str, Any]:
@@ -429,25 +477,7 @@ def sp_get_item(remote_path: str) -> Dict[str, Any]:
     Récupère les métadonnées d'un item (fichier/dossier) par chemin.
     """
     _ensure_sharepoint_env()
-    token = get_sp_token()
-
-    base = "https://graph.microsoft.com/v1.0"
-    url = f"{base}/sites/{SP_SITE_ID}/drive/root:/{remote_path}"
-
-    headers = {"Authorization": f"Bearer {token}"}
-
-    try:
-        r = requests.get(url, headers=headers, timeout=30)
-        if r.status_code >= 400:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur item SharePoint : {r.status_code} {r.text}",
-            )
-        return r.json()
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur item SharePoint : {e}")
+    return get_sharepoint_client().get_item(remote_path)
 
 
 def sp_download_file(remote_file_path: str) -> bytes:
@@ -456,25 +486,7 @@ def sp_download_file(remote_file_path: str) -> bytes:
     Retourne les bytes.
     """
     _ensure_sharepoint_env()
-    token = get_sp_token()
-
-    base = "https://graph.microsoft.com/v1.0"
-    url = f"{base}/sites/{SP_SITE_ID}/drive/root:/{remote_file_path}:/content"
-
-    headers = {"Authorization": f"Bearer {token}"}
-
-    try:
-        r = requests.get(url, headers=headers, timeout=60)
-        if r.status_code >= 400:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur download SharePoint : {r.status_code} {r.text}",
-            )
-        return r.content
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur download SharePoint : {e}")
+    return get_sharepoint_client().download(remote_file_path)
 
 
 def upload_enterprise_document_to_sharepoint(
@@ -485,8 +497,9 @@ def upload_enterprise_document_to_sharepoint(
     logical_name: str,
     filename: Optional[str],
     content_type: Optional[str],
-    data: bytes,
+    data: Union[bytes, BinaryIO],
     base_path: Optional[str] = None,
+    size: Optional[int] = None,
 ) -> str:
     """
     Upload générique d'un fichier entreprise.
@@ -495,6 +508,7 @@ def upload_enterprise_document_to_sharepoint(
     - Sinon : upload dans base_path (utile si tu veux viser un autre espace type "Dossiers Compta").
 
     logical_name = préfixe logique du fichier (ex: 'facture_{id}', 'plan_actions', ...)
+    data = bytes ou flux binaire (ex: UploadFile.file) ; au-delà de 4 Mo, upload par session Graph en morceaux.
 
     Retourne une URL de téléchargement (downloadUrl ou webUrl), sinon le chemin brut.
     """
@@ -508,48 +522,18 @@ def upload_enterprise_document_to_sharepoint(
 
     remote_path = join_sp_path(root, f"{logical_name}{ext}")
 
-    token = get_sp_token()
-    base = "https://graph.microsoft.com/v1.0"
-    upload_url = f"{base}/sites/{SP_SITE_ID}/drive/root:/{remote_path}:/content"
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": content_type or "application/octet-stream",
-    }
-
-    try:
-        r = requests.put(upload_url, headers=headers, data=data, timeout=60)
-        if r.status_code >= 400:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur upload SharePoint : {r.status_code} {r.text}",
-            )
-        js = r.json()
-        return js.get("@microsoft.graph.downloadUrl") or js.get("webUrl") or remote_path
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur upload SharePoint : {e}")
+    js = get_sharepoint_client().upload(remote_path, data, content_type=content_type, size=size)
+    return js.get("@microsoft.graph.downloadUrl") or js.get("webUrl") or remote_path
 
 
 # ======================================================
 # Helpers SQL
 # ======================================================
 def _get_public_table_columns(cur, table_name: str) -> set:
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-          AND table_name = %s
-        """,
-        (table_name,),
-    )
-    return {
-        (r.get("column_name") or "").strip()
-        for r in (cur.fetchall() or [])
-        if (r.get("column_name") or "").strip()
-    }
+    """
+    Colonnes d'une table public.* (catalogue schéma en mémoire, chargé une fois par process).
+    """
+    return table_columns(cur, table_name)
 
 
 def _fetch_mon_entreprise_normalized(cur, id_mon_ent: str) -> Optional[Dict[str, Any]]:
@@ -812,7 +796,7 @@ def skills_get_supabase_user(access_token: str) -> dict:
     }
 
     try:
-        r = requests.get(url, headers=headers, timeout=15)
+        r = integration_get("supabase_auth", url, headers=headers)
         if r.status_code in (401, 403):
             raise HTTPException(status_code=401, detail="Session invalide ou expirée.")
         if r.status_code >= 400:
@@ -1143,10 +1127,13 @@ def resolve_insights_id_ent_for_request(cur, id_contact: str, request) -> str:
     """
     studio_id_ent = resolve_studio_embedded_id_ent_for_request(cur, id_contact, request)
     if studio_id_ent:
+        remember_tenant(id_contact, studio_id_ent)
         return studio_id_ent
 
     eff_id = resolve_insights_effectif_for_request(cur, id_contact, request)
     ctx = resolve_insights_context(cur, eff_id)
+    # Contrôle d'admission : les requêtes suivantes de ce contact comptent pour l'entreprise
+    remember_tenant(id_contact, ctx["id_ent"])
     return ctx["id_ent"]
 
 def fetch_contact_with_entreprise(cur, id_contact: str):
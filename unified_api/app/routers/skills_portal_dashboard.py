@@ -1,6 +1,6 @@
 from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, Field
 from psycopg.rows import dict_row
 
@@ -9,6 +9,8 @@ from app.routers.skills_portal_common import (
     fetch_contact_with_entreprise,
     resolve_insights_effectif_for_request,
 )
+from app.services.conditional_get import not_modified
+from app.services.fast_json import fast_json_response
 from app.services.skills_analyse_engine import (
     CRITICITE_MIN_DEFAULT,
     NON_LIE_ID,
@@ -462,19 +464,22 @@ def get_skills_context(id_contact: str, request: Request):
 
 
 @router.get("/skills/dashboard/risk-overview/{id_contact}", response_model=DashboardRiskOverview)
-def get_dashboard_risk_overview(id_contact: str, request: Request, id_service: Optional[str] = None, criticite_min: Optional[int] = None):
+def get_dashboard_risk_overview(id_contact: str, request: Request, response: Response, id_service: Optional[str] = None, criticite_min: Optional[int] = None):
     try:
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent, access, scope, services = _dashboard_context(cur, id_contact, request, id_service)
-                return build_dashboard_risk_overview_for_scope(
+                nm = not_modified(request, response, id_ent)
+                if nm is not None:
+                    return nm
+                return fast_json_response(build_dashboard_risk_overview_for_scope(
                     cur,
                     id_ent=id_ent,
                     access=access,
                     scope=scope,
                     services=services,
                     criticite_min=criticite_min,
-                )
+                ), response=response)
     except HTTPException:
         raise
     except Exception as e:
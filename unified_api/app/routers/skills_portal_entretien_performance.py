@@ -19,6 +19,18 @@ from app.routers.skills_portal_common import (
     get_conn,
     resolve_insights_id_ent_for_request,
 )
+from app.services.calendar_suggestion_store import invalidate_calendar_suggestions
+from app.services.data_version import DOMAIN_AUDITS, DOMAIN_COMPETENCES, bump_data_version
+from app.services.pagination import (
+    PAGE_SIZE_MAX,
+    apply_page_headers,
+    keyset_order_by,
+    keyset_select,
+    keyset_where,
+    page_finish,
+    page_request,
+)
+from app.services.schema_catalog import table_exists
 
 
 
@@ -751,17 +763,7 @@ def _ep_current_actor_context(cur, id_contact: str, request: Request) -> Dict[st
 
 
 def _ep_table_exists(cur, table_name: str) -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-          AND table_name = %s
-        LIMIT 1
-        """,
-        (table_name,),
-    )
-    return cur.fetchone() is not None
+    return table_exists(cur, table_name)
 
 
 def _ep_sync_json_dict(value: Any) -> Dict[str, Any]:
@@ -1465,14 +1467,22 @@ def get_entretien_performance_bootstrap(id_contact: str, request: Request):
 def get_entretien_performance_collaborateurs(
     id_contact: str,
     request: Request,
+    response: Response,
     id_service: str,
     q: Optional[str] = Query(default=None),
     limit: int = Query(default=200, ge=1, le=500),
+    page_size: Optional[int] = Query(default=None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
 ):
     try:
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                page_req = page_request(
+                    page_size,
+                    cursor,
+                    ["ep_collaborateurs", id_ent, id_service, (q or "").strip()],
+                )
 
 
                 where_parts: List[str] = [
@@ -1498,6 +1508,28 @@ def get_entretien_performance_collaborateurs(
                     )
                     params.extend([like, like, like, like])
 
+                sort_keys = [
+                    ("COALESCE(e.nom_effectif, '')", "asc"),
+                    ("COALESCE(e.prenom_effectif, '')", "asc"),
+                    ("e.id_effectif", "asc"),
+                ]
+                total = None
+                row_limit = limit
+                if page_req is not None:
+                    total = page_req.get("total")
+                    if total is None:
+                        cur.execute(
+                            f"SELECT COUNT(1) AS n FROM public.tbl_effectif_client e WHERE {' AND '.join(where_parts)}",
+                            tuple(params),
+                        )
+                        total = int((cur.fetchone() or {}).get("n") or 0)
+
+                    after_sql, after_params = keyset_where(sort_keys, page_req.get("after"))
+                    if after_sql:
+                        where_parts.append(after_sql)
+                        params.extend(after_params)
+                    row_limit = page_req["size"] + 1
+
                 where_sql = " AND ".join(where_parts)
 
                 cur.execute(
@@ -1604,7 +1636,7 @@ def get_entretien_performance_collaborateurs(
                             WHEN ent.date_dernier_entretien IS NULL THEN 'Entretien à planifier'
                             WHEN ent.date_dernier_entretien < (CURRENT_DATE - INTERVAL '12 months') THEN 'Entretien en retard'
                             ELSE 'Entretien à jour'
-                        END AS libelle_entretien_suivi
+                        END AS libelle_entretien_suivi{keyset_select(sort_keys)}
 
                     FROM public.tbl_effectif_client e
 
@@ -1626,16 +1658,18 @@ def get_entretien_performance_collaborateurs(
 
                     WHERE {where_sql}
 
-                    ORDER BY
-                        e.nom_effectif,
-                        e.prenom_effectif
+                    ORDER BY {keyset_order_by(sort_keys)}
 
                     LIMIT %s
                     """,
-                    tuple([id_ent, id_ent, *params, limit]),
+                    tuple([id_ent, id_ent, *params, row_limit]),
                 )
 
                 rows = cur.fetchall() or []
+                if page_req is not None:
+                    rows, page = page_finish(rows, page_req, sort_keys, total)
+                    apply_page_headers(response, page)
+
                 return [
                     CollaborateurListItem(
                         id_effectif=r["id_effectif"],
@@ -2031,6 +2065,8 @@ def ep_create_entretien_individuel(
                 row = cur.fetchone()
                 _ep_sync_calendar_for_entretien_update(cur, id_ent, dict(row or {}))
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_AUDITS,))
+                invalidate_calendar_suggestions(id_ent, "entretien", "evenement")
 
                 return _ep_entretien_item_from_row(row)
 
@@ -2157,6 +2193,8 @@ def ep_update_entretien_individuel(
                 row = cur.fetchone()
                 _ep_sync_calendar_for_entretien_update(cur, id_ent, dict(row or {}))
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_AUDITS,))
+                invalidate_calendar_suggestions(id_ent, "entretien", "evenement")
 
                 return _ep_entretien_item_from_row(row)
 
@@ -2197,6 +2235,8 @@ def ep_archive_entretien_individuel(
                     raise HTTPException(status_code=404, detail="Entretien individuel introuvable.")
 
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_AUDITS,))
+                invalidate_calendar_suggestions(id_ent, "entretien")
 
                 return {"ok": True, "id_entretien": id_entretien}
 
@@ -2324,6 +2364,7 @@ def ep_ensure_effectif_competence(
                 )
 
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_COMPETENCES,))
 
                 return {"id_effectif_competence": id_effectif_competence}
 
@@ -2881,6 +2922,8 @@ def save_entretien_competence_audit(id_contact: str, payload: AuditSavePayload,
                 )
 
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_AUDITS, DOMAIN_COMPETENCES))
+                invalidate_calendar_suggestions(id_ent, "evaluation")
 
                 return AuditSaveResponse(
                     id_audit_competence=id_audit,
@@ -3024,6 +3067,8 @@ def update_entretien_competence_audit(
                     )
 
                 conn.commit()
+                bump_data_version(id_ent, domains=(DOMAIN_AUDITS, DOMAIN_COMPETENCES))
+                invalidate_calendar_suggestions(id_ent, "evaluation")
 
                 return AuditSaveResponse(
                     id_audit_competence=id_audit,
@@ -3039,13 +3084,28 @@ def update_entretien_competence_audit(
 # Historique (audits compétences par collaborateur)
 # ======================================================
 
+_EP_HISTORIQUE_SORT_KEYS = [
+    ("COALESCE(a.date_audit, DATE '0001-01-01')", "desc"),
+    ("COALESCE(c.code, '')", "asc"),
+    ("a.id_audit_competence", "asc"),
+]
+
+
 @router.get(
     "/skills/entretien-performance/historique/{id_contact}/{id_effectif_client}",
     response_model=List[AuditHistoryItem],
 )
-def get_entretien_performance_historique(id_contact: str, id_effectif_client: str, request: Request):
+def get_entretien_performance_historique(
+    id_contact: str,
+    id_effectif_client: str,
+    request: Request,
+    response: Response,
+    page_size: Optional[int] = Query(default=None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
+):
     """
     Retourne l'historique des audits compétences d'un collaborateur (derniers en premier).
+    Pagination par clé optionnelle (page_size / cursor, métadonnées en en-têtes X-Page-*).
     """
     try:
         with get_conn() as conn:
@@ -3071,8 +3131,15 @@ def get_entretien_performance_historique(id_contact: str, id_effectif_client: st
                 if not cur.fetchone():
                     raise HTTPException(status_code=404, detail="Collaborateur introuvable (ou archivé).")
 
+                page_req = page_request(page_size, cursor, ["ep_historique", id_ent, id_effectif_client])
+                after_sql, after_params = keyset_where(
+                    _EP_HISTORIQUE_SORT_KEYS,
+                    page_req.get("after") if page_req else None,
+                )
+                row_limit = (page_req["size"] + 1) if page_req else 500
+
                 cur.execute(
-                    """
+                    f"""
                     SELECT
                         a.id_audit_competence,
                         a.id_effectif_competence,
@@ -3102,7 +3169,7 @@ def get_entretien_performance_historique(id_contact: str, id_effectif_client: st
                               OR lower(COALESCE(a.methode_eval, '')) LIKE '%%entretien de performance%%'
                                 THEN 'Entretien ponctuel'
                             ELSE a.methode_eval
-                        END AS source_eval
+                        END AS source_eval{keyset_select(_EP_HISTORIQUE_SORT_KEYS)}
                     FROM public.tbl_effectif_client_audit_competence a
                     JOIN public.tbl_effectif_client_competence ec
                       ON ec.id_effectif_competence = a.id_effectif_competence
@@ -3122,13 +3189,17 @@ def get_entretien_performance_historique(id_contact: str, id_effectif_client: st
                      AND ei.id_ent = e.id_ent
                      AND COALESCE(ei.archive, FALSE) = FALSE
                     WHERE ec.id_effectif_client = %s
-                    ORDER BY a.date_audit DESC NULLS LAST, c.code ASC
-                    LIMIT 500
+                    {("AND " + after_sql) if after_sql else ""}
+                    ORDER BY {keyset_order_by(_EP_HISTORIQUE_SORT_KEYS)}
+                    LIMIT %s
                     """,
-                    (id_ent, id_effectif_client),
+                    tuple([id_ent, id_effectif_client] + after_params + [row_limit]),
                 )
 
                 rows = cur.fetchall() or []
+                if page_req is not None:
+                    rows, page = page_finish(rows, page_req, _EP_HISTORIQUE_SORT_KEYS)
+                    apply_page_headers(response, page)
                 out: List[AuditHistoryItem] = []
 
                 for r in rows:
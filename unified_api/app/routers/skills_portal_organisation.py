@@ -25,6 +25,8 @@ from app.routers.studio_portal_organisation import (
     _pdf_format_footer_date,
     _pdf_latin1_safe,
 )
+from app.services.cartographie_cache import invalidate_cartographie
+from app.services.data_version import DOMAIN_COMPETENCES, DOMAIN_POSTES, bump_data_version
 
 
 router = APIRouter()
@@ -1827,6 +1829,8 @@ def update_poste_competence(id_contact: str, id_poste: str, payload: PosteCompet
                     (niv, poids, fu, im, de, statut_eval, id_poste, cid),
                 )
                 conn.commit()
+                invalidate_cartographie(id_ent=id_ent)
+                bump_data_version(id_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return get_poste_detail(id_contact, id_poste, request)
 
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile
 from typing import Optional, Dict, Any, List
 import json
+import os
 import uuid
 
 from psycopg.rows import dict_row
@@ -15,14 +16,33 @@ from app.services.skills_analyse_engine import (
 )
 from app.services.skills_simulation_engine import (
     SimulationEvalRequest,
+    SimulationHypothese,
     analyser_cv_recrutement_payload,
     build_simulation_options_payload,
+    evaluate_simulation_batch,
     evaluate_simulation_payload,
     comparer_simulation_scenarios_payload,
 )
+from app.services.background_jobs import get_job, start_job
+from app.services.fast_json import fast_json_response
+from app.services.simulation_scenario_store import (
+    build_scenario_resume,
+    clear_recalc_failure,
+    compute_data_version,
+    decode_resultat,
+    encode_resultat,
+    failure_marker_ready,
+    mark_recalc_failure,
+    recalc_failed,
+    storage_ready,
+)
 
 router = APIRouter()
 
+# Recalcul en tâche de fond des scénarios périmés détectés à l'affichage de la liste
+SIMULATION_AUTO_RECALC = (os.getenv("SIMULATION_AUTO_RECALC", "1") or "1").strip().lower() in ("1", "true", "yes")
+SIMULATION_RECALC_MAX = int(os.getenv("SIMULATION_RECALC_MAX", "20") or 20)
+
 
 class SimulationScenarioSaveRequest(BaseModel):
     titre: str
@@ -34,6 +54,8 @@ class SimulationScenarioSaveRequest(BaseModel):
 
 class SimulationScenarioCompareRequest(BaseModel):
     ids: List[str] = []
+    # True : réévaluation des scénarios sur les données actuelles (un seul chargement partagé)
+    recalculer: bool = False
 
 
 def _resolve_id_ent_for_request(cur, id_contact: str, request: Request) -> str:
@@ -114,6 +136,30 @@ def analyser_cv_simulation(
         raise HTTPException(status_code=500, detail=f"skills/simulations/analyse-cv error: {e}")
 
 
+_JSONB_COLUMNS = ("scenario_json", "hypotheses_json", "resultat_json", "resume_json")
+
+
+def _insert_scenario(cur, values: Dict[str, Any]):
+    cols = list(values.keys())
+    placeholders = ["%s::jsonb" if c in _JSONB_COLUMNS else "%s" for c in cols]
+    if "resultat_gz" in values:
+        cols.append("resultat_calcule_at")
+        placeholders.append("NOW()")
+    cur.execute(
+        f"""
+        INSERT INTO public.tbl_insights_simulation_scenario (
+            {", ".join(cols)},
+            archive,
+            masque,
+            created_at,
+            updated_at
+        )
+        VALUES ({", ".join(placeholders)}, FALSE, FALSE, NOW(), NOW())
+        """,
+        tuple(values.values()),
+    )
+
+
 @router.post("/skills/simulations/scenarios/{id_contact}")
 def conserver_simulation_scenario(
     id_contact: str,
@@ -139,46 +185,26 @@ def conserver_simulation_scenario(
                     "criticite_min": int(criticite_min),
                     "scope": scope.dict() if hasattr(scope, "dict") else dict(scope or {}),
                 }
-                cur.execute(
-                    """
-                    INSERT INTO public.tbl_insights_simulation_scenario (
-                        id_scenario,
-                        id_ent,
-                        id_contact,
-                        id_service,
-                        titre,
-                        objectif,
-                        id_poste_focus,
-                        criticite_min,
-                        scenario_json,
-                        hypotheses_json,
-                        resultat_json,
-                        archive,
-                        masque,
-                        created_at,
-                        updated_at
-                    )
-                    VALUES (
-                        %s, %s, %s, %s, %s,
-                        %s, %s, %s,
-                        %s::jsonb, %s::jsonb, %s::jsonb,
-                        FALSE, FALSE, NOW(), NOW()
-                    )
-                    """,
-                    (
-                        id_scenario,
-                        id_ent,
-                        id_contact,
-                        scope.id_service,
-                        titre,
-                        payload.objectif or "",
-                        payload.id_poste_focus or None,
-                        int(criticite_min),
-                        json.dumps(scenario_json, ensure_ascii=False),
-                        json.dumps(payload.hypotheses or [], ensure_ascii=False),
-                        json.dumps(payload.resultat or {}, ensure_ascii=False),
-                    ),
-                )
+                values = {
+                    "id_scenario": id_scenario,
+                    "id_ent": id_ent,
+                    "id_contact": id_contact,
+                    "id_service": scope.id_service,
+                    "titre": titre,
+                    "objectif": payload.objectif or "",
+                    "id_poste_focus": payload.id_poste_focus or None,
+                    "criticite_min": int(criticite_min),
+                    "scenario_json": json.dumps(scenario_json, ensure_ascii=False),
+                    "hypotheses_json": json.dumps(payload.hypotheses or [], ensure_ascii=False),
+                    "resultat_json": json.dumps(payload.resultat or {}, ensure_ascii=False),
+                }
+                if storage_ready(cur):
+                    # Résultat complet compressé + résumé pour les listes ; resultat_json reste vide
+                    values["resultat_json"] = "{}"
+                    values["resume_json"] = json.dumps(build_scenario_resume(payload.resultat, scenario_json), ensure_ascii=False)
+                    values["resultat_gz"] = encode_resultat(payload.resultat)
+                    values["data_version"] = compute_data_version(cur, id_ent)
+                _insert_scenario(cur, values)
                 conn.commit()
                 return {
                     "id_scenario": id_scenario,
@@ -192,6 +218,126 @@ def conserver_simulation_scenario(
 
 
 
+def _scenario_eval_request(cur, id_ent: str, row: Dict[str, Any]):
+    """
+    (scope, requête d'évaluation, criticité) reconstruits depuis un scénario enregistré.
+    """
+    scope = _fetch_service_label(cur, id_ent, row.get("id_service") or None)
+    payload = SimulationEvalRequest(
+        titre=row.get("titre") or "",
+        objectif=row.get("objectif") or "",
+        id_poste_focus=row.get("id_poste_focus") or None,
+        hypotheses=[SimulationHypothese(**h) for h in (row.get("hypotheses_json") or []) if isinstance(h, dict) and h.get("type")],
+    )
+    return scope, payload, int(row.get("criticite_min") or CRITICITE_MIN_DEFAULT)
+
+
+def _store_scenario_result(cur, id_ent: str, id_scenario: str, result: Dict[str, Any], data_version: str):
+    clear_sql = (
+        ", recalcul_echec_version = NULL, recalcul_echec_at = NULL, recalcul_echec = NULL"
+        if failure_marker_ready(cur)
+        else ""
+    )
+    cur.execute(
+        f"""
+        UPDATE public.tbl_insights_simulation_scenario
+        SET resultat_json = '{{}}'::jsonb,
+            resultat_gz = %s,
+            resume_json = %s::jsonb,
+            data_version = %s,
+            resultat_calcule_at = NOW()
+            {clear_sql}
+        WHERE id_ent = %s
+          AND id_scenario = %s
+        """,
+        (
+            encode_resultat(result),
+            json.dumps(build_scenario_resume(result), ensure_ascii=False, default=str),
+            data_version,
+            id_ent,
+            id_scenario,
+        ),
+    )
+    clear_recalc_failure(id_ent, id_scenario)
+
+
+def _evaluate_scenarios(conn, cur, id_ent: str, evals: List[Any]) -> List[Any]:
+    """
+    Évaluation groupée (une baseline par périmètre / criticité). Si elle échoue, reprise
+    scénario par scénario pour isoler le fautif : résultat ou exception, dans l'ordre.
+    """
+    try:
+        return list(evaluate_simulation_batch(cur, id_ent, evals))
+    except Exception:
+        conn.rollback()
+    out: List[Any] = []
+    for req in evals:
+        try:
+            out.append(evaluate_simulation_batch(cur, id_ent, [req])[0])
+        except Exception as e:
+            conn.rollback()
+            out.append(e)
+    return out
+
+
+def _run_recalc_job(progress, id_ent: str, ids: List[str], data_version: str) -> Dict[str, Any]:
+    """
+    data_version : empreinte lue par la requête qui a lancé le job, avant le calcul ; une
+    modification pendant le calcul laisse les scénarios périmés.
+    """
+    errors: List[Dict[str, Any]] = []
+    progress(total=len(ids), done=0, errors=0)
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(
+                """
+                SELECT id_scenario, id_service, titre, objectif, id_poste_focus, criticite_min, hypotheses_json
+                FROM public.tbl_insights_simulation_scenario
+                WHERE id_ent = %s
+                  AND id_scenario = ANY(%s::text[])
+                  AND COALESCE(archive, FALSE) = FALSE
+                """,
+                (id_ent, ids),
+            )
+            rows = [dict(r) for r in (cur.fetchall() or [])]
+
+            # Hypothèses invalides (SimulationHypothese) : échec du scénario, pas du lot
+            pending: List[Any] = []
+            failed: List[Any] = []
+            for row in rows:
+                try:
+                    pending.append((row, _scenario_eval_request(cur, id_ent, row)))
+                except Exception as e:
+                    conn.rollback()
+                    failed.append((row, e))
+
+            results = _evaluate_scenarios(conn, cur, id_ent, [req for _, req in pending])
+            done = 0
+            for (row, _), result in zip(pending, results):
+                if isinstance(result, Exception):
+                    failed.append((row, result))
+                    continue
+                _store_scenario_result(cur, id_ent, str(row.get("id_scenario")), result, data_version)
+                done += 1
+            for row, e in failed:
+                id_scenario = str(row.get("id_scenario"))
+                errors.append({"id_scenario": id_scenario, "error": str(e)[:300]})
+                mark_recalc_failure(cur, id_ent, id_scenario, data_version, str(e))
+            conn.commit()
+
+    progress(done=done, errors=len(errors))
+    return {"recalcules": done, "erreurs": errors}
+
+
+def _start_recalc_job(id_ent: str, id_contact: str, ids: List[str], data_version: str) -> Dict[str, Any]:
+    ids = ids[: max(1, SIMULATION_RECALC_MAX)]
+    return start_job(
+        "simulation_recalcul",
+        lambda progress: _run_recalc_job(progress, id_ent, ids, data_version),
+        dedupe_key=f"simulation_recalcul:{id_ent}",
+        meta={"id_ent": id_ent, "id_contact": id_contact, "id_scenarios": ids},
+    )
+
 
 @router.get("/skills/simulations/scenarios/{id_contact}")
 def lister_simulation_scenarios(
@@ -212,6 +358,16 @@ def lister_simulation_scenarios(
                     params.append(scope.id_service)
                 params.append(int(limit))
 
+                # Projection légère : resume_json calculé à l'enregistrement ; le résultat
+                # complet n'est lu que pour les lignes antérieures au patch (sans résumé).
+                ready = storage_ready(cur)
+                resume_sql = (
+                    "resume_json, data_version, CASE WHEN resume_json IS NULL THEN resultat_json END AS resultat_json"
+                    if ready
+                    else "resultat_json"
+                )
+                if ready and failure_marker_ready(cur):
+                    resume_sql += ", recalcul_echec_version"
                 cur.execute(
                     f"""
                     SELECT
@@ -222,9 +378,8 @@ def lister_simulation_scenarios(
                         objectif,
                         id_poste_focus,
                         criticite_min,
-                        scenario_json,
-                        hypotheses_json,
-                        resultat_json,
+                        scenario_json -> 'scope' AS scenario_scope,
+                        {resume_sql},
                         created_at,
                         updated_at
                     FROM public.tbl_insights_simulation_scenario
@@ -238,25 +393,18 @@ def lister_simulation_scenarios(
                     tuple(params),
                 )
                 rows = [dict(r) for r in (cur.fetchall() or [])]
+                data_version = compute_data_version(cur, id_ent) if ready and rows else None
                 items = []
+                stale_ids: List[str] = []
                 for row in rows:
-                    result = row.get("resultat_json") or {}
-                    scenario = row.get("scenario_json") or {}
-                    focus = result.get("poste_focus") or {}
-                    developpement = result.get("developpement") or {}
-                    besoins = developpement.get("besoins_formation") or []
-                    resultats = result.get("resultats") or {}
-                    final_summary = (resultats.get("projete") or {}).get("summary") or (resultats.get("immediat") or {}).get("summary") or result.get("simule") or {}
-                    current_summary = result.get("actuel") or {}
-                    impact = (resultats.get("projete") or {}).get("impact") or result.get("impact") or {}
-                    try:
-                        impact_poste_pct = int(round(float(focus.get("fragilite_projete") or 0) - float(focus.get("fragilite_avant") or 0)))
-                    except Exception:
-                        impact_poste_pct = 0
-                    try:
-                        impact_global_pct = int(round(float(final_summary.get("fragilite_moyenne") or 0) - float(current_summary.get("fragilite_moyenne") or 0)))
-                    except Exception:
-                        impact_global_pct = 0
+                    resume = row.get("resume_json") or build_scenario_resume(
+                        row.get("resultat_json"),
+                        {"scope": row.get("scenario_scope") or {}},
+                    )
+                    stale = bool(ready and row.get("data_version") != data_version)
+                    # Recalcul déjà en échec sur ces données : pas de relance à chaque liste
+                    if stale and not recalc_failed(row, id_ent, data_version):
+                        stale_ids.append(str(row.get("id_scenario")))
                     items.append({
                         "id_scenario": row.get("id_scenario"),
                         "titre": row.get("titre"),
@@ -266,23 +414,21 @@ def lister_simulation_scenarios(
                         "id_service": row.get("id_service"),
                         "created_at": row.get("created_at"),
                         "updated_at": row.get("updated_at"),
-                        "scope": result.get("scope") or scenario.get("scope") or {},
-                        "poste_focus": {
-                            "codif_client": focus.get("codif_client") or "",
-                            "codif_poste": focus.get("codif_poste") or "",
-                            "intitule_poste": focus.get("intitule_poste") or "",
-                            "fragilite_avant": focus.get("fragilite_avant"),
-                            "fragilite_projete": focus.get("fragilite_projete"),
-                        },
-                        "resume": {
-                            "impact_poste_pct": impact_poste_pct,
-                            "impact_global_pct": impact_global_pct,
-                            "besoins_count": len(besoins),
-                            "postes_degrades": impact.get("postes_degrades", 0),
-                            "postes_securises": impact.get("postes_securises", 0),
-                        },
+                        "scope": resume.get("scope") or {},
+                        "poste_focus": resume.get("poste_focus") or {},
+                        "resume": resume.get("resume") or {},
+                        "stale": stale,
                     })
-                return {"items": items, "scope": scope.dict() if hasattr(scope, "dict") else dict(scope or {})}
+
+                recalcul = None
+                if stale_ids and SIMULATION_AUTO_RECALC:
+                    recalcul = _start_recalc_job(id_ent, id_contact, stale_ids, data_version)
+                return {
+                    "items": items,
+                    "scope": scope.dict() if hasattr(scope, "dict") else dict(scope or {}),
+                    "data_version": data_version,
+                    "recalcul": recalcul,
+                }
     except HTTPException:
         raise
     except Exception as e:
@@ -299,8 +445,10 @@ def lire_simulation_scenario(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                ready = storage_ready(cur)
+                storage_sql = ", resultat_gz, data_version, resultat_calcule_at" if ready else ""
                 cur.execute(
-                    """
+                    f"""
                     SELECT
                         id_scenario,
                         id_contact,
@@ -314,6 +462,7 @@ def lire_simulation_scenario(
                         resultat_json,
                         created_at,
                         updated_at
+                        {storage_sql}
                     FROM public.tbl_insights_simulation_scenario
                     WHERE id_ent = %s
                       AND id_scenario = %s
@@ -327,7 +476,7 @@ def lire_simulation_scenario(
                 if not row:
                     raise HTTPException(status_code=404, detail="Scénario introuvable ou archivé.")
                 data = dict(row)
-                result = data.get("resultat_json") or {}
+                result = decode_resultat(data)
                 if isinstance(result, dict):
                     result["id_scenario"] = data.get("id_scenario")
                     result["titre"] = data.get("titre") or result.get("titre")
@@ -346,6 +495,9 @@ def lire_simulation_scenario(
                     "resultat_json": result,
                     "created_at": data.get("created_at"),
                     "updated_at": data.get("updated_at"),
+                    "resultat_calcule_at": data.get("resultat_calcule_at"),
+                    # Sans empreinte enregistrée : périmé sans calculer l'empreinte courante
+                    "stale": bool(ready and (not data.get("data_version") or data.get("data_version") != compute_data_version(cur, id_ent))),
                 }
     except HTTPException:
         raise
@@ -372,18 +524,24 @@ def comparer_simulation_scenarios(
         with get_conn() as conn:
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                ready = storage_ready(cur)
+                resume_sql = (
+                    "resume_json, CASE WHEN resume_json IS NULL THEN resultat_json END AS resultat_json"
+                    if ready
+                    else "resultat_json"
+                )
                 cur.execute(
-                    """
+                    f"""
                     SELECT
                         id_scenario,
+                        id_service,
                         titre,
                         objectif,
                         id_poste_focus,
                         criticite_min,
-                        scenario_json,
+                        scenario_json -> 'scope' AS scenario_scope,
                         hypotheses_json,
-                        resultat_json,
-                        created_at
+                        {resume_sql}
                     FROM public.tbl_insights_simulation_scenario
                     WHERE id_ent = %s
                       AND id_scenario = ANY(%s::text[])
@@ -398,24 +556,29 @@ def comparer_simulation_scenarios(
                 if len(ordered) < 2:
                     raise HTTPException(status_code=404, detail="Scénarios introuvables ou archivés.")
 
+                if payload.recalculer:
+                    # Mêmes données pour tous les scénarios : état réel chargé une fois par
+                    # périmètre / criticité, seuls les deltas sont calculés par scénario.
+                    data_version = compute_data_version(cur, id_ent) if ready else None
+                    results = evaluate_simulation_batch(
+                        cur,
+                        id_ent,
+                        [_scenario_eval_request(cur, id_ent, row) for row in ordered],
+                    )
+                    for row, result in zip(ordered, results):
+                        row["resume_json"] = build_scenario_resume(result)
+                        if ready:
+                            _store_scenario_result(cur, id_ent, str(row.get("id_scenario")), result, data_version)
+                    if ready:
+                        conn.commit()
+
                 compact_items: List[Dict[str, Any]] = []
                 for row in ordered:
-                    result = row.get("resultat_json") or {}
-                    focus = result.get("poste_focus") or {}
-                    resultats = result.get("resultats") or {}
-                    final_summary = (resultats.get("projete") or {}).get("summary") or (resultats.get("immediat") or {}).get("summary") or result.get("simule") or {}
-                    current_summary = result.get("actuel") or {}
-                    impact = (resultats.get("projete") or {}).get("impact") or result.get("impact") or {}
-                    besoins = (result.get("developpement") or {}).get("besoins_formation") or []
-                    hypotheses = row.get("hypotheses_json") or result.get("hypotheses") or []
-                    try:
-                        impact_poste_pct = int(round(float(focus.get("fragilite_projete") or 0) - float(focus.get("fragilite_avant") or 0)))
-                    except Exception:
-                        impact_poste_pct = 0
-                    try:
-                        impact_global_pct = int(round(float(final_summary.get("fragilite_moyenne") or 0) - float(current_summary.get("fragilite_moyenne") or 0)))
-                    except Exception:
-                        impact_global_pct = 0
+                    legacy = row.get("resultat_json") or {}
+                    resume = row.get("resume_json") or build_scenario_resume(legacy, {"scope": row.get("scenario_scope") or {}})
+                    focus = resume.get("poste_focus") or {}
+                    kpis = resume.get("resume") or {}
+                    hypotheses = row.get("hypotheses_json") or legacy.get("hypotheses") or []
                     compact_items.append({
                         "id_scenario": row.get("id_scenario"),
                         "titre": row.get("titre") or "Scénario RH",
@@ -423,7 +586,7 @@ def comparer_simulation_scenarios(
                             "code": focus.get("codif_client") or focus.get("codif_poste") or "",
                             "intitule": focus.get("intitule_poste") or "Poste étudié",
                         },
-                        "perimetre": (result.get("scope") or (row.get("scenario_json") or {}).get("scope") or {}).get("nom_service") or "Tous les services",
+                        "perimetre": (resume.get("scope") or {}).get("nom_service") or "Tous les services",
                         "hypotheses": [
                             {
                                 "type": h.get("type") if isinstance(h, dict) else "",
@@ -432,24 +595,100 @@ def comparer_simulation_scenarios(
                             for h in hypotheses[:8]
                         ],
                         "resultats": {
-                            "impact_poste_pct": impact_poste_pct,
-                            "impact_global_pct": impact_global_pct,
-                            "besoins": len(besoins),
-                            "postes_ameliore": impact.get("postes_securises", 0),
-                            "postes_degrade": impact.get("postes_degrades", 0),
+                            "impact_poste_pct": kpis.get("impact_poste_pct", 0),
+                            "impact_global_pct": kpis.get("impact_global_pct", 0),
+                            "besoins": kpis.get("besoins_count", 0),
+                            "postes_ameliore": kpis.get("postes_securises", 0),
+                            "postes_degrade": kpis.get("postes_degrades", 0),
                         },
                     })
 
-                return {
-                    "items": compact_items,
-                    "analyse": comparer_simulation_scenarios_payload(compact_items),
-                }
+        # Commentaire IA hors connexion : appel externe potentiellement long
+        return {
+            "items": compact_items,
+            "recalcule": bool(payload.recalculer),
+            "analyse": comparer_simulation_scenarios_payload(compact_items),
+        }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"skills/simulations/scenarios comparer error: {e}")
 
 
+@router.post("/skills/simulations/scenarios/{id_contact}/recalcul")
+def recalculer_simulation_scenarios(
+    id_contact: str,
+    payload: SimulationScenarioCompareRequest,
+    request: Request,
+):
+    """
+    Recalcul en tâche de fond des scénarios indiqués (tous les scénarios périmés si ids vide).
+    """
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+                if not storage_ready(cur):
+                    raise HTTPException(status_code=409, detail="Recalcul indisponible : patch SQL des scénarios non appliqué.")
+                data_version = compute_data_version(cur, id_ent)
+                ids = [str(x or "").strip() for x in (payload.ids or []) if str(x or "").strip()]
+                if ids:
+                    cur.execute(
+                        """
+                        SELECT id_scenario
+                        FROM public.tbl_insights_simulation_scenario
+                        WHERE id_ent = %s
+                          AND id_scenario = ANY(%s::text[])
+                          AND COALESCE(archive, FALSE) = FALSE
+                        """,
+                        (id_ent, ids),
+                    )
+                else:
+                    cur.execute(
+                        """
+                        SELECT id_scenario
+                        FROM public.tbl_insights_simulation_scenario
+                        WHERE id_ent = %s
+                          AND COALESCE(archive, FALSE) = FALSE
+                          AND COALESCE(masque, FALSE) = FALSE
+                          AND data_version IS DISTINCT FROM %s
+                        ORDER BY created_at DESC
+                        LIMIT %s
+                        """,
+                        (id_ent, data_version, max(1, SIMULATION_RECALC_MAX)),
+                    )
+                found = [str(r.get("id_scenario")) for r in (cur.fetchall() or [])]
+
+        if not found:
+            return {"ok": True, "job": None}
+        return {"ok": True, "job": _start_recalc_job(id_ent, id_contact, found, data_version)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"skills/simulations/scenarios recalcul error: {e}")
+
+
+@router.get("/skills/simulations/scenarios/{id_contact}/jobs/{id_job}")
+def lire_recalcul_simulation_scenarios(
+    id_contact: str,
+    id_job: str,
+    request: Request,
+):
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
+
+        job = get_job(id_job)
+        if not job or job.get("kind") != "simulation_recalcul" or (job.get("meta") or {}).get("id_ent") != id_ent:
+            raise HTTPException(status_code=404, detail="Job introuvable.")
+        return {"ok": True, "job": job}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"skills/simulations/scenarios job error: {e}")
+
+
 @router.delete("/skills/simulations/scenarios/{id_contact}/{id_scenario}")
 def supprimer_simulation_scenario(
     id_contact: str,
@@ -495,7 +734,7 @@ def evaluer_simulation(
             with conn.cursor(row_factory=dict_row) as cur:
                 id_ent = _resolve_id_ent_for_request(cur, id_contact, request)
                 scope = _fetch_service_label(cur, id_ent, (id_service or "").strip() or None)
-                return evaluate_simulation_payload(cur, id_ent, scope, payload, int(criticite_min))
+                return fast_json_response(evaluate_simulation_payload(cur, id_ent, scope, payload, int(criticite_min)))
     except HTTPException:
         raise
     except Exception as e:
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from typing import Optional
 from psycopg.rows import dict_row
 
 from app.routers import studio_portal_auth, studio_portal_dashboard, studio_portal_data, studio_portal_organisation, studio_portal_collaborateurs, studio_portal_catalog_postes, studio_portal_catalog_competences, studio_portal_clients, studio_portal_connexions, studio_portal_sirh, studio_portal_planification
@@ -9,6 +10,10 @@ from app.routers.studio_portal_common import (
     studio_list_owners,
     studio_fetch_owner,
 )
+from app.services.metrics import METRICS_SLOW_REQUEST_MS, recent_slow_requests
+from app.services.request_capture import capture_stats, get_capture, list_captures
+from app.services.sql_profiler import get_sql_profile, list_sql_profiles
+from app.services.startup import startup_report
 
 app_local = FastAPI(title="Novoskill - Portail Studio API")
 
@@ -183,6 +188,76 @@ def studio_me_scope(request: Request):
             ow["role_label"] = role_label
             return {"mode": "standard", "owners": [ow]}
 
+
+def _require_super_admin(request: Request):
+    u = studio_require_user(request.headers.get("Authorization", ""))
+    if not u.get("is_super_admin"):
+        raise HTTPException(status_code=403, detail="Accès réservé au support.")
+    return u
+
+
+@app_local.get("/studio/support/captures")
+def studio_support_captures(
+    request: Request,
+    route: Optional[str] = None,
+    ref: Optional[str] = None,
+    limit: int = 50,
+    include_files: bool = False,
+):
+    """
+    Support : dernières soumissions de formulaires capturées (recueil, satisfaction, présence...).
+    """
+    _require_super_admin(request)
+    return {
+        "items": list_captures(route=route, ref=ref, limit=limit, include_files=include_files),
+        "stats": capture_stats(),
+    }
+
+
+@app_local.get("/studio/support/captures/{id_capture}")
+def studio_support_capture(id_capture: str, request: Request):
+    _require_super_admin(request)
+    item = get_capture(id_capture)
+    if not item:
+        raise HTTPException(status_code=404, detail="Capture introuvable.")
+    return item
+
+
+@app_local.get("/studio/support/slow-requests")
+def studio_support_slow_requests(request: Request, limit: int = 50):
+    """
+    Support : dernières requêtes lentes du process (durée, SQL, attente pool, requêtes SQL les plus coûteuses).
+    """
+    _require_super_admin(request)
+    return {"threshold_ms": METRICS_SLOW_REQUEST_MS, "items": recent_slow_requests(limit)}
+
+
+@app_local.get("/studio/support/sql-profiles")
+def studio_support_sql_profiles(request: Request, limit: int = 50):
+    """
+    Support : requêtes profilées (header X-Sql-Profile ou SQL_PROFILER_ENABLED), sans le détail SQL.
+    """
+    _require_super_admin(request)
+    return {"items": list_sql_profiles(limit)}
+
+
+@app_local.get("/studio/support/sql-profiles/{id_profile}")
+def studio_support_sql_profile(id_profile: str, request: Request):
+    _require_super_admin(request)
+    item = get_sql_profile(id_profile)
+    if not item:
+        raise HTTPException(status_code=404, detail="Profil SQL introuvable.")
+    return item
+
+
+@app_local.get("/studio/support/startup-report")
+def studio_support_startup_report(request: Request):
+    """
+    Support : mode de chargement des routers, coût d'import par module, imports différés, warm-up.
+    """
+    _require_super_admin(request)
+    return startup_report()
+
 # Injection routes auth
 for route in studio_portal_auth.router.routes:
     app_local.router.routes.append(route)
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, Request
 from psycopg.rows import dict_row
 import os
-import requests
 
 from app.routers.skills_portal_common import get_conn
+from app.services.http_client import integration_get
 
 router = APIRouter()
 
@@ -35,7 +35,7 @@ def _supabase_get_user_email(access_token: str) -> str:
     }
 
     try:
-        r = requests.get(url, headers=headers, timeout=15)
+        r = integration_get("supabase_auth", url, headers=headers)
         if r.status_code >= 400:
             raise HTTPException(status_code=401, detail="Token invalide.")
         js = r.json()
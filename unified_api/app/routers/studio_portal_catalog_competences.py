@@ -5,7 +5,6 @@ from psycopg.rows import dict_row
 import uuid
 import os
 import json
-import re
 
 from app.routers.skills_portal_common import get_conn
 from app.routers.studio_portal_common import (
@@ -13,11 +12,18 @@ from app.routers.studio_portal_common import (
     studio_fetch_owner,
     studio_require_min_role,
 )
+from app.services.cartographie_cache import (
+    KIND_OWNER,
+    CartographieModel,
+    get_cartographie,
+    invalidate_cartographie,
+)
+from app.services.code_sequence import COMPETENCE_CODES, allocate_codes, competence_code_prefix, peek_code
+from app.services.data_version import DOMAIN_COMPETENCES, bump_owner_data_version
+from app.services.startup import lazy_attr
 
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+# Dépendances lourdes (IA, parsing documents) : importées au premier usage
+OpenAI = lazy_attr("openai", "OpenAI")
 
 router = APIRouter()
 
@@ -110,54 +116,11 @@ def _competence_code_exists_owner(cur, oid: str, code: str, exclude_id: Optional
 
 
 def _next_comp_code(cur, oid: str) -> str:
-    # Sérialise les créations pour un owner (évite doublons).
-    # Le code est un repère humain, pas l'identifiant métier : on conserve
-    # les codes importés et on attribue ensuite le premier numéro disponible.
+    # Séquence par owner et préfixe (C / CO selon les codes existants) ;
+    # les codes importés sont conservés et sautés par la séquence.
     owner_id = (oid or "").strip()
-    lock_key = f"comp_code:{owner_id}"
-    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (lock_key,))
-
-    cur.execute(
-        """
-        SELECT upper(substring(code from '^(CO?)[0-9]{5}$')) AS prefix, COUNT(*) AS nb
-        FROM public.tbl_competence
-        WHERE id_owner = %s
-          AND upper(COALESCE(code, '')) ~ '^CO?[0-9]{5}$'
-        GROUP BY 1
-        ORDER BY COUNT(*) DESC,
-                 CASE WHEN upper(substring(code from '^(CO?)[0-9]{5}$')) = 'CO' THEN 0 ELSE 1 END
-        LIMIT 1
-        """,
-        (owner_id,),
-    )
-    row = cur.fetchone() or {}
-    prefix = (row.get("prefix") or "CO").strip().upper() or "CO"
-    if prefix not in ("C", "CO"):
-        prefix = "CO"
-
-    cur.execute(
-        """
-        SELECT code
-        FROM public.tbl_competence
-        WHERE id_owner = %s
-          AND upper(COALESCE(code, '')) ~ %s
-        """,
-        (owner_id, f"^{prefix}[0-9]{{5}}$"),
-    )
-    rows = cur.fetchall() or []
-
-    used = set()
-    rx = re.compile(rf"^{re.escape(prefix)}([0-9]{{5}})$", re.I)
-    for r in rows:
-        m = rx.match(str((r.get("code") or "")).strip())
-        if m:
-            used.add(int(m.group(1)))
-
-    for nxt in range(1, 100000):
-        if nxt not in used:
-            return f"{prefix}{nxt:05d}"
-
-    raise HTTPException(status_code=400, detail=f"Limite de numérotation atteinte ({prefix}99999).")
+    prefix = competence_code_prefix(cur, owner_id)
+    return allocate_codes(cur, COMPETENCE_CODES, (owner_id,), prefix=prefix)[0]
 
 def _level_score(txt: Optional[str]) -> int:
     t = (txt or "").lower()
@@ -235,7 +198,7 @@ def studio_catalog_ai_draft_competence(id_owner: str, payload: AiDraftCompetence
     u = studio_require_user(auth)
 
     try:
-        if OpenAI is None:
+        if not OpenAI:
             raise HTTPException(status_code=500, detail="Lib OpenAI manquante (pip install openai).")
 
         objectif = (payload.objectif or "").strip()
@@ -590,6 +553,12 @@ def studio_catalog_list_competences(
         raise HTTPException(status_code=500, detail=f"studio/catalog/competences list error: {e}")
 
 
+def _domaine_visible(model: CartographieModel, did: str) -> Dict[str, Any]:
+    # Domaine masqué : la colonne reste, sans libellé ni couleur
+    d = model.domaines.get(did) or {}
+    return {} if d.get("masque") else d
+
+
 @router.get("/studio/catalog/competences/{id_owner}/cartographie")
 def studio_catalog_competences_cartographie(id_owner: str, request: Request):
     auth = request.headers.get("Authorization", "")
@@ -602,124 +571,38 @@ def studio_catalog_competences_cartographie(id_owner: str, request: Request):
                 studio_fetch_owner(cur, oid)
                 studio_require_min_role(cur, u, oid, "supervisor")
 
-                cur.execute(
-                    """
-                    SELECT
-                      fp.id_poste,
-                      fp.codif_poste,
-                      fp.codif_client,
-                      fp.intitule_poste,
-                      fp.id_service,
-                      o.nom_service
-                    FROM public.tbl_fiche_poste fp
-                    LEFT JOIN public.tbl_entreprise_organigramme o
-                      ON o.id_ent = fp.id_ent
-                     AND o.id_service = fp.id_service
-                     AND COALESCE(o.archive, FALSE) = FALSE
-                    WHERE fp.id_owner = %s
-                      AND COALESCE(fp.actif, TRUE) = TRUE
-                    ORDER BY lower(COALESCE(fp.codif_client, fp.codif_poste, '')), lower(fp.intitule_poste)
-                    """,
-                    (oid,),
-                )
-                postes_rows = cur.fetchall() or []
+                model = get_cartographie(cur, KIND_OWNER, oid)
 
-                cur.execute(
-                    """
-                    SELECT
-                      fp.id_poste,
-                      c.domaine AS id_domaine_competence,
-                      COUNT(DISTINCT c.id_comp)::int AS nb_competences,
-                      d.titre,
-                      d.titre_court,
-                      d.ordre_affichage,
-                      d.couleur
-                    FROM public.tbl_fiche_poste fp
-                    JOIN public.tbl_fiche_poste_competence fpc
-                      ON fpc.id_poste = fp.id_poste
-                     AND COALESCE(fpc.masque, FALSE) = FALSE
-                    JOIN public.tbl_competence c
-                      ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
-                     AND c.id_owner = %s
-                    LEFT JOIN public.tbl_domaine_competence d
-                      ON d.id_domaine_competence = c.domaine
-                     AND COALESCE(d.masque, FALSE) = FALSE
-                    WHERE fp.id_owner = %s
-                      AND COALESCE(fp.actif, TRUE) = TRUE
-                      AND NULLIF(BTRIM(COALESCE(c.domaine, '')), '') IS NOT NULL
-                    GROUP BY
-                      fp.id_poste,
-                      c.domaine,
-                      d.titre,
-                      d.titre_court,
-                      d.ordre_affichage,
-                      d.couleur
-                    """,
-                    (oid, oid),
-                )
-                matrix_rows = cur.fetchall() or []
-
-                cur.execute(
-                    """
-                    SELECT
-                      fp.id_poste,
-                      c.domaine AS id_domaine_competence,
-                      c.id_comp,
-                      c.code,
-                      c.intitule,
-                      c.etat,
-                      COALESCE(c.masque, FALSE) AS masque,
-                      fpc.niveau_requis,
-                      d.titre AS domaine_titre,
-                      d.titre_court AS domaine_titre_court,
-                      d.couleur AS domaine_couleur
-                    FROM public.tbl_fiche_poste fp
-                    JOIN public.tbl_fiche_poste_competence fpc
-                      ON fpc.id_poste = fp.id_poste
-                     AND COALESCE(fpc.masque, FALSE) = FALSE
-                    JOIN public.tbl_competence c
-                      ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
-                     AND c.id_owner = %s
-                    LEFT JOIN public.tbl_domaine_competence d
-                      ON d.id_domaine_competence = c.domaine
-                     AND COALESCE(d.masque, FALSE) = FALSE
-                    WHERE fp.id_owner = %s
-                      AND COALESCE(fp.actif, TRUE) = TRUE
-                      AND NULLIF(BTRIM(COALESCE(c.domaine, '')), '') IS NOT NULL
-                    ORDER BY lower(COALESCE(c.code, '')), lower(COALESCE(c.intitule, ''))
-                    """,
-                    (oid, oid),
-                )
-                link_rows = cur.fetchall() or []
+        # Matrice, totaux et liens calculés depuis le modèle en mémoire (liens poste-compétence non masqués)
+        cells = model.cell_competences("studio", lambda link: not link["fpc_masque"])
 
         domaines_map: Dict[str, Dict[str, Any]] = {}
         tot_poste: Dict[str, int] = {}
         tot_dom: Dict[str, int] = {}
         matrix: List[Dict[str, Any]] = []
 
-        for r in matrix_rows:
-            did = (r.get("id_domaine_competence") or "").strip()
-            pid = (r.get("id_poste") or "").strip()
-            if not did or not pid:
-                continue
-
+        for (pid, did), comps in cells.items():
             if did not in domaines_map:
+                d = _domaine_visible(model, did)
                 domaines_map[did] = {
                     "id_domaine_competence": did,
-                    "titre": r.get("titre"),
-                    "titre_court": r.get("titre_court"),
-                    "ordre_affichage": r.get("ordre_affichage"),
-                    "couleur": r.get("couleur"),
+                    "titre": d.get("titre"),
+                    "titre_court": d.get("titre_court"),
+                    "ordre_affichage": d.get("ordre_affichage"),
+                    "couleur": d.get("couleur"),
                 }
 
-            nb = int(r.get("nb_competences") or 0)
+            nb = len(comps)
             matrix.append({"id_poste": pid, "id_domaine_competence": did, "nb_competences": nb})
             tot_poste[pid] = int(tot_poste.get(pid, 0)) + nb
             tot_dom[did] = int(tot_dom.get(did, 0)) + nb
 
         postes = []
-        for r in postes_rows:
-            pid = (r.get("id_poste") or "").strip()
+        for r in sorted(
+            model.postes,
+            key=lambda p: ((p.get("codif_client") or p.get("codif_poste") or "").lower(), (p.get("intitule_poste") or "").lower()),
+        ):
+            pid = r["id_poste"]
             postes.append(
                 {
                     "id_poste": pid,
@@ -741,20 +624,23 @@ def studio_catalog_competences_cartographie(id_owner: str, request: Request):
         )
 
         links = []
-        for r in link_rows:
+        for r in model.links:
+            if r["fpc_masque"] or not r["domaine"] or r["id_poste"] not in model.poste_index:
+                continue
+            d = _domaine_visible(model, r["domaine"])
             links.append(
                 {
                     "id_poste": r.get("id_poste"),
-                    "id_domaine_competence": r.get("id_domaine_competence"),
+                    "id_domaine_competence": r.get("domaine"),
                     "id_comp": r.get("id_comp"),
                     "code": r.get("code"),
                     "intitule": r.get("intitule"),
                     "etat": r.get("etat"),
                     "masque": bool(r.get("masque")),
                     "niveau_requis": r.get("niveau_requis"),
-                    "domaine_titre": r.get("domaine_titre"),
-                    "domaine_titre_court": r.get("domaine_titre_court"),
-                    "domaine_couleur": r.get("domaine_couleur"),
+                    "domaine_titre": d.get("titre"),
+                    "domaine_titre_court": d.get("titre_court"),
+                    "domaine_couleur": d.get("couleur"),
                 }
             )
 
@@ -793,7 +679,8 @@ def studio_catalog_next_competence_code(id_owner: str, request: Request, prefix:
                 studio_fetch_owner(cur, oid)
                 studio_require_min_role(cur, u, oid, "supervisor")
 
-                code = _next_comp_code(cur, oid)
+                # Aperçu : le numéro est réservé à la création
+                code = peek_code(cur, COMPETENCE_CODES, (oid,), prefix=competence_code_prefix(cur, oid))
 
         return {"code": code}
 
@@ -925,6 +812,8 @@ def studio_catalog_create_competence(id_owner: str, payload: CreateCompetencePay
                     ),
                 )
                 conn.commit()
+                invalidate_cartographie(oid)
+                bump_owner_data_version(cur, oid, domains=(DOMAIN_COMPETENCES,))
 
         return {"id_comp": cid, "code": code}
 
@@ -1015,6 +904,8 @@ def studio_catalog_update_competence(id_owner: str, id_comp: str, payload: Updat
                         tuple(vals),
                     )
                     conn.commit()
+                    invalidate_cartographie(oid)
+                    bump_owner_data_version(cur, oid, domains=(DOMAIN_COMPETENCES,))
 
         return {"ok": True}
 
@@ -1051,6 +942,8 @@ def studio_catalog_archive_competence(id_owner: str, id_comp: str, request: Requ
                     (cid, oid),
                 )
                 conn.commit()
+                invalidate_cartographie(oid)
+                bump_owner_data_version(cur, oid, domains=(DOMAIN_COMPETENCES,))
 
         return {"ok": True}
 
@@ -10,6 +10,9 @@ from app.routers.studio_portal_common import (
     studio_fetch_owner,
     studio_require_min_role,
 )
+from app.services.cartographie_cache import invalidate_cartographie
+from app.services.code_sequence import POSTE_CODES, allocate_codes, peek_code
+from app.services.data_version import DOMAIN_POSTES, bump_owner_data_version
 
 router = APIRouter()
 
@@ -62,30 +65,8 @@ def _safe_show(v: str) -> str:
     return s
 
 def _next_pt_code(cur, oid: str, id_ent: str) -> str:
-    # Sérialise les créations pour une entreprise (évite doublons)
-    lock_key = f"poste_code:{oid}:{id_ent}"
-    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (lock_key,))
-
-    cur.execute(
-        """
-        SELECT COALESCE(
-          MAX( (regexp_match(p.codif_poste, '^PT([0-9]{4})$'))[1]::int ),
-          0
-        ) AS max_n
-        FROM public.tbl_fiche_poste p
-        WHERE p.id_owner = %s
-          AND p.id_ent = %s
-          AND p.codif_poste ~ '^PT[0-9]{4}$'
-        """,
-        (oid, id_ent),
-    )
-    r = cur.fetchone() or {}
-    max_n_raw = r.get("max_n")
-    max_n = int(max_n_raw) if max_n_raw is not None else 0
-    nxt = max_n + 1
-    if nxt > 9999:
-        raise HTTPException(status_code=400, detail="Limite de numérotation atteinte (PT9999) pour cette entreprise.")
-    return f"PT{nxt:04d}"
+    # Séquence par entreprise (réservation atomique, sans doublon)
+    return allocate_codes(cur, POSTE_CODES, (oid, id_ent))[0]
 
 # ------------------------------------------------------
 # Models
@@ -220,7 +201,8 @@ def studio_catalog_next_code(id_owner: str, request: Request):
                 studio_require_min_role(cur, u, oid, "supervisor")
 
                 # V1: création “Mon entreprise” uniquement => id_ent = oid
-                code = _next_pt_code(cur, oid, oid)
+                # Aperçu : le numéro est réservé à la création
+                code = peek_code(cur, POSTE_CODES, (oid, oid))
         return {"codif_poste": code}
 
     except HTTPException:
@@ -263,6 +245,8 @@ def studio_catalog_create_poste(id_owner: str, payload: CreatePostePayload, requ
                     (pid, oid, oid, cod, cod_cli, title),
                 )
                 conn.commit()
+                invalidate_cartographie(oid, oid)
+                bump_owner_data_version(cur, oid, domains=(DOMAIN_POSTES,))
 
         return {"id_poste": pid, "codif_poste": cod}
 
@@ -337,6 +321,8 @@ def studio_catalog_update_poste(id_owner: str, id_poste: str, payload: UpdatePos
                         tuple(vals),
                     )
                     conn.commit()
+                    invalidate_cartographie(oid)
+                    bump_owner_data_version(cur, oid, domains=(DOMAIN_POSTES,))
 
         return {"ok": True}
 
@@ -373,6 +359,8 @@ def studio_catalog_archive_poste(id_owner: str, id_poste: str, request: Request)
                     (pid, oid),
                 )
                 conn.commit()
+                invalidate_cartographie(oid)
+                bump_owner_data_version(cur, oid, domains=(DOMAIN_POSTES,))
 
         return {"ok": True}
 
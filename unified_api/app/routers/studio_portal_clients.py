@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response, Query
 from pydantic import BaseModel
 from psycopg.rows import dict_row
 from psycopg.types.json import Json
@@ -14,6 +14,18 @@ from datetime import date
 from app.routers.skills_portal_common import get_conn
 from app.routers.studio_portal_common import studio_require_user, studio_fetch_owner, studio_require_min_role, studio_fetch_role_code
 from app.services.skills_analyse_engine import _fetch_service_label
+from app.services.pagination import (
+    PAGE_SIZE_MAX,
+    apply_page_headers,
+    is_ndjson_format,
+    iter_server_cursor,
+    keyset_order_by,
+    keyset_select,
+    keyset_where,
+    ndjson_response,
+    page_finish,
+    page_request,
+)
 from app.routers.skills_portal_dashboard import (
     DashboardAccess,
     DashboardRiskOverview,
@@ -21,6 +33,9 @@ from app.routers.skills_portal_dashboard import (
     build_dashboard_risk_overview_for_scope,
     _service_options,
 )
+from app.services.cartographie_cache import invalidate_cartographie
+from app.services.fast_json import fast_json_response
+from app.services.schema_catalog import column_exists
 
 router = APIRouter()
 
@@ -552,18 +567,7 @@ def _quota_when_active(value: Any, active: bool, minimum: Any = 0) -> int:
 
 
 def _table_has_column(cur, table_name: str, column_name: str) -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-          AND table_name = %s
-          AND column_name = %s
-        LIMIT 1
-        """,
-        (table_name, column_name),
-    )
-    return cur.fetchone() is not None
+    return column_exists(cur, table_name, column_name)
 
 
 def _normalize_extension_console(value: Any) -> str:
@@ -1452,75 +1456,119 @@ def _fetch_clients_summary(cur, id_owner: str) -> dict:
     }
 
 
+_CLIENTS_LIST_SORT_KEYS = [
+    ("COALESCE(lower(e.nom_ent), '')", "asc"),
+    ("e.id_ent", "asc"),
+]
+
+_CLIENTS_LIST_SELECT = """
+    e.id_ent,
+    e.nom_ent,
+    e.cp_ent,
+    e.ville_ent,
+    e.pays_ent,
+    e.email_ent,
+    e.telephone_ent,
+    e.site_web,
+    e.nom_groupe,
+    e.type_groupe,
+    e.group_ok,
+    e.tete_groupe,
+    e.profil_structurel,
+    EXISTS (
+        SELECT 1
+        FROM public.tbl_novoskill_owner o
+        WHERE o.id_owner = e.id_ent
+          AND COALESCE(o.archive, FALSE) = FALSE
+    ) AS has_owner_scope,
+    COALESCE((
+        SELECT oc.studio_actif
+        FROM public.tbl_novoskill_owner_commercial oc
+        WHERE oc.id_owner = e.id_ent
+          AND COALESCE(oc.archive, FALSE) = FALSE
+        LIMIT 1
+    ), FALSE) AS studio_actif,
+    COALESCE((
+        SELECT oc.gestion_acces_studio_autorisee
+        FROM public.tbl_novoskill_owner_commercial oc
+        WHERE oc.id_owner = e.id_ent
+          AND COALESCE(oc.archive, FALSE) = FALSE
+        LIMIT 1
+    ), FALSE) AS gestion_acces_studio_autorisee
+"""
+
+_CLIENTS_LIST_FROM_WHERE = """
+    FROM public.tbl_entreprise e
+    WHERE e.id_owner_gestionnaire = %s
+      AND e.type_entreprise = 'Client'
+      AND COALESCE(e.masque, FALSE) = FALSE
+"""
+
+
+def _clients_list_item(r: dict) -> dict:
+    return {
+        "id_ent": r.get("id_ent"),
+        "nom_ent": r.get("nom_ent"),
+        "cp_ent": r.get("cp_ent"),
+        "ville_ent": r.get("ville_ent"),
+        "pays_ent": r.get("pays_ent"),
+        "email_ent": r.get("email_ent"),
+        "telephone_ent": r.get("telephone_ent"),
+        "site_web": r.get("site_web"),
+        "nom_groupe": r.get("nom_groupe"),
+        "type_groupe": r.get("type_groupe"),
+        "group_ok": bool(r.get("group_ok")),
+        "tete_groupe": bool(r.get("tete_groupe")),
+        "profil_structurel": r.get("profil_structurel"),
+        "has_owner_scope": bool(r.get("has_owner_scope")),
+        "studio_actif": bool(r.get("studio_actif")),
+        "gestion_acces_studio_autorisee": bool(r.get("gestion_acces_studio_autorisee")),
+    }
+
+
 def _fetch_clients_list(cur, id_owner: str) -> list:
     cur.execute(
-        """
-        SELECT
-            e.id_ent,
-            e.nom_ent,
-            e.cp_ent,
-            e.ville_ent,
-            e.pays_ent,
-            e.email_ent,
-            e.telephone_ent,
-            e.site_web,
-            e.nom_groupe,
-            e.type_groupe,
-            e.group_ok,
-            e.tete_groupe,
-            e.profil_structurel,
-            EXISTS (
-                SELECT 1
-                FROM public.tbl_novoskill_owner o
-                WHERE o.id_owner = e.id_ent
-                  AND COALESCE(o.archive, FALSE) = FALSE
-            ) AS has_owner_scope,
-            COALESCE((
-                SELECT oc.studio_actif
-                FROM public.tbl_novoskill_owner_commercial oc
-                WHERE oc.id_owner = e.id_ent
-                  AND COALESCE(oc.archive, FALSE) = FALSE
-                LIMIT 1
-            ), FALSE) AS studio_actif,
-            COALESCE((
-                SELECT oc.gestion_acces_studio_autorisee
-                FROM public.tbl_novoskill_owner_commercial oc
-                WHERE oc.id_owner = e.id_ent
-                  AND COALESCE(oc.archive, FALSE) = FALSE
-                LIMIT 1
-            ), FALSE) AS gestion_acces_studio_autorisee
-        FROM public.tbl_entreprise e
-        WHERE e.id_owner_gestionnaire = %s
-          AND e.type_entreprise = 'Client'
-          AND COALESCE(e.masque, FALSE) = FALSE
-        ORDER BY lower(e.nom_ent), e.id_ent
+        f"""
+        SELECT {_CLIENTS_LIST_SELECT}
+        {_CLIENTS_LIST_FROM_WHERE}
+        ORDER BY {keyset_order_by(_CLIENTS_LIST_SORT_KEYS)}
         """,
         (id_owner,),
     )
-    rows = cur.fetchall() or []
-    out = []
-    for r in rows:
-        out.append(
-            {
-                "id_ent": r.get("id_ent"),
-                "nom_ent": r.get("nom_ent"),
-                "cp_ent": r.get("cp_ent"),
-                "ville_ent": r.get("ville_ent"),
-                "pays_ent": r.get("pays_ent"),
-                "email_ent": r.get("email_ent"),
-                "telephone_ent": r.get("telephone_ent"),
-                "site_web": r.get("site_web"),
-                "nom_groupe": r.get("nom_groupe"),
-                "type_groupe": r.get("type_groupe"),
-                "group_ok": bool(r.get("group_ok")),
-                "tete_groupe": bool(r.get("tete_groupe")),
-                "profil_structurel": r.get("profil_structurel"),
-                "has_owner_scope": bool(r.get("has_owner_scope")),
-                "studio_actif": bool(r.get("studio_actif")),
-                "gestion_acces_studio_autorisee": bool(r.get("gestion_acces_studio_autorisee")),
-            }
-        )
-    return out
+    return [_clients_list_item(r) for r in (cur.fetchall() or [])]
+
+
+def _fetch_clients_page(cur, id_owner: str, page_req: dict):
+    total = page_req.get("total")
+    if total is None:
+        cur.execute(f"SELECT COUNT(1) AS n {_CLIENTS_LIST_FROM_WHERE}", (id_owner,))
+        total = int((cur.fetchone() or {}).get("n") or 0)
+
+    after_sql, after_params = keyset_where(_CLIENTS_LIST_SORT_KEYS, page_req.get("after"))
+    cur.execute(
+        f"""
+        SELECT {_CLIENTS_LIST_SELECT}{keyset_select(_CLIENTS_LIST_SORT_KEYS)}
+        {_CLIENTS_LIST_FROM_WHERE}
+        {("AND " + after_sql) if after_sql else ""}
+        ORDER BY {keyset_order_by(_CLIENTS_LIST_SORT_KEYS)}
+        LIMIT %s
+        """,
+        tuple([id_owner] + after_params + [page_req["size"] + 1]),
+    )
+    rows, page = page_finish(cur.fetchall() or [], page_req, _CLIENTS_LIST_SORT_KEYS, total)
+    return [_clients_list_item(r) for r in rows], page
+
+
+def _stream_clients_list(id_owner: str):
+    sql = f"""
+        SELECT {_CLIENTS_LIST_SELECT}
+        {_CLIENTS_LIST_FROM_WHERE}
+        ORDER BY {keyset_order_by(_CLIENTS_LIST_SORT_KEYS)}
+    """
+    with get_conn() as conn:
+        for batch in iter_server_cursor(conn, sql, (id_owner,)):
+            for r in batch:
+                yield _clients_list_item(r)
 
 
 def _fetch_client_detail(cur, id_owner: str, id_ent: str) -> dict:
@@ -1653,7 +1701,14 @@ def _fetch_client_detail(cur, id_owner: str, id_ent: str) -> dict:
 
 
 @router.get("/studio/clients/{id_owner}")
-def get_studio_clients(id_owner: str, request: Request):
+def get_studio_clients(
+    id_owner: str,
+    request: Request,
+    response: Response,
+    page_size: Optional[int] = Query(default=None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
+    fmt: str = Query(default="json", alias="format"),
+):
     auth = request.headers.get("Authorization", "")
     u = studio_require_user(auth)
 
@@ -1664,6 +1719,20 @@ def get_studio_clients(id_owner: str, request: Request):
                 studio_fetch_owner(cur, oid)
                 studio_require_min_role(cur, u, oid, "supervisor")
 
+                if is_ndjson_format(fmt):
+                    return ndjson_response(_stream_clients_list(oid), filename=f"clients_{oid}.ndjson")
+
+                page_req = page_request(page_size, cursor, ["studio_clients", oid])
+                if page_req is not None:
+                    items, page = _fetch_clients_page(cur, oid, page_req)
+                    apply_page_headers(response, page)
+                    return {
+                        "summary": _fetch_clients_summary(cur, oid),
+                        "owner_features": _fetch_owner_feature_flags(cur, oid),
+                        "items": items,
+                        "page": page,
+                    }
+
                 return {
                     "summary": _fetch_clients_summary(cur, oid),
                     "owner_features": _fetch_owner_feature_flags(cur, oid),
@@ -1924,6 +1993,8 @@ def upsert_studio_client_commercial(id_owner: str, id_ent: str, payload: Commerc
 
                 _sync_client_skills_eligibility(cur, id_ent)
                 conn.commit()
+                if referentiel_studio is not None:
+                    invalidate_cartographie(id_ent=id_ent)
 
                 detail = _fetch_client_commercial(cur, id_ent)
                 if referentiel_studio is not None:
@@ -2738,14 +2809,14 @@ def get_studio_client_dashboard_risk_overview(
                 )
                 services = _service_options(cur, id_ent, access, scope)
 
-                return build_dashboard_risk_overview_for_scope(
+                return fast_json_response(build_dashboard_risk_overview_for_scope(
                     cur,
                     id_ent=id_ent,
                     access=access,
                     scope=scope,
                     services=services,
                     criticite_min=criticite_min,
-                )
+                ))
     except HTTPException:
         raise
     except Exception as e:
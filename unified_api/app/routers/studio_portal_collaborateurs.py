@@ -1,12 +1,12 @@
-from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Response
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Response, Query
 from pydantic import BaseModel
 from typing import Optional, List, Any
 from psycopg.rows import dict_row
 import os
 import secrets
 import uuid
-import requests
 import json
+import hashlib
 import re
 from datetime import date as py_date, timedelta
 from io import BytesIO
@@ -34,6 +34,25 @@ from app.routers.studio_portal_common import (
     studio_fetch_owner,
     studio_require_min_role,
 )
+from app.routers.studio_portal_dashboard import studio_dashboard_cache_invalidate
+from app.services.background_jobs import get_job, start_job
+from app.services.bulk_write import execute_unnest
+from app.services.calendar_suggestion_store import invalidate_calendar_suggestions
+from app.services.fast_json import fast_json_response
+from app.services.http_client import integration_request
+from app.services.pagination import (
+    PAGE_SIZE_MAX,
+    apply_page_headers,
+    is_ndjson_format,
+    iter_server_cursor,
+    keyset_order_by,
+    keyset_select,
+    keyset_where,
+    ndjson_response,
+    page_finish,
+    page_request,
+)
+from app.services.schema_catalog import table_columns
 
 router = APIRouter()
 
@@ -624,13 +643,13 @@ def _supabase_admin_request(
     url = f"{STUDIO_SUPABASE_URL.rstrip('/')}{path}"
 
     try:
-        r = requests.request(
-            method=method.upper(),
-            url=url,
+        r = integration_request(
+            "supabase_admin",
+            method.upper(),
+            url,
             headers=_supabase_admin_headers(),
             params=params,
             json=payload,
-            timeout=20,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur Supabase Admin: {e}")
@@ -1826,15 +1845,7 @@ def _load_domaine_competence_map(cur, ids: list) -> dict:
     if not ids:
         return {}
 
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-          AND table_name = 'tbl_domaine_competence'
-        """
-    )
-    cols = {r["column_name"] for r in (cur.fetchall() or [])}
+    cols = table_columns(cur, "tbl_domaine_competence")
     if not cols:
         return {}
 
@@ -2286,6 +2297,11 @@ class CollaborateurPayload(BaseModel):
 class SyncPosteCompetencesPayload(BaseModel):
     id_poste_actuel: Optional[str] = None
 
+class SyncPostesBulkPayload(BaseModel):
+    id_postes: Optional[List[str]] = None
+    competences: Optional[bool] = True
+    certifications: Optional[bool] = True
+
 class CollaborateurCompetenceRemovePayload(BaseModel):
     id_comp: Optional[str] = None
 
@@ -2365,19 +2381,7 @@ def _normalize_skill_level_from_poste(value: Optional[str]) -> str:
 
 
 def _get_effectif_competence_columns(cur) -> set:
-    cur.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-          AND table_name = 'tbl_effectif_client_competence'
-        """
-    )
-    return {
-        (r.get("column_name") or "").strip()
-        for r in (cur.fetchall() or [])
-        if (r.get("column_name") or "").strip()
-    }
+    return table_columns(cur, "tbl_effectif_client_competence")
 
 
 def _insert_effectif_competence_row(cur, id_effectif_client: str, id_comp: str, niveau_actuel: str) -> str:
@@ -2592,6 +2596,267 @@ def _upsert_effectif_competence_without_audit(
         "niveau_actuel": niveau_norm,
     }
 
+def _bulk_upsert_effectif_competence_pairs_without_audit(cur, pairs: List[tuple]) -> List[dict]:
+    """
+    Version ensembliste de _upsert_effectif_competence_without_audit.
+    pairs = [(id_effectif_client, id_comp, niveau_actuel)] ; un résultat par couple (même format
+    + id_effectif_client / id_comp), dans l'ordre. 3 requêtes au plus par lot (lecture de l'existant,
+    réactivations, insertions), quel que soit le nombre de couples.
+    """
+    cols = _get_effectif_competence_columns(cur)
+
+    wanted: List[tuple] = []
+    seen = set()
+    for id_effectif_client, id_comp, niveau in pairs or []:
+        eid = _norm_text(id_effectif_client)
+        cid = _norm_text(id_comp)
+        if not eid or not cid or (eid, cid) in seen:
+            continue
+        seen.add((eid, cid))
+        wanted.append((eid, cid, _normalize_skill_level_from_poste(niveau) if _norm_text(niveau) else None))
+    if not wanted:
+        return []
+
+    archive_expr = "COALESCE(ecc.archive, FALSE)" if "archive" in cols else "FALSE"
+    actif_expr = "COALESCE(ecc.actif, TRUE)" if "actif" in cols else "TRUE"
+    order_expr = "COALESCE(ecc.dernier_update, NOW()) DESC" if "dernier_update" in cols else "ecc.id_effectif_competence DESC"
+
+    cur.execute(
+        f"""
+        SELECT DISTINCT ON (ecc.id_effectif_client, ecc.id_comp)
+          ecc.id_effectif_client,
+          ecc.id_comp,
+          ecc.id_effectif_competence,
+          {archive_expr} AS archive_row,
+          {actif_expr} AS actif_row,
+          COALESCE(ecc.niveau_actuel, '') AS niveau_actuel_row
+        FROM public.tbl_effectif_client_competence ecc
+        WHERE ecc.id_effectif_client = ANY(%s)
+          AND ecc.id_comp = ANY(%s)
+        ORDER BY
+          ecc.id_effectif_client,
+          ecc.id_comp,
+          {archive_expr} ASC,
+          {actif_expr} DESC,
+          {order_expr}
+        """,
+        (sorted({e for e, _, _ in wanted}), sorted({c for _, c, _ in wanted})),
+    )
+    existing_by_pair = {
+        ((r.get("id_effectif_client") or "").strip(), (r.get("id_comp") or "").strip()): r
+        for r in (cur.fetchall() or [])
+    }
+
+    results: List[dict] = []
+    to_reactivate: List[tuple] = []
+    to_insert: List[tuple] = []
+
+    for eid, cid, niveau_norm in wanted:
+        existing = existing_by_pair.get((eid, cid)) or {}
+        existing_id = (existing.get("id_effectif_competence") or "").strip()
+        base = {"id_effectif_client": eid, "id_comp": cid}
+
+        if existing_id and not bool(existing.get("archive_row")) and bool(existing.get("actif_row")):
+            results.append({
+                **base,
+                "id_effectif_competence": existing_id,
+                "action": "existing",
+                "already_exists": True,
+                "niveau_actuel": (existing.get("niveau_actuel_row") or "").strip() or niveau_norm,
+            })
+        elif existing_id:
+            to_reactivate.append((existing_id, niveau_norm))
+            results.append({
+                **base,
+                "id_effectif_competence": existing_id,
+                "action": "reactivated",
+                "already_exists": False,
+                "niveau_actuel": niveau_norm,
+            })
+        else:
+            row_id = str(uuid.uuid4())
+            to_insert.append((row_id, eid, cid, niveau_norm))
+            results.append({
+                **base,
+                "id_effectif_competence": row_id,
+                "action": "inserted",
+                "already_exists": False,
+                "niveau_actuel": niveau_norm,
+            })
+
+    if to_reactivate:
+        set_parts = []
+        if "niveau_actuel" in cols:
+            set_parts.append("niveau_actuel = u.niveau_actuel")
+        if "id_dernier_audit" in cols:
+            set_parts.append("id_dernier_audit = NULL")
+        if "actif" in cols:
+            set_parts.append("actif = TRUE")
+        if "archive" in cols:
+            set_parts.append("archive = FALSE")
+        if "date_derniere_eval" in cols:
+            set_parts.append("date_derniere_eval = NULL")
+        if "dernier_update" in cols:
+            set_parts.append("dernier_update = NOW()")
+
+        if set_parts:
+            execute_unnest(
+                cur,
+                f"""
+                UPDATE public.tbl_effectif_client_competence ecc
+                SET {", ".join(set_parts)}
+                FROM UNNEST(%s::text[], %s::text[]) AS u(id_effectif_competence, niveau_actuel)
+                WHERE ecc.id_effectif_competence = u.id_effectif_competence
+                """,
+                to_reactivate,
+            )
+
+    if to_insert:
+        required = ("id_effectif_competence", "id_effectif_client", "id_comp", "id_dernier_audit")
+        missing = [c for c in required if c not in cols]
+        if missing:
+            raise HTTPException(
+                status_code=500,
+                detail="tbl_effectif_client_competence incomplète : " + ", ".join(missing),
+            )
+
+        insert_cols = ["id_effectif_competence", "id_effectif_client", "id_comp", "id_dernier_audit"]
+        select_exprs = ["u.id_effectif_competence", "u.id_effectif_client", "u.id_comp", "NULL"]
+
+        def add_sql(col: str, expr: str):
+            if col in cols:
+                insert_cols.append(col)
+                select_exprs.append(expr)
+
+        add_sql("niveau_actuel", "u.niveau_actuel")
+        add_sql("actif", "TRUE")
+        add_sql("archive", "FALSE")
+        add_sql("date_derniere_eval", "NULL")
+        add_sql("date_creation", "CURRENT_DATE")
+        add_sql("dernier_update", "NOW()")
+
+        execute_unnest(
+            cur,
+            f"""
+            INSERT INTO public.tbl_effectif_client_competence (
+              {", ".join(insert_cols)}
+            )
+            SELECT {", ".join(select_exprs)}
+            FROM UNNEST(%s::text[], %s::text[], %s::text[], %s::text[])
+              AS u(id_effectif_competence, id_effectif_client, id_comp, niveau_actuel)
+            """,
+            to_insert,
+        )
+
+    return results
+
+def _bulk_upsert_effectif_competences_without_audit(
+    cur,
+    id_effectif_client: str,
+    items: List[tuple],
+) -> List[dict]:
+    """
+    items = [(id_comp, niveau_actuel)] pour un salarié.
+    """
+    return _bulk_upsert_effectif_competence_pairs_without_audit(
+        cur,
+        [(id_effectif_client, id_comp, niveau) for id_comp, niveau in (items or [])],
+    )
+
+def _bulk_insert_missing_effectif_certifications(cur, pairs: List[tuple]) -> List[dict]:
+    """
+    pairs = [(id_effectif, id_certification)] : insère en une requête (par lot) les certifications
+    'a_obtenir' absentes. Retourne les couples effectivement insérés.
+    """
+    wanted: List[tuple] = []
+    seen = set()
+    for id_effectif, id_certification in pairs or []:
+        eid = _norm_text(id_effectif)
+        cert_id = _norm_text(id_certification)
+        if not eid or not cert_id or (eid, cert_id) in seen:
+            continue
+        seen.add((eid, cert_id))
+        wanted.append((str(uuid.uuid4()), eid, cert_id))
+    if not wanted:
+        return []
+
+    return execute_unnest(
+        cur,
+        """
+        INSERT INTO public.tbl_effectif_client_certification (
+          id_effectif_certification,
+          id_effectif,
+          id_certification,
+          date_obtention,
+          date_expiration,
+          organisme,
+          reference,
+          commentaire,
+          id_preuve_doc,
+          etat,
+          archive,
+          date_creation,
+          date_maj
+        )
+        SELECT
+          u.id_effectif_certification, u.id_effectif, u.id_certification,
+          NULL, NULL, NULL, NULL, NULL, NULL, 'a_obtenir', FALSE, CURRENT_DATE, NOW()
+        FROM UNNEST(%s::text[], %s::text[], %s::text[]) AS u(id_effectif_certification, id_effectif, id_certification)
+        WHERE NOT EXISTS (
+          SELECT 1
+          FROM public.tbl_effectif_client_certification ec
+          WHERE ec.id_effectif = u.id_effectif
+            AND ec.id_certification = u.id_certification
+            AND COALESCE(ec.archive, FALSE) = FALSE
+        )
+        RETURNING id_effectif, id_certification
+        """,
+        wanted,
+        fetch=True,
+    )
+
+def _fetch_poste_required_competences(cur, id_poste: str) -> List[dict]:
+    cur.execute(
+        """
+        SELECT
+          fpc.id_competence AS id_comp,
+          fpc.niveau_requis
+        FROM public.tbl_fiche_poste_competence fpc
+        JOIN public.tbl_competence c
+          ON c.id_comp = fpc.id_competence
+         AND COALESCE(c.masque, FALSE) = FALSE
+         AND COALESCE(c.etat, 'active') IN ('active', 'valide', 'à valider')
+        WHERE fpc.id_poste = %s
+          AND COALESCE(fpc.masque, FALSE) = FALSE
+        ORDER BY COALESCE(fpc.poids_criticite, 0) DESC, c.intitule
+        """,
+        (id_poste,),
+    )
+    return cur.fetchall() or []
+
+def _fetch_poste_required_certifications(cur, id_poste: str) -> List[str]:
+    cur.execute(
+        """
+        SELECT
+          fpc.id_certification
+        FROM public.tbl_fiche_poste_certification fpc
+        JOIN public.tbl_certification c
+          ON c.id_certification = fpc.id_certification
+         AND COALESCE(c.masque, FALSE) = FALSE
+        WHERE fpc.id_poste = %s
+        ORDER BY lower(COALESCE(c.categorie, '')), lower(COALESCE(c.nom_certification, ''))
+        """,
+        (id_poste,),
+    )
+    # Une entrée par ligne du poste (doublons conservés pour les compteurs) :
+    # _bulk_insert_missing_effectif_certifications dédoublonne à l'insertion.
+    cert_ids: List[str] = []
+    for r in cur.fetchall() or []:
+        cert_id = (r.get("id_certification") or "").strip()
+        if cert_id:
+            cert_ids.append(cert_id)
+    return cert_ids
+
 def _set_effectif_competence_last_audit(cur, id_effectif_competence: str, id_audit_competence: str, niveau_actuel: str) -> None:
     cols = _get_effectif_competence_columns(cur)
 
@@ -3074,15 +3339,331 @@ def studio_collab_context(id_owner: str, request: Request):
 # ------------------------------------------------------
 # Liste
 # ------------------------------------------------------
+def _collab_list_query(src_kind: str, oid: str, scope_ent: str, qq: str, svc: str, pst: str, act: str, inc_arch: bool) -> dict:
+    """
+    Construit la requête de liste (SELECT / FROM+WHERE / clés de tri) partagée par
+    la réponse complète, la pagination par clé et l'export NDJSON.
+    """
+    if src_kind == "entreprise":
+        where = ["e.id_ent = %s"]
+        params = [scope_ent]
+
+        if not inc_arch:
+            where.append("COALESCE(e.archive, FALSE) = FALSE")
+
+        if svc not in ("", "__all__"):
+            if svc == "__none__":
+                where.append("e.id_service IS NULL")
+            else:
+                where.append("e.id_service = %s")
+                params.append(svc)
+
+        if pst not in ("", "__all__"):
+            if pst == "__none__":
+                where.append("e.id_poste_actuel IS NULL")
+            else:
+                where.append("e.id_poste_actuel = %s")
+                params.append(pst)
+
+        if act == "active":
+            where.append("COALESCE(e.statut_actif, TRUE) = TRUE")
+        elif act == "inactive":
+            where.append("COALESCE(e.statut_actif, TRUE) = FALSE")
+        elif act == "manager":
+            where.append("COALESCE(e.ismanager, FALSE) = TRUE")
+        elif act == "formateur":
+            where.append("COALESCE(e.isformateur, FALSE) = TRUE")
+
+        if qq:
+            like = f"%{qq}%"
+            where.append(
+                """
+                (
+                  e.nom_effectif ILIKE %s
+                  OR e.prenom_effectif ILIKE %s
+                  OR COALESCE(e.email_effectif,'') ILIKE %s
+                  OR COALESCE(e.code_effectif,'') ILIKE %s
+                  OR COALESCE(e.matricule_interne,'') ILIKE %s
+                )
+                """
+            )
+            params.extend([like, like, like, like, like])
+
+        return {
+            "select": """
+              e.id_effectif AS id_collaborateur,
+              e.prenom_effectif AS prenom,
+              e.nom_effectif AS nom,
+              e.civilite_effectif AS civilite,
+              e.email_effectif AS email,
+              e.telephone_effectif AS telephone,
+              e.telephone2_effectif AS telephone2,
+              e.id_service,
+              COALESCE(s.nom_service, '') AS nom_service,
+              e.id_poste_actuel,
+              COALESCE(p.intitule_poste, '') AS intitule_poste,
+              COALESCE(p.codif_client, p.codif_poste, '') AS code_poste,
+              COALESCE(e.statut_actif, TRUE) AS actif,
+              COALESCE(e.archive, FALSE) AS archive,
+              COALESCE(e.ismanager, FALSE) AS ismanager,
+              COALESCE(e.isformateur, FALSE) AS isformateur,
+              COALESCE(e.is_temp, FALSE) AS is_temp,
+              e.role_temp,
+              e.type_contrat,
+              e.matricule_interne,
+              e.code_effectif,
+              e.date_entree_entreprise_effectif AS date_entree,
+              e.date_sortie_prevue,
+              e.note_commentaire,
+              'effectif_client' AS source_row_kind
+            """,
+            "from_where": f"""
+            FROM public.tbl_effectif_client e
+            LEFT JOIN public.tbl_entreprise_organigramme s
+              ON s.id_ent = e.id_ent
+             AND s.id_service = e.id_service
+             AND COALESCE(s.archive, FALSE) = FALSE
+            LEFT JOIN public.tbl_fiche_poste p
+              ON p.id_owner = %s
+             AND p.id_ent = e.id_ent
+             AND p.id_poste = e.id_poste_actuel
+             AND COALESCE(p.actif, TRUE) = TRUE
+            WHERE {" AND ".join(where)}
+            """,
+            "params": [oid] + params,
+            "sort_keys": [
+                # Ordre historique lower(nom), lower(prenom), NULL en dernier : clés non nulles
+                # pour le keyset, l'indicateur IS NULL place les noms absents après les autres.
+                ("(e.nom_effectif IS NULL)", "asc"),
+                ("COALESCE(lower(e.nom_effectif), '')", "asc"),
+                ("(e.prenom_effectif IS NULL)", "asc"),
+                ("COALESCE(lower(e.prenom_effectif), '')", "asc"),
+                ("e.id_effectif", "asc"),
+            ],
+        }
+
+    where = ["1=1"]
+    params = []
+
+    if not inc_arch:
+        where.append("COALESCE(u.archive, FALSE) = FALSE")
+
+    if svc not in ("", "__all__"):
+        if svc == "__none__":
+            where.append("COALESCE(ec.id_service, p.id_service) IS NULL")
+        else:
+            where.append("COALESCE(ec.id_service, p.id_service) = %s")
+            params.append(svc)
+
+    if pst not in ("", "__all__"):
+        if pst == "__none__":
+            where.append("COALESCE(ec.id_poste_actuel, p.id_poste) IS NULL")
+        else:
+            where.append("COALESCE(ec.id_poste_actuel, p.id_poste) = %s")
+            params.append(pst)
+
+    if act == "active":
+        where.append("COALESCE(u.actif, TRUE) = TRUE")
+    elif act == "inactive":
+        where.append("COALESCE(u.actif, TRUE) = FALSE")
+    elif act == "manager":
+        where.append("COALESCE(ec.ismanager, FALSE) = TRUE")
+    elif act == "formateur":
+        where.append("COALESCE(ec.isformateur, FALSE) = TRUE")
+
+    if qq:
+        like = f"%{qq}%"
+        where.append(
+            """
+            (
+              u.ut_nom ILIKE %s
+              OR u.ut_prenom ILIKE %s
+              OR COALESCE(u.ut_mail,'') ILIKE %s
+              OR COALESCE(p.intitule_poste,'') ILIKE %s
+              OR COALESCE(p.codif_client, p.codif_poste, '') ILIKE %s
+              OR COALESCE(ec.code_effectif, '') ILIKE %s
+              OR COALESCE(ec.matricule_interne, '') ILIKE %s
+            )
+            """
+        )
+        params.extend([like, like, like, like, like, like, like])
+
+    return {
+        "select": """
+          u.id_utilisateur AS id_collaborateur,
+          u.ut_prenom AS prenom,
+          u.ut_nom AS nom,
+          u.ut_civilite AS civilite,
+          u.ut_mail AS email,
+          u.ut_tel AS telephone,
+          u.ut_tel2 AS telephone2,
+          u.ut_fonction AS fonction,
+          u.ut_adresse AS adresse,
+          u.ut_cp AS code_postal,
+          u.ut_ville AS ville,
+          u.ut_pays AS pays,
+          COALESCE(u.actif, TRUE) AS actif,
+          COALESCE(u.archive, FALSE) AS archive,
+          u.ut_obs AS observations,
+          COALESCE(ec.id_poste_actuel, p.id_poste) AS id_poste_actuel,
+          COALESCE(ec.id_service, p.id_service) AS id_service,
+          COALESCE(p.intitule_poste, '') AS intitule_poste,
+          COALESCE(p.codif_client, p.codif_poste, '') AS code_poste,
+          COALESCE(s.nom_service, '') AS nom_service,
+          COALESCE(ec.ismanager, FALSE) AS ismanager,
+          COALESCE(ec.isformateur, FALSE) AS isformateur,
+          COALESCE(ec.is_temp, FALSE) AS is_temp,
+          ec.role_temp,
+          ec.type_contrat,
+          ec.matricule_interne,
+          ec.code_effectif,
+          ec.date_entree_entreprise_effectif AS date_entree,
+          ec.date_sortie_prevue,
+          ec.note_commentaire,
+          'utilisateur' AS source_row_kind
+        """,
+        "from_where": f"""
+        FROM public.tbl_utilisateur u
+        LEFT JOIN public.tbl_effectif_client ec
+          ON ec.id_ent = %s
+         AND ec.id_effectif = u.id_utilisateur
+        LEFT JOIN public.tbl_fiche_poste p
+          ON p.id_poste = COALESCE(ec.id_poste_actuel, u.ut_fonction)
+         AND p.id_owner = %s
+         AND p.id_ent = %s
+         AND COALESCE(p.actif, TRUE) = TRUE
+        LEFT JOIN public.tbl_entreprise_organigramme s
+          ON s.id_service = COALESCE(ec.id_service, p.id_service)
+         AND s.id_ent = %s
+         AND COALESCE(s.archive, FALSE) = FALSE
+        WHERE {" AND ".join(where)}
+        """,
+        "params": [oid, oid, oid, oid] + params,
+        "sort_keys": [
+            # Ordre historique lower(nom), lower(prenom), NULL en dernier : clés non nulles
+            # pour le keyset, l'indicateur IS NULL place les noms absents après les autres.
+            ("(u.ut_nom IS NULL)", "asc"),
+            ("COALESCE(lower(u.ut_nom), '')", "asc"),
+            ("(u.ut_prenom IS NULL)", "asc"),
+            ("COALESCE(lower(u.ut_prenom), '')", "asc"),
+            ("u.id_utilisateur", "asc"),
+        ],
+    }
+
+
+def _collab_list_item(src_kind: str, r: dict) -> dict:
+    code_poste = (r.get("code_poste") or "").strip()
+    intitule_poste = (r.get("intitule_poste") or "").strip()
+    poste_label = (f"{code_poste} · {intitule_poste}" if code_poste else intitule_poste).strip()
+
+    if src_kind == "entreprise":
+        return {
+            "id_collaborateur": r.get("id_collaborateur"),
+            "source_kind": src_kind,
+            "source_row_kind": r.get("source_row_kind"),
+            "civilite": r.get("civilite"),
+            "prenom": r.get("prenom"),
+            "nom": r.get("nom"),
+            "email": r.get("email"),
+            "telephone": r.get("telephone"),
+            "telephone2": r.get("telephone2"),
+            "id_service": r.get("id_service"),
+            "nom_service": r.get("nom_service"),
+            "id_poste_actuel": r.get("id_poste_actuel"),
+            "poste_label": poste_label,
+            "type_contrat": r.get("type_contrat"),
+            "matricule_interne": r.get("matricule_interne"),
+            "code_effectif": r.get("code_effectif"),
+            "date_entree": r.get("date_entree").isoformat() if r.get("date_entree") else None,
+            "date_sortie_prevue": r.get("date_sortie_prevue").isoformat() if r.get("date_sortie_prevue") else None,
+            "actif": bool(r.get("actif")),
+            "archive": bool(r.get("archive")),
+            "ismanager": bool(r.get("ismanager")),
+            "isformateur": bool(r.get("isformateur")),
+            "is_temp": bool(r.get("is_temp")),
+            "role_temp": r.get("role_temp"),
+            "note_commentaire": r.get("note_commentaire"),
+        }
+
+    return {
+        "id_collaborateur": r.get("id_collaborateur"),
+        "source_kind": src_kind,
+        "source_row_kind": r.get("source_row_kind"),
+        "civilite": r.get("civilite"),
+        "prenom": r.get("prenom"),
+        "nom": r.get("nom"),
+        "email": r.get("email"),
+        "telephone": r.get("telephone"),
+        "telephone2": r.get("telephone2"),
+        "fonction": r.get("fonction"),
+        "id_poste_actuel": r.get("id_poste_actuel"),
+        "id_service": r.get("id_service"),
+        "nom_service": r.get("nom_service"),
+        "poste_label": poste_label,
+        "adresse": r.get("adresse"),
+        "code_postal": r.get("code_postal"),
+        "ville": r.get("ville"),
+        "pays": r.get("pays"),
+        "actif": bool(r.get("actif")),
+        "archive": bool(r.get("archive")),
+        "ismanager": bool(r.get("ismanager")),
+        "isformateur": bool(r.get("isformateur")),
+        "is_temp": bool(r.get("is_temp")),
+        "role_temp": r.get("role_temp"),
+        "type_contrat": r.get("type_contrat"),
+        "matricule_interne": r.get("matricule_interne"),
+        "code_effectif": r.get("code_effectif"),
+        "date_entree": r.get("date_entree").isoformat() if r.get("date_entree") else None,
+        "date_sortie_prevue": r.get("date_sortie_prevue").isoformat() if r.get("date_sortie_prevue") else None,
+        "note_commentaire": r.get("note_commentaire"),
+        "observations": r.get("observations"),
+    }
+
+
+def _collab_list_attach_access(cur, access_owner_id: str, items: list) -> list:
+    access_summary_map = _fetch_access_summary_map(
+        cur,
+        access_owner_id,
+        [x.get("id_collaborateur") for x in items]
+    )
+    for it in items:
+        it["access_summary"] = access_summary_map.get(
+            (it.get("id_collaborateur") or "").strip(),
+            []
+        )
+    return items
+
+
+def _collab_list_stream(src_kind: str, access_owner_id: str, q: dict):
+    """
+    Export NDJSON : curseur serveur lu par lots, accès enrichis lot par lot.
+    """
+    sql = f"""
+        SELECT {q["select"]}
+        {q["from_where"]}
+        ORDER BY {keyset_order_by(q["sort_keys"])}
+    """
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            for batch in iter_server_cursor(conn, sql, tuple(q["params"])):
+                items = [_collab_list_item(src_kind, r) for r in batch]
+                for it in _collab_list_attach_access(cur, access_owner_id, items):
+                    yield it
+
+
 @router.get("/studio/collaborateurs/list/{id_owner}")
 def studio_collab_list(
     id_owner: str,
     request: Request,
+    response: Response,
     q: str = "",
     service: str = "__all__",
     poste: str = "__all__",
     active: str = "all",
     include_archived: int = 0,
+    page_size: Optional[int] = Query(default=None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
+    fmt: str = Query(default="json", alias="format"),
 ):
     auth = request.headers.get("Authorization", "")
     u = studio_require_user(auth)
@@ -3102,6 +3683,21 @@ def studio_collab_list(
                 src = _resolve_owner_source(cur, oid, request)
                 scope_ent = _resolve_collab_scope_ent(cur, oid, src["source_kind"], request)
 
+                lq = _collab_list_query(src["source_kind"], oid, scope_ent, qq, svc, pst, act, inc_arch)
+                access_owner_id = _resolve_access_owner_id(oid, src["source_kind"], scope_ent)
+
+                if is_ndjson_format(fmt):
+                    return ndjson_response(
+                        _collab_list_stream(src["source_kind"], access_owner_id, lq),
+                        filename=f"collaborateurs_{oid}.ndjson",
+                    )
+
+                page_req = page_request(
+                    page_size,
+                    cursor,
+                    ["studio_collab_list", oid, scope_ent, qq, svc, pst, act, inc_arch],
+                )
+
                 if src["source_kind"] == "entreprise":
                     cur.execute(
                         """
@@ -3152,285 +3748,45 @@ def studio_collab_list(
                     "archives": int(s.get("archives") or 0),
                 }
 
-                items = []
-
-                if src["source_kind"] == "entreprise":
-                    where = ["e.id_ent = %s"]
-                    params = [scope_ent]
-
-                    if not inc_arch:
-                        where.append("COALESCE(e.archive, FALSE) = FALSE")
-
-                    if svc not in ("", "__all__"):
-                        if svc == "__none__":
-                            where.append("e.id_service IS NULL")
-                        else:
-                            where.append("e.id_service = %s")
-                            params.append(svc)
-
-                    if pst not in ("", "__all__"):
-                        if pst == "__none__":
-                            where.append("e.id_poste_actuel IS NULL")
-                        else:
-                            where.append("e.id_poste_actuel = %s")
-                            params.append(pst)
-
-                    if act == "active":
-                        where.append("COALESCE(e.statut_actif, TRUE) = TRUE")
-                    elif act == "inactive":
-                        where.append("COALESCE(e.statut_actif, TRUE) = FALSE")
-                    elif act == "manager":
-                        where.append("COALESCE(e.ismanager, FALSE) = TRUE")
-                    elif act == "formateur":
-                        where.append("COALESCE(e.isformateur, FALSE) = TRUE")
-
-                    if qq:
-                        like = f"%{qq}%"
-                        where.append(
-                            """
-                            (
-                              e.nom_effectif ILIKE %s
-                              OR e.prenom_effectif ILIKE %s
-                              OR COALESCE(e.email_effectif,'') ILIKE %s
-                              OR COALESCE(e.code_effectif,'') ILIKE %s
-                              OR COALESCE(e.matricule_interne,'') ILIKE %s
-                            )
-                            """
-                        )
-                        params.extend([like, like, like, like, like])
+                sort_keys = lq["sort_keys"]
+                page = None
 
+                if page_req is None:
                     cur.execute(
                         f"""
-                        SELECT
-                          e.id_effectif AS id_collaborateur,
-                          e.prenom_effectif AS prenom,
-                          e.nom_effectif AS nom,
-                          e.civilite_effectif AS civilite,
-                          e.email_effectif AS email,
-                          e.telephone_effectif AS telephone,
-                          e.telephone2_effectif AS telephone2,
-                          e.id_service,
-                          COALESCE(s.nom_service, '') AS nom_service,
-                          e.id_poste_actuel,
-                          COALESCE(p.intitule_poste, '') AS intitule_poste,
-                          COALESCE(p.codif_client, p.codif_poste, '') AS code_poste,
-                          COALESCE(e.statut_actif, TRUE) AS actif,
-                          COALESCE(e.archive, FALSE) AS archive,
-                          COALESCE(e.ismanager, FALSE) AS ismanager,
-                          COALESCE(e.isformateur, FALSE) AS isformateur,
-                          COALESCE(e.is_temp, FALSE) AS is_temp,
-                          e.role_temp,
-                          e.type_contrat,
-                          e.matricule_interne,
-                          e.code_effectif,
-                          e.date_entree_entreprise_effectif AS date_entree,
-                          e.date_sortie_prevue,
-                          e.note_commentaire,
-                          'effectif_client' AS source_row_kind
-                        FROM public.tbl_effectif_client e
-                        LEFT JOIN public.tbl_entreprise_organigramme s
-                          ON s.id_ent = e.id_ent
-                         AND s.id_service = e.id_service
-                         AND COALESCE(s.archive, FALSE) = FALSE
-                        LEFT JOIN public.tbl_fiche_poste p
-                          ON p.id_owner = %s
-                         AND p.id_ent = e.id_ent
-                         AND p.id_poste = e.id_poste_actuel
-                         AND COALESCE(p.actif, TRUE) = TRUE
-                        WHERE {" AND ".join(where)}
-                        ORDER BY lower(e.nom_effectif), lower(e.prenom_effectif)
+                        SELECT {lq["select"]}
+                        {lq["from_where"]}
+                        ORDER BY {keyset_order_by(sort_keys)}
                         """,
-                        tuple([oid] + params),
+                        tuple(lq["params"]),
                     )
                     rows = cur.fetchall() or []
-
-                    for r in rows:
-                        code_poste = (r.get("code_poste") or "").strip()
-                        intitule_poste = (r.get("intitule_poste") or "").strip()
-                        poste_label = (f"{code_poste} · {intitule_poste}" if code_poste else intitule_poste).strip()
-                        items.append(
-                            {
-                                "id_collaborateur": r.get("id_collaborateur"),
-                                "source_kind": src["source_kind"],
-                                "source_row_kind": r.get("source_row_kind"),
-                                "civilite": r.get("civilite"),
-                                "prenom": r.get("prenom"),
-                                "nom": r.get("nom"),
-                                "email": r.get("email"),
-                                "telephone": r.get("telephone"),
-                                "telephone2": r.get("telephone2"),
-                                "id_service": r.get("id_service"),
-                                "nom_service": r.get("nom_service"),
-                                "id_poste_actuel": r.get("id_poste_actuel"),
-                                "poste_label": poste_label,
-                                "type_contrat": r.get("type_contrat"),
-                                "matricule_interne": r.get("matricule_interne"),
-                                "code_effectif": r.get("code_effectif"),
-                                "date_entree": r.get("date_entree").isoformat() if r.get("date_entree") else None,
-                                "date_sortie_prevue": r.get("date_sortie_prevue").isoformat() if r.get("date_sortie_prevue") else None,
-                                "actif": bool(r.get("actif")),
-                                "archive": bool(r.get("archive")),
-                                "ismanager": bool(r.get("ismanager")),
-                                "isformateur": bool(r.get("isformateur")),
-                                "is_temp": bool(r.get("is_temp")),
-                                "role_temp": r.get("role_temp"),
-                                "note_commentaire": r.get("note_commentaire"),
-                            }
-                        )
                 else:
-                    where = ["1=1"]
-                    params = []
-
-                    if not inc_arch:
-                        where.append("COALESCE(u.archive, FALSE) = FALSE")
-
-                    if svc not in ("", "__all__"):
-                        if svc == "__none__":
-                            where.append("COALESCE(ec.id_service, p.id_service) IS NULL")
-                        else:
-                            where.append("COALESCE(ec.id_service, p.id_service) = %s")
-                            params.append(svc)
-
-                    if pst not in ("", "__all__"):
-                        if pst == "__none__":
-                            where.append("COALESCE(ec.id_poste_actuel, p.id_poste) IS NULL")
-                        else:
-                            where.append("COALESCE(ec.id_poste_actuel, p.id_poste) = %s")
-                            params.append(pst)
-
-                    if act == "active":
-                        where.append("COALESCE(u.actif, TRUE) = TRUE")
-                    elif act == "inactive":
-                        where.append("COALESCE(u.actif, TRUE) = FALSE")
-                    elif act == "manager":
-                        where.append("COALESCE(ec.ismanager, FALSE) = TRUE")
-                    elif act == "formateur":
-                        where.append("COALESCE(ec.isformateur, FALSE) = TRUE")
-
-                    if qq:
-                        like = f"%{qq}%"
-                        where.append(
-                            """
-                            (
-                              u.ut_nom ILIKE %s
-                              OR u.ut_prenom ILIKE %s
-                              OR COALESCE(u.ut_mail,'') ILIKE %s
-                              OR COALESCE(p.intitule_poste,'') ILIKE %s
-                              OR COALESCE(p.codif_client, p.codif_poste, '') ILIKE %s
-                              OR COALESCE(ec.code_effectif, '') ILIKE %s
-                              OR COALESCE(ec.matricule_interne, '') ILIKE %s
-                            )
-                            """
-                        )
-                        params.extend([like, like, like, like, like, like, like])
+                    total = page_req.get("total")
+                    if total is None:
+                        cur.execute(f"SELECT COUNT(1) AS n {lq['from_where']}", tuple(lq["params"]))
+                        total = int((cur.fetchone() or {}).get("n") or 0)
 
+                    after_sql, after_params = keyset_where(sort_keys, page_req.get("after"))
                     cur.execute(
                         f"""
-                        SELECT
-                          u.id_utilisateur AS id_collaborateur,
-                          u.ut_prenom AS prenom,
-                          u.ut_nom AS nom,
-                          u.ut_civilite AS civilite,
-                          u.ut_mail AS email,
-                          u.ut_tel AS telephone,
-                          u.ut_tel2 AS telephone2,
-                          u.ut_fonction AS fonction,
-                          u.ut_adresse AS adresse,
-                          u.ut_cp AS code_postal,
-                          u.ut_ville AS ville,
-                          u.ut_pays AS pays,
-                          COALESCE(u.actif, TRUE) AS actif,
-                          COALESCE(u.archive, FALSE) AS archive,
-                          u.ut_obs AS observations,
-                          COALESCE(ec.id_poste_actuel, p.id_poste) AS id_poste_actuel,
-                          COALESCE(ec.id_service, p.id_service) AS id_service,
-                          COALESCE(p.intitule_poste, '') AS intitule_poste,
-                          COALESCE(p.codif_client, p.codif_poste, '') AS code_poste,
-                          COALESCE(s.nom_service, '') AS nom_service,
-                          COALESCE(ec.ismanager, FALSE) AS ismanager,
-                          COALESCE(ec.isformateur, FALSE) AS isformateur,
-                          COALESCE(ec.is_temp, FALSE) AS is_temp,
-                          ec.role_temp,
-                          ec.type_contrat,
-                          ec.matricule_interne,
-                          ec.code_effectif,
-                          ec.date_entree_entreprise_effectif AS date_entree,
-                          ec.date_sortie_prevue,
-                          ec.note_commentaire,
-                          'utilisateur' AS source_row_kind
-                        FROM public.tbl_utilisateur u
-                        LEFT JOIN public.tbl_effectif_client ec
-                          ON ec.id_ent = %s
-                         AND ec.id_effectif = u.id_utilisateur
-                        LEFT JOIN public.tbl_fiche_poste p
-                          ON p.id_poste = COALESCE(ec.id_poste_actuel, u.ut_fonction)
-                         AND p.id_owner = %s
-                         AND p.id_ent = %s
-                         AND COALESCE(p.actif, TRUE) = TRUE
-                        LEFT JOIN public.tbl_entreprise_organigramme s
-                          ON s.id_service = COALESCE(ec.id_service, p.id_service)
-                         AND s.id_ent = %s
-                         AND COALESCE(s.archive, FALSE) = FALSE
-                        WHERE {" AND ".join(where)}
-                        ORDER BY lower(u.ut_nom), lower(u.ut_prenom)
+                        SELECT {lq["select"]}{keyset_select(sort_keys)}
+                        {lq["from_where"]}
+                        {("AND " + after_sql) if after_sql else ""}
+                        ORDER BY {keyset_order_by(sort_keys)}
+                        LIMIT %s
                         """,
-                        tuple([oid, oid, oid, oid] + params),
+                        tuple(lq["params"] + after_params + [page_req["size"] + 1]),
                     )
-                    rows = cur.fetchall() or []
+                    rows, page = page_finish(cur.fetchall() or [], page_req, sort_keys, total)
 
-                    for r in rows:
-                        code_poste = (r.get("code_poste") or "").strip()
-                        intitule_poste = (r.get("intitule_poste") or "").strip()
-                        poste_label = (f"{code_poste} · {intitule_poste}" if code_poste else intitule_poste).strip()
+                items = [_collab_list_item(src["source_kind"], r) for r in rows]
+                _collab_list_attach_access(cur, access_owner_id, items)
 
-                        items.append(
-                            {
-                                "id_collaborateur": r.get("id_collaborateur"),
-                                "source_kind": src["source_kind"],
-                                "source_row_kind": r.get("source_row_kind"),
-                                "civilite": r.get("civilite"),
-                                "prenom": r.get("prenom"),
-                                "nom": r.get("nom"),
-                                "email": r.get("email"),
-                                "telephone": r.get("telephone"),
-                                "telephone2": r.get("telephone2"),
-                                "fonction": r.get("fonction"),
-                                "id_poste_actuel": r.get("id_poste_actuel"),
-                                "id_service": r.get("id_service"),
-                                "nom_service": r.get("nom_service"),
-                                "poste_label": poste_label,
-                                "adresse": r.get("adresse"),
-                                "code_postal": r.get("code_postal"),
-                                "ville": r.get("ville"),
-                                "pays": r.get("pays"),
-                                "actif": bool(r.get("actif")),
-                                "archive": bool(r.get("archive")),
-                                "ismanager": bool(r.get("ismanager")),
-                                "isformateur": bool(r.get("isformateur")),
-                                "is_temp": bool(r.get("is_temp")),
-                                "role_temp": r.get("role_temp"),
-                                "type_contrat": r.get("type_contrat"),
-                                "matricule_interne": r.get("matricule_interne"),
-                                "code_effectif": r.get("code_effectif"),
-                                "date_entree": r.get("date_entree").isoformat() if r.get("date_entree") else None,
-                                "date_sortie_prevue": r.get("date_sortie_prevue").isoformat() if r.get("date_sortie_prevue") else None,
-                                "note_commentaire": r.get("note_commentaire"),
-                                "observations": r.get("observations"),
-                            }
-                        )
-                access_owner_id = _resolve_access_owner_id(oid, src["source_kind"], scope_ent)
-                access_summary_map = _fetch_access_summary_map(
-                    cur,
-                    access_owner_id,
-                    [x.get("id_collaborateur") for x in items]
-                )
-                for it in items:
-                    it["access_summary"] = access_summary_map.get(
-                        (it.get("id_collaborateur") or "").strip(),
-                        []
-                    )                        
-
-        return {"items": items, "stats": stats_global}
+        if page is not None:
+            apply_page_headers(response, page)
+            return fast_json_response({"items": items, "stats": stats_global, "page": page}, response=response)
+        return fast_json_response({"items": items, "stats": stats_global})
     except HTTPException:
         raise
     except Exception as e:
@@ -3937,44 +4293,18 @@ def studio_collab_sync_competences_from_poste(
                 poste_row = cur.fetchone() or {}
                 intitule_poste = (poste_row.get("intitule_poste") or "").strip() or None
 
-                cur.execute(
-                    """
-                    SELECT
-                      fpc.id_competence AS id_comp,
-                      fpc.niveau_requis
-                    FROM public.tbl_fiche_poste_competence fpc
-                    JOIN public.tbl_competence c
-                      ON c.id_comp = fpc.id_competence
-                     AND COALESCE(c.masque, FALSE) = FALSE
-                     AND COALESCE(c.etat, 'active') IN ('active', 'valide', 'à valider')
-                    WHERE fpc.id_poste = %s
-                      AND COALESCE(fpc.masque, FALSE) = FALSE
-                    ORDER BY COALESCE(fpc.poids_criticite, 0) DESC, c.intitule
-                    """,
-                    (id_poste,),
-                )
-                req_rows = cur.fetchall() or []
-
-                inserted = 0
-                skipped_existing = 0
-
-                for r in req_rows:
-                    id_comp = (r.get("id_comp") or "").strip()
-                    if not id_comp:
-                        continue
+                req_rows = _fetch_poste_required_competences(cur, id_poste)
 
-                    niveau = _normalize_skill_level_from_poste(r.get("niveau_requis"))
-                    upsert_res = _upsert_effectif_competence_without_audit(
-                        cur,
-                        id_effectif_data,
-                        id_comp,
-                        niveau,
-                    )
-
-                    if upsert_res.get("already_exists"):
-                        skipped_existing += 1
-                    else:
-                        inserted += 1
+                upsert_results = _bulk_upsert_effectif_competences_without_audit(
+                    cur,
+                    id_effectif_data,
+                    [(r.get("id_comp"), _normalize_skill_level_from_poste(r.get("niveau_requis"))) for r in req_rows],
+                )
+                # Compteurs par ligne requise (comme la boucle précédente) : une compétence
+                # présente plusieurs fois sur le poste compte ses doublons comme existants.
+                nb_requises = sum(1 for r in req_rows if (r.get("id_comp") or "").strip())
+                inserted = sum(1 for x in upsert_results if not x.get("already_exists"))
+                skipped_existing = nb_requises - inserted
 
                 conn.commit()
 
@@ -4985,67 +5315,16 @@ def studio_collab_sync_certifications_from_poste(
                 poste_row = cur.fetchone() or {}
                 intitule_poste = (poste_row.get("intitule_poste") or "").strip() or None
 
-                cur.execute(
-                    """
-                    SELECT
-                      fpc.id_certification
-                    FROM public.tbl_fiche_poste_certification fpc
-                    JOIN public.tbl_certification c
-                      ON c.id_certification = fpc.id_certification
-                     AND COALESCE(c.masque, FALSE) = FALSE
-                    WHERE fpc.id_poste = %s
-                    ORDER BY lower(COALESCE(c.categorie, '')), lower(COALESCE(c.nom_certification, ''))
-                    """,
-                    (id_poste,),
-                )
-                req_rows = cur.fetchall() or []
-
-                inserted = 0
-                skipped_existing = 0
-
-                for r in req_rows:
-                    cert_id = (r.get("id_certification") or "").strip()
-                    if not cert_id:
-                        continue
-
-                    cur.execute(
-                        """
-                        SELECT 1
-                        FROM public.tbl_effectif_client_certification
-                        WHERE id_effectif = %s
-                          AND id_certification = %s
-                          AND COALESCE(archive, FALSE) = FALSE
-                        LIMIT 1
-                        """,
-                        (id_effectif_data, cert_id),
-                    )
-                    if cur.fetchone():
-                        skipped_existing += 1
-                        continue
+                cert_ids = _fetch_poste_required_certifications(cur, id_poste)
 
-                    cur.execute(
-                        """
-                        INSERT INTO public.tbl_effectif_client_certification (
-                          id_effectif_certification,
-                          id_effectif,
-                          id_certification,
-                          date_obtention,
-                          date_expiration,
-                          organisme,
-                          reference,
-                          commentaire,
-                          id_preuve_doc,
-                          etat,
-                          archive,
-                          date_creation,
-                          date_maj
-                        ) VALUES (
-                          %s, %s, %s, NULL, NULL, NULL, NULL, NULL, NULL, 'a_obtenir', FALSE, CURRENT_DATE, NOW()
-                        )
-                        """,
-                        (str(uuid.uuid4()), id_effectif_data, cert_id),
-                    )
-                    inserted += 1
+                # Insertion ensembliste des certifications manquantes (une requête)
+                inserted_rows = _bulk_insert_missing_effectif_certifications(
+                    cur,
+                    [(id_effectif_data, cert_id) for cert_id in cert_ids],
+                )
+                # Doublons de certification sur le poste : comptés comme existants (comme avant)
+                inserted = len(inserted_rows)
+                skipped_existing = len(cert_ids) - inserted
 
                 conn.commit()
 
@@ -5065,6 +5344,220 @@ def studio_collab_sync_certifications_from_poste(
         raise HTTPException(status_code=500, detail=f"studio/collaborateurs/certifications/sync-poste error: {e}")
 
 
+# ------------------------------------------------------
+# Synchronisation poste -> titulaires (job de masse)
+# ------------------------------------------------------
+def _fetch_poste_holder_ids(cur, src_kind: str, oid: str, scope_ent: str, id_poste: str) -> List[str]:
+    q = _collab_list_query(src_kind, oid, scope_ent, "", "", id_poste, "", False)
+    cur.execute(
+        f"""
+        SELECT {q["select"]}
+        {q["from_where"]}
+        """,
+        tuple(q["params"]),
+    )
+    out: List[str] = []
+    for r in cur.fetchall() or []:
+        hid = (r.get("id_collaborateur") or "").strip()
+        if hid and hid not in out:
+            out.append(hid)
+    return out
+
+
+def _run_sync_postes_job(
+    progress,
+    oid: str,
+    src_kind: str,
+    scope_ent: str,
+    postes: List[dict],
+    sync_competences: bool,
+    sync_certifications: bool,
+) -> dict:
+    """
+    Un poste = une transaction : exigences chargées une fois, existant de tous les titulaires
+    lu en une requête, insertions/réactivations ensemblistes. Caches invalidés une fois à la fin.
+    """
+    totals = {
+        "postes_total": len(postes),
+        "postes_done": 0,
+        "holders_done": 0,
+        "competences_inserted": 0,
+        "competences_reactivated": 0,
+        "competences_existing": 0,
+        "certifications_inserted": 0,
+        "certifications_existing": 0,
+    }
+    progress(**totals)
+    details: List[dict] = []
+
+    for p in postes:
+        pid = p["id_poste"]
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                holders = _fetch_poste_holder_ids(cur, src_kind, oid, scope_ent, pid)
+                detail = {
+                    "id_poste": pid,
+                    "intitule_poste": p.get("intitule_poste"),
+                    "holders": len(holders),
+                    "competences_inserted": 0,
+                    "competences_reactivated": 0,
+                    "competences_existing": 0,
+                    "certifications_inserted": 0,
+                    "certifications_existing": 0,
+                }
+
+                if holders and sync_competences:
+                    reqs = _fetch_poste_required_competences(cur, pid)
+                    pairs = [
+                        (hid, r.get("id_comp"), _normalize_skill_level_from_poste(r.get("niveau_requis")))
+                        for hid in holders
+                        for r in reqs
+                    ]
+                    for res in _bulk_upsert_effectif_competence_pairs_without_audit(cur, pairs):
+                        action = res.get("action")
+                        if action == "inserted":
+                            detail["competences_inserted"] += 1
+                        elif action == "reactivated":
+                            detail["competences_reactivated"] += 1
+                        else:
+                            detail["competences_existing"] += 1
+
+                if holders and sync_certifications:
+                    cert_ids = _fetch_poste_required_certifications(cur, pid)
+                    inserted_rows = _bulk_insert_missing_effectif_certifications(
+                        cur,
+                        [(hid, cert_id) for hid in holders for cert_id in cert_ids],
+                    )
+                    detail["certifications_inserted"] = len(inserted_rows)
+                    detail["certifications_existing"] = len(holders) * len(cert_ids) - len(inserted_rows)
+
+                conn.commit()
+
+        details.append(detail)
+        totals["postes_done"] += 1
+        totals["holders_done"] += detail["holders"]
+        for k in (
+            "competences_inserted",
+            "competences_reactivated",
+            "competences_existing",
+            "certifications_inserted",
+            "certifications_existing",
+        ):
+            totals[k] += detail[k]
+        progress(**totals, id_poste_courant=pid)
+
+    # Invalidation unique des caches d'analyse de la structure
+    studio_dashboard_cache_invalidate(scope_ent, oid)
+    invalidate_calendar_suggestions(scope_ent, "evaluation")
+
+    return {**totals, "postes": details}
+
+
+@router.post("/studio/collaborateurs/sync-postes/{id_owner}")
+def studio_collab_sync_postes_start(
+    id_owner: str,
+    payload: SyncPostesBulkPayload,
+    request: Request,
+):
+    """
+    Synchronise compétences / certifications requises de un ou plusieurs postes sur tous leurs titulaires.
+    Traitement en tâche de fond : suivi via GET /studio/collaborateurs/sync-postes/{id_owner}/jobs/{id_job}.
+    """
+    auth = request.headers.get("Authorization", "")
+    u = studio_require_user(auth)
+
+    try:
+        pids: List[str] = []
+        for x in payload.id_postes or []:
+            pid = _norm_text(x)
+            if pid and pid not in pids:
+                pids.append(pid)
+        if not pids:
+            raise HTTPException(status_code=400, detail="Aucun poste sélectionné.")
+
+        sync_competences = payload.competences is not False
+        sync_certifications = payload.certifications is not False
+        if not sync_competences and not sync_certifications:
+            raise HTTPException(status_code=400, detail="Rien à synchroniser.")
+
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                oid = _require_owner_access(cur, u, id_owner)
+                studio_fetch_owner(cur, oid)
+                studio_require_min_role(cur, u, oid, "admin")
+                src = _resolve_owner_source(cur, oid, request)
+                scope_ent = _resolve_collab_scope_ent(cur, oid, src["source_kind"], request)
+
+                cur.execute(
+                    """
+                    SELECT id_poste, COALESCE(intitule_poste, '') AS intitule_poste
+                    FROM public.tbl_fiche_poste
+                    WHERE id_poste = ANY(%s)
+                      AND id_owner = %s
+                      AND id_ent = %s
+                      AND COALESCE(actif, TRUE) = TRUE
+                    """,
+                    (pids, oid, scope_ent),
+                )
+                found = {(r.get("id_poste") or "").strip(): r for r in (cur.fetchall() or [])}
+
+        missing = [pid for pid in pids if pid not in found]
+        if missing:
+            raise HTTPException(status_code=400, detail="Poste(s) invalide(s) pour cette structure : " + ", ".join(missing))
+
+        postes = [
+            {"id_poste": pid, "intitule_poste": (found[pid].get("intitule_poste") or "").strip() or None}
+            for pid in pids
+        ]
+
+        # Dédoublonnage par demande (postes + options) : une autre sélection lance son propre job
+        sync_sig = hashlib.sha1(
+            json.dumps([sorted(pids), sync_competences, sync_certifications]).encode("utf-8")
+        ).hexdigest()[:12]
+
+        job = start_job(
+            "collab_sync_postes",
+            lambda progress: _run_sync_postes_job(
+                progress,
+                oid,
+                src["source_kind"],
+                scope_ent,
+                postes,
+                sync_competences,
+                sync_certifications,
+            ),
+            dedupe_key=f"collab_sync_postes:{oid}:{scope_ent}:{sync_sig}",
+            meta={"id_owner": oid, "id_ent": scope_ent, "id_postes": pids},
+        )
+        return {"ok": True, "job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"studio/collaborateurs/sync-postes error: {e}")
+
+
+@router.get("/studio/collaborateurs/sync-postes/{id_owner}/jobs/{id_job}")
+def studio_collab_sync_postes_job(id_owner: str, id_job: str, request: Request):
+    auth = request.headers.get("Authorization", "")
+    u = studio_require_user(auth)
+
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                oid = _require_owner_access(cur, u, id_owner)
+
+        job = get_job(id_job)
+        if not job or job.get("kind") != "collab_sync_postes" or (job.get("meta") or {}).get("id_owner") != oid:
+            raise HTTPException(status_code=404, detail="Job introuvable.")
+        return {"ok": True, "job": job}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"studio/collaborateurs/sync-postes job error: {e}")
+
+
 @router.post("/studio/collaborateurs/certifications/{id_owner}/{id_collaborateur}/add")
 def studio_collab_certification_add(
     id_owner: str,
@@ -5773,8 +6266,21 @@ def studio_collab_historique_evolutions(id_owner: str, id_collaborateur: str, re
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"studio/collaborateurs/historique/evolutions error: {e}")
 
+_COLLAB_AUDITS_SORT_KEYS = [
+    ("COALESCE(a.date_audit, DATE '0001-01-01')", "desc"),
+    ("a.id_audit_competence", "desc"),
+]
+
+
 @router.get("/studio/collaborateurs/historique/audits/{id_owner}/{id_collaborateur}")
-def studio_collab_historique_audits(id_owner: str, id_collaborateur: str, request: Request):
+def studio_collab_historique_audits(
+    id_owner: str,
+    id_collaborateur: str,
+    request: Request,
+    response: Response,
+    page_size: Optional[int] = Query(default=None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(default=None),
+):
     auth = request.headers.get("Authorization", "")
     u = studio_require_user(auth)
 
@@ -5795,8 +6301,14 @@ def studio_collab_historique_audits(id_owner: str, id_collaborateur: str, reques
                 if not id_effectif_ids:
                     return {"id_collaborateur": cid, "items": []}
 
+                page_req = page_request(page_size, cursor, ["studio_collab_audits", oid, cid])
+                after_sql, after_params = keyset_where(
+                    _COLLAB_AUDITS_SORT_KEYS,
+                    page_req.get("after") if page_req else None,
+                )
+
                 cur.execute(
-                    """
+                    f"""
                     SELECT
                       a.id_audit_competence,
                       a.id_effectif_competence,
@@ -5807,7 +6319,7 @@ def studio_collab_historique_audits(id_owner: str, id_collaborateur: str, reques
                       a.nom_evaluateur,
                       ecc.niveau_actuel,
                       COALESCE(NULLIF(BTRIM(c.code), ''), '') AS code_competence,
-                      COALESCE(NULLIF(BTRIM(c.intitule), ''), 'Compétence') AS intitule_competence
+                      COALESCE(NULLIF(BTRIM(c.intitule), ''), 'Compétence') AS intitule_competence{keyset_select(_COLLAB_AUDITS_SORT_KEYS)}
                     FROM public.tbl_effectif_client_audit_competence a
                     JOIN public.tbl_effectif_client_competence ecc
                       ON ecc.id_effectif_competence = a.id_effectif_competence
@@ -5817,13 +6329,16 @@ def studio_collab_historique_audits(id_owner: str, id_collaborateur: str, reques
                       ON c.id_comp = ecc.id_comp
                      AND COALESCE(c.masque, FALSE) = FALSE
                      AND COALESCE(c.etat, 'active') IN ('active', 'valide', 'à valider')
-                    ORDER BY
-                      a.date_audit DESC NULLS LAST,
-                      a.id_audit_competence DESC
+                    {("WHERE " + after_sql) if after_sql else ""}
+                    ORDER BY {keyset_order_by(_COLLAB_AUDITS_SORT_KEYS)}
+                    {"LIMIT %s" if page_req else ""}
                     """,
-                    (id_effectif_ids,),
+                    tuple([id_effectif_ids] + after_params + ([page_req["size"] + 1] if page_req else [])),
                 )
                 rows = cur.fetchall() or []
+                page = None
+                if page_req is not None:
+                    rows, page = page_finish(rows, page_req, _COLLAB_AUDITS_SORT_KEYS)
 
         level_labels = {
             "debutant": "Débutant",
@@ -5851,6 +6366,9 @@ def studio_collab_historique_audits(id_owner: str, id_collaborateur: str, reques
                 }
             )
 
+        if page is not None:
+            apply_page_headers(response, page)
+            return {"id_collaborateur": cid, "items": items, "page": page}
         return {"id_collaborateur": cid, "items": items}
 
     except HTTPException:
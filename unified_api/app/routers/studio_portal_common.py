@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 import os
-import requests
+
+from app.services.http_client import integration_get
 
 STUDIO_SUPABASE_URL = os.getenv("STUDIO_SUPABASE_URL") or ""
 STUDIO_SUPABASE_ANON_KEY = os.getenv("STUDIO_SUPABASE_ANON_KEY") or ""
@@ -36,7 +37,7 @@ def studio_get_supabase_user(access_token: str) -> dict:
     }
 
     try:
-        r = requests.get(url, headers=headers, timeout=15)
+        r = integration_get("supabase_auth", url, headers=headers)
         if r.status_code in (401, 403):
             raise HTTPException(status_code=401, detail="Session invalide ou expirée.")
         if r.status_code >= 400:
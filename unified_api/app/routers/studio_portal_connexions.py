@@ -11,6 +11,7 @@ from app.routers.studio_portal_common import (
     studio_fetch_owner,
     studio_require_min_role,
 )
+from app.services.schema_catalog import table_exists
 
 router = APIRouter()
 
@@ -74,9 +75,7 @@ def _normalize_attr_email(value: Any) -> str:
 
 
 def _sso_table_exists(cur) -> bool:
-    cur.execute("SELECT to_regclass('public.tbl_novoskill_sso_config') AS table_name")
-    r = cur.fetchone() or {}
-    return bool(r.get("table_name"))
+    return table_exists(cur, "tbl_novoskill_sso_config")
 
 
 def _require_owner_access(cur, u: dict, id_owner: str) -> str:
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi import APIRouter, HTTPException, Request, Response, Query
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 import copy
@@ -18,7 +18,10 @@ from app.routers.skills_portal_dashboard import (
     build_dashboard_risk_overview_for_scope,
     _service_options,
 )
+from app.services.conditional_get import not_modified
+from app.services.data_version import bump_data_version, subscribe_data_changes
 from app.services.skills_analyse_engine import _fetch_postes_fragility_records, _fetch_service_label
+from app.services.schema_catalog import column_exists, table_exists
 
 router = APIRouter()
 
@@ -43,6 +46,31 @@ def _studio_cache_set(cache: Dict[tuple, Dict[str, Any]], key: tuple, value: Dic
             cache.pop(old_key, None)
     cache[key] = {"ts": time.time(), "value": copy.deepcopy(value)}
 
+def _studio_cache_purge(wanted: set) -> int:
+    removed = 0
+    for cache in (_STUDIO_DASH_RESPONSE_CACHE, _STUDIO_DASH_INSIGHTS_CACHE):
+        for key in list(cache.keys()):
+            if wanted.intersection(str(k) for k in key):
+                cache.pop(key, None)
+                removed += 1
+    return removed
+
+def studio_dashboard_cache_invalidate(*ids: str) -> int:
+    """
+    Purge les réponses en cache qui concernent l'un des ids (owner / entreprise)
+    et incrémente leur version de données (ETags, autres workers).
+    À appeler après une écriture de masse (ex. synchronisation des compétences d'un poste).
+    """
+    wanted = {str(x or "").strip() for x in ids if str(x or "").strip()}
+    bump_data_version(*wanted)
+    return _studio_cache_purge(wanted)
+
+def _studio_cache_on_data_change(id_scope: str, domaine: str):
+    # Écriture d'un autre worker
+    _studio_cache_purge({id_scope})
+
+subscribe_data_changes(_studio_cache_on_data_change)
+
 def _studio_cache_bypass(request: Request) -> bool:
     v = (request.query_params.get("refresh") or request.query_params.get("no_cache") or "").strip().lower()
     return v in ("1", "true", "yes", "oui")
@@ -97,18 +125,7 @@ def _require_owner_access(cur, u: dict, id_owner: str):
     return oid
 
 def _has_column(cur, table_name: str, column_name: str, schema: str = "public") -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.columns
-        WHERE table_schema = %s
-          AND table_name = %s
-          AND column_name = %s
-        LIMIT 1
-        """,
-        (schema, table_name, column_name),
-    )
-    return cur.fetchone() is not None
+    return column_exists(cur, table_name, column_name, schema)
 
 def _resolve_prenom(cur, email: str, id_owner: str) -> Optional[str]:
     e = (email or "").strip()
@@ -290,17 +307,7 @@ def _studio_s(v) -> str:
 
 
 def _studio_has_table(cur, table_name: str, schema: str = "public") -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.tables
-        WHERE table_schema = %s
-          AND table_name = %s
-        LIMIT 1
-        """,
-        (schema, table_name),
-    )
-    return cur.fetchone() is not None
+    return table_exists(cur, table_name, schema)
 
 
 def _studio_norm_priorite(v: str) -> str:
@@ -1096,6 +1103,7 @@ def _studio_build_linked(cur, id_owner: str, linked_structures: List[Dict[str, A
 def get_studio_dashboard_overview(
     id_owner: str,
     request: Request,
+    response: Response,
     perimetre: str = Query(default="ma_structure"),
     priorite: str = Query(default="tous"),
     criticite_min: int = Query(default=70, ge=0, le=100),
@@ -1126,6 +1134,10 @@ def get_studio_dashboard_overview(
                 if not service_requested and requested_perim.startswith("service:"):
                     service_requested = requested_perim.split(":", 1)[1].strip()
 
+                nm = not_modified(request, response, oid, current_id, *[_studio_s(x.get("id_ent")) for x in linked_structures])
+                if nm is not None:
+                    return nm
+
                 response_cache_key = ("dashboard_overview", oid, current_id, service_requested, criticite, len(linked_structures))
                 if not _studio_cache_bypass(request):
                     cached_response = _studio_cache_get(_STUDIO_DASH_RESPONSE_CACHE, response_cache_key)
@@ -50,21 +50,16 @@ from app.routers.studio_portal_common import (
     studio_fetch_owner,
     studio_require_min_role,
 )
+from app.services.cartographie_cache import invalidate_cartographie
+from app.services.code_sequence import POSTE_CODES, COMPETENCE_CODES, allocate_codes, competence_code_prefix
+from app.services.data_version import DOMAIN_COMPETENCES, DOMAIN_ORGANIGRAMME, DOMAIN_POSTES, bump_data_version
+from app.services.organigramme_cache import invalidate_organigramme
+from app.services.startup import lazy_attr
 
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
-
-try:
-    from docx import Document as DocxDocument
-except Exception:
-    DocxDocument = None
-
-try:
-    from pypdf import PdfReader
-except Exception:
-    PdfReader = None
+# Dépendances lourdes (IA, parsing documents) : importées au premier usage
+OpenAI = lazy_attr("openai", "OpenAI")
+DocxDocument = lazy_attr("docx", "Document")
+PdfReader = lazy_attr("pypdf", "PdfReader")
 
 router = APIRouter()
 
@@ -1303,30 +1298,8 @@ def _build_organigramme_pdf(oid: str, data: dict, logo_bytes: Optional[bytes] =
     return buffer.getvalue()
 
 def _next_pt_code(cur, oid: str, id_ent: str) -> str:
-    # Sérialise les créations pour une entreprise (évite doublons)
-    lock_key = f"poste_code:{oid}:{id_ent}"
-    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (lock_key,))
-
-    cur.execute(
-        """
-        SELECT COALESCE(
-          MAX( (regexp_match(p.codif_poste, '^PT([0-9]{4})$'))[1]::int ),
-          0
-        ) AS max_n
-        FROM public.tbl_fiche_poste p
-        WHERE p.id_owner = %s
-          AND p.id_ent = %s
-          AND p.codif_poste ~ '^PT[0-9]{4}$'
-        """,
-        (oid, id_ent),
-    )
-    r = cur.fetchone() or {}
-    max_n_raw = r.get("max_n")
-    max_n = int(max_n_raw) if max_n_raw is not None else 0
-    nxt = max_n + 1
-    if nxt > 9999:
-        raise HTTPException(status_code=400, detail="Limite de numérotation atteinte (PT9999) pour cette entreprise.")
-    return f"PT{nxt:04d}"
+    # Séquence par entreprise (réservation atomique, sans doublon)
+    return allocate_codes(cur, POSTE_CODES, (oid, id_ent))[0]
 
 
 def _poste_exists(cur, oid: str, id_ent: str, id_poste: str) -> bool:
@@ -1502,54 +1475,11 @@ def _clean_ai_comp_text(v: Optional[str], max_len: int = 280) -> str:
     return s
 
 def _next_comp_code(cur, oid: str) -> str:
-    # Sérialise les créations pour un owner (évite doublons).
-    # Le code est un repère humain, pas l'identifiant métier : on conserve
-    # les codes importés et on attribue ensuite le premier numéro disponible.
+    # Séquence par owner et préfixe (C / CO selon les codes existants) ;
+    # les codes importés sont conservés et sautés par la séquence.
     owner_id = (oid or "").strip()
-    lock_key = f"comp_code:{owner_id}"
-    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (lock_key,))
-
-    cur.execute(
-        """
-        SELECT upper(substring(code from '^(CO?)[0-9]{5}$')) AS prefix, COUNT(*) AS nb
-        FROM public.tbl_competence
-        WHERE id_owner = %s
-          AND upper(COALESCE(code, '')) ~ '^CO?[0-9]{5}$'
-        GROUP BY 1
-        ORDER BY COUNT(*) DESC,
-                 CASE WHEN upper(substring(code from '^(CO?)[0-9]{5}$')) = 'CO' THEN 0 ELSE 1 END
-        LIMIT 1
-        """,
-        (owner_id,),
-    )
-    row = cur.fetchone() or {}
-    prefix = (row.get("prefix") or "CO").strip().upper() or "CO"
-    if prefix not in ("C", "CO"):
-        prefix = "CO"
-
-    cur.execute(
-        """
-        SELECT code
-        FROM public.tbl_competence
-        WHERE id_owner = %s
-          AND upper(COALESCE(code, '')) ~ %s
-        """,
-        (owner_id, f"^{prefix}[0-9]{{5}}$"),
-    )
-    rows = cur.fetchall() or []
-
-    used = set()
-    rx = re.compile(rf"^{re.escape(prefix)}([0-9]{{5}})$", re.I)
-    for r in rows:
-        m = rx.match(str((r.get("code") or "")).strip())
-        if m:
-            used.add(int(m.group(1)))
-
-    for nxt in range(1, 100000):
-        if nxt not in used:
-            return f"{prefix}{nxt:05d}"
-
-    raise HTTPException(status_code=400, detail=f"Limite de numérotation atteinte ({prefix}99999).")
+    prefix = competence_code_prefix(cur, owner_id)
+    return allocate_codes(cur, COMPETENCE_CODES, (owner_id,), prefix=prefix)[0]
 
 _ACTION_VERB_HINTS = {
     "animer", "administrer", "piloter", "conduire", "concevoir", "mettre",
@@ -2118,7 +2048,7 @@ def _response_output_text(resp) -> str:
 
 
 def _openai_responses_json(model: str, schema_name: str, schema: dict, system_prompt: str, user_prompt: str, use_web: bool = False) -> dict:
-    if OpenAI is None:
+    if not OpenAI:
         raise HTTPException(status_code=500, detail="Lib OpenAI manquante (pip install openai).")
 
     api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
@@ -2192,7 +2122,7 @@ def _openai_responses_text(model: str, schema_name: str, system_prompt: str, use
     complète avec JSON Schema strict. Les niveaux, critères et grilles restent générés
     uniquement au moment de la création de la compétence.
     """
-    if OpenAI is None:
+    if not OpenAI:
         raise HTTPException(status_code=500, detail="Lib OpenAI manquante (pip install openai).")
 
     api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
@@ -3889,7 +3819,7 @@ def _get_poste_import_ext(filename: Optional[str]) -> str:
 
 
 def _extract_docx_text(raw: bytes) -> str:
-    if DocxDocument is None:
+    if not DocxDocument:
         raise HTTPException(status_code=500, detail="Lecture DOCX indisponible (python-docx manquant).")
 
     try:
@@ -3918,7 +3848,7 @@ def _extract_docx_text(raw: bytes) -> str:
 
 
 def _extract_pdf_text(raw: bytes) -> str:
-    if PdfReader is None:
+    if not PdfReader:
         raise HTTPException(status_code=500, detail="Lecture PDF indisponible (pypdf manquant).")
 
     try:
@@ -7325,6 +7255,8 @@ def studio_org_ai_comp_create(id_owner: str, payload: AiPosteCompetenceCreatePay
                     )
 
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {
             "ok": True,
@@ -8003,6 +7935,9 @@ def studio_org_create_service(id_owner: str, payload: CreateServicePayload, requ
                     (sid, scope_ent, nom, parent),
                 )
                 conn.commit()
+                invalidate_organigramme(scope_ent)
+                invalidate_cartographie(id_ent=scope_ent)
+                bump_data_version(scope_ent, domains=(DOMAIN_ORGANIGRAMME,))
 
         return {"id_service": sid}
 
@@ -8095,6 +8030,9 @@ def studio_org_update_service(id_owner: str, id_service: str, payload: UpdateSer
                         tuple(vals),
                     )
                     conn.commit()
+                    invalidate_organigramme(scope_ent)
+                    invalidate_cartographie(id_ent=scope_ent)
+                    bump_data_version(scope_ent, domains=(DOMAIN_ORGANIGRAMME,))
 
         return {"ok": True}
 
@@ -8159,6 +8097,9 @@ def studio_org_archive_service(id_owner: str, id_service: str, request: Request)
                 )
 
                 conn.commit()
+                invalidate_organigramme(scope_ent)
+                invalidate_cartographie(id_ent=scope_ent)
+                bump_data_version(scope_ent, domains=(DOMAIN_ORGANIGRAMME,))
 
         return {"ok": True}
 
@@ -8514,6 +8455,8 @@ def studio_org_create_poste(id_owner: str, payload: CreatePosteOrgPayload, reque
                 )
 
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"id_poste": pid, "codif_poste": codif}
 
@@ -8728,6 +8671,8 @@ def studio_org_update_poste(id_owner: str, id_poste: str, payload: UpdatePosteOr
 
                 if need_commit:
                     conn.commit()
+                    invalidate_cartographie(poste_owner, scope_ent)
+                    bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"ok": True}
 
@@ -8776,6 +8721,8 @@ def studio_org_archive_poste(id_owner: str, id_poste: str, payload: ArchivePoste
                     (set_actif, pid, poste_owner, poste_ent),
                 )
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"ok": True, "actif": bool(set_actif)}
 
@@ -8947,6 +8894,8 @@ def studio_org_duplicate_poste(id_owner: str, id_poste: str, payload: DuplicateP
                 )
 
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"id_poste": new_id, "codif_poste": new_code}
 
@@ -9056,6 +9005,8 @@ def studio_org_assign_poste(id_owner: str, payload: AssignPostePayload, request:
                     (sid, pid, poste_owner, scope_ent),
                 )
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"ok": True}
 
@@ -9096,6 +9047,8 @@ def studio_org_detach_poste(id_owner: str, payload: DetachPostePayload, request:
                     (pid, poste_owner, scope_ent),
                 )
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"ok": True}
 
@@ -9320,6 +9273,8 @@ def studio_org_upsert_poste_competence(id_owner: str, id_poste: str, payload: Up
                     (pid, cid, niv, poids, fu, im, de, statut_eval),
                 )
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"ok": True, "poids_criticite": poids, "statut_eval": statut_eval}
 
@@ -9375,6 +9330,8 @@ def studio_org_remove_poste_competence(id_owner: str, id_poste: str, id_competen
                     (pid, cid),
                 )
                 conn.commit()
+                invalidate_cartographie(poste_owner, scope_ent)
+                bump_data_version(poste_owner, scope_ent, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES))
 
         return {"ok": True}
 
@@ -13,6 +13,8 @@ from app.routers.studio_portal_common import (
     studio_require_min_role,
     studio_require_user,
 )
+from app.services.calendar_suggestion_store import invalidate_calendar_suggestions
+from app.services.schema_catalog import table_exists
 
 router = APIRouter()
 
@@ -141,17 +143,7 @@ def _parse_datetime_param(label: str, value: Optional[str], default_hour: int =
 
 
 def _calendar_table_exists(cur, table_name: str) -> bool:
-    cur.execute(
-        """
-        SELECT 1
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-          AND table_name = %s
-        LIMIT 1
-        """,
-        (table_name,),
-    )
-    return cur.fetchone() is not None
+    return table_exists(cur, table_name)
 
 
 def _ensure_calendar_tables(cur):
@@ -1359,6 +1351,7 @@ def studio_planification_create_campagne(id_owner: str, payload: StudioRhCampagn
                     )
                     created.append(_row_to_suggestion(row))
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "suggestion")
                 return {"id_campagne": campagne_id, "created": len(created), "items": created}
     except HTTPException:
         raise
@@ -1406,6 +1399,7 @@ def studio_planification_create_competence_event(id_owner: str, payload: StudioR
                         payload_json=event_payload,
                     )
                     conn.commit()
+                    invalidate_calendar_suggestions(ctx["id_ent"], "evenement")
                     return _row_to_event(row)
 
                 row = _insert_suggestion(
@@ -1420,6 +1414,7 @@ def studio_planification_create_competence_event(id_owner: str, payload: StudioR
                     payload_json=event_payload,
                 )
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "suggestion")
                 return _row_to_suggestion(row)
     except HTTPException:
         raise
@@ -1481,6 +1476,7 @@ def studio_calendrier_event_from_suggestion(id_owner: str, payload: StudioRhFrom
                     (event_row.get("id_evenement"), suggestion.get("id_suggestion"), ctx["id_ent"]),
                 )
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "evenement", "entretien", "suggestion")
                 return _row_to_event(event_row)
     except HTTPException:
         raise
@@ -1564,6 +1560,7 @@ def studio_calendrier_patch_event(id_owner: str, id_evenement: str, payload: Stu
                 row = dict(cur.fetchone() or {})
                 _ensure_entretien_annuel(cur, ctx, row)
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "evenement", "entretien")
                 return _row_to_event(row)
     except HTTPException:
         raise
@@ -1607,6 +1604,7 @@ def studio_calendrier_patch_suggestion(id_owner: str, id_suggestion: str, payloa
                 if not row:
                     raise HTTPException(status_code=404, detail="Brique à planifier introuvable.")
                 conn.commit()
+                invalidate_calendar_suggestions(ctx["id_ent"], "suggestion")
                 return _row_to_suggestion(row)
     except HTTPException:
         raise
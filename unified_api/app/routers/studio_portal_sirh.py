@@ -13,6 +13,7 @@ from app.routers.studio_portal_common import (
 )
 from app.studio_connectors_sirh import normalize_provider_code, provider_label
 from app.studio_connectors_sirh import ebp_paie
+from app.services.schema_catalog import table_exists
 
 router = APIRouter()
 
@@ -45,9 +46,7 @@ def _sirh_secret_key() -> str:
 
 
 def _sirh_table_exists(cur) -> bool:
-    cur.execute("SELECT to_regclass('public.tbl_studio_sirh_config') AS table_name")
-    row = cur.fetchone() or {}
-    return bool(row.get("table_name"))
+    return table_exists(cur, "tbl_studio_sirh_config")
 
 
 def _require_owner_access(cur, u: dict, id_owner: str) -> str:
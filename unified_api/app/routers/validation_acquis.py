@@ -1,17 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 import os
 import json
 import uuid
-from pathlib import Path
 
 import psycopg
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
 
+from app.services.request_capture import capture_request
+
 # ======================================================
 # ENV
 # ======================================================
@@ -153,20 +153,6 @@ def get_conn():
         raise HTTPException(status_code=500, detail=f"Erreur connexion DB: {e}")
 
 
-# ======================================================
-# Cache local (debug / audit)
-# ======================================================
-CACHE_DIR = Path(__file__).parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def save_cache(payload: SaveEvaluationRequest):
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fname = CACHE_DIR / f"validation_acquis_{payload.id_action_formation_effectif}_{ts}.json"
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(payload.model_dump(), f, ensure_ascii=False, indent=2)
-
-
 # ======================================================
 # Helpers internes
 # ======================================================
@@ -752,7 +738,7 @@ def save_evaluation(payload: SaveEvaluationRequest):
                     message = "Évaluation enregistrée"
 
                 conn.commit()
-                save_cache(payload)
+                capture_request("validation_acquis", payload, ref=payload.id_action_formation_effectif)
 
                 return SaveEvaluationResponse(
                     id_action_formation_acquisition=id_acq,
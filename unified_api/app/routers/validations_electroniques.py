@@ -16,6 +16,7 @@ from app.routers.skills_portal_common import (
     get_conn,
     resolve_insights_id_ent_for_request,
 )
+from app.services.calendar_suggestion_store import invalidate_calendar_suggestions
 
 router = APIRouter()
 
@@ -457,6 +458,7 @@ def create_validation_electronique_insights(
                     _recalculer_statut_entretien_signature(cur, id_ent, doc_id)
 
                 conn.commit()
+                invalidate_calendar_suggestions(id_ent, "signature", "entretien")
                 return _validation_item_from_row(row)
 
     except HTTPException:
@@ -0,0 +1,339 @@
+# unified_api/app/services/admission_control.py
+#
+# Contrôle d'admission des routes coûteuses (par worker).
+#
+# - Classes : interactive (lectures courantes, non limitées), heavy (analyses, dashboards,
+#   simulations, exports), pdf (rendu PDF / rapport), ai (brouillons IA, analyse de documents),
+#   bulk (synchronisations, imports, envois en masse). Classement par le chemin (_RULES).
+# - Par classe : ADMISSION_CLASS_LIMITS requêtes simultanées au total, ADMISSION_TENANT_LIMITS
+#   par tenant. Format "heavy=4,pdf=2,ai=2,bulk=1" ; 0 = pas de limite.
+# - Tenant : id_ent / id_owner des paramètres de la route ; un id_contact est rattaché à son
+#   entreprise dès qu'une route l'a résolu (remember_tenant), sinon il compte pour lui-même.
+# - File d'attente courte et équitable : au plus ADMISSION_QUEUE_MAX attentes par classe
+#   (ADMISSION_TENANT_QUEUE_MAX par tenant), ADMISSION_QUEUE_TIMEOUT_MS d'attente maximum
+#   (ADMISSION_QUEUE_TIMEOUTS_MS par classe, ex. "pdf=15000"). Une place libérée va au tenant
+#   qui a le moins de requêtes en cours dans la classe (puis au plus ancien).
+# - Refus : 429 + Retry-After (durée moyenne récente de la classe) au lieu d'un 503 "DB saturée"
+#   pour tout le monde.
+# - Priorité DB : les classes autres qu'interactive positionnent current_db_priority à "batch"
+#   pour la durée de la requête (même si le contrôle d'admission est désactivé) ; le pool DB
+#   les fait passer après le trafic interactif (cf. skills_portal_common). db_priority(...)
+#   fait de même pour les traitements hors requête (jobs de fond, dispatcher).
+# - ADMISSION_CONTROL_ENABLED=0 : désactivé.
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import contextvars
+import json
+import math
+import os
+import re
+import threading
+import time
+
+CLASS_INTERACTIVE = "interactive"
+CLASS_HEAVY = "heavy"
+CLASS_PDF = "pdf"
+CLASS_AI = "ai"
+CLASS_BULK = "bulk"
+ALL_CLASSES = (CLASS_INTERACTIVE, CLASS_HEAVY, CLASS_PDF, CLASS_AI, CLASS_BULK)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+ALL_PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+current_db_priority = contextvars.ContextVar("current_db_priority", default=PRIORITY_INTERACTIVE)
+
+
+def _env_map(name: str, default: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for part in (os.getenv(name, default) or "").split(","):
+        if "=" not in part:
+            continue
+        k, v = part.split("=", 1)
+        try:
+            out[k.strip().lower()] = max(0, int(v.strip()))
+        except ValueError:
+            continue
+    return out
+
+
+ADMISSION_CONTROL_ENABLED = (os.getenv("ADMISSION_CONTROL_ENABLED", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+ADMISSION_CLASS_LIMITS = _env_map("ADMISSION_CLASS_LIMITS", "heavy=4,pdf=2,ai=2,bulk=1")
+ADMISSION_TENANT_LIMITS = _env_map("ADMISSION_TENANT_LIMITS", "heavy=2,pdf=1,ai=1,bulk=1")
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "32") or 32)
+ADMISSION_TENANT_QUEUE_MAX = int(os.getenv("ADMISSION_TENANT_QUEUE_MAX", "6") or 6)
+ADMISSION_QUEUE_TIMEOUT_MS = int(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "5000") or 5000)
+ADMISSION_QUEUE_TIMEOUTS_MS = _env_map("ADMISSION_QUEUE_TIMEOUTS_MS", "pdf=15000")
+ADMISSION_TENANT_ALIASES_MAX = int(os.getenv("ADMISSION_TENANT_ALIASES_MAX", "20000") or 20000)
+
+# Premier motif reconnu l'emporte (méthodes None = toutes)
+_RULES: List[Tuple[str, Optional[Tuple[str, ...]], "re.Pattern[str]"]] = [
+    (CLASS_AI, None, re.compile(r"(^|[/_-])ai([/_-]|$)|generate_ai|analyse-cv|import_document")),
+    (CLASS_PDF, ("GET",), re.compile(r"pdf|^/skills/analyse/rapport/")),
+    (CLASS_BULK, ("POST", "PUT", "PATCH", "DELETE"), re.compile(r"sync|bulk|import|batch|recalcul")),
+    (
+        CLASS_HEAVY,
+        None,
+        re.compile(
+            r"^/skills/analyse/|^/skills/dashboard/|^/studio/dashboard/|^/skills/cartographie/"
+            r"|^/skills/simulations/evaluer/|/comparer$|/risk-overview|/export(/|$)"
+        ),
+    ),
+]
+
+# Paramètres de route identifiant le tenant, par ordre de préférence
+_TENANT_PARAMS = ("id_ent", "id_owner", "id_contact", "id_effectif", "id_consultant")
+
+_stats_lock = threading.Lock()
+_aliases_lock = threading.Lock()
+_TENANT_ALIASES: "OrderedDict[str, str]" = OrderedDict()
+
+
+def classify_request(method: str, path: str) -> str:
+    m = (method or "GET").upper()
+    for cls, methods, rx in _RULES:
+        if methods is not None and m not in methods:
+            continue
+        if rx.search(path or ""):
+            return cls
+    return CLASS_INTERACTIVE
+
+
+def priority_for_class(cls: str) -> str:
+    return PRIORITY_INTERACTIVE if cls == CLASS_INTERACTIVE else PRIORITY_BATCH
+
+
+@contextmanager
+def db_priority(priority: str) -> Iterator[None]:
+    token = current_db_priority.set(priority if priority in ALL_PRIORITIES else PRIORITY_INTERACTIVE)
+    try:
+        yield
+    finally:
+        current_db_priority.reset(token)
+
+
+def remember_tenant(key: Any, id_tenant: Any):
+    """
+    Rattache un identifiant de chemin (id_contact...) à son entreprise pour les requêtes suivantes.
+    """
+    k, t = str(key or "").strip(), str(id_tenant or "").strip()
+    if not k or not t or k == t:
+        return
+    with _aliases_lock:
+        _TENANT_ALIASES[k] = t
+        _TENANT_ALIASES.move_to_end(k)
+        while len(_TENANT_ALIASES) > max(1, ADMISSION_TENANT_ALIASES_MAX):
+            _TENANT_ALIASES.popitem(last=False)
+
+
+def _tenant_for_scope(scope) -> str:
+    params: Dict[str, Any] = {}
+    app = scope.get("app")
+    routes = getattr(getattr(app, "router", None), "routes", None) or []
+    try:
+        from starlette.routing import Match
+
+        for route in routes:
+            match, child = route.matches(scope)
+            if match == Match.FULL:
+                params = child.get("path_params") or {}
+                break
+    except Exception:
+        params = {}
+
+    for name in _TENANT_PARAMS:
+        v = str(params.get(name) or "").strip()
+        if v:
+            with _aliases_lock:
+                return _TENANT_ALIASES.get(v, v)
+
+    client = scope.get("client") or ("?", 0)
+    return f"ip:{client[0]}"
+
+
+class _Waiter:
+    __slots__ = ("tenant", "future", "t0")
+
+    def __init__(self, tenant: str, future: "asyncio.Future[bool]"):
+        self.tenant = tenant
+        self.future = future
+        self.t0 = time.monotonic()
+
+
+class _ClassState:
+    def __init__(self, name: str):
+        self.name = name
+        self.limit = ADMISSION_CLASS_LIMITS.get(name, 0)
+        self.tenant_limit = ADMISSION_TENANT_LIMITS.get(name, 0)
+        self.timeout_s = max(0.0, ADMISSION_QUEUE_TIMEOUTS_MS.get(name, ADMISSION_QUEUE_TIMEOUT_MS) / 1000.0)
+        self.in_flight = 0
+        self.per_tenant: Dict[str, int] = {}
+        self.waiters: List[_Waiter] = []
+        self.ema_ms = 1000.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0, "wait_ms": 0.0}
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.limit or self.tenant_limit)
+
+    def can_run(self, tenant: str) -> bool:
+        if self.limit and self.in_flight >= self.limit:
+            return False
+        if self.tenant_limit and self.per_tenant.get(tenant, 0) >= self.tenant_limit:
+            return False
+        return True
+
+    def take(self, tenant: str):
+        self.in_flight += 1
+        self.per_tenant[tenant] = self.per_tenant.get(tenant, 0) + 1
+
+    def release(self, tenant: str, ms: float):
+        self.in_flight = max(0, self.in_flight - 1)
+        n = self.per_tenant.get(tenant, 0) - 1
+        if n > 0:
+            self.per_tenant[tenant] = n
+        else:
+            self.per_tenant.pop(tenant, None)
+        self.ema_ms = 0.8 * self.ema_ms + 0.2 * ms
+        self.dispatch()
+
+    def dispatch(self):
+        # Place libérée : tenant le moins servi dans la classe, puis le plus ancien
+        while self.waiters:
+            eligible = [w for w in self.waiters if not w.future.done() and self.can_run(w.tenant)]
+            if not eligible:
+                self.waiters = [w for w in self.waiters if not w.future.done()]
+                return
+            w = min(eligible, key=lambda x: (self.per_tenant.get(x.tenant, 0), x.t0))
+            self.waiters.remove(w)
+            self.take(w.tenant)
+            w.future.set_result(True)
+
+    def retry_after(self) -> int:
+        queued = len(self.waiters) + 1
+        per_slot = self.ema_ms / 1000.0 * queued / max(1, self.limit or self.tenant_limit or 1)
+        return int(min(60, max(1, math.ceil(per_slot))))
+
+
+_STATES: Dict[str, _ClassState] = {name: _ClassState(name) for name in ALL_CLASSES}
+
+
+class _Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+async def _acquire(state: _ClassState, tenant: str):
+    if state.can_run(tenant) and not any(w.tenant == tenant for w in state.waiters):
+        state.take(tenant)
+        return
+
+    tenant_waiting = sum(1 for w in state.waiters if w.tenant == tenant)
+    if len(state.waiters) >= ADMISSION_QUEUE_MAX or tenant_waiting >= ADMISSION_TENANT_QUEUE_MAX:
+        raise _Rejected("queue_full", state.retry_after())
+
+    waiter = _Waiter(tenant, asyncio.get_running_loop().create_future())
+    state.waiters.append(waiter)
+    with _stats_lock:
+        state.stats["queued"] += 1
+    try:
+        await asyncio.wait({waiter.future}, timeout=state.timeout_s)
+    except asyncio.CancelledError:
+        # Client parti : on rend la place si elle venait d'être attribuée
+        if waiter.future.done():
+            state.release(tenant, state.ema_ms)
+        elif waiter in state.waiters:
+            state.waiters.remove(waiter)
+            waiter.future.cancel()
+        raise
+    finally:
+        with _stats_lock:
+            state.stats["wait_ms"] += (time.monotonic() - waiter.t0) * 1000.0
+
+    if waiter.future.done():
+        return
+    if waiter in state.waiters:
+        state.waiters.remove(waiter)
+    waiter.future.cancel()
+    with _stats_lock:
+        state.stats["timeouts"] += 1
+    raise _Rejected("timeout", state.retry_after())
+
+
+async def _send_429(send, cls: str, retry_after: int):
+    body = json.dumps(
+        {"detail": f"Trop de traitements lourds ({cls}) en cours. Réessaie dans {retry_after} s."},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(retry_after).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body, "more_body": False})
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI : à placer sous CORS pour que les 429 portent les en-têtes CORS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http" or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        cls = classify_request(scope.get("method") or "GET", scope.get("path") or "")
+        with db_priority(priority_for_class(cls)):
+            await self._admit(_STATES[cls], scope, receive, send)
+
+    async def _admit(self, state: _ClassState, scope, receive, send):
+        if not ADMISSION_CONTROL_ENABLED or not state.limited:
+            await self.app(scope, receive, send)
+            return
+
+        tenant = _tenant_for_scope(scope)
+        try:
+            await _acquire(state, tenant)
+        except _Rejected as r:
+            with _stats_lock:
+                state.stats["rejected"] += 1
+            await _send_429(send, state.name, r.retry_after)
+            return
+
+        with _stats_lock:
+            state.stats["admitted"] += 1
+        t0 = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            state.release(tenant, (time.monotonic() - t0) * 1000.0)
+
+
+def admission_control_stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"enabled": ADMISSION_CONTROL_ENABLED}
+    with _stats_lock:
+        for name, st in _STATES.items():
+            if not st.limited:
+                continue
+            for k, v in st.stats.items():
+                out[f"{name}_{k}"] = round(v, 1) if isinstance(v, float) else v
+            out[f"{name}_in_flight"] = st.in_flight
+            out[f"{name}_waiting"] = len(st.waiters)
+            out[f"{name}_tenants"] = len(st.per_tenant)
+            out[f"{name}_avg_ms"] = round(st.ema_ms, 1)
+    with _aliases_lock:
+        out["tenant_aliases"] = len(_TENANT_ALIASES)
+    return out
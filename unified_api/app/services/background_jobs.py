@@ -0,0 +1,147 @@
+# unified_api/app/services/background_jobs.py
+#
+# Jobs de fond en mémoire (traitements longs déclenchés par une route, suivis par polling).
+#
+# - start_job() exécute la fonction dans un pool de threads borné et retourne immédiatement
+#   l'état du job (id_job, statut, progression).
+# - La fonction reçoit un callback progress(**champs) qui met à jour la progression visible
+#   via get_job().
+# - Un seul job actif par clé de dédoublonnage (ex. owner + entreprise) : un second
+#   déclenchement renvoie le job en cours.
+# - Les jobs terminés sont conservés BACKGROUND_JOBS_TTL_SECONDS (suivi / support).
+# - Connexions DB en priorité batch (cf. admission_control.db_priority).
+#
+# Jobs non persistants : un redémarrage du process perd les jobs en cours (à relancer).
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+
+from app.services.admission_control import PRIORITY_BATCH, db_priority
+
+_log = logging.getLogger("background_jobs")
+
+BACKGROUND_JOBS_MAX_WORKERS = int(os.getenv("BACKGROUND_JOBS_MAX_WORKERS", "2") or 2)
+BACKGROUND_JOBS_TTL_SECONDS = int(os.getenv("BACKGROUND_JOBS_TTL_SECONDS", "3600") or 3600)
+BACKGROUND_JOBS_MAX_ITEMS = int(os.getenv("BACKGROUND_JOBS_MAX_ITEMS", "200") or 200)
+
+_lock = threading.Lock()
+_JOBS: Dict[str, Dict[str, Any]] = {}
+_ACTIVE_BY_KEY: Dict[str, str] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, BACKGROUND_JOBS_MAX_WORKERS), thread_name_prefix="bg-job")
+        return _executor
+
+
+def _purge_locked():
+    now = time.time()
+    for jid, job in list(_JOBS.items()):
+        ended = job.get("ended_at")
+        if ended and now - float(ended) > BACKGROUND_JOBS_TTL_SECONDS:
+            _JOBS.pop(jid, None)
+    if len(_JOBS) > BACKGROUND_JOBS_MAX_ITEMS:
+        done = sorted(
+            (j for j in _JOBS.values() if j.get("ended_at")),
+            key=lambda j: float(j.get("ended_at") or 0),
+        )
+        for j in done[: len(_JOBS) - BACKGROUND_JOBS_MAX_ITEMS]:
+            _JOBS.pop(j["id_job"], None)
+
+
+def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+    return copy.deepcopy({k: v for k, v in job.items() if not k.startswith("_")})
+
+
+def start_job(
+    kind: str,
+    fn: Callable[[Callable[..., None]], Any],
+    *,
+    dedupe_key: Optional[str] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Lance fn(progress) en tâche de fond. Retourne l'état du job (avec already_running=True
+    si un job de même dedupe_key est déjà en cours).
+    """
+    with _lock:
+        _purge_locked()
+        if dedupe_key:
+            active_id = _ACTIVE_BY_KEY.get(dedupe_key)
+            active = _JOBS.get(active_id or "")
+            if active and active.get("statut") in ("en_attente", "en_cours"):
+                snap = _snapshot(active)
+                snap["already_running"] = True
+                return snap
+
+        id_job = str(uuid.uuid4())
+        job = {
+            "id_job": id_job,
+            "kind": kind,
+            "statut": "en_attente",
+            "meta": dict(meta or {}),
+            "progress": {},
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "ended_at": None,
+            "_dedupe_key": dedupe_key,
+        }
+        _JOBS[id_job] = job
+        if dedupe_key:
+            _ACTIVE_BY_KEY[dedupe_key] = id_job
+
+    def progress(**fields):
+        with _lock:
+            job["progress"].update(fields)
+
+    def run():
+        with _lock:
+            job["statut"] = "en_cours"
+            job["started_at"] = time.time()
+        try:
+            # Jobs de fond : priorité batch sur le pool DB
+            with db_priority(PRIORITY_BATCH):
+                result = fn(progress)
+            with _lock:
+                job["result"] = result
+                job["statut"] = "termine"
+        except Exception as e:
+            _log.warning(f"[JOB] {kind} {id_job} en échec: {e}")
+            with _lock:
+                job["error"] = str(getattr(e, "detail", None) or e)[:500]
+                job["statut"] = "echec"
+        finally:
+            with _lock:
+                job["ended_at"] = time.time()
+                if dedupe_key and _ACTIVE_BY_KEY.get(dedupe_key) == id_job:
+                    _ACTIVE_BY_KEY.pop(dedupe_key, None)
+
+    _get_executor().submit(run)
+    with _lock:
+        return _snapshot(job)
+
+
+def get_job(id_job: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        job = _JOBS.get((id_job or "").strip())
+        return _snapshot(job) if job else None
+
+
+def background_jobs_stats() -> Dict[str, Any]:
+    with _lock:
+        by_status: Dict[str, int] = {}
+        for j in _JOBS.values():
+            by_status[j["statut"]] = by_status.get(j["statut"], 0) + 1
+        return {"jobs": len(_JOBS), "by_status": by_status, "max_workers": BACKGROUND_JOBS_MAX_WORKERS}
@@ -0,0 +1,80 @@
+# unified_api/app/services/bulk_write.py
+#
+# Écritures ensemblistes : remplace les boucles "un cur.execute par ligne".
+#
+# - execute_unnest : une requête par lot de lignes, paramètres passés en colonnes
+#   (INSERT ... SELECT FROM UNNEST(%s::text[], ...), UPDATE ... FROM UNNEST(...)).
+#   1 aller-retour par lot de BULK_WRITE_PAGE_SIZE lignes. Résultat par ligne : RETURNING
+#   + fetch=True (lignes retournées, ex. uniquement celles insérées par un NOT EXISTS).
+#
+# Toutes les fonctions s'exécutent dans la transaction du curseur appelant (pas de commit).
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+import threading
+
+BULK_WRITE_PAGE_SIZE = int(os.getenv("BULK_WRITE_PAGE_SIZE", "1000") or 1000)
+
+_stats_lock = threading.Lock()
+_stats = {"statements": 0, "rows": 0}
+
+
+def _record(statements: int, rows: int):
+    with _stats_lock:
+        _stats["statements"] += statements
+        _stats["rows"] += rows
+
+
+def _pages(rows: Sequence[Any], page_size: int):
+    size = max(1, int(page_size or BULK_WRITE_PAGE_SIZE))
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def unnest_columns(rows: Sequence[Sequence[Any]], ncols: int) -> Tuple[List[Any], ...]:
+    """
+    [(a1, b1), (a2, b2)] -> ([a1, a2], [b1, b2]) : paramètres d'un UNNEST(%s::type[], ...).
+    """
+    cols: Tuple[List[Any], ...] = tuple([] for _ in range(ncols))
+    for r in rows:
+        for i in range(ncols):
+            cols[i].append(r[i])
+    return cols
+
+
+def execute_unnest(
+    cur,
+    query: str,
+    rows: Sequence[Sequence[Any]],
+    ncols: Optional[int] = None,
+    *,
+    extra_params: Sequence[Any] = (),
+    fetch: bool = False,
+    page_size: int = BULK_WRITE_PAGE_SIZE,
+):
+    """
+    Exécute query une fois par page de lignes.
+    query reçoit d'abord les colonnes (une liste par colonne), puis extra_params.
+    fetch=True : retourne toutes les lignes RETURNING ; sinon le nombre de lignes affectées.
+    """
+    if not rows:
+        return [] if fetch else 0
+    n = ncols if ncols is not None else len(rows[0])
+
+    fetched: List[Any] = []
+    affected = 0
+    statements = 0
+    for page in _pages(rows, page_size):
+        cur.execute(query, (*unnest_columns(page, n), *extra_params))
+        statements += 1
+        if fetch:
+            fetched.extend(cur.fetchall() or [])
+        else:
+            affected += max(0, int(cur.rowcount or 0))
+    _record(statements, len(rows))
+    return fetched if fetch else affected
+
+
+def bulk_write_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {"page_size": BULK_WRITE_PAGE_SIZE, **_stats}
@@ -0,0 +1,194 @@
+# unified_api/app/services/calendar_suggestion_store.py
+#
+# Store matérialisé des suggestions calculées du calendrier RH (Skills).
+#
+# - Une entrée par (id_ent, périmètre service) ; chaque famille de suggestions
+#   (entretien annuel, préparation, signature, évaluation compétence) et les statuts
+#   persistés (ignorée / planifiée) y sont stockés séparément, avec un index par id_suggestion.
+# - Rafraîchissement incrémental : une écriture (entretien, évaluation, événement, signature,
+#   statut de suggestion) invalide uniquement les familles qu'elle impacte, pour l'entreprise
+#   concernée ; seules ces familles sont recalculées à la lecture suivante.
+# - Filet de sécurité : TTL (écritures hors des routes instrumentées) et changement de jour
+#   (les règles dépendent de CURRENT_DATE).
+# - Les lignes renvoyées sont partagées entre requêtes : les appelants ne les modifient pas.
+
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import os
+import threading
+import time
+
+
+FAMILY_ENTRETIEN_ANNUEL = "entretien_annuel"
+FAMILY_PREPARATION = "preparation_entretien"
+FAMILY_SIGNATURE = "signature"
+FAMILY_EVALUATION_COMPETENCE = "evaluation_competence"
+FAMILY_STATUTS = "statuts"
+
+SUGGESTION_FAMILIES = (
+    FAMILY_ENTRETIEN_ANNUEL,
+    FAMILY_PREPARATION,
+    FAMILY_SIGNATURE,
+    FAMILY_EVALUATION_COMPETENCE,
+)
+ALL_FAMILIES = SUGGESTION_FAMILIES + (FAMILY_STATUTS,)
+
+# Source de l'écriture -> familles à recalculer
+FAMILIES_BY_SOURCE: Dict[str, Tuple[str, ...]] = {
+    "entretien": (FAMILY_ENTRETIEN_ANNUEL, FAMILY_PREPARATION, FAMILY_SIGNATURE),
+    "evaluation": (FAMILY_EVALUATION_COMPETENCE,),
+    "evenement": (FAMILY_ENTRETIEN_ANNUEL, FAMILY_STATUTS),
+    "signature": (FAMILY_SIGNATURE,),
+    "suggestion": (FAMILY_STATUTS,),
+    "effectif": ALL_FAMILIES,
+}
+
+CALENDAR_SUGGESTION_STORE_TTL_SECONDS = int(os.getenv("CALENDAR_SUGGESTION_STORE_TTL_SECONDS", "900") or 900)
+CALENDAR_SUGGESTION_STORE_MAX_ITEMS = int(os.getenv("CALENDAR_SUGGESTION_STORE_MAX_ITEMS", "256") or 256)
+
+_store_lock = threading.Lock()
+_STORE: Dict[tuple, Dict[str, Any]] = {}
+_GENERATIONS: Dict[str, Dict[str, int]] = {}
+_stats = {"hits": 0, "loads": 0, "invalidations": 0, "evictions": 0}
+
+
+def _ent_key(id_ent: Any) -> str:
+    return str(id_ent or "").strip()
+
+
+def _generation(id_ent: str, family: str) -> int:
+    return int((_GENERATIONS.get(id_ent) or {}).get(family) or 0)
+
+
+def _family_fresh(slot: Optional[Dict[str, Any]], id_ent: str, family: str, now: float) -> bool:
+    if not slot:
+        return False
+    if int(slot.get("gen") or 0) != _generation(id_ent, family):
+        return False
+    return now - float(slot.get("ts") or 0) <= CALENDAR_SUGGESTION_STORE_TTL_SECONDS
+
+
+def _evict_if_needed():
+    if len(_STORE) < CALENDAR_SUGGESTION_STORE_MAX_ITEMS:
+        return
+    oldest = sorted(_STORE.items(), key=lambda kv: float((kv[1] or {}).get("used") or 0))
+    for old_key, _ in oldest[: max(1, CALENDAR_SUGGESTION_STORE_MAX_ITEMS // 4)]:
+        _STORE.pop(old_key, None)
+        _stats["evictions"] += 1
+
+
+def _build_index(value: Any) -> Dict[str, Any]:
+    if not isinstance(value, list):
+        return {}
+    out: Dict[str, Any] = {}
+    for row in value:
+        sid = str((row or {}).get("id_suggestion") or "").strip()
+        if sid:
+            out[sid] = row
+    return out
+
+
+def _entry(key: tuple, today: str) -> Dict[str, Any]:
+    entry = _STORE.get(key)
+    if entry is None or entry.get("day") != today:
+        _evict_if_needed()
+        entry = {"day": today, "used": time.time(), "families": {}}
+        _STORE[key] = entry
+    return entry
+
+
+def calendar_suggestion_snapshot(
+    id_ent: str,
+    scope: Optional[str],
+    loaders: Dict[str, Callable[[], Any]],
+    families: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Retourne {famille: valeur} pour les familles demandées (toutes celles de loaders par défaut).
+    Seules les familles absentes, invalidées ou expirées sont recalculées via leur loader.
+    """
+    ent = _ent_key(id_ent)
+    key = (ent, str(scope or ""))
+    wanted = [f for f in (families if families is not None else loaders.keys()) if f in loaders]
+    today = date.today().isoformat()
+
+    out: Dict[str, Any] = {}
+    stale: List[Tuple[str, int]] = []
+    now = time.time()
+    with _store_lock:
+        entry = _entry(key, today)
+        entry["used"] = now
+        for fam in wanted:
+            slot = entry["families"].get(fam)
+            if _family_fresh(slot, ent, fam, now):
+                out[fam] = slot["value"]
+                _stats["hits"] += 1
+            else:
+                stale.append((fam, _generation(ent, fam)))
+
+    # Calcul hors verrou : la génération lue avant le calcul est stockée avec le résultat,
+    # une invalidation concurrente le rend donc immédiatement périmé.
+    for fam, gen in stale:
+        value = loaders[fam]()
+        out[fam] = value
+        with _store_lock:
+            entry = _entry(key, today)
+            entry["families"][fam] = {"gen": gen, "ts": time.time(), "value": value, "index": _build_index(value)}
+            _stats["loads"] += 1
+
+    return out
+
+
+def find_calendar_suggestion(
+    id_ent: str,
+    scope: Optional[str],
+    id_suggestion: str,
+    loaders: Dict[str, Callable[[], Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Recherche directe par id_suggestion dans les familles de suggestions (index du store).
+    """
+    wanted = str(id_suggestion or "").strip()
+    if not wanted:
+        return None
+    fams = [f for f in SUGGESTION_FAMILIES if f in loaders]
+    calendar_suggestion_snapshot(id_ent, scope, loaders, fams)
+
+    key = (_ent_key(id_ent), str(scope or ""))
+    with _store_lock:
+        entry = _STORE.get(key) or {}
+        for fam in fams:
+            slot = (entry.get("families") or {}).get(fam) or {}
+            row = (slot.get("index") or {}).get(wanted)
+            if row is not None:
+                return row
+    return None
+
+
+def invalidate_calendar_suggestions(id_ent: Any, *sources: str):
+    """
+    À appeler après commit d'une écriture impactant les suggestions d'une entreprise.
+    sources : clés de FAMILIES_BY_SOURCE ; aucune source = toutes les familles.
+    """
+    ent = _ent_key(id_ent)
+    if not ent:
+        return
+    fams = set()
+    for src in sources:
+        fams.update(FAMILIES_BY_SOURCE.get(src) or ALL_FAMILIES)
+    if not fams:
+        fams = set(ALL_FAMILIES)
+    with _store_lock:
+        gens = _GENERATIONS.setdefault(ent, {})
+        for fam in fams:
+            gens[fam] = int(gens.get(fam) or 0) + 1
+        _stats["invalidations"] += 1
+
+
+def calendar_suggestion_store_stats() -> Dict[str, Any]:
+    with _store_lock:
+        return {
+            "entries": len(_STORE),
+            "ttl_seconds": CALENDAR_SUGGESTION_STORE_TTL_SECONDS,
+            **_stats,
+        }
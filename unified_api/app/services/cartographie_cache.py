@@ -0,0 +1,273 @@
+# unified_api/app/services/cartographie_cache.py
+#
+# Cartographie postes x domaines en mémoire (matrice creuse).
+#
+# - Deux portées : "owner" (Studio, compétences du owner sur ses postes) et "ent" (Insights,
+#   postes de l'entreprise). Un modèle = postes indexés, domaines indexés, liens poste-compétence
+#   et, par cellule (index poste, index domaine), la liste des liens.
+# - La matrice, le détail d'une cellule et l'export sont calculés depuis le modèle ; les
+#   agrégats par filtre (état, masquées) sont mémorisés dans le modèle.
+# - Invalidation par les routes d'écriture (postes, poste-compétences, compétences, services) ;
+#   croisée : invalider un owner invalide les entreprises de ses postes et inversement.
+#   Changements postes / compétences / organigramme des autres workers : cf. data_version.
+#   Filet de sécurité : TTL (écritures hors de ces routes).
+# - Les modèles sont partagés entre requêtes : les appelants ne les modifient pas.
+
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+import os
+import threading
+import time
+
+from app.services.data_version import DOMAIN_COMPETENCES, DOMAIN_ORGANIGRAMME, DOMAIN_POSTES, subscribe_data_changes
+
+CARTOGRAPHIE_CACHE_TTL_SECONDS = int(os.getenv("CARTOGRAPHIE_CACHE_TTL_SECONDS", "300") or 300)
+CARTOGRAPHIE_CACHE_MAX_ITEMS = int(os.getenv("CARTOGRAPHIE_CACHE_MAX_ITEMS", "256") or 256)
+
+KIND_OWNER = "owner"
+KIND_ENT = "ent"
+
+_lock = threading.Lock()
+_CACHE: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_GENERATIONS: Dict[Tuple[str, str], int] = {}
+_global_generation = 0
+_stats = {"hits": 0, "loads": 0, "invalidations": 0, "evictions": 0}
+
+
+class CartographieModel:
+    def __init__(
+        self,
+        kind: str,
+        key: str,
+        postes: List[Dict[str, Any]],
+        links: List[Dict[str, Any]],
+        domaines: List[Dict[str, Any]],
+    ):
+        self.kind = kind
+        self.key = key
+        self.postes = postes
+        self.poste_index: Dict[str, int] = {p["id_poste"]: i for i, p in enumerate(postes)}
+        self.domaines: Dict[str, Dict[str, Any]] = {d["id_domaine_competence"]: d for d in domaines}
+        self.links = links
+
+        self.domaine_ids: List[str] = []
+        self.domaine_index: Dict[str, int] = {}
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.by_poste: Dict[int, List[int]] = {}
+        for li, link in enumerate(links):
+            pi = self.poste_index.get(link["id_poste"])
+            if pi is None:
+                continue
+            self.by_poste.setdefault(pi, []).append(li)
+            did = link["domaine"]
+            if not did:
+                continue
+            di = self.domaine_index.get(did)
+            if di is None:
+                di = self.domaine_index[did] = len(self.domaine_ids)
+                self.domaine_ids.append(did)
+            self.cells.setdefault((pi, di), []).append(li)
+
+        self.owners: FrozenSet[str] = frozenset(p["id_owner"] for p in postes if p.get("id_owner"))
+        self.ents: FrozenSet[str] = frozenset(p["id_ent"] for p in postes if p.get("id_ent"))
+        self._memo: Dict[Hashable, Dict[Tuple[str, str], List[str]]] = {}
+
+    def poste(self, id_poste: str) -> Optional[Dict[str, Any]]:
+        pi = self.poste_index.get(id_poste)
+        return self.postes[pi] if pi is not None else None
+
+    def poste_links(self, id_poste: str) -> List[Dict[str, Any]]:
+        pi = self.poste_index.get(id_poste)
+        return [self.links[li] for li in self.by_poste.get(pi, ())] if pi is not None else []
+
+    def cell_competences(self, memo_key: Hashable, accept: Callable[[Dict[str, Any]], bool]) -> Dict[Tuple[str, str], List[str]]:
+        """
+        {(id_poste, id_domaine): [id_comp distincts]} pour les liens acceptés ; mémorisé par memo_key.
+        """
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+        out: Dict[Tuple[str, str], List[str]] = {}
+        for (pi, di), lis in self.cells.items():
+            comps: List[str] = []
+            seen = set()
+            for li in lis:
+                link = self.links[li]
+                cid = link["id_comp"]
+                if cid not in seen and accept(link):
+                    seen.add(cid)
+                    comps.append(cid)
+            if comps:
+                out[(self.postes[pi]["id_poste"], self.domaine_ids[di])] = comps
+        self._memo[memo_key] = out
+        return out
+
+
+def _s(v: Any) -> str:
+    return str(v or "").strip()
+
+
+def _load(cur, kind: str, key: str) -> CartographieModel:
+    if kind == KIND_OWNER:
+        poste_where = "fp.id_owner = %s"
+        comp_where = "AND c.id_owner = %s"
+        params_links: Tuple[Any, ...] = (key, key)
+    else:
+        poste_where = "fp.id_ent = %s"
+        comp_where = ""
+        params_links = (key,)
+
+    cur.execute(
+        f"""
+        SELECT
+          fp.id_poste,
+          fp.id_owner,
+          fp.id_ent,
+          fp.codif_poste,
+          fp.codif_client,
+          fp.intitule_poste,
+          fp.id_service,
+          o.nom_service
+        FROM public.tbl_fiche_poste fp
+        LEFT JOIN public.tbl_entreprise_organigramme o
+          ON o.id_ent = fp.id_ent
+         AND o.id_service = fp.id_service
+         AND COALESCE(o.archive, FALSE) = FALSE
+        WHERE {poste_where}
+          AND COALESCE(fp.actif, TRUE) = TRUE
+        """,
+        (key,),
+    )
+    postes = []
+    for r in cur.fetchall() or []:
+        p = dict(r)
+        p["id_poste"] = _s(p.get("id_poste"))
+        if p["id_poste"]:
+            postes.append(p)
+
+    cur.execute(
+        f"""
+        SELECT
+          fp.id_poste,
+          c.id_comp,
+          c.code,
+          c.intitule,
+          c.description,
+          c.domaine,
+          c.etat,
+          COALESCE(c.masque, FALSE) AS masque,
+          COALESCE(fpc.masque, FALSE) AS fpc_masque,
+          fpc.niveau_requis,
+          fpc.poids_criticite,
+          fpc.freq_usage,
+          fpc.impact_resultat,
+          fpc.dependance,
+          fpc.date_valorisation
+        FROM public.tbl_fiche_poste fp
+        JOIN public.tbl_fiche_poste_competence fpc
+          ON fpc.id_poste = fp.id_poste
+        JOIN public.tbl_competence c
+          ON (c.id_comp = fpc.id_competence OR c.code = fpc.id_competence)
+         {comp_where}
+        WHERE {poste_where}
+          AND COALESCE(fp.actif, TRUE) = TRUE
+        ORDER BY lower(COALESCE(c.code, '')), lower(COALESCE(c.intitule, ''))
+        """,
+        params_links,
+    )
+    links = []
+    for r in cur.fetchall() or []:
+        link = dict(r)
+        link["id_poste"] = _s(link.get("id_poste"))
+        link["domaine"] = _s(link.get("domaine"))
+        links.append(link)
+
+    domaine_ids = sorted({link["domaine"] for link in links if link["domaine"]})
+    domaines: List[Dict[str, Any]] = []
+    if domaine_ids:
+        cur.execute(
+            """
+            SELECT
+              d.id_domaine_competence,
+              d.titre,
+              d.titre_court,
+              d.ordre_affichage,
+              d.couleur,
+              COALESCE(d.masque, FALSE) AS masque
+            FROM public.tbl_domaine_competence d
+            WHERE d.id_domaine_competence = ANY(%s)
+            """,
+            (domaine_ids,),
+        )
+        domaines = [dict(r) for r in (cur.fetchall() or [])]
+
+    return CartographieModel(kind, key, postes, links, domaines)
+
+
+def get_cartographie(cur, kind: str, key: str) -> CartographieModel:
+    ck = (kind, _s(key))
+    now = time.monotonic()
+    with _lock:
+        entry = _CACHE.get(ck)
+        if entry is not None and now - entry["loaded_at"] < CARTOGRAPHIE_CACHE_TTL_SECONDS:
+            _stats["hits"] += 1
+            return entry["model"]
+        generation = (_global_generation, _GENERATIONS.get(ck, 0))
+
+    model = _load(cur, kind, ck[1])
+
+    with _lock:
+        _stats["loads"] += 1
+        # Invalidation pendant le chargement : le modèle sert à cette requête mais n'est pas conservé
+        if (_global_generation, _GENERATIONS.get(ck, 0)) == generation:
+            _CACHE[ck] = {"model": model, "loaded_at": time.monotonic()}
+            while len(_CACHE) > max(1, CARTOGRAPHIE_CACHE_MAX_ITEMS):
+                oldest = min(_CACHE, key=lambda k: _CACHE[k]["loaded_at"])
+                _CACHE.pop(oldest, None)
+                _stats["evictions"] += 1
+    return model
+
+
+def _drop_locked(ck: Tuple[str, str]):
+    _GENERATIONS[ck] = _GENERATIONS.get(ck, 0) + 1
+    _CACHE.pop(ck, None)
+
+
+def invalidate_cartographie(id_owner: Optional[str] = None, id_ent: Optional[str] = None):
+    """
+    Invalide la cartographie d'un owner et/ou d'une entreprise (et les modèles qui les contiennent) ;
+    sans argument : tout le cache.
+    """
+    global _global_generation
+    oid, ent = _s(id_owner), _s(id_ent)
+    with _lock:
+        _stats["invalidations"] += 1
+        if not oid and not ent:
+            _global_generation += 1
+            _CACHE.clear()
+            return
+        if oid:
+            _drop_locked((KIND_OWNER, oid))
+        if ent:
+            _drop_locked((KIND_ENT, ent))
+        for ck, entry in list(_CACHE.items()):
+            model = entry["model"]
+            if (oid and oid in model.owners) or (ent and ent in model.ents):
+                _drop_locked(ck)
+
+
+def _on_data_change(id_scope: str, domaine: str):
+    # id owner ou entreprise : les deux portées sont invalidées
+    invalidate_cartographie(id_scope, id_scope)
+
+
+subscribe_data_changes(_on_data_change, domains=(DOMAIN_POSTES, DOMAIN_COMPETENCES, DOMAIN_ORGANIGRAMME))
+
+
+def cartographie_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "items": len(_CACHE),
+            "links": sum(len(e["model"].links) for e in _CACHE.values()),
+            "ttl_seconds": CARTOGRAPHIE_CACHE_TTL_SECONDS,
+        }
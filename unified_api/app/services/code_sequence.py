@@ -0,0 +1,268 @@
+# unified_api/app/services/code_sequence.py
+#
+# Numérotation des codes métier (PT0001, CO00001, PL00001, FC00001...) par séquence en base.
+#
+# - Une ligne par (portée, préfixe) dans tbl_code_sequence : dernier numéro attribué.
+#   La réservation est un UPDATE ... RETURNING dans la transaction de l'appelant : O(1),
+#   sans collision entre requêtes concurrentes (verrou de ligne jusqu'au commit) et sans trou
+#   si la création est annulée (le rollback annule aussi la réservation).
+# - Initialisation paresseuse : au premier appel d'une portée, la ligne est créée avec le
+#   plus grand numéro existant (seul parcours de la table, une fois par portée).
+# - Réservation de N codes consécutifs en un UPDATE : allocate_codes(..., count=N).
+# - Codes saisis ou importés au-delà du compteur : les numéros déjà pris sont sautés.
+# - Mémoire : plus haut numéro connu par portée (évite la requête d'initialisation ; stats).
+#
+# Patch SQL : sql/20261019_code_sequence.sql. Sans le patch : calcul MAX + 1 sous verrou
+# consultatif (comportement précédent).
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import threading
+
+from fastapi import HTTPException
+
+from app.services.schema_catalog import table_exists
+
+_TABLE = "tbl_code_sequence"
+
+_lock = threading.Lock()
+_HIGH_WATER: Dict[Tuple[str, str], int] = {}
+_COMP_PREFIX: Dict[str, str] = {}
+_stats = {"allocations": 0, "codes": 0, "seeds": 0, "skipped": 0, "fallbacks": 0}
+
+
+class CodeSequence:
+    """
+    Définition d'une numérotation : table / colonne du code, colonnes de portée, largeur.
+    """
+
+    def __init__(self, name: str, table: str, column: str, scope_columns: Sequence[str], width: int, prefix: str):
+        self.name = name
+        self.table = table
+        self.column = column
+        self.scope_columns = tuple(scope_columns)
+        self.width = width
+        self.prefix = prefix
+
+    def scope(self, scope_values: Sequence[Any]) -> str:
+        return ":".join([self.name] + [str(v or "").strip() for v in scope_values])
+
+    def where(self) -> str:
+        return " AND ".join(f"{c} = %s" for c in self.scope_columns)
+
+    def format(self, prefix: str, n: int) -> str:
+        return f"{prefix}{n:0{self.width}d}"
+
+    def limit(self) -> int:
+        return 10 ** self.width - 1
+
+
+POSTE_CODES = CodeSequence("poste", "public.tbl_fiche_poste", "codif_poste", ("id_owner", "id_ent"), 4, "PT")
+COMPETENCE_CODES = CodeSequence("competence", "public.tbl_competence", "code", ("id_owner",), 5, "CO")
+PLAN_CODES = CodeSequence("plan", "public.tbl_plan_pedagogique", "codification", ("id_owner",), 5, "PL")
+FORMATION_CODES = CodeSequence("formation", "public.tbl_fiche_formation", "code", ("id_owner",), 5, "FC")
+
+
+def _val(row: Any, key: str) -> Any:
+    if isinstance(row, dict):
+        return row.get(key)
+    return (row or [None])[0]
+
+
+def _limit_error(seq: CodeSequence, prefix: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"Limite de numérotation atteinte ({seq.format(prefix, seq.limit())}).")
+
+
+def _max_existing(cur, seq: CodeSequence, prefix: str, scope_values: Sequence[Any]) -> int:
+    cur.execute(
+        f"""
+        SELECT COALESCE(
+          MAX((regexp_match(upper({seq.column}), %s))[1]::int),
+          0
+        ) AS max_n
+        FROM {seq.table}
+        WHERE {seq.where()}
+          AND upper(COALESCE({seq.column}, '')) ~ %s
+        """,
+        (f"^{prefix}([0-9]{{{seq.width}}})$", *scope_values, f"^{prefix}[0-9]{{{seq.width}}}$"),
+    )
+    return int(_val(cur.fetchone(), "max_n") or 0)
+
+
+def _used_codes(cur, seq: CodeSequence, scope_values: Sequence[Any], codes: List[str]) -> set:
+    cur.execute(
+        f"""
+        SELECT upper({seq.column}) AS code
+        FROM {seq.table}
+        WHERE {seq.where()}
+          AND upper(COALESCE({seq.column}, '')) = ANY(%s)
+        """,
+        (*scope_values, codes),
+    )
+    return {str(_val(r, "code") or "") for r in (cur.fetchall() or [])}
+
+
+def _seed(cur, seq: CodeSequence, scope: str, prefix: str, scope_values: Sequence[Any]):
+    cur.execute(
+        f"""
+        INSERT INTO public.{_TABLE} (scope, prefix, dernier_numero)
+        SELECT %s, %s, COALESCE(MAX((regexp_match(upper({seq.column}), %s))[1]::int), 0)
+        FROM {seq.table}
+        WHERE {seq.where()}
+          AND upper(COALESCE({seq.column}, '')) ~ %s
+        ON CONFLICT (scope, prefix) DO NOTHING
+        """,
+        (scope, prefix, f"^{prefix}([0-9]{{{seq.width}}})$", *scope_values, f"^{prefix}[0-9]{{{seq.width}}}$"),
+    )
+    with _lock:
+        _stats["seeds"] += 1
+
+
+def _reserve(cur, seq: CodeSequence, scope: str, prefix: str, scope_values: Sequence[Any], count: int) -> int:
+    """
+    Réserve count numéros ; retourne le dernier numéro réservé.
+    """
+    key = (scope, prefix)
+    with _lock:
+        known = key in _HIGH_WATER
+
+    for attempt in range(2):
+        if not known or attempt:
+            _seed(cur, seq, scope, prefix, scope_values)
+        cur.execute(
+            f"""
+            UPDATE public.{_TABLE}
+            SET dernier_numero = dernier_numero + %s,
+                updated_at = NOW()
+            WHERE scope = %s
+              AND prefix = %s
+            RETURNING dernier_numero
+            """,
+            (count, scope, prefix),
+        )
+        row = cur.fetchone()
+        if row is not None:
+            last = int(_val(row, "dernier_numero") or 0)
+            with _lock:
+                _HIGH_WATER[key] = max(_HIGH_WATER.get(key, 0), last)
+            return last
+        # Ligne absente (mémoire d'un autre schéma / ligne supprimée) : initialisation
+        with _lock:
+            _HIGH_WATER.pop(key, None)
+    raise HTTPException(status_code=500, detail=f"Séquence de codes indisponible ({scope}).")
+
+
+def allocate_codes(
+    cur,
+    seq: CodeSequence,
+    scope_values: Sequence[Any],
+    count: int = 1,
+    prefix: Optional[str] = None,
+) -> List[str]:
+    """
+    Réserve count codes consécutifs (hors codes déjà présents) pour la portée.
+    Les codes sont acquis dès le commit de la transaction de l'appelant.
+    Appelants actuels : création unitaire (count=1) ; aucune création en lot à ce jour.
+    """
+    prefix = (prefix or seq.prefix).strip().upper()
+    count = max(1, int(count or 1))
+    scope = seq.scope(scope_values)
+
+    if not table_exists(cur, _TABLE):
+        # Patch non appliqué : MAX + 1 sous verrou consultatif
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"code_sequence:{scope}:{prefix}",))
+        start = _max_existing(cur, seq, prefix, scope_values) + 1
+        if start + count - 1 > seq.limit():
+            raise _limit_error(seq, prefix)
+        with _lock:
+            _stats["fallbacks"] += 1
+        return [seq.format(prefix, n) for n in range(start, start + count)]
+
+    codes: List[str] = []
+    needed = count
+    while needed:
+        last = _reserve(cur, seq, scope, prefix, scope_values, needed)
+        if last > seq.limit():
+            raise _limit_error(seq, prefix)
+        batch = [seq.format(prefix, n) for n in range(last - needed + 1, last + 1)]
+        used = _used_codes(cur, seq, scope_values, batch)
+        codes.extend(c for c in batch if c not in used)
+        needed = count - len(codes)
+        with _lock:
+            _stats["skipped"] += len(used)
+
+    with _lock:
+        _stats["allocations"] += 1
+        _stats["codes"] += count
+    return codes
+
+
+def peek_code(cur, seq: CodeSequence, scope_values: Sequence[Any], prefix: Optional[str] = None) -> str:
+    """
+    Prochain code probable (aperçu des écrans de création), sans réservation.
+    """
+    prefix = (prefix or seq.prefix).strip().upper()
+    scope = seq.scope(scope_values)
+
+    last = None
+    if table_exists(cur, _TABLE):
+        cur.execute(
+            f"SELECT dernier_numero FROM public.{_TABLE} WHERE scope = %s AND prefix = %s",
+            (scope, prefix),
+        )
+        row = cur.fetchone()
+        if row is not None:
+            last = int(_val(row, "dernier_numero") or 0)
+    if last is None:
+        last = _max_existing(cur, seq, prefix, scope_values)
+
+    # Codes saisis au-delà du compteur : on saute les numéros pris (fenêtre courte)
+    n = last + 1
+    while n <= seq.limit():
+        window = [seq.format(prefix, i) for i in range(n, min(n + 20, seq.limit() + 1))]
+        used = _used_codes(cur, seq, scope_values, window)
+        for code in window:
+            if code not in used:
+                return code
+        n += len(window)
+    raise _limit_error(seq, prefix)
+
+
+def competence_code_prefix(cur, id_owner: str) -> str:
+    """
+    Préfixe des codes compétence d'un owner (C ou CO) : celui des codes existants majoritaires,
+    CO par défaut. Calculé une fois par owner et par processus.
+    """
+    owner_id = (id_owner or "").strip()
+    with _lock:
+        cached = _COMP_PREFIX.get(owner_id)
+    if cached:
+        return cached
+
+    cur.execute(
+        """
+        SELECT upper(substring(code from '^(CO?)[0-9]{5}$')) AS prefix, COUNT(*) AS nb
+        FROM public.tbl_competence
+        WHERE id_owner = %s
+          AND upper(COALESCE(code, '')) ~ '^CO?[0-9]{5}$'
+        GROUP BY 1
+        ORDER BY COUNT(*) DESC,
+                 CASE WHEN upper(substring(code from '^(CO?)[0-9]{5}$')) = 'CO' THEN 0 ELSE 1 END
+        LIMIT 1
+        """,
+        (owner_id,),
+    )
+    prefix = str(_val(cur.fetchone(), "prefix") or "CO").strip().upper()
+    if prefix not in ("C", "CO"):
+        prefix = "CO"
+    with _lock:
+        _COMP_PREFIX[owner_id] = prefix
+    return prefix
+
+
+def code_sequence_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "scopes": len(_HIGH_WATER),
+            "owners_prefix": len(_COMP_PREFIX),
+        }
@@ -0,0 +1,221 @@
+# unified_api/app/services/compression.py
+#
+# Compression des réponses (brotli si la lib est installée et acceptée par le client, sinon gzip).
+#
+# - Uniquement au-delà de COMPRESSION_MIN_SIZE octets et pour les types de COMPRESSION_CONTENT_TYPES
+#   (préfixes : JSON, NDJSON, texte, HTML, JS, SVG). PDF, DOCX, images... sont déjà compressés.
+# - Réponse en un bloc : compressée d'un coup (Content-Length recalculé).
+#   Réponse en streaming (exports NDJSON) : compressée au fil de l'eau, chaque bloc est vidé
+#   (flush) pour ne pas retarder l'envoi au client.
+# - Ignorées : HEAD, 204 / 304, réponses déjà encodées (Content-Encoding présent).
+# - COMPRESSION_ENABLED=0 : désactivé.
+
+from typing import Any, Dict, List, Optional
+import gzip
+import os
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle
+    brotli = None
+
+COMPRESSION_ENABLED = (os.getenv("COMPRESSION_ENABLED", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024") or 1024)
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6") or 6)
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4") or 4)
+COMPRESSION_CONTENT_TYPES = tuple(
+    s.strip().lower()
+    for s in (
+        os.getenv(
+            "COMPRESSION_CONTENT_TYPES",
+            "application/json,application/x-ndjson,text/,application/javascript,image/svg+xml",
+        )
+        or ""
+    ).split(",")
+    if s.strip()
+)
+
+_lock = threading.Lock()
+_stats = {"responses": 0, "streamed": 0, "bytes_in": 0, "bytes_out": 0, "gzip": 0, "br": 0, "skipped_small": 0}
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in (header or "").lower().split(","):
+        bits = [b.strip() for b in part.split(";")]
+        if not bits[0]:
+            continue
+        q = 1.0
+        for b in bits[1:]:
+            if b.startswith("q="):
+                try:
+                    q = float(b[2:])
+                except ValueError:
+                    q = 0.0
+        out[bits[0]] = q
+    return out
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    acc = _accepted_encodings(accept_encoding)
+    if brotli is not None and acc.get("br", 0) > 0:
+        return "br"
+    if acc.get("gzip", acc.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def _compressible(content_type: str) -> bool:
+    ct = (content_type or "").lower()
+    return bool(ct) and any(ct.startswith(p) for p in COMPRESSION_CONTENT_TYPES)
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits 16+ : en-tête / pied gzip
+            self._c = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush(zlib.Z_FINISH)
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+
+def _record(encoding: str, n_in: int, n_out: int, streamed: bool = False):
+    with _lock:
+        _stats["responses"] += 1
+        _stats[encoding] += 1
+        _stats["bytes_in"] += n_in
+        _stats["bytes_out"] += n_out
+        if streamed:
+            _stats["streamed"] += 1
+
+
+def _with_headers(headers: List[Any], encoding: str, length: Optional[int]) -> List[Any]:
+    out = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"vary")]
+    vary = [v for k, v in headers if k.lower() == b"vary"]
+    vary_values = {x.strip().lower() for v in vary for x in v.split(b",") if x.strip()}
+    if b"accept-encoding" not in vary_values:
+        vary.append(b"Accept-Encoding")
+    out.append((b"vary", b", ".join(vary)))
+    out.append((b"content-encoding", encoding.encode("latin-1")))
+    if length is not None:
+        out.append((b"content-length", str(length).encode("latin-1")))
+    return out
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI (pas GZipMiddleware : seuil + liste de types + brotli).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http" or not COMPRESSION_ENABLED or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for k, v in scope.get("headers") or []:
+            if k == b"accept-encoding":
+                accept = v.decode("latin-1")
+                break
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state: Dict[str, Any] = {"start": None, "mode": None, "compressor": None, "n_in": 0, "n_out": 0}
+
+        async def send_wrapper(message):
+            mtype = message.get("type")
+            if mtype == "http.response.start":
+                headers = message.get("headers") or []
+                ctype, already = "", False
+                for k, v in headers:
+                    kl = k.lower()
+                    if kl == b"content-type":
+                        ctype = v.decode("latin-1")
+                    elif kl == b"content-encoding":
+                        already = True
+                status = int(message.get("status") or 200)
+                if already or status in (204, 304) or status < 200 or not _compressible(ctype):
+                    state["mode"] = "passthrough"
+                    await send(message)
+                    return
+                # Décision reportée au premier bloc (taille / streaming)
+                state["start"] = message
+                return
+
+            if mtype != "http.response.body" or state["mode"] == "passthrough":
+                await send(message)
+                return
+
+            body = message.get("body", b"") or b""
+            more = bool(message.get("more_body", False))
+
+            if state["mode"] is None:
+                start = state["start"]
+                if not more:
+                    if len(body) < COMPRESSION_MIN_SIZE:
+                        state["mode"] = "passthrough"
+                        with _lock:
+                            _stats["skipped_small"] += 1
+                        await send(start)
+                        await send(message)
+                        return
+                    out = compress_bytes(body, encoding)
+                    _record(encoding, len(body), len(out))
+                    await send({**start, "headers": _with_headers(start.get("headers") or [], encoding, len(out))})
+                    await send({"type": "http.response.body", "body": out, "more_body": False})
+                    state["mode"] = "done"
+                    return
+                state["mode"] = "stream"
+                state["compressor"] = _Compressor(encoding)
+                await send({**start, "headers": _with_headers(start.get("headers") or [], encoding, None)})
+
+            if state["mode"] != "stream":
+                await send(message)
+                return
+
+            c = state["compressor"]
+            out = c.chunk(body) if body else b""
+            if not more:
+                out += c.finish()
+            state["n_in"] += len(body)
+            state["n_out"] += len(out)
+            if out or not more:
+                await send({"type": "http.response.body", "body": out, "more_body": more})
+            if not more:
+                _record(encoding, state["n_in"], state["n_out"], streamed=True)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def compression_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "enabled": COMPRESSION_ENABLED,
+            "brotli_available": brotli is not None,
+            "min_size": COMPRESSION_MIN_SIZE,
+        }
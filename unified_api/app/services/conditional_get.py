@@ -0,0 +1,90 @@
+# unified_api/app/services/conditional_get.py
+#
+# GET conditionnels (ETag / If-None-Match) pour les routes d'analyse lourdes.
+#
+# - not_modified(request, response, *ids, domains=...) : à appeler dans la route une fois l'accès
+#   vérifié et les ids de périmètre résolus (entreprise, owner), avant tout calcul. L'ETag est
+#   dérivé du chemin, des paramètres, de la version des ids (cf. data_version) et d'une tranche
+#   de temps. Retourne une réponse 304 sans corps si le client a déjà cette version, sinon None
+#   (l'ETag est posé sur la Response injectée).
+# - Tranche : CONDITIONAL_GET_MAX_AGE_SECONDS tant que les versions sont locales au worker,
+#   CONDITIONAL_GET_SHARED_MAX_AGE_SECONDS quand elles sont partagées (LISTEN / NOTIFY actif) ;
+#   cette dernière ne couvre plus que les écritures faites hors de l'API.
+# - ETag faible (W/"...") : le corps peut être compressé ou non selon le client.
+# - Cache-Control: private, no-cache : le navigateur conserve la réponse mais revalide à chaque
+#   affichage.
+# - CONDITIONAL_GET_ENABLED=0 : désactivé (ni ETag ni 304).
+
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import os
+import threading
+import time
+
+from fastapi import Request, Response
+
+from app.services.data_version import ALL_DOMAINS, data_version, data_versions_shared
+
+CONDITIONAL_GET_ENABLED = (os.getenv("CONDITIONAL_GET_ENABLED", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+CONDITIONAL_GET_MAX_AGE_SECONDS = max(1, int(os.getenv("CONDITIONAL_GET_MAX_AGE_SECONDS", "180") or 180))
+CONDITIONAL_GET_SHARED_MAX_AGE_SECONDS = max(1, int(os.getenv("CONDITIONAL_GET_SHARED_MAX_AGE_SECONDS", "1800") or 1800))
+
+_CACHE_CONTROL = "private, no-cache"
+
+_lock = threading.Lock()
+_stats = {"etags": 0, "not_modified": 0}
+
+
+def request_etag(request: Request, *ids: Any, domains: Iterable[str] = ALL_DOMAINS) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    max_age = CONDITIONAL_GET_SHARED_MAX_AGE_SECONDS if data_versions_shared() else CONDITIONAL_GET_MAX_AGE_SECONDS
+    raw = "|".join([
+        request.url.path,
+        query,
+        ",".join(str(v) for v in data_version(*ids, domains=domains)),
+        f"{max_age}:{int(time.time() // max_age)}",
+    ])
+    return 'W/"' + hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest() + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Comparaison faible : W/ ignoré des deux côtés
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        c = candidate.strip()
+        if c.startswith("W/"):
+            c = c[2:]
+        if c == wanted:
+            return True
+    return False
+
+
+def not_modified(request: Request, response: Response, *ids: Any, domains: Iterable[str] = ALL_DOMAINS) -> Optional[Response]:
+    if not CONDITIONAL_GET_ENABLED or request.method not in ("GET", "HEAD"):
+        return None
+
+    etag = request_etag(request, *ids, domains=domains)
+    headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+    if _etag_matches(request.headers.get("If-None-Match", ""), etag):
+        with _lock:
+            _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    with _lock:
+        _stats["etags"] += 1
+    for k, v in headers.items():
+        response.headers[k] = v
+    return None
+
+
+def conditional_get_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "enabled": CONDITIONAL_GET_ENABLED,
+            "max_age_seconds": CONDITIONAL_GET_SHARED_MAX_AGE_SECONDS if data_versions_shared() else CONDITIONAL_GET_MAX_AGE_SECONDS,
+        }
@@ -0,0 +1,390 @@
+# unified_api/app/services/data_version.py
+#
+# Versions de données par (entreprise / owner, domaine), partagées entre workers.
+#
+# - Domaines : effectifs, postes, competences, audits, breaks, organigramme.
+# - bump_data_version(*ids, domains=...) : à appeler par les routes d'écriture (après commit) et
+#   les jobs de fond. Incrément local immédiat, puis diffusion aux autres workers : le thread
+#   d'écoute incrémente tbl_data_version (UPSERT ... RETURNING) et publie NOTIFY sur
+#   DATA_VERSION_CHANNEL.
+# - bump_owner_data_version(cur, id_owner, domains=...) : écritures sur le catalogue d'un owner
+#   (compétences, postes) ; incrémente aussi les entreprises dont les postes relèvent de ce owner
+#   (même cascade que cartographie_cache), leurs ETags Insights étant calculés par id_ent.
+# - Thread d'écoute (un par worker, connexion dédiée hors pool) : LISTEN, applique les versions
+#   reçues (max) et relit tbl_data_version à chaque (re)connexion, notifications manquées comprises.
+# - data_version(*ids, domains=...) : empreinte (génération globale, versions) pour les ETags,
+#   les caches et les instantanés (scénarios de simulation).
+# - subscribe_data_changes(fn, domains) : fn(id, domaine) appelé pour les changements venant des
+#   AUTRES workers (localement, les routes d'écriture invalident déjà leurs caches).
+# - DataVersionMiddleware : une requête POST / PUT / PATCH / DELETE réussie qui n'a appelé
+#   bump_data_version pour aucun id incrémente la génération globale (diffusée elle aussi) :
+#   les écritures non attribuées invalident les ETags de toutes les entreprises.
+# - data_versions_shared() : écoute active et synchronisée. Sinon, les versions ne sont que
+#   locales et les consommateurs gardent leur durée de validité courte.
+#
+# Patch SQL : sql/20261019_data_version.sql. Sans le patch, NOTIFY seul : les workers
+# incrémentent leur propre compteur (les numéros diffèrent, les invalidations sont diffusées)
+# et une reconnexion incrémente la génération globale (notifications manquées inconnues).
+# DATA_VERSION_LISTENER_ENABLED=0 : versions locales uniquement (comportement précédent).
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from app.services.schema_catalog import table_exists
+
+_log = logging.getLogger("data_version")
+
+DOMAIN_EFFECTIFS = "effectifs"
+DOMAIN_POSTES = "postes"
+DOMAIN_COMPETENCES = "competences"
+DOMAIN_AUDITS = "audits"
+DOMAIN_BREAKS = "breaks"
+DOMAIN_ORGANIGRAMME = "organigramme"
+ALL_DOMAINS = (
+    DOMAIN_EFFECTIFS,
+    DOMAIN_POSTES,
+    DOMAIN_COMPETENCES,
+    DOMAIN_AUDITS,
+    DOMAIN_BREAKS,
+    DOMAIN_ORGANIGRAMME,
+)
+
+DATA_VERSION_LISTENER_ENABLED = (os.getenv("DATA_VERSION_LISTENER_ENABLED", "1") or "1").strip().lower() in ("1", "true", "yes", "on")
+DATA_VERSION_CHANNEL = (os.getenv("DATA_VERSION_CHANNEL", "skillboard_data_version") or "skillboard_data_version").strip()
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "0.5") or 0.5)
+DATA_VERSION_RECONNECT_SECONDS = float(os.getenv("DATA_VERSION_RECONNECT_SECONDS", "5") or 5)
+DATA_VERSION_QUEUE_SIZE = int(os.getenv("DATA_VERSION_QUEUE_SIZE", "10000") or 10000)
+
+_TABLE = "tbl_data_version"
+_GLOBAL = ("*", "*")
+_UNSAFE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+_WORKER_ID = uuid.uuid4().hex[:12]
+
+_lock = threading.Lock()
+_VERSIONS: Dict[Tuple[str, str], int] = {}
+_subscribers: List[Tuple[Callable[[str, str], Any], Optional[frozenset]]] = []
+_outgoing: "queue.Queue[Tuple[str, str]]" = queue.Queue(maxsize=max(1, DATA_VERSION_QUEUE_SIZE))
+_listener: Dict[str, Any] = {"thread": None, "synced": False, "connected_once": False, "table": False, "last_error": None}
+_stats = {
+    "bumps": 0,
+    "write_requests": 0,
+    "published": 0,
+    "received": 0,
+    "remote_changes": 0,
+    "dropped": 0,
+    "reconnects": 0,
+    "resyncs": 0,
+}
+
+# Requête HTTP en cours : une écriture a-t-elle été attribuée à un id ?
+_request_writes = contextvars.ContextVar("data_version_request_writes", default=None)
+
+
+def _s(v: Any) -> str:
+    return str(v or "").strip()
+
+
+# ======================================================
+# Lecture
+# ======================================================
+def data_version(*ids: Any, domains: Iterable[str] = ALL_DOMAINS) -> Tuple[int, ...]:
+    doms = tuple(domains)
+    with _lock:
+        out = [_VERSIONS.get(_GLOBAL, 0)]
+        for x in ids:
+            k = _s(x)
+            out.extend(_VERSIONS.get((k, d), 0) for d in doms)
+        return tuple(out)
+
+
+def data_versions_shared() -> bool:
+    t = _listener.get("thread")
+    return bool(t is not None and t.is_alive() and _listener.get("synced"))
+
+
+def subscribe_data_changes(fn: Callable[[str, str], Any], domains: Optional[Iterable[str]] = None):
+    with _lock:
+        _subscribers.append((fn, frozenset(domains) if domains is not None else None))
+
+
+# ======================================================
+# Écriture
+# ======================================================
+def _publish(key: Tuple[str, str]):
+    t = _listener.get("thread")
+    if t is None or not t.is_alive():
+        return
+    try:
+        _outgoing.put_nowait(key)
+    except queue.Full:
+        with _lock:
+            _stats["dropped"] += 1
+
+
+def bump_data_version(*ids: Any, domains: Iterable[str] = ALL_DOMAINS):
+    """
+    Sans id : génération globale (toutes les entreprises).
+    """
+    keys = [k for k in (_s(x) for x in ids) if k]
+    pairs = [(k, d) for k in keys for d in domains] if keys else [_GLOBAL]
+    with _lock:
+        _stats["bumps"] += 1
+        for p in pairs:
+            _VERSIONS[p] = _VERSIONS.get(p, 0) + 1
+    rw = _request_writes.get()
+    if rw is not None and keys:
+        rw["attributed"] = True
+    for p in pairs:
+        _publish(p)
+
+
+def bump_owner_data_version(cur, id_owner: Any, domains: Iterable[str] = ALL_DOMAINS):
+    """
+    Owner + entreprises de ses postes. Entreprises introuvables : génération globale.
+    """
+    oid = _s(id_owner)
+    if not oid:
+        bump_data_version(domains=domains)
+        return
+    try:
+        cur.execute(
+            """
+            SELECT DISTINCT fp.id_ent
+            FROM public.tbl_fiche_poste fp
+            WHERE fp.id_owner = %s
+              AND fp.id_ent IS NOT NULL
+            """,
+            (oid,),
+        )
+        ents = [_s(r["id_ent"] if isinstance(r, dict) else r[0]) for r in cur.fetchall()]
+    except Exception as e:
+        _log.warning(f"[DATA_VERSION] entreprises du owner {oid}: {e}")
+        bump_data_version(domains=domains)
+        return
+    bump_data_version(oid, *[e for e in ents if e != oid], domains=domains)
+
+
+# ======================================================
+# Écoute (LISTEN / NOTIFY)
+# ======================================================
+def _notify_subscribers(id_scope: str, domaine: str):
+    with _lock:
+        subs = list(_subscribers)
+    for fn, doms in subs:
+        if doms is not None and domaine not in doms:
+            continue
+        try:
+            fn(id_scope, domaine)
+        except Exception as e:
+            _log.warning(f"[DATA_VERSION] abonné {getattr(fn, '__name__', fn)}: {e}")
+
+
+def _apply_remote(key: Tuple[str, str], version: Optional[int]) -> bool:
+    """
+    version None (sans patch SQL) : incrément local. Retourne True si la version a changé.
+    """
+    with _lock:
+        cur_v = _VERSIONS.get(key, 0)
+        new_v = cur_v + 1 if version is None else max(cur_v, int(version))
+        if new_v == cur_v:
+            return False
+        _VERSIONS[key] = new_v
+        _stats["remote_changes"] += 1
+    if key != _GLOBAL:
+        _notify_subscribers(key[0], key[1])
+    return True
+
+
+def _on_notify(payload: str):
+    try:
+        msg = json.loads(payload or "{}")
+        key = (_s(msg.get("s")), _s(msg.get("d")))
+        version = msg.get("v")
+    except Exception:
+        return
+    if not key[0] or not key[1]:
+        return
+    with _lock:
+        _stats["received"] += 1
+    if msg.get("w") == _WORKER_ID:
+        # Notre propre écriture : déjà appliquée, on aligne seulement le numéro sur la base
+        if version is not None:
+            with _lock:
+                _VERSIONS[key] = max(_VERSIONS.get(key, 0), int(version))
+        return
+    _apply_remote(key, version)
+
+
+def _resync(conn):
+    with conn.cursor() as cur:
+        has_table = table_exists(cur, _TABLE)
+        _listener["table"] = has_table
+        if not has_table:
+            if _listener.get("connected_once"):
+                # Notifications perdues pendant la coupure : on invalide tout
+                _apply_remote(_GLOBAL, None)
+            return
+        cur.execute(f"SELECT id_scope, domaine, version FROM public.{_TABLE}")
+        rows = cur.fetchall() or []
+    for r in rows:
+        _apply_remote((_s(r[0]), _s(r[1])), int(r[2] or 0))
+    with _lock:
+        _stats["resyncs"] += 1
+
+
+def _flush_outgoing(conn):
+    while True:
+        try:
+            key = _outgoing.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            version = _publish_one(conn, key)
+        except Exception:
+            # Reprise après reconnexion
+            try:
+                _outgoing.put_nowait(key)
+            except queue.Full:
+                with _lock:
+                    _stats["dropped"] += 1
+            raise
+        if version is not None:
+            with _lock:
+                _VERSIONS[key] = max(_VERSIONS.get(key, 0), version)
+        with _lock:
+            _stats["published"] += 1
+
+
+def _publish_one(conn, key: Tuple[str, str]) -> Optional[int]:
+    version = None
+    with conn.cursor() as cur:
+        if _listener.get("table"):
+            cur.execute(
+                f"""
+                INSERT INTO public.{_TABLE} (id_scope, domaine, version, updated_at)
+                VALUES (%s, %s, 1, NOW())
+                ON CONFLICT (id_scope, domaine)
+                DO UPDATE SET version = public.{_TABLE}.version + 1, updated_at = NOW()
+                RETURNING version
+                """,
+                key,
+            )
+            row = cur.fetchone()
+            version = int(row[0]) if row else None
+        payload = json.dumps({"s": key[0], "d": key[1], "v": version, "w": _WORKER_ID}, separators=(",", ":"))
+        cur.execute("SELECT pg_notify(%s, %s)", (DATA_VERSION_CHANNEL, payload))
+    return version
+
+
+def _connect():
+    from app.routers.skills_portal_common import _create_conn, _missing_env
+
+    if _missing_env():
+        return None
+    conn = _create_conn()
+    conn.autocommit = True
+    return conn
+
+
+def _listener_loop():
+    while True:
+        conn = None
+        try:
+            conn = _connect()
+            if conn is None:
+                _listener["last_error"] = {"at": time.time(), "error": "variables DB manquantes"}
+                return
+            conn.execute(f'LISTEN "{DATA_VERSION_CHANNEL}"')
+            _resync(conn)
+            _listener["connected_once"] = True
+            _listener["synced"] = True
+            while True:
+                _flush_outgoing(conn)
+                for n in conn.notifies(timeout=DATA_VERSION_POLL_SECONDS):
+                    _on_notify(n.payload)
+        except Exception as e:
+            _listener["synced"] = False
+            _listener["last_error"] = {"at": time.time(), "error": str(e)[:300]}
+            with _lock:
+                _stats["reconnects"] += 1
+            _log.warning(f"[DATA_VERSION] écoute interrompue: {e}")
+        finally:
+            _listener["synced"] = False
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(DATA_VERSION_RECONNECT_SECONDS)
+
+
+def start_data_version_listener():
+    if not DATA_VERSION_LISTENER_ENABLED:
+        return
+    t = _listener.get("thread")
+    if t is not None and t.is_alive():
+        return
+    with _lock:
+        t = _listener.get("thread")
+        if t is None or not t.is_alive():
+            t = threading.Thread(target=_listener_loop, name="data-version-listener", daemon=True)
+            _listener["thread"] = t
+            t.start()
+
+
+# ======================================================
+# Middleware
+# ======================================================
+def _record_write():
+    with _lock:
+        _stats["write_requests"] += 1
+    bump_data_version()
+
+
+class DataVersionMiddleware:
+    """
+    Middleware ASGI : génération globale incrémentée après chaque écriture réussie non attribuée.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http" or (scope.get("method") or "").upper() not in _UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+        rw = {"attributed": False}
+        tok = _request_writes.set(rw)
+
+        async def send_wrapper(message):
+            if message.get("type") == "http.response.start":
+                status["code"] = int(message.get("status") or 500)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_writes.reset(tok)
+            if status["code"] < 400 and not rw["attributed"]:
+                _record_write()
+
+
+def data_version_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "global_generation": _VERSIONS.get(_GLOBAL, 0),
+            "keys": len(_VERSIONS),
+            "queued": _outgoing.qsize(),
+            "shared": data_versions_shared(),
+            "sql_table": bool(_listener.get("table")),
+        }
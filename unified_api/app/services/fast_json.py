@@ -0,0 +1,115 @@
+# unified_api/app/services/fast_json.py
+#
+# Réponses JSON rapides pour les routes volumineuses (analyse, prévisions, simulation, listes).
+#
+# - json_dumps() : sérialisation native (orjson si installé, sinon json compact). Dates,
+#   Decimal, UUID, ensembles et modèles Pydantic sont gérés directement, sans passage
+#   préalable par jsonable_encoder.
+# - fast_json_response(content) : à retourner depuis la route. FastAPI ne repasse pas une
+#   Response dans jsonable_encoder et ne la revalide pas contre response_model (conservé pour
+#   la documentation OpenAPI) : réservé aux données déjà produites / validées par nos moteurs.
+# - FAST_JSON_RESPONSES=0 : retour au chemin FastAPI standard (le contenu est renvoyé tel quel).
+
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+import json
+import os
+import threading
+import time
+import uuid
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle
+    orjson = None
+
+FAST_JSON_RESPONSES = (os.getenv("FAST_JSON_RESPONSES", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+_SKIP_HEADERS = (b"content-length", b"content-type")
+
+_lock = threading.Lock()
+_stats = {"responses": 0, "bytes": 0, "encode_ms": 0.0, "model_responses": 0}
+
+
+def _decimal(v: Decimal) -> Any:
+    # Même rendu que jsonable_encoder : entier si pas de partie décimale
+    if v.as_tuple().exponent >= 0:
+        return int(v)
+    return float(v)
+
+
+def _default(v: Any) -> Any:
+    if isinstance(v, BaseModel):
+        return v.model_dump()
+    if isinstance(v, Decimal):
+        return _decimal(v)
+    if isinstance(v, (datetime, date, dt_time)):
+        return v.isoformat()
+    if isinstance(v, uuid.UUID):
+        return str(v)
+    if isinstance(v, (set, frozenset, tuple)):
+        return list(v)
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace")
+    return str(v)
+
+
+def json_dumps(content: Any) -> bytes:
+    """
+    JSON compact (UTF-8) ; un modèle Pydantic de tête est sérialisé par Pydantic (un seul passage).
+    """
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        t0 = time.perf_counter()
+        body = json_dumps(content)
+        ms = (time.perf_counter() - t0) * 1000.0
+        with _lock:
+            _stats["responses"] += 1
+            _stats["bytes"] += len(body)
+            _stats["encode_ms"] += ms
+            if isinstance(content, BaseModel):
+                _stats["model_responses"] += 1
+        return body
+
+
+def fast_json_response(content: Any, status_code: int = 200, response: Optional[Response] = None) -> Any:
+    """
+    response : Response injectée dans la route (en-têtes de pagination, cookies...) ; FastAPI ne
+    fusionne ses en-têtes que dans la réponse qu'il construit lui-même, on les reporte ici.
+    """
+    if not FAST_JSON_RESPONSES:
+        return content
+    out = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        out.raw_headers.extend((k, v) for k, v in response.raw_headers if k not in _SKIP_HEADERS)
+    return out
+
+
+def fast_json_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "encode_ms": round(_stats["encode_ms"], 1),
+            "enabled": FAST_JSON_RESPONSES,
+            "encoder": "orjson" if orjson is not None else "json",
+        }
@@ -0,0 +1,318 @@
+# unified_api/app/services/http_client.py
+#
+# Couche HTTP commune aux intégrations sortantes (Supabase, Graph/SharePoint, Mailjet, LMS).
+#
+# - Une session requests par hôte (keep-alive + pool de connexions) : plus de DNS/TCP/TLS
+#   à chaque appel.
+# - Paramètres par intégration : timeouts (connexion, lecture), nombre de tentatives, backoff.
+# - Retry uniquement sur les appels idempotents (GET/HEAD/PUT/DELETE/OPTIONS, ou idempotent=True)
+#   en cas d'erreur réseau ou de réponse 429/502/503/504 (Retry-After respecté, plafonné).
+# - Disjoncteur par intégration : après N échecs consécutifs, les appels échouent
+#   immédiatement (IntegrationUnavailable) pendant cooldown secondes, puis un appel test passe.
+# - Métriques par intégration : appels, erreurs, retries, coupures, latences.
+#
+# INTEGRATION_BASE_OVERRIDES (tests de charge / stack locale uniquement) : redirige le schéma+hôte
+# des appels, par intégration ou par hôte d'origine, ex. "graph=http://127.0.0.1:8900/graph,
+# https://api.mailjet.com=http://127.0.0.1:8900/mailjet".
+#
+# IntegrationUnavailable hérite de requests.ConnectionError : les gestionnaires existants
+# (except Exception / RequestException) continuent de fonctionner sans modification.
+
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_log = logging.getLogger("http_client")
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16") or 16)
+
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+_RETRY_STATUSES = {429, 502, 503, 504}
+_RETRY_AFTER_MAX_SECONDS = 5.0
+
+
+def _parse_base_overrides(raw: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for item in (raw or "").split(","):
+        k, sep, v = item.strip().partition("=")
+        if sep and k.strip() and v.strip():
+            out[k.strip().lower().rstrip("/")] = v.strip().rstrip("/")
+    return out
+
+
+_BASE_OVERRIDES = _parse_base_overrides(os.getenv("INTEGRATION_BASE_OVERRIDES", ""))
+
+
+# ======================================================
+# Configuration par intégration
+# - timeout : (connexion, lecture) en secondes
+# - retries : tentatives supplémentaires (appels idempotents)
+# - backoff : base du backoff exponentiel (secondes)
+# - breaker_threshold : échecs consécutifs avant ouverture du disjoncteur
+# - breaker_cooldown : durée d'ouverture (secondes)
+# ======================================================
+_DEFAULT_CONFIG: Dict[str, Any] = {
+    "timeout": (5.0, 30.0),
+    "retries": 2,
+    "backoff": 0.3,
+    "breaker_threshold": 5,
+    "breaker_cooldown": 30.0,
+}
+
+INTEGRATIONS: Dict[str, Dict[str, Any]] = {
+    "supabase_auth": {"timeout": (3.0, 15.0), "retries": 2},
+    "supabase_admin": {"timeout": (3.0, 20.0), "retries": 1},
+    "supabase_storage": {"timeout": (3.0, 30.0), "retries": 2},
+    "graph_auth": {"timeout": (5.0, 20.0), "retries": 2},
+    "graph": {"timeout": (5.0, 60.0), "retries": 2},
+    "mailjet": {"timeout": (5.0, 20.0), "retries": 0, "breaker_threshold": 3, "breaker_cooldown": 60.0},
+    "lms": {"timeout": (5.0, 45.0), "retries": 0},
+}
+
+
+def integration_config(integration: str) -> Dict[str, Any]:
+    cfg = dict(_DEFAULT_CONFIG)
+    cfg.update(INTEGRATIONS.get(integration) or {})
+    return cfg
+
+
+class IntegrationUnavailable(requests.ConnectionError):
+    """
+    Disjoncteur ouvert : le partenaire est considéré indisponible, l'appel n'est pas tenté.
+    """
+
+
+def _apply_base_override(integration: str, url: str) -> str:
+    if not _BASE_OVERRIDES:
+        return url
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}".lower()
+    base = _BASE_OVERRIDES.get(integration) or _BASE_OVERRIDES.get(origin)
+    if not base:
+        return url
+    return base + url[len(origin):]
+
+
+# ======================================================
+# Sessions par hôte
+# ======================================================
+_sessions_lock = threading.Lock()
+_SESSIONS: Dict[str, requests.Session] = {}
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_session(url: str) -> requests.Session:
+    key = _host_key(url)
+    s = _SESSIONS.get(key)
+    if s is not None:
+        return s
+    with _sessions_lock:
+        s = _SESSIONS.get(key)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _SESSIONS[key] = s
+        return s
+
+
+def close_sessions():
+    with _sessions_lock:
+        for s in _SESSIONS.values():
+            try:
+                s.close()
+            except Exception:
+                pass
+        _SESSIONS.clear()
+
+
+# ======================================================
+# Disjoncteur + métriques
+# ======================================================
+_state_lock = threading.Lock()
+_BREAKERS: Dict[str, Dict[str, Any]] = {}
+_METRICS: Dict[str, Dict[str, Any]] = {}
+
+
+def _metrics(integration: str) -> Dict[str, Any]:
+    m = _METRICS.get(integration)
+    if m is None:
+        m = {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "short_circuits": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "status": {},
+            "last_error": None,
+        }
+        _METRICS[integration] = m
+    return m
+
+
+def _breaker_allow(integration: str, cfg: Dict[str, Any]) -> bool:
+    with _state_lock:
+        b = _BREAKERS.get(integration)
+        if not b or b.get("opened_at") is None:
+            return True
+        if time.time() - b["opened_at"] >= float(cfg["breaker_cooldown"]):
+            # demi-ouvert : un seul appel test à la fois
+            if b.get("probing"):
+                return False
+            b["probing"] = True
+            return True
+        return False
+
+
+def _breaker_record(integration: str, cfg: Dict[str, Any], ok: bool):
+    with _state_lock:
+        b = _BREAKERS.setdefault(integration, {"failures": 0, "opened_at": None, "probing": False})
+        if ok:
+            b["failures"] = 0
+            b["opened_at"] = None
+            b["probing"] = False
+            return
+        b["failures"] += 1
+        b["probing"] = False
+        if b["failures"] >= int(cfg["breaker_threshold"]):
+            if b["opened_at"] is None:
+                _log.warning(f"[HTTP] circuit ouvert integration={integration} failures={b['failures']}")
+            b["opened_at"] = time.time()
+
+
+def _record_call(integration: str, elapsed_ms: float, status: Optional[int], error: Optional[str]):
+    with _state_lock:
+        m = _metrics(integration)
+        m["calls"] += 1
+        m["total_ms"] += elapsed_ms
+        m["max_ms"] = max(m["max_ms"], elapsed_ms)
+        k = str(status) if status is not None else "exception"
+        m["status"][k] = int(m["status"].get(k) or 0) + 1
+        if error:
+            m["errors"] += 1
+            m["last_error"] = {"at": time.time(), "error": error[:300]}
+
+
+def _bump(integration: str, field: str):
+    with _state_lock:
+        m = _metrics(integration)
+        m[field] += 1
+
+
+def _retry_delay(cfg: Dict[str, Any], attempt: int, response: Optional[requests.Response]) -> float:
+    if response is not None:
+        ra = (response.headers.get("Retry-After") or "").strip()
+        if ra.isdigit():
+            return min(float(ra), _RETRY_AFTER_MAX_SECONDS)
+    base = float(cfg["backoff"]) * (2 ** attempt)
+    return base + random.uniform(0, base / 2)
+
+
+# ======================================================
+# API
+# ======================================================
+def integration_request(
+    integration: str,
+    method: str,
+    url: str,
+    *,
+    idempotent: Optional[bool] = None,
+    timeout: Optional[Any] = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Appel HTTP via la session poolée de l'hôte.
+    Retourne la Response (aucune exception sur les statuts HTTP : l'appelant garde sa gestion).
+    Lève requests.RequestException sur erreur réseau, IntegrationUnavailable si disjoncteur ouvert.
+    """
+    cfg = integration_config(integration)
+    m = (method or "GET").upper()
+    can_retry = idempotent if idempotent is not None else (m in _IDEMPOTENT_METHODS)
+    max_attempts = 1 + (int(cfg["retries"]) if can_retry else 0)
+    eff_timeout = timeout if timeout is not None else cfg["timeout"]
+
+    if not _breaker_allow(integration, cfg):
+        _bump(integration, "short_circuits")
+        raise IntegrationUnavailable(f"Intégration {integration} indisponible (circuit ouvert).")
+
+    url = _apply_base_override(integration, url)
+    session = get_session(url)
+    attempt = 0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            r = session.request(m, url, timeout=eff_timeout, **kwargs)
+        except requests.RequestException as e:
+            _record_call(integration, (time.perf_counter() - t0) * 1000, None, str(e))
+            attempt += 1
+            if attempt < max_attempts:
+                _bump(integration, "retries")
+                time.sleep(_retry_delay(cfg, attempt - 1, None))
+                continue
+            _breaker_record(integration, cfg, ok=False)
+            raise
+
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        server_error = r.status_code >= 500 or r.status_code == 429
+        _record_call(integration, elapsed_ms, r.status_code, f"HTTP {r.status_code}" if server_error else None)
+
+        attempt += 1
+        if r.status_code in _RETRY_STATUSES and attempt < max_attempts:
+            _bump(integration, "retries")
+            time.sleep(_retry_delay(cfg, attempt - 1, r))
+            r.close()
+            continue
+
+        _breaker_record(integration, cfg, ok=not server_error)
+        return r
+
+
+def integration_get(integration: str, url: str, **kwargs) -> requests.Response:
+    return integration_request(integration, "GET", url, **kwargs)
+
+
+def integration_post(integration: str, url: str, **kwargs) -> requests.Response:
+    return integration_request(integration, "POST", url, **kwargs)
+
+
+def integration_put(integration: str, url: str, **kwargs) -> requests.Response:
+    return integration_request(integration, "PUT", url, **kwargs)
+
+
+def integration_delete(integration: str, url: str, **kwargs) -> requests.Response:
+    return integration_request(integration, "DELETE", url, **kwargs)
+
+
+def integration_http_stats() -> Dict[str, Any]:
+    with _state_lock:
+        out: Dict[str, Any] = {}
+        for name, m in _METRICS.items():
+            b = _BREAKERS.get(name) or {}
+            calls = int(m["calls"]) or 1
+            out[name] = {
+                "calls": m["calls"],
+                "errors": m["errors"],
+                "retries": m["retries"],
+                "short_circuits": m["short_circuits"],
+                "avg_ms": round(m["total_ms"] / calls, 1),
+                "max_ms": round(m["max_ms"], 1),
+                "status": dict(m["status"]),
+                "last_error": m["last_error"],
+                "circuit_open": b.get("opened_at") is not None,
+                "consecutive_failures": int(b.get("failures") or 0),
+            }
+        out["_sessions"] = sorted(_SESSIONS.keys())
+        return out
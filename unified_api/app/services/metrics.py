@@ -0,0 +1,360 @@
+# unified_api/app/services/metrics.py
+#
+# Métriques process (format texte Prometheus) + journal des requêtes lentes.
+#
+# - MetricsMiddleware : positionne current_endpoint ("GET /chemin") pour la requête, mesure la
+#   latence par route (gabarit FastAPI, ex. /studio/collaborateurs/{id_owner}) en histogramme,
+#   et agrège le SQL + l'attente pool de la requête.
+# - InstrumentedCursor : curseur psycopg (cursor_factory des connexions du pool) qui compte
+#   les requêtes SQL et leur durée, globalement et pour la requête HTTP en cours
+#   (et alimente le profil SQL si la requête est profilée, cf. sql_profiler).
+# - record_pool_wait : temps d'attente à l'acquisition d'une connexion du pool, par priorité
+#   (interactive / batch).
+# - register_metrics_source(nom, fn) : expose les stats d'un service (dict de nombres)
+#   en gauges skillboard_<nom>_<clé>.
+# - Requête > METRICS_SLOW_REQUEST_MS : log WARNING avec les requêtes SQL les plus coûteuses,
+#   et conservation des METRICS_SLOW_LOG_SIZE dernières (recent_slow_requests()).
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+
+import psycopg
+
+from app.services.sql_profiler import is_profiling, profile_statement
+
+_log = logging.getLogger("metrics")
+
+METRICS_ENABLED = (os.getenv("METRICS_ENABLED", "1") or "").strip().lower() not in ("0", "false", "no")
+METRICS_SLOW_REQUEST_MS = float(os.getenv("METRICS_SLOW_REQUEST_MS", "1000") or 1000)
+METRICS_SLOW_LOG_SIZE = int(os.getenv("METRICS_SLOW_LOG_SIZE", "50") or 50)
+METRICS_SLOW_TOP_STATEMENTS = int(os.getenv("METRICS_SLOW_TOP_STATEMENTS", "5") or 5)
+
+# Bornes des histogrammes (ms)
+_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+_POOL_WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+current_endpoint = contextvars.ContextVar("current_endpoint", default="?")
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+_lock = threading.Lock()
+_routes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_status: Dict[Tuple[str, str, str], int] = {}
+_sql = {"statements": 0, "ms": 0.0, "errors": 0}
+_pool_wait: Dict[str, Dict[str, Any]] = {}
+_slow: Deque[Dict[str, Any]] = deque(maxlen=max(1, METRICS_SLOW_LOG_SIZE))
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+_WS_RE = re.compile(r"\s+")
+
+
+# ======================================================
+# Contexte requête
+# ======================================================
+def _new_request_stats() -> Dict[str, Any]:
+    return {"sql_count": 0, "sql_ms": 0.0, "pool_wait_ms": 0.0, "statements": {}}
+
+
+def _statement_key(query: Any) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    return f"<{type(query).__name__}>"
+
+
+def record_sql(query: Any, ms: float, error: bool = False):
+    with _lock:
+        _sql["statements"] += 1
+        _sql["ms"] += ms
+        if error:
+            _sql["errors"] += 1
+
+    rs = _request_stats.get()
+    if rs is None:
+        return
+    rs["sql_count"] += 1
+    rs["sql_ms"] += ms
+    key = _statement_key(query)
+    st = rs["statements"].get(key)
+    if st is None:
+        rs["statements"][key] = [1, ms]
+    else:
+        st[0] += 1
+        st[1] += ms
+
+
+def record_pool_wait(ms: float, priority: str = "interactive"):
+    with _lock:
+        pw = _pool_wait.get(priority)
+        if pw is None:
+            pw = {"count": 0, "ms": 0.0, "buckets": [0] * len(_POOL_WAIT_BUCKETS_MS)}
+            _pool_wait[priority] = pw
+        pw["count"] += 1
+        pw["ms"] += ms
+        for i, b in enumerate(_POOL_WAIT_BUCKETS_MS):
+            if ms <= b:
+                pw["buckets"][i] += 1
+
+    rs = _request_stats.get()
+    if rs is not None:
+        rs["pool_wait_ms"] += ms
+
+
+# ======================================================
+# Curseur instrumenté (cursor_factory psycopg)
+# ======================================================
+class InstrumentedCursor(psycopg.Cursor):
+    def execute(self, query, params=None, **kwargs):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            res = super().execute(query, params, **kwargs)
+            ok = True
+            return res
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            record_sql(query, ms, error=not ok)
+            if ok and is_profiling():
+                profile_statement(self, query, params, ms)
+
+    def executemany(self, query, params_seq, **kwargs):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            res = super().executemany(query, params_seq, **kwargs)
+            ok = True
+            return res
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            record_sql(query, ms, error=not ok)
+            if ok and is_profiling():
+                profile_statement(self, query, None, ms, many=True)
+
+
+# ======================================================
+# Middleware
+# ======================================================
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return path or "<non_route>"
+
+
+def _top_statements(rs: Dict[str, Any], n: int) -> List[Dict[str, Any]]:
+    items = sorted(rs["statements"].items(), key=lambda kv: kv[1][1], reverse=True)[: max(0, n)]
+    return [
+        {"sql": _WS_RE.sub(" ", k).strip()[:300], "count": v[0], "ms": round(v[1], 1)}
+        for k, v in items
+    ]
+
+
+def _record_request(method: str, route: str, status: int, ms: float, rs: Dict[str, Any], path: str):
+    status_class = f"{int(status) // 100}xx"
+    with _lock:
+        r = _routes.get((method, route))
+        if r is None:
+            r = {"count": 0, "ms": 0.0, "buckets": [0] * len(_LATENCY_BUCKETS_MS), "sql_count": 0, "sql_ms": 0.0, "pool_wait_ms": 0.0}
+            _routes[(method, route)] = r
+        r["count"] += 1
+        r["ms"] += ms
+        for i, b in enumerate(_LATENCY_BUCKETS_MS):
+            if ms <= b:
+                r["buckets"][i] += 1
+        r["sql_count"] += rs["sql_count"]
+        r["sql_ms"] += rs["sql_ms"]
+        r["pool_wait_ms"] += rs["pool_wait_ms"]
+        k = (method, route, status_class)
+        _status[k] = _status.get(k, 0) + 1
+
+    if ms < METRICS_SLOW_REQUEST_MS:
+        return
+
+    entry = {
+        "ts": time.time(),
+        "method": method,
+        "route": route,
+        "path": path,
+        "status": int(status),
+        "ms": round(ms, 1),
+        "sql_count": rs["sql_count"],
+        "sql_ms": round(rs["sql_ms"], 1),
+        "pool_wait_ms": round(rs["pool_wait_ms"], 1),
+        "top_statements": _top_statements(rs, METRICS_SLOW_TOP_STATEMENTS),
+    }
+    with _lock:
+        _slow.append(entry)
+    _log.warning(
+        f"[SLOW] {method} {path} status={entry['status']} ms={entry['ms']} "
+        f"sql={entry['sql_count']}/{entry['sql_ms']}ms pool_wait={entry['pool_wait_ms']}ms "
+        f"top={entry['top_statements']}"
+    )
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (pas BaseHTTPMiddleware : ne bufferise pas les réponses en streaming).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method") or "?"
+        path = scope.get("path") or ""
+        rs = _new_request_stats()
+        tok_ep = current_endpoint.set(f"{method} {path}")
+        tok_rs = _request_stats.set(rs)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message.get("type") == "http.response.start":
+                status["code"] = int(message.get("status") or 500)
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            current_endpoint.reset(tok_ep)
+            _request_stats.reset(tok_rs)
+            try:
+                _record_request(method, _route_label(scope), status["code"], ms, rs, path)
+            except Exception:
+                pass
+
+
+# ======================================================
+# Export
+# ======================================================
+def sql_totals() -> Dict[str, Any]:
+    """
+    Compteurs SQL cumulés du process (statements, ms, errors) : mesure par différence.
+    """
+    with _lock:
+        return dict(_sql)
+
+
+def register_metrics_source(name: str, fn: Callable[[], Dict[str, Any]]):
+    _sources[(name or "").strip()] = fn
+
+
+def recent_slow_requests(limit: int = 50) -> List[Dict[str, Any]]:
+    with _lock:
+        items = list(_slow)
+    return list(reversed(items))[: max(0, int(limit or 0))]
+
+
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _metric_name(*parts: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(p for p in parts if p)).lower()
+
+
+def _num(v: Any) -> Optional[float]:
+    if isinstance(v, bool):
+        return 1.0 if v else 0.0
+    if isinstance(v, (int, float)):
+        return float(v)
+    return None
+
+
+def _histogram_lines(name: str, labels: str, buckets_def, buckets, count: int, total: float) -> List[str]:
+    # buckets : compteurs déjà cumulatifs (une observation incrémente toutes les bornes >= valeur)
+    out = []
+    for b, c in zip(buckets_def, buckets):
+        out.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{b}"}} {c}')
+    out.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {count}')
+    out.append(f"{name}_sum{{{labels}}} {total / 1000.0:.6f}" if labels else f"{name}_sum {total / 1000.0:.6f}")
+    out.append(f"{name}_count{{{labels}}} {count}" if labels else f"{name}_count {count}")
+    return out
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    with _lock:
+        routes = {k: {**v, "buckets": list(v["buckets"])} for k, v in _routes.items()}
+        status = dict(_status)
+        sql = dict(_sql)
+        pool_wait = {k: {**v, "buckets": list(v["buckets"])} for k, v in _pool_wait.items()}
+
+    # Requêtes HTTP (bornes en secondes, convention Prometheus)
+    lines.append("# TYPE skillboard_http_request_duration_seconds histogram")
+    for (method, route), r in sorted(routes.items()):
+        labels = f'method="{_esc(method)}",route="{_esc(route)}"'
+        out = _histogram_lines(
+            "skillboard_http_request_duration_seconds",
+            labels,
+            [b / 1000.0 for b in _LATENCY_BUCKETS_MS],
+            r["buckets"],
+            r["count"],
+            r["ms"],
+        )
+        lines.extend(out)
+
+    lines.append("# TYPE skillboard_http_requests_total counter")
+    for (method, route, sc), n in sorted(status.items()):
+        lines.append(f'skillboard_http_requests_total{{method="{_esc(method)}",route="{_esc(route)}",status="{sc}"}} {n}')
+
+    lines.append("# TYPE skillboard_http_request_sql_statements_total counter")
+    for (method, route), r in sorted(routes.items()):
+        lines.append(f'skillboard_http_request_sql_statements_total{{method="{_esc(method)}",route="{_esc(route)}"}} {r["sql_count"]}')
+    lines.append("# TYPE skillboard_http_request_sql_seconds_total counter")
+    for (method, route), r in sorted(routes.items()):
+        lines.append(f'skillboard_http_request_sql_seconds_total{{method="{_esc(method)}",route="{_esc(route)}"}} {r["sql_ms"] / 1000.0:.6f}')
+    lines.append("# TYPE skillboard_http_request_pool_wait_seconds_total counter")
+    for (method, route), r in sorted(routes.items()):
+        lines.append(f'skillboard_http_request_pool_wait_seconds_total{{method="{_esc(method)}",route="{_esc(route)}"}} {r["pool_wait_ms"] / 1000.0:.6f}')
+
+    # SQL (toutes origines : requêtes HTTP + jobs de fond)
+    lines.append("# TYPE skillboard_sql_statements_total counter")
+    lines.append(f"skillboard_sql_statements_total {sql['statements']}")
+    lines.append("# TYPE skillboard_sql_errors_total counter")
+    lines.append(f"skillboard_sql_errors_total {sql['errors']}")
+    lines.append("# TYPE skillboard_sql_seconds_total counter")
+    lines.append(f"skillboard_sql_seconds_total {sql['ms'] / 1000.0:.6f}")
+
+    # Attente pool
+    lines.append("# TYPE skillboard_db_pool_acquire_wait_seconds histogram")
+    for priority, pw in sorted(pool_wait.items()):
+        lines.extend(
+            _histogram_lines(
+                "skillboard_db_pool_acquire_wait_seconds",
+                f'priority="{_esc(priority)}"',
+                [b / 1000.0 for b in _POOL_WAIT_BUCKETS_MS],
+                pw["buckets"],
+                pw["count"],
+                pw["ms"],
+            )
+        )
+
+    # Stats des services (gauges)
+    for src_name, fn in sorted(_sources.items()):
+        try:
+            stats = fn() or {}
+        except Exception:
+            continue
+        for k, v in stats.items():
+            n = _num(v)
+            if n is not None:
+                lines.append(f"{_metric_name('skillboard', src_name, k)} {n:g}")
+            elif isinstance(v, dict):
+                metric = _metric_name("skillboard", src_name, k)
+                for k2, v2 in v.items():
+                    n2 = _num(v2)
+                    if n2 is not None:
+                        lines.append(f'{metric}{{key="{_esc(k2)}"}} {n2:g}')
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,438 @@
+# unified_api/app/services/notification_queue.py
+#
+# File persistante des notifications (mails) des formulaires de formation.
+#
+# - enqueue_notification(cur, ...) : enregistre l'intention dans la transaction métier
+#   (tbl_notification_queue, cf. sql/20261019_notification_queue.sql). Rien n'est envoyé
+#   si la transaction est annulée ; la requête ne dépend plus de Mailjet.
+# - Un dispatcher (thread) traite la file : les notifications d'un même groupe
+#   (type + clé de regroupement, ex. une formation) sont envoyées en un seul appel
+#   au handler après NOTIFICATION_COALESCE_SECONDS (digest).
+# - Retries avec backoff exponentiel, statut de délivrance (a_envoyer / en_cours / envoye /
+#   echec / ignore), verrou de traitement avec expiration (plusieurs workers possibles :
+#   FOR UPDATE SKIP LOCKED).
+# - Table absente (script SQL non appliqué) : repli sur une file mémoire traitée par
+#   le même dispatcher (non persistante). Chaque entrée porte l'id de la transaction
+#   métier (txid_current) : envoyée seulement une fois celle-ci validée (txid_status),
+#   abandonnée si elle est annulée.
+# - Digest : un groupe échu embarque ses notifications jamais tentées ; celles en attente
+#   de retry gardent leur backoff (prochaine_tentative).
+#
+# Les handlers sont enregistrés par type (register_notification_handler) et reçoivent la
+# liste des payloads du groupe. Ils retournent True si l'envoi a réussi, False sinon
+# (retry), ou lèvent NotificationSkipped si l'envoi n'a pas lieu d'être (config absente...).
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from psycopg.rows import dict_row
+
+from app.services.admission_control import PRIORITY_BATCH, db_priority
+from app.services.schema_catalog import table_exists
+
+_log = logging.getLogger("notification_queue")
+
+NOTIFICATION_TABLE = "tbl_notification_queue"
+
+# Modules enregistrant les handlers (chargés au démarrage du dispatcher)
+NOTIFICATION_HANDLER_MODULES = ("app.routers.MailManager",)
+
+NOTIFICATION_DISPATCHER_ENABLED = (os.getenv("NOTIFICATION_DISPATCHER_ENABLED", "1") or "1").strip().lower() in ("1", "true", "yes", "on")
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "15") or 15)
+NOTIFICATION_COALESCE_SECONDS = int(os.getenv("NOTIFICATION_COALESCE_SECONDS", "120") or 0)
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "6") or 6)
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "60") or 60)
+NOTIFICATION_LOCK_SECONDS = int(os.getenv("NOTIFICATION_LOCK_SECONDS", "300") or 300)
+NOTIFICATION_GROUPS_PER_CYCLE = int(os.getenv("NOTIFICATION_GROUPS_PER_CYCLE", "20") or 20)
+
+
+class NotificationSkipped(Exception):
+    """
+    Levée par un handler : la notification ne sera pas envoyée (statut 'ignore', sans retry).
+    """
+
+
+_HANDLERS: Dict[str, Callable[[List[Dict[str, Any]]], bool]] = {}
+
+_lock = threading.Lock()
+_MEMORY_QUEUE: List[Dict[str, Any]] = []
+_stats = {"enqueued": 0, "enqueued_memory": 0, "rolled_back_memory": 0, "sent": 0, "coalesced": 0, "retries": 0, "failed": 0, "skipped": 0, "cycles": 0}
+_dispatcher: Dict[str, Any] = {"thread": None, "last_cycle": None, "last_error": None}
+_wake = threading.Event()
+
+
+def register_notification_handler(type_notification: str, handler: Callable[[List[Dict[str, Any]]], bool]):
+    _HANDLERS[type_notification] = handler
+
+
+# ======================================================
+# Enregistrement (dans la transaction métier)
+# ======================================================
+def enqueue_notification(
+    cur,
+    type_notification: str,
+    payload: Dict[str, Any],
+    cle_regroupement: Optional[str] = None,
+) -> str:
+    """
+    Enregistre une notification à envoyer. À appeler avant conn.commit() de l'écriture métier.
+    Retourne l'id de notification.
+    """
+    id_notification = str(uuid.uuid4())
+    cle = str(cle_regroupement) if cle_regroupement is not None else None
+
+    if table_exists(cur, NOTIFICATION_TABLE):
+        cur.execute(
+            """
+            INSERT INTO public.tbl_notification_queue
+              (id_notification, type_notification, cle_regroupement, payload, statut, prochaine_tentative)
+            VALUES (%s, %s, %s, %s::jsonb, 'a_envoyer', now() + make_interval(secs => %s))
+            """,
+            (
+                id_notification,
+                type_notification,
+                cle,
+                json.dumps(payload, ensure_ascii=False, default=str),
+                NOTIFICATION_COALESCE_SECONDS,
+            ),
+        )
+        with _lock:
+            _stats["enqueued"] += 1
+    else:
+        # Transaction de l'appelant : l'envoi attend son commit (cf. _confirm_memory_commits)
+        cur.execute("SELECT txid_current() AS xid")
+        row = cur.fetchone()
+        xid = row.get("xid") if isinstance(row, dict) else (row or [None])[0]
+        with _lock:
+            _MEMORY_QUEUE.append(
+                {
+                    "id_notification": id_notification,
+                    "xid": int(xid) if xid is not None else None,
+                    "type_notification": type_notification,
+                    "cle_regroupement": cle,
+                    "payload": payload,
+                    "due": time.time() + NOTIFICATION_COALESCE_SECONDS,
+                    "nb_tentatives": 0,
+                }
+            )
+            _stats["enqueued_memory"] += 1
+
+    start_notification_dispatcher()
+    return id_notification
+
+
+# ======================================================
+# Dispatch
+# ======================================================
+def _run_handler(type_notification: str, payloads: List[Dict[str, Any]]) -> str:
+    """
+    Retourne 'envoye', 'ignore' ou 'retry'.
+    """
+    handler = _HANDLERS.get(type_notification)
+    if handler is None:
+        _log.warning(f"[NOTIF] aucun handler pour type={type_notification}")
+        return "retry"
+    try:
+        ok = handler(payloads)
+    except NotificationSkipped as e:
+        _log.info(f"[NOTIF] ignorée type={type_notification}: {e}")
+        return "ignore"
+    except Exception as e:
+        _log.warning(f"[NOTIF] handler en échec type={type_notification}: {e}")
+        return "retry"
+    return "envoye" if ok else "retry"
+
+
+def _retry_delay(nb_tentatives: int) -> int:
+    return NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(0, nb_tentatives - 1))
+
+
+def _record_outcome(outcome: str, n: int, final_failure: bool):
+    with _lock:
+        if outcome == "envoye":
+            _stats["sent"] += 1
+            _stats["coalesced"] += max(0, n - 1)
+        elif outcome == "ignore":
+            _stats["skipped"] += 1
+        elif final_failure:
+            _stats["failed"] += 1
+        else:
+            _stats["retries"] += 1
+
+
+def _dispatch_db_group(type_notification: str, cle: Optional[str]) -> int:
+    from app.routers.skills_portal_common import get_conn
+
+    id_envoi = str(uuid.uuid4())
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(
+                """
+                UPDATE public.tbl_notification_queue q
+                SET statut = 'en_cours',
+                    verrou_jusqua = now() + make_interval(secs => %s),
+                    id_envoi = %s,
+                    nb_tentatives = q.nb_tentatives + 1,
+                    updated_at = now()
+                WHERE q.id_notification IN (
+                  SELECT id_notification
+                  FROM public.tbl_notification_queue
+                  WHERE type_notification = %s
+                    AND cle_regroupement IS NOT DISTINCT FROM %s
+                    AND (
+                      -- groupe échu : on embarque aussi ses notifications plus récentes (digest),
+                      -- sans avancer celles en attente de retry (backoff)
+                      (statut = 'a_envoyer' AND (prochaine_tentative <= now() OR nb_tentatives = 0))
+                      OR (statut = 'en_cours' AND verrou_jusqua < now())
+                    )
+                  ORDER BY created_at
+                  FOR UPDATE SKIP LOCKED
+                )
+                RETURNING q.id_notification, q.payload, q.nb_tentatives, q.created_at
+                """,
+                (NOTIFICATION_LOCK_SECONDS, id_envoi, type_notification, cle),
+            )
+            rows = cur.fetchall() or []
+        conn.commit()
+
+    if not rows:
+        return 0
+
+    rows.sort(key=lambda r: r.get("created_at") or datetime.min.replace(tzinfo=timezone.utc))
+    payloads = [r.get("payload") or {} for r in rows]
+    outcome = _run_handler(type_notification, payloads)
+    attempts = max(int(r.get("nb_tentatives") or 0) for r in rows)
+    final_failure = outcome == "retry" and attempts >= NOTIFICATION_MAX_ATTEMPTS
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            if outcome in ("envoye", "ignore"):
+                cur.execute(
+                    """
+                    UPDATE public.tbl_notification_queue
+                    SET statut = %s,
+                        verrou_jusqua = NULL,
+                        date_envoi = CASE WHEN %s = 'envoye' THEN now() ELSE NULL END,
+                        derniere_erreur = NULL,
+                        updated_at = now()
+                    WHERE id_envoi = %s
+                    """,
+                    (outcome, outcome, id_envoi),
+                )
+            else:
+                cur.execute(
+                    """
+                    UPDATE public.tbl_notification_queue
+                    SET statut = %s,
+                        verrou_jusqua = NULL,
+                        prochaine_tentative = now() + make_interval(secs => %s),
+                        derniere_erreur = %s,
+                        updated_at = now()
+                    WHERE id_envoi = %s
+                    """,
+                    (
+                        "echec" if final_failure else "a_envoyer",
+                        _retry_delay(attempts),
+                        f"Envoi en échec (tentative {attempts}/{NOTIFICATION_MAX_ATTEMPTS})",
+                        id_envoi,
+                    ),
+                )
+        conn.commit()
+
+    _record_outcome(outcome, len(rows), final_failure)
+    return len(rows)
+
+
+def _dispatch_db() -> int:
+    from app.routers.skills_portal_common import get_conn
+
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            if not table_exists(cur, NOTIFICATION_TABLE):
+                return 0
+            cur.execute(
+                """
+                SELECT type_notification, cle_regroupement
+                FROM public.tbl_notification_queue
+                WHERE (statut = 'a_envoyer' AND prochaine_tentative <= now())
+                   OR (statut = 'en_cours' AND verrou_jusqua < now())
+                GROUP BY type_notification, cle_regroupement
+                ORDER BY min(prochaine_tentative)
+                LIMIT %s
+                """,
+                (NOTIFICATION_GROUPS_PER_CYCLE,),
+            )
+            groups = cur.fetchall() or []
+        conn.commit()
+
+    done = 0
+    for g in groups:
+        done += _dispatch_db_group(g.get("type_notification"), g.get("cle_regroupement"))
+    return done
+
+
+def _confirm_memory_commits():
+    """
+    File mémoire : statut des transactions métier en attente. Validée : entrée
+    envoyable ; annulée (ou inconnue) : entrée retirée ; en cours : attente du cycle suivant.
+    """
+    from app.routers.skills_portal_common import get_conn
+
+    with _lock:
+        xids = {it["xid"] for it in _MEMORY_QUEUE if it.get("xid") is not None}
+    if not xids:
+        return
+
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    "SELECT u.xid, txid_status(u.xid) AS statut FROM unnest(%s::bigint[]) AS u(xid)",
+                    (sorted(xids),),
+                )
+                status = {int(r["xid"]): r.get("statut") for r in (cur.fetchall() or [])}
+            conn.commit()
+    except Exception as e:
+        _log.warning(f"[NOTIF] statut des transactions (file mémoire) indisponible: {e}")
+        return
+
+    with _lock:
+        kept = []
+        for it in _MEMORY_QUEUE:
+            x = it.get("xid")
+            if x is not None and x in status:
+                if status[x] == "committed":
+                    it["xid"] = None
+                elif status[x] != "in progress":
+                    _stats["rolled_back_memory"] += 1
+                    continue
+            kept.append(it)
+        _MEMORY_QUEUE[:] = kept
+
+
+def _dispatch_memory() -> int:
+    now = time.time()
+    _confirm_memory_commits()
+    with _lock:
+        ready = [it for it in _MEMORY_QUEUE if it.get("xid") is None]
+        due_keys = {(it["type_notification"], it["cle_regroupement"]) for it in ready if it["due"] <= now}
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        remaining = []
+        for it in _MEMORY_QUEUE:
+            k = (it["type_notification"], it["cle_regroupement"])
+            # Digest : entrées validées du groupe, hors retries non échus (backoff)
+            if k in due_keys and it.get("xid") is None and (it["due"] <= now or it["nb_tentatives"] == 0):
+                groups.setdefault(k, []).append(it)
+            else:
+                remaining.append(it)
+        _MEMORY_QUEUE[:] = remaining
+
+    done = 0
+    for (type_notification, _cle), items in groups.items():
+        outcome = _run_handler(type_notification, [it["payload"] for it in items])
+        attempts = max(it["nb_tentatives"] for it in items) + 1
+        final_failure = outcome == "retry" and attempts >= NOTIFICATION_MAX_ATTEMPTS
+        _record_outcome(outcome, len(items), final_failure)
+        if outcome == "retry" and not final_failure:
+            with _lock:
+                for it in items:
+                    it["nb_tentatives"] = attempts
+                    it["due"] = time.time() + _retry_delay(attempts)
+                    _MEMORY_QUEUE.append(it)
+        done += len(items)
+    return done
+
+
+def dispatch_notifications() -> int:
+    """
+    Un cycle du dispatcher (appelable directement, ex. script / tâche planifiée).
+    Retourne le nombre de notifications traitées.
+    """
+    done = _dispatch_memory()
+    try:
+        done += _dispatch_db()
+    except Exception as e:
+        _dispatcher["last_error"] = {"at": time.time(), "error": str(e)[:300]}
+        _log.warning(f"[NOTIF] cycle DB en échec: {e}")
+    with _lock:
+        _stats["cycles"] += 1
+    _dispatcher["last_cycle"] = time.time()
+    return done
+
+
+def _load_handlers():
+    for mod in NOTIFICATION_HANDLER_MODULES:
+        try:
+            importlib.import_module(mod)
+        except Exception as e:
+            _log.warning(f"[NOTIF] handlers {mod} non chargés: {e}")
+
+
+def _dispatcher_loop():
+    _load_handlers()
+    while True:
+        _wake.wait(NOTIFICATION_POLL_SECONDS)
+        _wake.clear()
+        try:
+            with db_priority(PRIORITY_BATCH):
+                dispatch_notifications()
+        except Exception as e:
+            _log.warning(f"[NOTIF] dispatcher: {e}")
+
+
+def start_notification_dispatcher():
+    if not NOTIFICATION_DISPATCHER_ENABLED:
+        return
+    t = _dispatcher.get("thread")
+    if t is not None and t.is_alive():
+        return
+    with _lock:
+        t = _dispatcher.get("thread")
+        if t is None or not t.is_alive():
+            t = threading.Thread(target=_dispatcher_loop, name="notification-dispatcher", daemon=True)
+            _dispatcher["thread"] = t
+            t.start()
+
+
+def wake_notification_dispatcher():
+    _wake.set()
+
+
+# ======================================================
+# Suivi
+# ======================================================
+def notification_status(cur, id_notification: str) -> Optional[Dict[str, Any]]:
+    if not table_exists(cur, NOTIFICATION_TABLE):
+        return None
+    with cur.connection.cursor(row_factory=dict_row) as ccur:
+        ccur.execute(
+            """
+            SELECT id_notification, type_notification, cle_regroupement, statut,
+                   nb_tentatives, prochaine_tentative, id_envoi, derniere_erreur,
+                   created_at, date_envoi
+            FROM public.tbl_notification_queue
+            WHERE id_notification = %s
+            """,
+            (id_notification,),
+        )
+        return ccur.fetchone()
+
+
+def notification_queue_stats() -> Dict[str, Any]:
+    t = _dispatcher.get("thread")
+    with _lock:
+        return {
+            "dispatcher_alive": bool(t is not None and t.is_alive()),
+            "last_cycle": _dispatcher.get("last_cycle"),
+            "last_error": _dispatcher.get("last_error"),
+            "memory_pending": len(_MEMORY_QUEUE),
+            "handlers": sorted(_HANDLERS.keys()),
+            **_stats,
+        }
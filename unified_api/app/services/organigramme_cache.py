@@ -0,0 +1,148 @@
+# unified_api/app/services/organigramme_cache.py
+#
+# Organigramme en mémoire par entreprise (services actifs de tbl_entreprise_organigramme).
+#
+# - Modèle : parent / enfants par service, ensemble des descendants précalculé pour chaque
+#   service (service inclus), services actifs (détection "non lié").
+# - Remplace le parcours WITH RECURSIVE répété dans chaque requête d'analyse : le moteur
+#   injecte une liste plate `id_service = ANY(%s)`.
+# - Invalidation par les routes de création / modification / archivage de service, et par les
+#   changements "organigramme" des autres workers (cf. data_version) ;
+#   filet de sécurité : TTL (écritures hors de ces routes).
+# - Les modèles sont partagés entre requêtes : les appelants ne les modifient pas.
+
+from typing import Any, Dict, FrozenSet, List, Optional
+import os
+import threading
+import time
+
+from app.services.data_version import DOMAIN_ORGANIGRAMME, subscribe_data_changes
+
+ORGANIGRAMME_CACHE_TTL_SECONDS = int(os.getenv("ORGANIGRAMME_CACHE_TTL_SECONDS", "300") or 300)
+ORGANIGRAMME_CACHE_MAX_ITEMS = int(os.getenv("ORGANIGRAMME_CACHE_MAX_ITEMS", "512") or 512)
+
+_lock = threading.Lock()
+_CACHE: Dict[str, Dict[str, Any]] = {}
+_GENERATIONS: Dict[str, int] = {}
+_global_generation = 0
+_stats = {"hits": 0, "loads": 0, "invalidations": 0, "evictions": 0}
+
+
+class Organigramme:
+    def __init__(self, id_ent: str, rows: List[Dict[str, Any]]):
+        self.id_ent = id_ent
+        self.noms: Dict[str, str] = {}
+        self.parents: Dict[str, Optional[str]] = {}
+        self.children: Dict[str, List[str]] = {}
+
+        for r in rows:
+            sid = str(r["id_service"])
+            parent = r.get("id_service_parent")
+            self.noms[sid] = r.get("nom_service") or ""
+            self.parents[sid] = str(parent) if parent else None
+        for sid, parent in self.parents.items():
+            if parent and parent in self.parents:
+                self.children.setdefault(parent, []).append(sid)
+
+        self.active_ids: FrozenSet[str] = frozenset(self.parents)
+        self._descendants: Dict[str, FrozenSet[str]] = {sid: self._walk(sid) for sid in self.parents}
+
+    def _walk(self, root: str) -> FrozenSet[str]:
+        # Parcours itératif (protégé contre un éventuel cycle en base)
+        seen = {root}
+        stack = [root]
+        while stack:
+            for child in self.children.get(stack.pop(), ()):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return frozenset(seen)
+
+    def descendants(self, id_service: str) -> FrozenSet[str]:
+        """
+        Service + descendants actifs ; vide si le service est absent / archivé.
+        """
+        return self._descendants.get(id_service, frozenset())
+
+    def is_linked(self, id_service: Optional[str]) -> bool:
+        return bool(id_service) and id_service in self.active_ids
+
+    def roots(self) -> List[str]:
+        return [sid for sid, parent in self.parents.items() if not parent or parent not in self.parents]
+
+
+def _ent_key(id_ent: Any) -> str:
+    return str(id_ent or "").strip()
+
+
+def _load(cur, id_ent: str) -> Organigramme:
+    cur.execute(
+        """
+        SELECT o.id_service, o.id_service_parent, o.nom_service
+        FROM public.tbl_entreprise_organigramme o
+        WHERE o.id_ent = %s
+          AND o.archive = FALSE
+        """,
+        (id_ent,),
+    )
+    rows = []
+    for r in cur.fetchall() or []:
+        if isinstance(r, dict):
+            rows.append(r)
+        else:
+            rows.append({"id_service": r[0], "id_service_parent": r[1], "nom_service": r[2]})
+    return Organigramme(id_ent, rows)
+
+
+def get_organigramme(cur, id_ent: str) -> Organigramme:
+    key = _ent_key(id_ent)
+    now = time.monotonic()
+    with _lock:
+        entry = _CACHE.get(key)
+        if entry is not None and now - entry["loaded_at"] < ORGANIGRAMME_CACHE_TTL_SECONDS:
+            _stats["hits"] += 1
+            return entry["model"]
+        generation = (_global_generation, _GENERATIONS.get(key, 0))
+
+    model = _load(cur, key)
+
+    with _lock:
+        _stats["loads"] += 1
+        # Invalidation pendant le chargement : le modèle sert à cette requête mais n'est pas conservé
+        if (_global_generation, _GENERATIONS.get(key, 0)) == generation:
+            _CACHE[key] = {"model": model, "loaded_at": time.monotonic()}
+            while len(_CACHE) > max(1, ORGANIGRAMME_CACHE_MAX_ITEMS):
+                oldest = min(_CACHE, key=lambda k: _CACHE[k]["loaded_at"])
+                _CACHE.pop(oldest, None)
+                _stats["evictions"] += 1
+    return model
+
+
+def invalidate_organigramme(id_ent: Optional[str] = None):
+    global _global_generation
+    with _lock:
+        _stats["invalidations"] += 1
+        if id_ent is None:
+            _global_generation += 1
+            _CACHE.clear()
+            return
+        key = _ent_key(id_ent)
+        _GENERATIONS[key] = _GENERATIONS.get(key, 0) + 1
+        _CACHE.pop(key, None)
+
+
+def _on_data_change(id_scope: str, domaine: str):
+    invalidate_organigramme(id_scope)
+
+
+subscribe_data_changes(_on_data_change, domains=(DOMAIN_ORGANIGRAMME,))
+
+
+def organigramme_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "items": len(_CACHE),
+            "services": sum(len(e["model"].active_ids) for e in _CACHE.values()),
+            "ttl_seconds": ORGANIGRAMME_CACHE_TTL_SECONDS,
+        }
@@ -0,0 +1,280 @@
+# unified_api/app/services/pagination.py
+#
+# Contrat de pagination commun aux listes volumineuses (Studio / Insights).
+#
+# - Pagination par clé (keyset) : le client envoie page_size (+ cursor pour la suite).
+#   Sans page_size, les routes gardent leur réponse historique complète.
+# - Curseur opaque : base64url(JSON) contenant la dernière clé de tri, l'estimation
+#   du total et une empreinte des filtres (un curseur n'est valable que pour sa requête).
+# - Métadonnées : en-têtes X-Page-* sur toutes les routes paginées, et bloc "page"
+#   dans le corps lorsque la réponse est un objet.
+# - Export NDJSON : curseur serveur (DECLARE/FETCH) lu par lots, mémoire constante.
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import base64
+import hashlib
+import json
+import uuid
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from psycopg.rows import dict_row
+
+
+PAGE_SIZE_DEFAULT = 200
+PAGE_SIZE_MAX = 1000
+STREAM_BATCH_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_KEY_PREFIX = "_pg_k"
+
+
+# ======================================================
+# Curseur opaque
+# ======================================================
+def _cursor_value_dump(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return {"dt": v.isoformat()}
+    if isinstance(v, date):
+        return {"d": v.isoformat()}
+    if isinstance(v, Decimal):
+        return {"n": str(v)}
+    return v
+
+
+def _cursor_value_load(v: Any) -> Any:
+    if isinstance(v, dict):
+        if "dt" in v:
+            return datetime.fromisoformat(v["dt"])
+        if "d" in v:
+            return date.fromisoformat(v["d"])
+        if "n" in v:
+            return Decimal(v["n"])
+    return v
+
+
+def _scope_fingerprint(scope: Any) -> str:
+    raw = json.dumps(scope, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    s = (cursor or "").strip()
+    try:
+        raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+        js = json.loads(raw.decode("utf-8"))
+        if not isinstance(js, dict):
+            raise ValueError("cursor")
+        return js
+    except Exception:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide.")
+
+
+def page_request(
+    page_size: Optional[int],
+    cursor: Optional[str],
+    scope: Any,
+    default_size: int = PAGE_SIZE_DEFAULT,
+    max_size: int = PAGE_SIZE_MAX,
+) -> Optional[Dict[str, Any]]:
+    """
+    Normalise les paramètres de pagination d'une route.
+    Retourne None si le client n'a rien demandé (réponse historique complète).
+
+    scope : filtres effectifs de la requête ; un curseur émis pour d'autres filtres est refusé.
+    """
+    c = (cursor or "").strip()
+    if page_size is None and not c:
+        return None
+
+    try:
+        size = int(page_size) if page_size is not None else int(default_size)
+    except Exception:
+        raise HTTPException(status_code=400, detail="page_size invalide.")
+    size = max(1, min(size, int(max_size)))
+
+    fp = _scope_fingerprint(scope)
+    req = {"size": size, "after": None, "offset": 0, "total": None, "scope": fp}
+
+    if c:
+        js = decode_cursor(c)
+        if js.get("s") != fp:
+            raise HTTPException(status_code=400, detail="Curseur de pagination non valable pour ces filtres.")
+        after = js.get("k")
+        req["after"] = [_cursor_value_load(v) for v in after] if isinstance(after, list) else None
+        req["offset"] = max(0, int(js.get("o") or 0))
+        req["total"] = js.get("t")
+
+    return req
+
+
+# ======================================================
+# Keyset SQL
+# - sort_keys : [(expression SQL non nulle, "asc" | "desc"), ...]
+# - la dernière clé doit être unique (id) pour un ordre total
+# ======================================================
+def keyset_order_by(sort_keys: List[Tuple[str, str]]) -> str:
+    return ", ".join(f"{expr} {'DESC' if (d or '').lower() == 'desc' else 'ASC'}" for expr, d in sort_keys)
+
+
+def keyset_select(sort_keys: List[Tuple[str, str]]) -> str:
+    return "".join(f",\n  {expr} AS {_KEY_PREFIX}{i}" for i, (expr, _d) in enumerate(sort_keys))
+
+
+def keyset_where(sort_keys: List[Tuple[str, str]], after: Optional[list]) -> Tuple[str, list]:
+    """
+    Condition "strictement après la dernière clé vue".
+    Même sens partout : comparaison de ligne (utilise l'index) ; sinon expansion OR.
+    """
+    if not after:
+        return "", []
+    if len(after) != len(sort_keys):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide.")
+
+    dirs = {(d or "asc").lower() for _e, d in sort_keys}
+    if len(dirs) == 1:
+        op = "<" if dirs == {"desc"} else ">"
+        cols = ", ".join(e for e, _d in sort_keys)
+        marks = ", ".join(["%s"] * len(sort_keys))
+        return f"({cols}) {op} ({marks})", list(after)
+
+    ors: List[str] = []
+    params: List[Any] = []
+    for i, (expr, d) in enumerate(sort_keys):
+        parts = [f"{sort_keys[j][0]} = %s" for j in range(i)]
+        params.extend(after[:i])
+        parts.append(f"{expr} {'<' if (d or '').lower() == 'desc' else '>'} %s")
+        params.append(after[i])
+        ors.append("(" + " AND ".join(parts) + ")")
+    return "(" + " OR ".join(ors) + ")", params
+
+
+def _row_key(row: Dict[str, Any], n: int) -> list:
+    return [row.get(f"{_KEY_PREFIX}{i}") for i in range(n)]
+
+
+def page_finish(
+    rows: List[Dict[str, Any]],
+    req: Dict[str, Any],
+    sort_keys: List[Tuple[str, str]],
+    total: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    rows : résultat d'une requête LIMIT size + 1 (la ligne en trop signale la page suivante).
+    Retourne (rows de la page, métadonnées page).
+    """
+    size = int(req["size"])
+    has_more = len(rows) > size
+    page_rows = rows[:size]
+    t = total if total is not None else req.get("total")
+
+    next_cursor = None
+    if has_more and page_rows:
+        next_cursor = encode_cursor(
+            {
+                "k": [_cursor_value_dump(v) for v in _row_key(page_rows[-1], len(sort_keys))],
+                "t": t,
+                "s": req["scope"],
+            }
+        )
+
+    return page_rows, {
+        "page_size": size,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "total_estimate": t,
+    }
+
+
+def paginate_items(items: List[Any], req: Dict[str, Any]) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Variante pour les listes calculées en mémoire (tri métier non exprimable en SQL) :
+    le curseur porte un décalage dans la liste triée.
+    """
+    size = int(req["size"])
+    start = int(req.get("offset") or 0)
+    page = items[start:start + size]
+    has_more = start + size < len(items)
+    total = len(items)
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor({"o": start + size, "t": total, "s": req["scope"]})
+    return page, {
+        "page_size": size,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "total_estimate": total,
+    }
+
+
+def apply_page_headers(response: Response, page: Optional[Dict[str, Any]]):
+    if response is None or not page:
+        return
+    response.headers["X-Page-Size"] = str(page.get("page_size") or "")
+    response.headers["X-Page-Has-More"] = "1" if page.get("has_more") else "0"
+    if page.get("next_cursor"):
+        response.headers["X-Page-Next-Cursor"] = page["next_cursor"]
+    if page.get("total_estimate") is not None:
+        response.headers["X-Page-Total-Estimate"] = str(page["total_estimate"])
+
+
+# ======================================================
+# Export NDJSON (curseur serveur)
+# ======================================================
+def iter_server_cursor(
+    conn,
+    sql: str,
+    params: Any = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Exécute sql via un curseur serveur nommé et renvoie les lignes par lots.
+    La connexion reste dans sa transaction : d'autres requêtes peuvent être
+    exécutées entre deux lots (enrichissement par lot).
+    """
+    name = f"ns_stream_{uuid.uuid4().hex[:12]}"
+    with conn.cursor(name=name, row_factory=dict_row) as scur:
+        scur.itersize = int(batch_size)
+        scur.execute(sql, params)
+        while True:
+            batch = scur.fetchmany(int(batch_size))
+            if not batch:
+                break
+            yield batch
+
+
+def _ndjson_default(v: Any):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, uuid.UUID):
+        return str(v)
+    return str(v)
+
+
+def ndjson_line(item: Any) -> bytes:
+    return (json.dumps(item, default=_ndjson_default, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def ndjson_response(items: Iterable[Any], filename: Optional[str] = None) -> StreamingResponse:
+    def _gen():
+        for it in items:
+            yield ndjson_line(it)
+
+    headers = {}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(_gen(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def is_ndjson_format(fmt: Optional[str]) -> bool:
+    return (fmt or "").strip().lower() in ("ndjson", "jsonl", "stream")
+
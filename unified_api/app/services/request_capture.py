@@ -0,0 +1,317 @@
+# unified_api/app/services/request_capture.py
+#
+# Capture des soumissions de formulaires (debug / support), en remplacement des
+# fichiers JSON écrits à chaque requête dans app/routers/cache/.
+#
+# - Ring buffer en mémoire par route (taille bornée) + index par id de capture.
+# - Échantillonnage par route (REQUEST_CAPTURE_SAMPLE_RATE, 1 = tout capturer).
+# - Écriture disque asynchrone : un thread vide la file par lots dans des fichiers
+#   JSONL gzip, avec rotation (taille max par fichier, nombre max de fichiers).
+#   REQUEST_CAPTURE_DIR vide = mémoire uniquement ; REQUEST_CAPTURE_ENABLED=0 = désactivé.
+# - capture_request() ne bloque jamais la requête : file pleine = capture disque abandonnée
+#   (comptée dans les stats), la copie mémoire reste disponible.
+# - get_capture(id) : recherche mémoire puis fichiers (du plus récent au plus ancien).
+
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import uuid
+
+_log = logging.getLogger("request_capture")
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    v = (os.getenv(name) or "").strip().lower()
+    if not v:
+        return default
+    return v in ("1", "true", "yes", "on")
+
+
+REQUEST_CAPTURE_ENABLED = _env_bool("REQUEST_CAPTURE_ENABLED", True)
+REQUEST_CAPTURE_SAMPLE_RATE = float(os.getenv("REQUEST_CAPTURE_SAMPLE_RATE", "1") or 1)
+REQUEST_CAPTURE_RING_SIZE = int(os.getenv("REQUEST_CAPTURE_RING_SIZE", "200") or 200)
+REQUEST_CAPTURE_DIR = os.getenv(
+    "REQUEST_CAPTURE_DIR",
+    str(Path(__file__).resolve().parent.parent / "routers" / "cache"),
+).strip()
+REQUEST_CAPTURE_FLUSH_SECONDS = float(os.getenv("REQUEST_CAPTURE_FLUSH_SECONDS", "5") or 5)
+REQUEST_CAPTURE_BATCH_SIZE = int(os.getenv("REQUEST_CAPTURE_BATCH_SIZE", "200") or 200)
+REQUEST_CAPTURE_QUEUE_SIZE = int(os.getenv("REQUEST_CAPTURE_QUEUE_SIZE", "5000") or 5000)
+REQUEST_CAPTURE_FILE_MAX_BYTES = int(os.getenv("REQUEST_CAPTURE_FILE_MAX_BYTES", str(5 * 1024 * 1024)) or 0)
+REQUEST_CAPTURE_MAX_FILES = int(os.getenv("REQUEST_CAPTURE_MAX_FILES", "20") or 20)
+
+_FILE_PREFIX = "capture_"
+_FILE_SUFFIX = ".jsonl.gz"
+
+_lock = threading.Lock()
+_RINGS: Dict[str, Deque[Dict[str, Any]]] = {}
+_INDEX: Dict[str, Dict[str, Any]] = {}
+_PENDING: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(1, REQUEST_CAPTURE_QUEUE_SIZE))
+_stats = {"captured": 0, "sampled_out": 0, "dropped": 0, "flushed": 0, "flush_errors": 0, "files_rotated": 0}
+
+_writer_lock = threading.Lock()
+_writer: Dict[str, Any] = {"thread": None, "path": None}
+_wake = threading.Event()
+
+
+def _persist_enabled() -> bool:
+    return bool(REQUEST_CAPTURE_DIR)
+
+
+def _to_jsonable(payload: Any) -> Any:
+    if hasattr(payload, "model_dump"):
+        try:
+            return payload.model_dump(mode="json")
+        except Exception:
+            return payload.model_dump()
+    return payload
+
+
+# ======================================================
+# Capture
+# ======================================================
+def capture_request(route: str, payload: Any, ref: Optional[str] = None) -> Optional[str]:
+    """
+    Capture une soumission (payload dict ou modèle pydantic).
+    ref : identifiant métier (id_action_formation_effectif, ...) pour la recherche support.
+    Retourne l'id de capture, ou None si non capturée (désactivé / échantillonnage).
+    """
+    if not REQUEST_CAPTURE_ENABLED:
+        return None
+    route = str(route or "").strip() or "unknown"
+    if REQUEST_CAPTURE_SAMPLE_RATE < 1 and random.random() >= REQUEST_CAPTURE_SAMPLE_RATE:
+        with _lock:
+            _stats["sampled_out"] += 1
+        return None
+
+    item = {
+        "id": uuid.uuid4().hex,
+        "route": route,
+        "ref": str(ref) if ref is not None else None,
+        "at": datetime.now(timezone.utc).isoformat(),
+        "payload": _to_jsonable(payload),
+    }
+
+    with _lock:
+        ring = _RINGS.get(route)
+        if ring is None:
+            ring = deque(maxlen=max(1, REQUEST_CAPTURE_RING_SIZE))
+            _RINGS[route] = ring
+        if len(ring) == ring.maxlen:
+            _INDEX.pop(ring[0]["id"], None)
+        ring.append(item)
+        _INDEX[item["id"]] = item
+        _stats["captured"] += 1
+
+    if _persist_enabled():
+        _ensure_writer()
+        try:
+            _PENDING.put_nowait(item)
+        except queue.Full:
+            with _lock:
+                _stats["dropped"] += 1
+
+    return item["id"]
+
+
+# ======================================================
+# Écriture asynchrone (JSONL gzip + rotation)
+# ======================================================
+def _capture_dir() -> Path:
+    p = Path(REQUEST_CAPTURE_DIR)
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+
+def _capture_files() -> List[Path]:
+    if not _persist_enabled():
+        return []
+    p = Path(REQUEST_CAPTURE_DIR)
+    if not p.is_dir():
+        return []
+    return sorted(p.glob(f"{_FILE_PREFIX}*{_FILE_SUFFIX}"), reverse=True)
+
+
+def _current_file() -> Path:
+    path = _writer.get("path")
+    if path is not None and path.exists():
+        try:
+            if REQUEST_CAPTURE_FILE_MAX_BYTES <= 0 or path.stat().st_size < REQUEST_CAPTURE_FILE_MAX_BYTES:
+                return path
+        except OSError:
+            pass
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = _capture_dir() / f"{_FILE_PREFIX}{ts}_{uuid.uuid4().hex[:6]}{_FILE_SUFFIX}"
+    _writer["path"] = path
+
+    # Nouveau fichier pas encore écrit : on garde MAX_FILES - 1 anciens fichiers
+    files = _capture_files()
+    for old in files[max(0, REQUEST_CAPTURE_MAX_FILES - 1):]:
+        try:
+            old.unlink()
+            _stats["files_rotated"] += 1
+        except OSError:
+            pass
+    return path
+
+
+def _write_batch(batch: List[Dict[str, Any]]):
+    # Un membre gzip par lot (fichier concaténable, relu d'un seul tenant par gzip.open).
+    lines = "".join(json.dumps(it, ensure_ascii=False, default=str) + "\n" for it in batch)
+    with _writer_lock:
+        path = _current_file()
+        with gzip.open(path, "ab") as f:
+            f.write(lines.encode("utf-8"))
+
+
+def flush_captures(max_items: Optional[int] = None) -> int:
+    """
+    Écrit les captures en attente. Retourne le nombre de captures écrites.
+    """
+    written = 0
+    while True:
+        batch: List[Dict[str, Any]] = []
+        limit = REQUEST_CAPTURE_BATCH_SIZE
+        if max_items is not None:
+            limit = min(limit, max_items - written)
+        while len(batch) < limit:
+            try:
+                batch.append(_PENDING.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return written
+        try:
+            _write_batch(batch)
+            written += len(batch)
+            with _lock:
+                _stats["flushed"] += len(batch)
+        except Exception as e:
+            with _lock:
+                _stats["flush_errors"] += 1
+            _log.warning(f"[CAPTURE] écriture impossible ({len(batch)} captures perdues): {e}")
+        if max_items is not None and written >= max_items:
+            return written
+
+
+def _writer_loop():
+    while True:
+        _wake.wait(REQUEST_CAPTURE_FLUSH_SECONDS)
+        _wake.clear()
+        try:
+            flush_captures()
+        except Exception as e:
+            _log.warning(f"[CAPTURE] flush en échec: {e}")
+
+
+def _ensure_writer():
+    t = _writer.get("thread")
+    if t is not None and t.is_alive():
+        if _PENDING.qsize() >= REQUEST_CAPTURE_BATCH_SIZE:
+            _wake.set()
+        return
+    with _writer_lock:
+        t = _writer.get("thread")
+        if t is None or not t.is_alive():
+            t = threading.Thread(target=_writer_loop, name="request-capture-writer", daemon=True)
+            _writer["thread"] = t
+            t.start()
+
+
+atexit.register(flush_captures)
+
+
+# ======================================================
+# Consultation (support)
+# ======================================================
+def _iter_file(path: Path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except (OSError, EOFError):
+        # fichier en cours d'écriture / tronqué : on ignore la fin
+        return
+
+
+def get_capture(capture_id: str) -> Optional[Dict[str, Any]]:
+    cid = str(capture_id or "").strip()
+    if not cid:
+        return None
+    with _lock:
+        item = _INDEX.get(cid)
+    if item is not None:
+        return item
+    for path in _capture_files():
+        for it in _iter_file(path):
+            if it.get("id") == cid:
+                return it
+    return None
+
+
+def list_captures(
+    route: Optional[str] = None,
+    ref: Optional[str] = None,
+    limit: int = 50,
+    include_files: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Dernières captures (plus récentes en premier), filtrées par route et/ou ref.
+    include_files : complète avec les fichiers si la mémoire ne suffit pas.
+    """
+    limit = max(1, min(int(limit or 50), 1000))
+    ref_s = str(ref) if ref is not None else None
+
+    def _match(it: Dict[str, Any]) -> bool:
+        if route and it.get("route") != route:
+            return False
+        if ref_s is not None and it.get("ref") != ref_s:
+            return False
+        return True
+
+    with _lock:
+        rings = [_RINGS.get(route)] if route else list(_RINGS.values())
+        items = [it for ring in rings if ring for it in ring if _match(it)]
+    items.sort(key=lambda it: it.get("at") or "", reverse=True)
+    out = items[:limit]
+
+    if include_files and len(out) < limit:
+        seen = {it["id"] for it in out}
+        for path in _capture_files():
+            for it in reversed(list(_iter_file(path))):
+                if it.get("id") in seen or not _match(it):
+                    continue
+                out.append(it)
+                seen.add(it.get("id"))
+                if len(out) >= limit:
+                    return out
+    return out
+
+
+def capture_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": REQUEST_CAPTURE_ENABLED,
+            "sample_rate": REQUEST_CAPTURE_SAMPLE_RATE,
+            "persist_dir": REQUEST_CAPTURE_DIR or None,
+            "routes": {k: len(v) for k, v in _RINGS.items()},
+            "pending": _PENDING.qsize(),
+            "files": len(_capture_files()),
+            **_stats,
+        }
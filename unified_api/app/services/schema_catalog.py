@@ -0,0 +1,254 @@
+# unified_api/app/services/schema_catalog.py
+#
+# Catalogue du schéma DB chargé une fois par process (tables, colonnes, index).
+#
+# Les routers s'adaptent à des variantes de schéma (tables optionnelles livrées par
+# scripts SQL, colonnes ajoutées au fil des patchs). Plutôt que d'interroger
+# information_schema / to_regclass à chaque requête, ils consultent ce catalogue.
+#
+# - Chargement paresseux au premier appel (ou au démarrage via preload_schema_catalog).
+# - Rafraîchissement explicite : refresh_schema_catalog() / invalidate_schema_catalog()
+#   (à appeler après un script SQL appliqué à chaud).
+# - Table/colonne absente : un rechargement est tenté au plus une fois par
+#   SCHEMA_CATALOG_MISS_RELOAD_SECONDS, pour qu'un patch SQL soit vu sans redémarrage.
+
+from typing import Any, Dict, List, Optional, Set
+import logging
+import os
+import threading
+import time
+
+from psycopg.rows import dict_row
+
+_log = logging.getLogger("schema_catalog")
+
+SCHEMA_CATALOG_SCHEMAS = tuple(
+    s.strip()
+    for s in (os.getenv("SCHEMA_CATALOG_SCHEMAS", "public") or "public").split(",")
+    if s.strip()
+) or ("public",)
+SCHEMA_CATALOG_MISS_RELOAD_SECONDS = float(os.getenv("SCHEMA_CATALOG_MISS_RELOAD_SECONDS", "300") or 300)
+
+_catalog_lock = threading.Lock()
+_catalog: Optional[Dict[str, Any]] = None
+_last_miss_reload = 0.0
+
+
+def _load_catalog(cur) -> Dict[str, Any]:
+    t0 = time.time()
+    schemas = list(SCHEMA_CATALOG_SCHEMAS)
+
+    with cur.connection.cursor(row_factory=dict_row) as ccur:
+        ccur.execute(
+            """
+            SELECT
+              n.nspname AS schema_name,
+              c.relname AS table_name,
+              c.relkind::text AS relkind,
+              a.attname AS column_name
+            FROM pg_catalog.pg_class c
+            JOIN pg_catalog.pg_namespace n
+              ON n.oid = c.relnamespace
+            LEFT JOIN pg_catalog.pg_attribute a
+              ON a.attrelid = c.oid
+             AND a.attnum > 0
+             AND NOT a.attisdropped
+            WHERE n.nspname = ANY(%s)
+              AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+            """,
+            (schemas,),
+        )
+        tables: Dict[tuple, str] = {}
+        columns: Dict[tuple, Set[str]] = {}
+        for r in (ccur.fetchall() or []):
+            key = (r.get("schema_name"), r.get("table_name"))
+            tables[key] = r.get("relkind") or ""
+            cols = columns.setdefault(key, set())
+            col = (r.get("column_name") or "").strip()
+            if col:
+                cols.add(col)
+
+        ccur.execute(
+            """
+            SELECT
+              n.nspname AS schema_name,
+              t.relname AS table_name,
+              i.relname AS index_name,
+              pg_catalog.pg_get_indexdef(i.oid) AS index_def
+            FROM pg_catalog.pg_index x
+            JOIN pg_catalog.pg_class i ON i.oid = x.indexrelid
+            JOIN pg_catalog.pg_class t ON t.oid = x.indrelid
+            JOIN pg_catalog.pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = ANY(%s)
+            """,
+            (schemas,),
+        )
+        indexes: Dict[tuple, Dict[str, str]] = {}
+        for r in (ccur.fetchall() or []):
+            key = (r.get("schema_name"), r.get("table_name"))
+            indexes.setdefault(key, {})[r.get("index_name")] = r.get("index_def") or ""
+
+    out = {
+        "schemas": set(schemas),
+        "tables": tables,
+        "columns": {k: frozenset(v) for k, v in columns.items()},
+        "indexes": indexes,
+        "loaded_at": time.time(),
+        "load_ms": int((time.time() - t0) * 1000),
+    }
+    _log.info(f"[SCHEMA_CATALOG] loaded tables={len(tables)} indexes={sum(len(v) for v in indexes.values())} ms={out['load_ms']}")
+    return out
+
+
+def get_schema_catalog(cur) -> Dict[str, Any]:
+    global _catalog
+    cat = _catalog
+    if cat is not None:
+        return cat
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = _load_catalog(cur)
+        return _catalog
+
+
+def refresh_schema_catalog(cur) -> Dict[str, Any]:
+    """
+    Recharge immédiatement le catalogue (ex: après un script SQL appliqué à chaud).
+    """
+    global _catalog
+    cat = _load_catalog(cur)
+    with _catalog_lock:
+        _catalog = cat
+    return cat
+
+
+def invalidate_schema_catalog():
+    """
+    Force un rechargement au prochain accès.
+    """
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+def preload_schema_catalog(conn) -> bool:
+    """
+    Chargement au démarrage (best effort : une DB indisponible ne bloque pas le boot).
+    """
+    try:
+        with conn.cursor() as cur:
+            get_schema_catalog(cur)
+        return True
+    except Exception as e:
+        _log.error(f"[SCHEMA_CATALOG] preload failed: {e}")
+        return False
+
+
+def _reload_on_miss(cur) -> bool:
+    global _last_miss_reload
+    now = time.time()
+    with _catalog_lock:
+        if now - _last_miss_reload < SCHEMA_CATALOG_MISS_RELOAD_SECONDS:
+            return False
+        _last_miss_reload = now
+    refresh_schema_catalog(cur)
+    return True
+
+
+def _direct_table_columns(cur, table_name: str, schema: str) -> Optional[Set[str]]:
+    with cur.connection.cursor(row_factory=dict_row) as ccur:
+        ccur.execute(
+            """
+            SELECT a.attname AS column_name
+            FROM pg_catalog.pg_class c
+            JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            LEFT JOIN pg_catalog.pg_attribute a
+              ON a.attrelid = c.oid
+             AND a.attnum > 0
+             AND NOT a.attisdropped
+            WHERE n.nspname = %s
+              AND c.relname = %s
+            """,
+            (schema, table_name),
+        )
+        rows = ccur.fetchall() or []
+    if not rows:
+        return None
+    return {(r.get("column_name") or "").strip() for r in rows if (r.get("column_name") or "").strip()}
+
+
+# ======================================================
+# Lookups (mémoire)
+# ======================================================
+def table_exists(cur, table_name: str, schema: str = "public") -> bool:
+    t = (table_name or "").strip()
+    if not t:
+        return False
+    cat = get_schema_catalog(cur)
+    if schema not in cat["schemas"]:
+        return _direct_table_columns(cur, t, schema) is not None
+    if (schema, t) in cat["tables"]:
+        return True
+    if _reload_on_miss(cur):
+        return (schema, t) in get_schema_catalog(cur)["tables"]
+    return False
+
+
+def table_columns(cur, table_name: str, schema: str = "public") -> Set[str]:
+    t = (table_name or "").strip()
+    if not t:
+        return set()
+    cat = get_schema_catalog(cur)
+    if schema not in cat["schemas"]:
+        return _direct_table_columns(cur, t, schema) or set()
+    cols = cat["columns"].get((schema, t))
+    if cols is None and _reload_on_miss(cur):
+        cols = get_schema_catalog(cur)["columns"].get((schema, t))
+    return set(cols or ())
+
+
+def column_exists(cur, table_name: str, column_name: str, schema: str = "public") -> bool:
+    c = (column_name or "").strip()
+    if not c:
+        return False
+    cat = get_schema_catalog(cur)
+    if schema in cat["schemas"]:
+        cols = cat["columns"].get((schema, (table_name or "").strip()))
+        if cols is not None and c in cols:
+            return True
+        if _reload_on_miss(cur):
+            cols = get_schema_catalog(cur)["columns"].get((schema, (table_name or "").strip()))
+            return bool(cols) and c in cols
+        return False
+    return c in table_columns(cur, table_name, schema)
+
+
+def list_tables(cur, schema: str = "public", base_tables_only: bool = False) -> List[str]:
+    cat = get_schema_catalog(cur)
+    out = []
+    for (s, t), relkind in cat["tables"].items():
+        if s != schema:
+            continue
+        if base_tables_only and relkind not in ("r", "p"):
+            continue
+        out.append(t)
+    return sorted(out)
+
+
+def table_indexes(cur, table_name: str, schema: str = "public") -> Dict[str, str]:
+    cat = get_schema_catalog(cur)
+    return dict(cat["indexes"].get((schema, (table_name or "").strip()), {}))
+
+
+def schema_catalog_stats() -> Dict[str, Any]:
+    cat = _catalog
+    if cat is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "schemas": sorted(cat["schemas"]),
+        "tables": len(cat["tables"]),
+        "indexes": sum(len(v) for v in cat["indexes"].values()),
+        "loaded_at": cat["loaded_at"],
+        "load_ms": cat["load_ms"],
+    }
@@ -0,0 +1,309 @@
+# unified_api/app/services/sharepoint_client.py
+#
+# Client SharePoint (Microsoft Graph) partagé par les portails.
+#
+# - Token client-credentials mis en cache jusqu'à SP_TOKEN_REFRESH_MARGIN secondes avant
+#   expiration (un seul POST login.microsoftonline.com par fenêtre de validité) ;
+#   un 401 Graph invalide le token et l'appel est rejoué une fois.
+# - Upload : PUT direct sous SP_SIMPLE_UPLOAD_MAX octets, sinon session d'upload Graph
+#   (createUploadSession) alimentée par morceaux de SP_UPLOAD_CHUNK_SIZE lus dans le flux.
+# - Download : itérateur de morceaux (stream=True) pour relayer le fichier sans le charger
+#   en mémoire ; download() reste disponible pour les petits fichiers.
+#
+# Toutes les requêtes passent par app.services.http_client (intégrations "graph_auth" / "graph").
+
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+import io
+import os
+import tempfile
+import threading
+import time
+
+from fastapi import HTTPException
+
+from app.services.http_client import integration_request
+
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+
+SP_TOKEN_REFRESH_MARGIN = int(os.getenv("SP_TOKEN_REFRESH_MARGIN", "300") or 300)
+SP_SIMPLE_UPLOAD_MAX = int(os.getenv("SP_SIMPLE_UPLOAD_MAX", str(4 * 1024 * 1024)) or 4 * 1024 * 1024)
+# Graph impose des morceaux multiples de 320 Kio (hors dernier morceau)
+SP_UPLOAD_CHUNK_SIZE = max(1, int(os.getenv("SP_UPLOAD_CHUNK_UNITS", "16") or 16)) * 320 * 1024
+SP_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class SharePointClient:
+    def __init__(self, tenant_id: Optional[str], client_id: Optional[str], client_secret: Optional[str], site_id: Optional[str]):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.site_id = site_id
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    # ------------------------------------------------------
+    # Configuration / token
+    # ------------------------------------------------------
+    def ensure_config(self):
+        missing = [
+            k
+            for k, v in {
+                "SP_TENANT_ID": self.tenant_id,
+                "SP_CLIENT_ID": self.client_id,
+                "SP_CLIENT_SECRET": self.client_secret,
+                "SP_SITE_ID": self.site_id,
+            }.items()
+            if not v
+        ]
+        if missing:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Paramètres SharePoint manquants: {', '.join(missing)}",
+            )
+
+    def token(self, force_refresh: bool = False) -> str:
+        now = time.time()
+        tok = self._token
+        if tok and not force_refresh and now < self._token_expires_at:
+            return tok
+
+        with self._token_lock:
+            if self._token and not force_refresh and time.time() < self._token_expires_at:
+                return self._token
+
+            self.ensure_config()
+            url = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
+            data = {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": "https://graph.microsoft.com/.default",
+            }
+            try:
+                r = integration_request("graph_auth", "POST", url, data=data, idempotent=True)
+                r.raise_for_status()
+                js = r.json()
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Erreur token SharePoint : {e}")
+
+            token = js.get("access_token")
+            if not token:
+                raise HTTPException(status_code=500, detail="Token SharePoint manquant")
+
+            expires_in = int(js.get("expires_in") or 3600)
+            self._token = token
+            self._token_expires_at = time.time() + max(60, expires_in - SP_TOKEN_REFRESH_MARGIN)
+            return token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0.0
+
+    # ------------------------------------------------------
+    # Appels Graph
+    # ------------------------------------------------------
+    def _drive_url(self, remote_path: str, suffix: str = "") -> str:
+        path = str(remote_path or "").strip("/")
+        return f"{GRAPH_BASE_URL}/sites/{self.site_id}/drive/root:/{path}{suffix}"
+
+    def _graph(self, method: str, url: str, *, headers: Optional[Dict[str, str]] = None, **kwargs):
+        self.ensure_config()
+        h = dict(headers or {})
+        h["Authorization"] = f"Bearer {self.token()}"
+        r = integration_request("graph", method, url, headers=h, **kwargs)
+        if r.status_code == 401:
+            r.close()
+            h["Authorization"] = f"Bearer {self.token(force_refresh=True)}"
+            r = integration_request("graph", method, url, headers=h, **kwargs)
+        return r
+
+    def list_children(self, remote_folder_path: str) -> List[Dict[str, Any]]:
+        url = self._drive_url(remote_folder_path, ":/children")
+        items: List[Dict[str, Any]] = []
+        try:
+            while url:
+                r = self._graph("GET", url)
+                if r.status_code >= 400:
+                    raise HTTPException(
+                        status_code=500,
+                        detail=f"Erreur liste dossier SharePoint : {r.status_code} {r.text}",
+                    )
+                js = r.json()
+                items.extend(js.get("value", []))
+                url = js.get("@odata.nextLink")
+            return items
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur liste SharePoint : {e}")
+
+    def get_item(self, remote_path: str) -> Dict[str, Any]:
+        try:
+            r = self._graph("GET", self._drive_url(remote_path))
+            if r.status_code >= 400:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Erreur item SharePoint : {r.status_code} {r.text}",
+                )
+            return r.json()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur item SharePoint : {e}")
+
+    def open_download(self, remote_file_path: str):
+        """
+        Ouvre le téléchargement en streaming. Retourne la Response (corps non lu) :
+        l'appelant itère iter_content() et ferme la réponse.
+        """
+        try:
+            r = self._graph("GET", self._drive_url(remote_file_path, ":/content"), stream=True)
+            if r.status_code >= 400:
+                detail = f"Erreur download SharePoint : {r.status_code} {r.text}"
+                r.close()
+                raise HTTPException(status_code=500, detail=detail)
+            return r
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur download SharePoint : {e}")
+
+    def iter_download(self, remote_file_path: str, chunk_size: int = SP_DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        # Ouverture immédiate : une erreur Graph remonte avant l'envoi des en-têtes de réponse.
+        return sp_iter_response(self.open_download(remote_file_path), chunk_size)
+
+    def download(self, remote_file_path: str) -> bytes:
+        return b"".join(self.iter_download(remote_file_path))
+
+    def upload(
+        self,
+        remote_path: str,
+        data: Union[bytes, BinaryIO],
+        content_type: Optional[str] = None,
+        size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Upload d'un fichier (bytes ou flux binaire). Retourne l'item Graph créé.
+        """
+        stream = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        total = size if size is not None else _stream_size(stream)
+
+        try:
+            if total is not None and total <= SP_SIMPLE_UPLOAD_MAX:
+                r = self._graph(
+                    "PUT",
+                    self._drive_url(remote_path, ":/content"),
+                    headers={"Content-Type": content_type or "application/octet-stream"},
+                    data=stream.read(),
+                )
+                if r.status_code >= 400:
+                    raise HTTPException(
+                        status_code=500,
+                        detail=f"Erreur upload SharePoint : {r.status_code} {r.text}",
+                    )
+                return r.json()
+            return self._upload_session(remote_path, stream, total)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur upload SharePoint : {e}")
+
+    def _upload_session(self, remote_path: str, stream: BinaryIO, total: Optional[int]) -> Dict[str, Any]:
+        if total is None:
+            # Content-Range exige la taille totale : flux non dimensionnable -> tampon disque.
+            spooled = tempfile.SpooledTemporaryFile(max_size=SP_SIMPLE_UPLOAD_MAX)
+            while True:
+                block = stream.read(SP_UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                spooled.write(block)
+            total = spooled.tell()
+            spooled.seek(0)
+            stream = spooled
+
+        r = self._graph(
+            "POST",
+            self._drive_url(remote_path, ":/createUploadSession"),
+            json={"item": {"@microsoft.graph.conflictBehavior": "replace"}},
+        )
+        if r.status_code >= 400:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erreur session upload SharePoint : {r.status_code} {r.text}",
+            )
+        upload_url = (r.json() or {}).get("uploadUrl")
+        if not upload_url:
+            raise HTTPException(status_code=500, detail="Session upload SharePoint sans uploadUrl")
+
+        offset = 0
+        last: Dict[str, Any] = {}
+        try:
+            while offset < total:
+                chunk = stream.read(SP_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    raise HTTPException(status_code=500, detail="Flux d'upload SharePoint interrompu")
+                end = offset + len(chunk) - 1
+                # L'URL de session est pré-authentifiée : pas d'en-tête Authorization.
+                rr = integration_request(
+                    "graph",
+                    "PUT",
+                    upload_url,
+                    headers={"Content-Length": str(len(chunk)), "Content-Range": f"bytes {offset}-{end}/{total}"},
+                    data=chunk,
+                )
+                if rr.status_code >= 400:
+                    raise HTTPException(
+                        status_code=500,
+                        detail=f"Erreur upload SharePoint (morceau {offset}-{end}) : {rr.status_code} {rr.text}",
+                    )
+                last = rr.json() if rr.content else {}
+                offset = end + 1
+        except Exception:
+            try:
+                integration_request("graph", "DELETE", upload_url)
+            except Exception:
+                pass
+            raise
+        return last
+
+
+def sp_iter_response(r, chunk_size: int = SP_DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    try:
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        r.close()
+
+
+def _stream_size(stream: BinaryIO) -> Optional[int]:
+    try:
+        pos = stream.tell()
+        stream.seek(0, io.SEEK_END)
+        end = stream.tell()
+        stream.seek(pos)
+        return end - pos
+    except Exception:
+        return None
+
+
+_client_lock = threading.Lock()
+_client: Optional[SharePointClient] = None
+
+
+def get_sharepoint_client() -> SharePointClient:
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            _client = SharePointClient(
+                os.getenv("SP_TENANT_ID"),
+                os.getenv("SP_CLIENT_ID"),
+                os.getenv("SP_CLIENT_SECRET"),
+                os.getenv("SP_SITE_ID"),
+            )
+        return _client
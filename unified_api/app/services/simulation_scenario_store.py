@@ -0,0 +1,259 @@
+# unified_api/app/services/simulation_scenario_store.py
+#
+# Stockage des scénarios de simulation sauvegardés (tbl_insights_simulation_scenario).
+#
+# - resume_json : projection légère calculée à l'enregistrement (poste focus, périmètre,
+#   indicateurs d'impact) : la liste et la comparaison ne lisent plus le résultat complet.
+# - resultat_gz : résultat complet en JSON gzip, lu uniquement à l'ouverture d'un scénario
+#   (resultat_json conservé pour les lignes antérieures au patch).
+# - data_version : empreinte des données de l'entreprise au moment du calcul ; un scénario
+#   dont l'empreinte diffère de l'empreinte courante est "périmé" et recalculé en tâche de fond.
+#   L'empreinte est mémorisée par entreprise tant que ses versions de données (cf. data_version)
+#   n'ont pas changé, uniquement si ces versions sont partagées entre workers, et au plus
+#   SIMULATION_DATA_VERSION_MEMO_SECONDS (écritures hors de l'API).
+# - Échec de recalcul : marqué avec l'empreinte courante (mark_recalc_failure) ; le recalcul
+#   automatique ignore le scénario tant que l'empreinte n'a pas changé (recalc_failed).
+#
+# Patch SQL : sql/20261019_insights_simulation_scenario_resume.sql. Sans le patch, les routes
+# gardent le comportement précédent (storage_ready() = False).
+# Patch SQL : sql/20261019_insights_simulation_scenario_recalcul_echec.sql. Sans le patch,
+# les échecs sont retenus en mémoire par le worker.
+
+from typing import Any, Dict, Optional, Tuple
+import gzip
+import json
+import os
+import threading
+import time
+
+from app.services.data_version import (
+    DOMAIN_AUDITS,
+    DOMAIN_COMPETENCES,
+    DOMAIN_EFFECTIFS,
+    DOMAIN_ORGANIGRAMME,
+    DOMAIN_POSTES,
+    data_version,
+    data_versions_shared,
+)
+from app.services.schema_catalog import column_exists
+
+SIMULATION_RESULT_GZIP_LEVEL = int(os.getenv("SIMULATION_RESULT_GZIP_LEVEL", "6") or 6)
+SIMULATION_DATA_VERSION_MEMO_SECONDS = int(os.getenv("SIMULATION_DATA_VERSION_MEMO_SECONDS", "300") or 300)
+
+_FINGERPRINT_DOMAINS = (DOMAIN_EFFECTIFS, DOMAIN_POSTES, DOMAIN_COMPETENCES, DOMAIN_AUDITS, DOMAIN_ORGANIGRAMME)
+
+_memo_lock = threading.Lock()
+_FINGERPRINTS: Dict[str, Tuple[Tuple[int, ...], float, str]] = {}
+
+_TABLE = "tbl_insights_simulation_scenario"
+_STORAGE_COLUMNS = ("resume_json", "resultat_gz", "data_version", "resultat_calcule_at")
+_FAILURE_COLUMNS = ("recalcul_echec_version", "recalcul_echec_at", "recalcul_echec")
+
+_failures_lock = threading.Lock()
+_RECALC_FAILURES: Dict[Tuple[str, str], str] = {}
+
+
+def storage_ready(cur) -> bool:
+    return all(column_exists(cur, _TABLE, c) for c in _STORAGE_COLUMNS)
+
+
+def failure_marker_ready(cur) -> bool:
+    return all(column_exists(cur, _TABLE, c) for c in _FAILURE_COLUMNS)
+
+
+def mark_recalc_failure(cur, id_ent: str, id_scenario: str, data_version: str, error: str):
+    """
+    Recalcul en échec pour cette empreinte (à committer par l'appelant).
+    """
+    if failure_marker_ready(cur):
+        cur.execute(
+            """
+            UPDATE public.tbl_insights_simulation_scenario
+            SET recalcul_echec_version = %s,
+                recalcul_echec_at = NOW(),
+                recalcul_echec = %s
+            WHERE id_ent = %s
+              AND id_scenario = %s
+            """,
+            (data_version, (error or "")[:500], id_ent, id_scenario),
+        )
+        return
+    with _failures_lock:
+        _RECALC_FAILURES[(str(id_ent), str(id_scenario))] = data_version
+
+
+def clear_recalc_failure(id_ent: str, id_scenario: str):
+    # Colonnes remises à NULL par l'UPDATE du résultat ; ici le repli mémoire
+    with _failures_lock:
+        _RECALC_FAILURES.pop((str(id_ent), str(id_scenario)), None)
+
+
+def recalc_failed(row: Dict[str, Any], id_ent: str, data_version: Optional[str]) -> bool:
+    """
+    row : ligne du scénario (avec recalcul_echec_version si le patch est appliqué).
+    """
+    if not data_version:
+        return False
+    marked = row.get("recalcul_echec_version")
+    if marked is None:
+        with _failures_lock:
+            marked = _RECALC_FAILURES.get((str(id_ent), str(row.get("id_scenario"))))
+    return marked == data_version
+
+
+def _int_delta(after: Any, before: Any) -> int:
+    try:
+        return int(round(float(after or 0) - float(before or 0)))
+    except Exception:
+        return 0
+
+
+def build_scenario_resume(result: Optional[Dict[str, Any]], scenario: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Indicateurs de tête d'un résultat de simulation (liste + comparaison).
+    """
+    result = result if isinstance(result, dict) else {}
+    scenario = scenario if isinstance(scenario, dict) else {}
+    focus = result.get("poste_focus") or {}
+    resultats = result.get("resultats") or {}
+    final_summary = (resultats.get("projete") or {}).get("summary") or (resultats.get("immediat") or {}).get("summary") or result.get("simule") or {}
+    current_summary = result.get("actuel") or {}
+    impact = (resultats.get("projete") or {}).get("impact") or result.get("impact") or {}
+    besoins = (result.get("developpement") or {}).get("besoins_formation") or []
+
+    return {
+        "scope": result.get("scope") or scenario.get("scope") or {},
+        "poste_focus": {
+            "codif_client": focus.get("codif_client") or "",
+            "codif_poste": focus.get("codif_poste") or "",
+            "intitule_poste": focus.get("intitule_poste") or "",
+            "fragilite_avant": focus.get("fragilite_avant"),
+            "fragilite_projete": focus.get("fragilite_projete"),
+        },
+        "resume": {
+            "impact_poste_pct": _int_delta(focus.get("fragilite_projete"), focus.get("fragilite_avant")),
+            "impact_global_pct": _int_delta(final_summary.get("fragilite_moyenne"), current_summary.get("fragilite_moyenne")),
+            "besoins_count": len(besoins),
+            "postes_degrades": impact.get("postes_degrades", 0),
+            "postes_securises": impact.get("postes_securises", 0),
+        },
+    }
+
+
+def encode_resultat(result: Optional[Dict[str, Any]]) -> bytes:
+    raw = json.dumps(result or {}, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return gzip.compress(raw, compresslevel=SIMULATION_RESULT_GZIP_LEVEL)
+
+
+def decode_resultat(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Résultat complet d'une ligne : resultat_gz si présent, sinon resultat_json (lignes anciennes).
+    """
+    gz = row.get("resultat_gz")
+    if gz:
+        try:
+            data = json.loads(gzip.decompress(bytes(gz)).decode("utf-8"))
+            if isinstance(data, dict):
+                return data
+        except Exception:
+            pass
+    data = row.get("resultat_json")
+    return data if isinstance(data, dict) else {}
+
+
+def compute_data_version(cur, id_ent: str) -> str:
+    key = str(id_ent or "").strip()
+    shared = data_versions_shared()
+    versions = data_version(key, domains=_FINGERPRINT_DOMAINS)
+    if shared:
+        with _memo_lock:
+            memo = _FINGERPRINTS.get(key)
+        if memo is not None and memo[0] == versions and time.monotonic() - memo[1] < SIMULATION_DATA_VERSION_MEMO_SECONDS:
+            return memo[2]
+
+    fingerprint = _fetch_data_fingerprint(cur, id_ent)
+    if shared:
+        with _memo_lock:
+            _FINGERPRINTS[key] = (versions, time.monotonic(), fingerprint)
+    return fingerprint
+
+
+def _fetch_data_fingerprint(cur, id_ent: str) -> str:
+    """
+    Empreinte des données lues par le moteur de simulation : collaborateurs (poste, service,
+    mise à jour), fiches de poste, exigences des postes (compétence, niveau, poids, masque),
+    paramètres RH des postes, compétences référencées (postes et collaborateurs), dernières
+    évaluations de compétences, organigramme.
+    Sommes de hash : insensibles à l'ordre, une requête d'agrégats par entreprise.
+    """
+    cur.execute(
+        """
+        SELECT md5(concat_ws('|',
+            (
+                SELECT COUNT(*)::text || ':' || COALESCE(MAX(e.dernier_update)::text, '')
+                       || ':' || COALESCE(SUM(hashtext(COALESCE(e.id_poste_actuel, '') || '/' || COALESCE(e.id_service, '') || '/' || COALESCE(e.archive, FALSE)::text))::text, '')
+                FROM public.tbl_effectif_client e
+                WHERE e.id_ent = %s
+            ),
+            (
+                SELECT COUNT(*)::text || ':' || COALESCE(MAX(fp.date_maj)::text, '')
+                FROM public.tbl_fiche_poste fp
+                WHERE fp.id_ent = %s
+            ),
+            (
+                SELECT COUNT(*)::text || ':' || COALESCE(MAX(fpc.date_modification)::text, '')
+                       || ':' || COALESCE(SUM(hashtext(COALESCE(fpc.id_poste, '') || '/' || COALESCE(fpc.id_competence, '') || '/' || COALESCE(fpc.niveau_requis::text, '') || '/' || COALESCE(fpc.poids_criticite::text, '') || '/' || COALESCE(fpc.masque, FALSE)::text))::text, '')
+                FROM public.tbl_fiche_poste_competence fpc
+                JOIN public.tbl_fiche_poste fp ON fp.id_poste = fpc.id_poste
+                WHERE fp.id_ent = %s
+            ),
+            (
+                SELECT COUNT(*)::text || ':' || COALESCE(SUM(hashtext(COALESCE(prh.id_poste, '') || '/' || COALESCE(prh.nb_titulaires_cible::text, '') || '/' || COALESCE(prh.criticite_poste::text, '') || '/' || COALESCE(prh.statut_poste::text, '')))::text, '')
+                FROM public.tbl_fiche_poste_param_rh prh
+                JOIN public.tbl_fiche_poste fp ON fp.id_poste = prh.id_poste
+                WHERE fp.id_ent = %s
+            ),
+            (
+                SELECT COUNT(*)::text || ':' || COALESCE(MAX(c.date_modification)::text, '')
+                       || ':' || COALESCE(SUM(hashtext(c.id_comp || '/' || COALESCE(c.code, '') || '/' || COALESCE(c.intitule, '') || '/' || COALESCE(c.domaine, '') || '/' || COALESCE(c.etat, '') || '/' || COALESCE(c.masque, FALSE)::text))::text, '')
+                FROM public.tbl_competence c
+                WHERE c.id_comp IN (
+                        SELECT ec.id_comp
+                        FROM public.tbl_effectif_client_competence ec
+                        JOIN public.tbl_effectif_client e ON e.id_effectif = ec.id_effectif_client
+                        WHERE e.id_ent = %s
+                    )
+                   OR c.id_comp IN (
+                        SELECT fpc.id_competence
+                        FROM public.tbl_fiche_poste_competence fpc
+                        JOIN public.tbl_fiche_poste fp ON fp.id_poste = fpc.id_poste
+                        WHERE fp.id_ent = %s
+                    )
+                   OR c.code IN (
+                        SELECT fpc.id_competence
+                        FROM public.tbl_fiche_poste_competence fpc
+                        JOIN public.tbl_fiche_poste fp ON fp.id_poste = fpc.id_poste
+                        WHERE fp.id_ent = %s
+                    )
+            ),
+            (
+                SELECT COUNT(*)::text || ':' || COALESCE(MAX(ec.date_derniere_eval)::text, '')
+                       || ':' || COALESCE(SUM(hashtext(COALESCE(ec.id_dernier_audit, '') || '/' || COALESCE(ec.actif, TRUE)::text || '/' || COALESCE(ec.archive, FALSE)::text))::text, '')
+                FROM public.tbl_effectif_client_competence ec
+                JOIN public.tbl_effectif_client e ON e.id_effectif = ec.id_effectif_client
+                WHERE e.id_ent = %s
+            ),
+            (
+                SELECT COUNT(*)::text || ':' || COALESCE(SUM(hashtext(o.id_service || '/' || COALESCE(o.id_service_parent, '')))::text, '')
+                FROM public.tbl_entreprise_organigramme o
+                WHERE o.id_ent = %s
+                  AND o.archive = FALSE
+            )
+        )) AS data_version
+        """,
+        (id_ent, id_ent, id_ent, id_ent, id_ent, id_ent, id_ent, id_ent, id_ent),
+    )
+    row = cur.fetchone()
+    if isinstance(row, dict):
+        return str(row.get("data_version") or "")
+    return str((row or [""])[0] or "")
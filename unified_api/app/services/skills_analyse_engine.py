@@ -7,6 +7,8 @@ import json
 from fastapi import HTTPException
 from pydantic import BaseModel
 
+from app.services.organigramme_cache import get_organigramme
+
 
 NON_LIE_ID = "__NON_LIE__"
 
@@ -95,7 +97,7 @@ def _fetch_service_label(cur, id_ent: str, id_service: Optional[str]) -> Service
         nom_service=row.get("nom_service") or "Service",
     )
 
-def _build_scope_cte(id_ent: str, id_service: Optional[str]) -> Tuple[str, List[Any]]:
+def _build_scope_cte(id_ent: str, id_service: Optional[str], cur=None) -> Tuple[str, List[Any]]:
     """
     Construit 2 scopes cohérents:
     - postes_scope: postes actifs dans le périmètre
@@ -104,6 +106,8 @@ def _build_scope_cte(id_ent: str, id_service: Optional[str]) -> Tuple[str, List[
     - None/"": toute l’entreprise
     - "__NON_LIE__": id_service NULL ou non présent dans l’organigramme actif
     - sinon: service + descendants (récursif)
+    cur fourni : services résolus via l'organigramme en cache (liste plate id_service = ANY),
+    sinon parcours SQL récursif.
     """
     if not id_service:
         cte = """
@@ -122,6 +126,9 @@ def _build_scope_cte(id_ent: str, id_service: Optional[str]) -> Tuple[str, List[
         """
         return cte, [id_ent, id_ent]
 
+    if cur is not None:
+        return _build_scope_cte_from_cache(cur, id_ent, id_service)
+
     if id_service == NON_LIE_ID:
         cte = """
         valid_services AS (
@@ -187,6 +194,48 @@ def _build_scope_cte(id_ent: str, id_service: Optional[str]) -> Tuple[str, List[
     """
     return cte, [id_ent, id_service, id_ent, id_ent, id_ent]
 
+
+def _build_scope_cte_from_cache(cur, id_ent: str, id_service: str) -> Tuple[str, List[Any]]:
+    org = get_organigramme(cur, id_ent)
+    if id_service == NON_LIE_ID:
+        services = sorted(org.active_ids)
+        cte = """
+        postes_scope AS (
+            SELECT fp.id_poste
+            FROM public.tbl_fiche_poste fp
+            WHERE fp.id_ent = %s
+              AND COALESCE(fp.actif, TRUE) = TRUE
+              AND (fp.id_service IS NULL OR NOT (fp.id_service = ANY(%s)))
+        ),
+        effectifs_scope AS (
+            SELECT e.id_effectif
+            FROM public.tbl_effectif_client e
+            WHERE e.id_ent = %s
+              AND COALESCE(e.archive, FALSE) = FALSE
+              AND (e.id_service IS NULL OR NOT (e.id_service = ANY(%s)))
+        )
+        """
+        return cte, [id_ent, services, id_ent, services]
+
+    services = sorted(org.descendants(id_service))
+    cte = """
+    postes_scope AS (
+        SELECT fp.id_poste
+        FROM public.tbl_fiche_poste fp
+        WHERE fp.id_ent = %s
+          AND COALESCE(fp.actif, TRUE) = TRUE
+          AND fp.id_service = ANY(%s)
+    ),
+    effectifs_scope AS (
+        SELECT e.id_effectif
+        FROM public.tbl_effectif_client e
+        WHERE e.id_ent = %s
+          AND COALESCE(e.archive, FALSE) = FALSE
+          AND e.id_service = ANY(%s)
+    )
+    """
+    return cte, [id_ent, services, id_ent, services]
+
 def _safe_float(v: Any) -> Optional[float]:
     try:
         if v is None:
@@ -595,7 +644,7 @@ def _analyse_matching_potential_by_poste(
     if period_start > period_end:
         period_start, period_end = period_end, period_start
     scope_id = (id_service or "").strip() or None
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
 
     excluded_ids = sorted({str(x or "").strip() for x in (excluded_effectif_ids or []) if str(x or "").strip()})
     excluded_filter_sql = ""
@@ -778,7 +827,7 @@ def _fetch_postes_fragility_records(
     id_service: Optional[str],
     criticite_min: int,
 ) -> List[Dict[str, Any]]:
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
     today = date.today()
     horizon_3m = _analyse_add_months(today, 3)
 
@@ -1000,7 +1049,7 @@ def _fetch_postes_fragility_records_projected(
     """
     if period_start > period_end:
         period_start, period_end = period_end, period_start
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
 
     excluded_ids = sorted({str(x or "").strip() for x in (excluded_effectif_ids or []) if str(x or "").strip()})
     excluded_filter_sql = ""
@@ -1311,7 +1360,7 @@ def _fetch_competence_fragility_records_centered(
     if period_start > period_end:
         period_start, period_end = period_end, period_start
 
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
     comp_filter_sql = ""
     comp_filter_params: List[Any] = []
     if comp_id:
@@ -2057,7 +2106,7 @@ def _fetch_prevision_competence_impacts(
     cmin = max(CRITICITE_MIN_MIN, min(CRITICITE_MIN_MAX, int(criticite_min or 0)))
     lim = max(1, min(2000, int(limit or 200)))
 
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
 
     # 1) Sortants N+X dans le périmètre courant.
     leaving_sql = f"""
@@ -2299,7 +2348,7 @@ def _fetch_prevision_poste_leaving_rows(
     """Sortants N+X du périmètre, avec date de sortie réelle ou retraite estimée."""
     scope_id = (id_service or "").strip() or None
     horizon = max(1, min(5, int(horizon_years or 1)))
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
     sql = f"""
     WITH
     {cte_sql},
@@ -2361,7 +2410,7 @@ def _fetch_prevision_poste_impact_causes(
         return {}
 
     scope_id = (id_service or "").strip() or None
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
     sql = f"""
     WITH
     {cte_sql},
@@ -2932,7 +2981,7 @@ def _dashboard_compute_transmission_capacity(
     """
     cmin = _dashboard_normalize_criticite_min(criticite_min)
     months = max(1, min(60, _safe_int(seuil_mois, 6)))
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
 
     sql = f"""
     WITH
@@ -3219,7 +3268,7 @@ def _dashboard_compute_reliability(
     criticite_min: int,
     seuil_mois: int = 6,
 ) -> Dict[str, Any]:
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
     months = max(1, min(60, _safe_int(seuil_mois, 6)))
     cur.execute(
         f"""
@@ -3277,7 +3326,7 @@ def _dashboard_compute_reliability(
 
 
 def _dashboard_fetch_postes_with_action(cur, id_ent: str, id_service: Optional[str]) -> set:
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
     cur.execute(
         f"""
         WITH
@@ -3383,7 +3432,7 @@ def _fetch_prevision_transition_events(
     if kind not in ("confirmed", "potential"):
         kind = ""
 
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
     kind_filter = "AND ee.exit_kind = %s" if kind else ""
 
     sql = f"""
@@ -3578,7 +3627,7 @@ def _fetch_prevision_transition_capacity(
         return default
 
     scope_id = (id_service or "").strip() or None
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
     try:
         horizon = max(1, min(5, int(horizon_years or 1)))
     except Exception:
@@ -3963,7 +4012,7 @@ def _fetch_prevision_transmission_items(
     horizon = max(1, min(5, int(horizon_years or 1)))
     cmin = max(CRITICITE_MIN_MIN, min(CRITICITE_MIN_MAX, int(criticite_min or 0)))
     lim = max(1, min(2000, int(limit or 200)))
-    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id)
+    cte_sql, cte_params = _build_scope_cte(id_ent, scope_id, cur)
 
     sql = f"""
     WITH
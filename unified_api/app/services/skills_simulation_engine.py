@@ -175,7 +175,7 @@ def _json_dict(v: Any) -> Dict[str, Any]:
 
 
 def _fetch_simulation_dataset(cur, id_ent: str, id_service: Optional[str], criticite_min: int) -> Dict[str, Any]:
-    cte_sql, cte_params = _build_scope_cte(id_ent, id_service)
+    cte_sql, cte_params = _build_scope_cte(id_ent, id_service, cur)
 
     sql_postes = f"""
     WITH
@@ -1632,6 +1632,12 @@ def _simulation_poste_payload(dataset: Dict[str, Any], id_poste: str) -> Dict[st
     }
 
 
+def _openai_chat_url() -> str:
+    # OPENAI_BASE_URL : même variable que le SDK OpenAI (stack locale / proxy)
+    base = (os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1").strip().rstrip("/")
+    return f"{base}/chat/completions"
+
+
 def _cv_ai_system_prompt() -> str:
     return (
         "Tu es un recruteur senior et un analyste compétences pour Novoskill. "
@@ -1704,7 +1710,7 @@ def _call_cv_ai(cv_text: str, poste_payload: Dict[str, Any], projet_professionne
         ],
     }
     req = urllib.request.Request(
-        "https://api.openai.com/v1/chat/completions",
+        _openai_chat_url(),
         data=json.dumps(payload).encode("utf-8"),
         headers={
             "Authorization": f"Bearer {api_key}",
@@ -1817,7 +1823,7 @@ def comparer_simulation_scenarios_payload(scenarios: List[Dict[str, Any]]) -> Di
         ],
     }
     req = urllib.request.Request(
-        "https://api.openai.com/v1/chat/completions",
+        _openai_chat_url(),
         data=json.dumps(payload).encode("utf-8"),
         headers={
             "Authorization": f"Bearer {api_key}",
@@ -2074,28 +2080,72 @@ def build_simulation_options_payload(cur, id_ent: str, scope: Any, criticite_min
     return payload
 
 
-def evaluate_simulation_payload(cur, id_ent: str, scope: Any, payload: SimulationEvalRequest, criticite_min: int) -> Dict[str, Any]:
+def load_simulation_baseline(cur, id_ent: str, scope: Any, criticite_min: int) -> Dict[str, Any]:
+    """
+    État réel commun aux évaluations d'un même périmètre / criticité : dataset, état courant,
+    postes du moteur Analyse, capacité de transmission. Lu une fois, partagé en lecture seule.
+    """
     id_service = getattr(scope, "id_service", None)
     dataset = _fetch_simulation_dataset(cur, id_ent, id_service, int(criticite_min))
-
     current_state = _build_state(dataset, [], simulated=False)
-    immediate_hypotheses = [h for h in (payload.hypotheses or []) if _hypothese_is_immediate(h)]
-    immediate_state = _build_state(dataset, immediate_hypotheses, simulated=True)
-
-    development_needs = _build_development_needs(payload, dataset)
-    projected_hypotheses = list(payload.hypotheses or []) + _projection_hypotheses_from_generated_needs(development_needs)
-    simulated_state = _build_state(dataset, projected_hypotheses, simulated=True)
 
     # Source de vérité de l'état réel : moteur Analyse, sans recopie de formule.
-    current_records_analyse = _fetch_current_poste_records_from_analyse_engine(cur, id_ent, id_service, int(criticite_min))
-    raw_current_records = _compute_poste_records(dataset, current_state)
-
-    current_records = current_records_analyse
+    current_records = _fetch_current_poste_records_from_analyse_engine(cur, id_ent, id_service, int(criticite_min))
     current_comp_records = _compute_competence_records(dataset, current_state)
     current_summary = _compute_summary(current_records, current_comp_records)
     dashboard_transmission_pct = _fetch_dashboard_transmission_pct(cur, id_ent, id_service, int(criticite_min))
     current_summary["capacite_transmission"] = dashboard_transmission_pct
 
+    return {
+        "scope": scope,
+        "id_service": id_service,
+        "criticite_min": int(criticite_min),
+        "dataset": dataset,
+        "raw_current_records": _compute_poste_records(dataset, current_state),
+        "current_records": current_records,
+        "current_comp_records": current_comp_records,
+        "current_summary": current_summary,
+        "dashboard_transmission_pct": dashboard_transmission_pct,
+    }
+
+
+def evaluate_simulation_payload(cur, id_ent: str, scope: Any, payload: SimulationEvalRequest, criticite_min: int) -> Dict[str, Any]:
+    return evaluate_simulation_on_baseline(load_simulation_baseline(cur, id_ent, scope, criticite_min), payload)
+
+
+def evaluate_simulation_batch(cur, id_ent: str, items: List[Tuple[Any, SimulationEvalRequest, int]]) -> List[Dict[str, Any]]:
+    """
+    Évalue N scénarios (scope, payload, criticite_min) sur des données lues une seule fois :
+    une baseline par couple (périmètre, criticité), seuls les deltas sont calculés par scénario.
+    """
+    baselines: Dict[Tuple[Optional[str], int], Dict[str, Any]] = {}
+    results: List[Dict[str, Any]] = []
+    for scope, payload, criticite_min in items:
+        key = (getattr(scope, "id_service", None), int(criticite_min))
+        if key not in baselines:
+            baselines[key] = load_simulation_baseline(cur, id_ent, scope, int(criticite_min))
+        results.append(evaluate_simulation_on_baseline(baselines[key], payload))
+    return results
+
+
+def evaluate_simulation_on_baseline(baseline: Dict[str, Any], payload: SimulationEvalRequest) -> Dict[str, Any]:
+    scope = baseline["scope"]
+    id_service = baseline["id_service"]
+    criticite_min = baseline["criticite_min"]
+    dataset = baseline["dataset"]
+    raw_current_records = baseline["raw_current_records"]
+    current_records = baseline["current_records"]
+    current_comp_records = baseline["current_comp_records"]
+    current_summary = dict(baseline["current_summary"])
+    dashboard_transmission_pct = baseline["dashboard_transmission_pct"]
+
+    immediate_hypotheses = [h for h in (payload.hypotheses or []) if _hypothese_is_immediate(h)]
+    immediate_state = _build_state(dataset, immediate_hypotheses, simulated=True)
+
+    development_needs = _build_development_needs(payload, dataset)
+    projected_hypotheses = list(payload.hypotheses or []) + _projection_hypotheses_from_generated_needs(development_needs)
+    simulated_state = _build_state(dataset, projected_hypotheses, simulated=True)
+
     projected_poste_ids = _projected_skill_poste_ids(payload, dataset)
 
     raw_immediate_records = _compute_poste_records(dataset, immediate_state)
@@ -0,0 +1,282 @@
+# unified_api/app/services/sql_profiler.py
+#
+# Profilage SQL par requête HTTP (diagnostic des dashboards / analyses lents).
+#
+# Activation :
+# - par requête : header X-Sql-Profile: <SQL_PROFILER_TOKEN> (ignoré si SQL_PROFILER_TOKEN absent)
+# - globalement : SQL_PROFILER_ENABLED=1 (échantillonné par SQL_PROFILER_SAMPLE_RATE)
+#
+# Pour chaque requête SQL (curseurs du pool, via metrics.InstrumentedCursor) : texte normalisé,
+# forme des paramètres (types / tailles, jamais les valeurs), durée, nb de lignes, fonction appelante.
+# Les SELECT au-delà de SQL_PROFILER_EXPLAIN_MS sont rejoués en EXPLAIN (ANALYZE, BUFFERS)
+# (au plus SQL_PROFILER_EXPLAIN_MAX par requête, dans un SAVEPOINT).
+#
+# Rapport : header X-Sql-Profile-Id + Server-Timing, rapport complet conservé en mémoire
+# (SQL_PROFILER_KEEP derniers) et consultable via get_sql_profile() / list_sql_profiles().
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import contextvars
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+_log = logging.getLogger("sql_profiler")
+
+SQL_PROFILER_ENABLED = (os.getenv("SQL_PROFILER_ENABLED", "") or "").strip().lower() in ("1", "true", "yes")
+SQL_PROFILER_SAMPLE_RATE = float(os.getenv("SQL_PROFILER_SAMPLE_RATE", "1") or 1)
+SQL_PROFILER_TOKEN = (os.getenv("SQL_PROFILER_TOKEN", "") or "").strip()
+SQL_PROFILER_EXPLAIN_MS = float(os.getenv("SQL_PROFILER_EXPLAIN_MS", "200") or 200)
+SQL_PROFILER_EXPLAIN_MAX = int(os.getenv("SQL_PROFILER_EXPLAIN_MAX", "3") or 3)
+SQL_PROFILER_KEEP = int(os.getenv("SQL_PROFILER_KEEP", "50") or 50)
+SQL_PROFILER_HEADER = "x-sql-profile"
+
+_profile = contextvars.ContextVar("sql_profile", default=None)
+_in_explain = contextvars.ContextVar("sql_profile_in_explain", default=False)
+
+_lock = threading.Lock()
+_profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+_WS_RE = re.compile(r"\s+")
+_STR_LIT_RE = re.compile(r"'(?:[^']|'')*'")
+_NUM_LIT_RE = re.compile(r"(?<![\w%$])\d+(?:\.\d+)?\b")
+_READ_ONLY_RE = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+_WRITE_RE = re.compile(r"\b(insert|update|delete|merge|create|alter|drop|truncate)\b", re.IGNORECASE)
+
+_THIS_FILES = ("sql_profiler.py", "metrics.py")
+
+
+# ======================================================
+# Normalisation
+# ======================================================
+def normalize_sql(query: Any) -> str:
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    if not isinstance(query, str):
+        return f"<{type(query).__name__}>"
+    q = _STR_LIT_RE.sub("?", query)
+    q = _NUM_LIT_RE.sub("?", q)
+    return _WS_RE.sub(" ", q).strip()[:2000]
+
+
+def _shape(v: Any) -> Any:
+    if v is None:
+        return "null"
+    if isinstance(v, (list, tuple)):
+        return f"{type(v).__name__}[{len(v)}]"
+    if isinstance(v, dict):
+        return {str(k): _shape(x) for k, x in v.items()}
+    return type(v).__name__
+
+
+def params_shape(params: Any) -> Any:
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return _shape(params)
+    try:
+        return [_shape(p) for p in params]
+    except TypeError:
+        return _shape(params)
+
+
+def _caller() -> str:
+    # Première frame applicative (hors psycopg / instrumentation)
+    f = sys._getframe(2)
+    while f is not None:
+        fn = f.f_code.co_filename
+        if "/app/" in fn.replace("\\", "/") and not fn.endswith(_THIS_FILES):
+            return f"{os.path.basename(fn)}:{f.f_code.co_name}:{f.f_lineno}"
+        f = f.f_back
+    return "?"
+
+
+# ======================================================
+# Activation
+# ======================================================
+def _should_profile(headers: Dict[str, str]) -> bool:
+    hv = (headers.get(SQL_PROFILER_HEADER) or "").strip()
+    if hv and SQL_PROFILER_TOKEN and hv == SQL_PROFILER_TOKEN:
+        return True
+    if SQL_PROFILER_ENABLED:
+        return SQL_PROFILER_SAMPLE_RATE >= 1 or random.random() < SQL_PROFILER_SAMPLE_RATE
+    return False
+
+
+def is_profiling() -> bool:
+    return _profile.get() is not None and not _in_explain.get()
+
+
+# ======================================================
+# Enregistrement (appelé par metrics.InstrumentedCursor)
+# ======================================================
+def _explain(cur, query: Any, params: Any) -> Optional[List[str]]:
+    conn = cur.connection
+    tok = _in_explain.set(True)
+    try:
+        with conn.cursor() as ecur:
+            ecur.execute("SAVEPOINT sql_profiler_explain")
+            try:
+                ecur.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+                plan = [r[0] for r in ecur.fetchall()]
+                ecur.execute("RELEASE SAVEPOINT sql_profiler_explain")
+                return plan
+            except Exception as e:
+                ecur.execute("ROLLBACK TO SAVEPOINT sql_profiler_explain")
+                return [f"EXPLAIN impossible: {e}"]
+    except Exception as e:
+        return [f"EXPLAIN impossible: {e}"]
+    finally:
+        _in_explain.reset(tok)
+
+
+def profile_statement(cur, query: Any, params: Any, ms: float, many: bool = False):
+    prof = _profile.get()
+    if prof is None or _in_explain.get():
+        return
+
+    key = normalize_sql(query)
+    try:
+        rows = int(cur.rowcount)
+    except Exception:
+        rows = -1
+
+    st = prof["_by_sql"].get(key)
+    if st is None:
+        st = {
+            "sql": key,
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "rows": 0,
+            "params_shape": params_shape(params) if not many else "executemany",
+            "callers": [],
+            "explain": None,
+        }
+        prof["_by_sql"][key] = st
+    st["count"] += 1
+    st["total_ms"] += ms
+    st["max_ms"] = max(st["max_ms"], ms)
+    if rows > 0:
+        st["rows"] += rows
+    caller = _caller()
+    if caller not in st["callers"] and len(st["callers"]) < 5:
+        st["callers"].append(caller)
+
+    prof["sql_count"] += 1
+    prof["sql_ms"] += ms
+
+    if (
+        not many
+        and st["explain"] is None
+        and ms >= SQL_PROFILER_EXPLAIN_MS
+        and prof["explains"] < SQL_PROFILER_EXPLAIN_MAX
+        and isinstance(query, str)
+        and _READ_ONLY_RE.match(query)
+        and not _WRITE_RE.search(query)
+    ):
+        prof["explains"] += 1
+        st["explain"] = _explain(cur, query, params)
+
+
+# ======================================================
+# Rapports
+# ======================================================
+def _report(prof: Dict[str, Any]) -> Dict[str, Any]:
+    statements = sorted(prof["_by_sql"].values(), key=lambda s: s["total_ms"], reverse=True)
+    out = {k: v for k, v in prof.items() if not k.startswith("_")}
+    out["sql_ms"] = round(out["sql_ms"], 1)
+    out["distinct_statements"] = len(statements)
+    out["statements"] = [
+        {**s, "total_ms": round(s["total_ms"], 1), "max_ms": round(s["max_ms"], 1)}
+        for s in statements
+    ]
+    return out
+
+
+def _store(prof: Dict[str, Any]):
+    with _lock:
+        _profiles[prof["id_profile"]] = prof
+        _profiles.move_to_end(prof["id_profile"])
+        while len(_profiles) > max(1, SQL_PROFILER_KEEP):
+            _profiles.popitem(last=False)
+
+
+def get_sql_profile(id_profile: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        prof = _profiles.get((id_profile or "").strip())
+    return _report(prof) if prof else None
+
+
+def list_sql_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    with _lock:
+        items = list(_profiles.values())
+    items.reverse()
+    return [
+        {k: (round(v, 1) if k in ("sql_ms", "ms") and isinstance(v, float) else v) for k, v in p.items() if not k.startswith("_")}
+        for p in items[: max(0, int(limit or 0))]
+    ]
+
+
+# ======================================================
+# Middleware
+# ======================================================
+class SqlProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http" or not (SQL_PROFILER_ENABLED or SQL_PROFILER_TOKEN):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers") or []}
+        if not _should_profile(headers):
+            await self.app(scope, receive, send)
+            return
+
+        prof = {
+            "id_profile": str(uuid.uuid4()),
+            "ts": time.time(),
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "route": None,
+            "status": None,
+            "ms": 0.0,
+            "sql_count": 0,
+            "sql_ms": 0.0,
+            "explains": 0,
+            "_by_sql": {},
+        }
+        _store(prof)
+        tok = _profile.set(prof)
+
+        async def send_wrapper(message):
+            if message.get("type") == "http.response.start":
+                prof["status"] = int(message.get("status") or 0)
+                hdrs = list(message.get("headers") or [])
+                hdrs.append((b"x-sql-profile-id", prof["id_profile"].encode()))
+                hdrs.append((
+                    b"server-timing",
+                    f'sql;dur={prof["sql_ms"]:.1f};desc="{prof["sql_count"]} statements"'.encode(),
+                ))
+                message = {**message, "headers": hdrs}
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(tok)
+            prof["ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+            route = scope.get("route")
+            prof["route"] = getattr(route, "path_format", None) or getattr(route, "path", None)
+            _log.info(
+                f"[SQL_PROFILE] {prof['id_profile']} {prof['method']} {prof['path']} "
+                f"ms={prof['ms']} sql={prof['sql_count']}/{prof['sql_ms']:.1f}ms"
+            )
@@ -0,0 +1,256 @@
+# unified_api/app/services/startup.py
+#
+# Démarrage rapide (instances autoscalées).
+#
+# - lazy_attr : dépendances lourdes (openai, pypdf, python-docx) importées au premier usage.
+#   Le proxy est "faux" si la lib est absente : `if not OpenAI:` remplace `if OpenAI is None:`.
+# - RouterRegistry : routers déclarés (nom, module, préfixes), chargés selon ROUTER_LOADING :
+#     eager (défaut) : import de tous les routers au démarrage, comme avant
+#     lazy           : routers à préfixe importés à la première requête sur leur préfixe
+#                      (les routes chargées apparaissent ensuite dans /docs)
+#   ROUTER_PRELOAD=skills_portal,studio_portal : chargés dès le démarrage en mode lazy
+#   ROUTER_PRELOAD_BACKGROUND=1 : les routers restants sont chargés en tâche de fond après le démarrage
+# - Rapport de démarrage : coût d'import par module (log [STARTUP] + startup_report()).
+# - STARTUP_WARMUP=1 : ouverture de STARTUP_WARM_CONNECTIONS connexions du pool (défaut: DB_POOL_SIZE)
+#   avant que l'instance ne se déclare prête.
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import importlib
+import logging
+import os
+import threading
+import time
+
+import anyio
+
+_log = logging.getLogger("startup")
+
+ROUTER_LOADING = (os.getenv("ROUTER_LOADING", "eager") or "eager").strip().lower()
+ROUTER_PRELOAD = [s.strip() for s in (os.getenv("ROUTER_PRELOAD", "") or "").split(",") if s.strip()]
+ROUTER_PRELOAD_BACKGROUND = (os.getenv("ROUTER_PRELOAD_BACKGROUND", "") or "").strip().lower() in ("1", "true", "yes")
+STARTUP_WARMUP = (os.getenv("STARTUP_WARMUP", "") or "").strip().lower() in ("1", "true", "yes")
+STARTUP_WARM_CONNECTIONS = (os.getenv("STARTUP_WARM_CONNECTIONS", "") or "").strip()
+
+_t_process = time.perf_counter()
+
+
+# ======================================================
+# Dépendances lourdes importées au premier usage
+# ======================================================
+_lazy_lock = threading.Lock()
+_lazy_stats: Dict[str, Dict[str, Any]] = {}
+
+
+class LazyAttr:
+    """
+    Proxy vers module.attr, importé au premier appel / accès.
+    """
+
+    def __init__(self, module: str, attr: str):
+        self._module = module
+        self._attr = attr
+        self._target: Any = None
+        self._resolved = False
+
+    def _resolve(self) -> Any:
+        if self._resolved:
+            return self._target
+        with _lazy_lock:
+            if not self._resolved:
+                t0 = time.perf_counter()
+                try:
+                    self._target = getattr(importlib.import_module(self._module), self._attr)
+                except Exception:
+                    self._target = None
+                _lazy_stats[self._module] = {
+                    "available": self._target is not None,
+                    "import_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+                }
+                self._resolved = True
+        return self._target
+
+    def __bool__(self) -> bool:
+        return self._resolve() is not None
+
+    def __call__(self, *args, **kwargs):
+        target = self._resolve()
+        if target is None:
+            raise ImportError(f"{self._module}.{self._attr} indisponible")
+        return target(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        target = self._resolve()
+        if target is None:
+            raise ImportError(f"{self._module}.{self._attr} indisponible")
+        return getattr(target, name)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._module}.{self._attr}>"
+
+
+def lazy_attr(module: str, attr: str) -> LazyAttr:
+    return LazyAttr(module, attr)
+
+
+# ======================================================
+# Registre des routers
+# ======================================================
+class RouterSpec:
+    def __init__(self, name: str, module: str, prefixes: Iterable[str] = ()):
+        self.name = name
+        self.module = module
+        self.prefixes: Tuple[str, ...] = tuple(prefixes or ())
+        self.loaded = False
+        self.import_ms: Optional[float] = None
+        self.routes = 0
+        self.loaded_by: Optional[str] = None
+
+
+_registry: Optional["RouterRegistry"] = None
+_warmup: Dict[str, Any] = {}
+_ready_ms: Optional[float] = None
+
+
+class RouterRegistry:
+    def __init__(self, app, specs: List[RouterSpec]):
+        global _registry
+        self.app = app
+        self.specs = specs
+        self.mode = "lazy" if ROUTER_LOADING == "lazy" else "eager"
+        self._lock = threading.Lock()
+        self._pending = len(specs)
+        _registry = self
+
+    def load(self, spec: RouterSpec, loaded_by: str) -> RouterSpec:
+        if spec.loaded:
+            return spec
+        with self._lock:
+            if spec.loaded:
+                return spec
+            t0 = time.perf_counter()
+            mod = importlib.import_module(spec.module)
+            routes = list(mod.router.routes)
+            for route in routes:
+                self.app.router.routes.append(route)
+            spec.import_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+            spec.routes = len(routes)
+            spec.loaded_by = loaded_by
+            spec.loaded = True
+            self._pending -= 1
+        if loaded_by != "startup":
+            _log.warning(f"[STARTUP] router {spec.name} chargé ({loaded_by}) en {spec.import_ms} ms")
+        return spec
+
+    def register(self):
+        """
+        Enregistrement initial (à l'import de main) : tout en eager, sinon seulement
+        les routers sans préfixe et ceux de ROUTER_PRELOAD.
+        """
+        for spec in self.specs:
+            if self.mode == "eager" or not spec.prefixes or spec.name in ROUTER_PRELOAD:
+                self.load(spec, "startup")
+
+    def pending_for(self, path: str) -> Optional[RouterSpec]:
+        for spec in self.specs:
+            if not spec.loaded and spec.prefixes and path.startswith(spec.prefixes):
+                return spec
+        return None
+
+    def has_pending(self) -> bool:
+        return self._pending > 0
+
+    def load_pending(self, loaded_by: str):
+        for spec in self.specs:
+            if not spec.loaded:
+                try:
+                    self.load(spec, loaded_by)
+                except Exception as e:
+                    _log.error(f"[STARTUP] chargement router {spec.name} impossible: {e}")
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": s.name,
+                "module": s.module,
+                "prefixes": list(s.prefixes),
+                "loaded": s.loaded,
+                "loaded_by": s.loaded_by,
+                "import_ms": s.import_ms,
+                "routes": s.routes,
+            }
+            for s in self.specs
+        ]
+
+
+class LazyRouterMiddleware:
+    """
+    Mode lazy : importe le router du préfixe demandé avant le routage (import hors boucle async).
+    """
+
+    def __init__(self, app, registry: RouterRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if self.registry.mode == "lazy" and self.registry.has_pending() and scope.get("type") in ("http", "websocket"):
+            spec = self.registry.pending_for(scope.get("path") or "")
+            if spec is not None:
+                await anyio.to_thread.run_sync(self.registry.load, spec, "request")
+        await self.app(scope, receive, send)
+
+
+# ======================================================
+# Warm-up + rapport (événement startup)
+# ======================================================
+def _warm_pool() -> Dict[str, Any]:
+    from app.routers.skills_portal_common import warm_pool
+
+    count = int(STARTUP_WARM_CONNECTIONS) if STARTUP_WARM_CONNECTIONS.isdigit() else None
+    t0 = time.perf_counter()
+    try:
+        opened = warm_pool(count)
+        err = None
+    except Exception as e:
+        opened, err = 0, str(e)[:300]
+    return {"connections": opened, "ms": round((time.perf_counter() - t0) * 1000.0, 1), "error": err}
+
+
+def run_startup_warmup():
+    global _ready_ms
+    if STARTUP_WARMUP:
+        _warmup["pool"] = _warm_pool()
+
+    _ready_ms = round((time.perf_counter() - _t_process) * 1000.0, 1)
+    rep = startup_report()
+    loaded = [r for r in rep["routers"] if r["loaded"]]
+    costs = ", ".join(f"{r['name']}={r['import_ms']}ms" for r in sorted(loaded, key=lambda r: -(r["import_ms"] or 0)))
+    _log.warning(
+        f"[STARTUP] mode={rep['mode']} prêt en {_ready_ms} ms ; routers chargés {len(loaded)}/{len(rep['routers'])} : {costs}"
+        + (f" ; warm-up pool={_warmup['pool']}" if _warmup.get("pool") else "")
+    )
+
+    if _registry is not None and _registry.mode == "lazy" and ROUTER_PRELOAD_BACKGROUND and _registry.has_pending():
+        threading.Thread(target=_registry.load_pending, args=("background",), name="router-preload", daemon=True).start()
+
+
+def startup_report() -> Dict[str, Any]:
+    with _lazy_lock:
+        lazy = {k: dict(v) for k, v in _lazy_stats.items()}
+    return {
+        "mode": _registry.mode if _registry is not None else ROUTER_LOADING,
+        "ready_ms": _ready_ms,
+        "routers": _registry.report() if _registry is not None else [],
+        "lazy_imports": lazy,
+        "warmup": dict(_warmup),
+    }
+
+
+def startup_stats() -> Dict[str, Any]:
+    routers = _registry.report() if _registry is not None else []
+    return {
+        "ready_ms": _ready_ms or 0.0,
+        "routers_loaded": sum(1 for r in routers if r["loaded"]),
+        "routers_pending": sum(1 for r in routers if not r["loaded"]),
+        "router_import_ms": {r["name"]: r["import_ms"] for r in routers if r["loaded"]},
+        "warm_connections": (_warmup.get("pool") or {}).get("connections", 0),
+    }
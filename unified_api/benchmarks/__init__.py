@@ -0,0 +1,4 @@
+# unified_api/benchmarks
+#
+# Benchmarks des moteurs Insights sur entreprises synthétiques (base Postgres locale).
+# Voir run_benchmarks.py pour l'usage.
@@ -0,0 +1,185 @@
+-- Schéma minimal pour les benchmarks des moteurs d'analyse / simulation.
+-- Base Postgres LOCALE dédiée uniquement (jamais la base de production) :
+-- ne contient que les colonnes lues par les moteurs benchmarkés.
+-- Idempotent : rejouable avant chaque génération.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.tbl_entreprise (
+    id_ent text PRIMARY KEY,
+    nom_ent text,
+    masque boolean DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_studio_owner_logo (
+    id_owner text,
+    logo_bytes bytea,
+    archive boolean DEFAULT FALSE,
+    date_creation timestamptz DEFAULT now(),
+    date_maj timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_entreprise_organigramme (
+    id_service text PRIMARY KEY,
+    id_ent text NOT NULL,
+    nom_service text,
+    id_service_parent text,
+    archive boolean DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS ix_bench_orga_ent ON public.tbl_entreprise_organigramme (id_ent, id_service_parent);
+
+CREATE TABLE IF NOT EXISTS public.tbl_nsf_domaine (
+    code text PRIMARY KEY,
+    titre text
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_domaine_competence (
+    id_domaine_competence text PRIMARY KEY,
+    titre text,
+    titre_court text,
+    couleur text,
+    ordre_affichage integer,
+    masque boolean DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_competence (
+    id_comp text PRIMARY KEY,
+    id_owner text,
+    code text,
+    intitule text,
+    description text,
+    domaine text,
+    etat text DEFAULT 'active',
+    masque boolean DEFAULT FALSE,
+    niveaua text,
+    niveaub text,
+    niveauc text,
+    niveaud text,
+    grille_evaluation jsonb
+);
+CREATE INDEX IF NOT EXISTS ix_bench_competence_code ON public.tbl_competence (code);
+
+CREATE TABLE IF NOT EXISTS public.tbl_fiche_poste (
+    id_poste text PRIMARY KEY,
+    id_ent text NOT NULL,
+    id_service text,
+    codif_poste text,
+    codif_client text,
+    intitule_poste text,
+    actif boolean DEFAULT TRUE,
+    niveau_education_minimum text,
+    nsf_domaine_code text,
+    nsf_domaine_obligatoire boolean DEFAULT FALSE,
+    nsf_groupe_obligatoire boolean DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS ix_bench_fiche_poste_ent ON public.tbl_fiche_poste (id_ent, id_service);
+
+CREATE TABLE IF NOT EXISTS public.tbl_fiche_poste_param_rh (
+    id_poste text PRIMARY KEY,
+    nb_titulaires_cible integer,
+    criticite_poste integer,
+    statut_poste text
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_fiche_poste_competence (
+    id_poste text NOT NULL,
+    id_competence text NOT NULL,
+    niveau_requis text,
+    poids_criticite integer,
+    masque boolean DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS ix_bench_fpc_poste ON public.tbl_fiche_poste_competence (id_poste);
+
+CREATE TABLE IF NOT EXISTS public.tbl_effectif_client (
+    id_effectif text PRIMARY KEY,
+    id_ent text NOT NULL,
+    id_service text,
+    id_poste_actuel text,
+    code_effectif text,
+    nom_effectif text,
+    prenom_effectif text,
+    statut_actif boolean DEFAULT TRUE,
+    archive boolean DEFAULT FALSE,
+    is_temp boolean DEFAULT FALSE,
+    type_contrat text,
+    date_entree_entreprise_effectif date,
+    date_sortie_prevue date,
+    havedatefin boolean DEFAULT FALSE,
+    motif_sortie text,
+    retraite_estimee integer,
+    niveau_education text,
+    domaine_education text
+);
+CREATE INDEX IF NOT EXISTS ix_bench_effectif_ent ON public.tbl_effectif_client (id_ent, id_service);
+CREATE INDEX IF NOT EXISTS ix_bench_effectif_poste ON public.tbl_effectif_client (id_poste_actuel);
+
+CREATE TABLE IF NOT EXISTS public.tbl_effectif_client_competence (
+    id_effectif_competence text PRIMARY KEY,
+    id_effectif_client text NOT NULL,
+    id_comp text NOT NULL,
+    niveau_actuel text,
+    date_derniere_eval date,
+    id_dernier_audit text,
+    actif boolean DEFAULT TRUE,
+    archive boolean DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS ix_bench_ec_effectif ON public.tbl_effectif_client_competence (id_effectif_client);
+CREATE INDEX IF NOT EXISTS ix_bench_ec_comp ON public.tbl_effectif_client_competence (id_comp);
+
+CREATE TABLE IF NOT EXISTS public.tbl_effectif_client_audit_competence (
+    id_audit_competence text PRIMARY KEY,
+    id_effectif_competence text NOT NULL,
+    date_audit date,
+    resultat_eval numeric,
+    detail_eval jsonb,
+    code text,
+    intitule text
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_effectif_client_break (
+    id_break text PRIMARY KEY,
+    id_ent text,
+    id_effectif text NOT NULL,
+    date_debut date,
+    date_fin date,
+    archive boolean DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS ix_bench_break_effectif ON public.tbl_effectif_client_break (id_effectif);
+
+CREATE TABLE IF NOT EXISTS public.tbl_studio_poste_cotation_ccn (
+    id_cotation_ccn text PRIMARY KEY,
+    id_ent text,
+    id_poste text,
+    idcc text,
+    statut_cotation text,
+    validation_json jsonb,
+    archive boolean DEFAULT FALSE,
+    date_maj timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_action_formation (
+    id_action_formation text PRIMARY KEY,
+    etat_action text,
+    date_fin_formation date,
+    archive boolean DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_action_formation_effectif (
+    id_action_formation text,
+    id_effectif text,
+    archive boolean DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS public.tbl_entretien_individuel (
+    id_effectif_client text,
+    statut text,
+    archive boolean DEFAULT FALSE
+);
+
+-- Colonnes de mise à jour lues par l'empreinte des scénarios (simulation_scenario_store)
+ALTER TABLE public.tbl_competence ADD COLUMN IF NOT EXISTS date_modification timestamptz DEFAULT now();
+ALTER TABLE public.tbl_fiche_poste ADD COLUMN IF NOT EXISTS date_maj timestamptz DEFAULT now();
+ALTER TABLE public.tbl_fiche_poste_competence ADD COLUMN IF NOT EXISTS date_modification timestamptz DEFAULT now();
+ALTER TABLE public.tbl_effectif_client ADD COLUMN IF NOT EXISTS dernier_update timestamptz DEFAULT now();
+
+COMMIT;
@@ -0,0 +1,335 @@
+# unified_api/benchmarks/synthetic_enterprise.py
+#
+# Générateur d'entreprises synthétiques (base Postgres locale de benchmark).
+#
+# Une entreprise = organigramme (profondeur / largeur), postes + exigences, catalogue de
+# compétences, effectifs rattachés, compétences déclarées, audits, indisponibilités (breaks)
+# et sorties prévues. Génération déterministe (seed) : deux runs sur la même échelle lisent
+# exactement les mêmes données.
+#
+# Tous les identifiants sont préfixés par id_ent : la régénération purge uniquement
+# l'entreprise concernée.
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+import pathlib
+import random
+
+from pydantic import BaseModel
+
+SCHEMA_FILE = pathlib.Path(__file__).resolve().parent / "schema_bench.sql"
+
+NIVEAUX = ["A", "B", "C", "D"]
+NIVEAUX_ACTUELS = ["Initial", "Intermédiaire", "Avancé", "Expert"]
+NSF_DOMAINES = [
+    ("200", "Technologies industrielles fondamentales"),
+    ("250", "Mécanique, électricité, électronique"),
+    ("310", "Échanges et gestion"),
+    ("320", "Communication et information"),
+    ("330", "Services aux personnes"),
+]
+DOMAINES_COMPETENCE = [
+    ("DOM-TECH", "Technique", "TEC", "#2563EB"),
+    ("DOM-QUAL", "Qualité / sécurité", "QSE", "#10B981"),
+    ("DOM-GEST", "Gestion", "GES", "#F97316"),
+    ("DOM-REL", "Relationnel", "REL", "#7C3AED"),
+    ("DOM-MAN", "Management", "MAN", "#EC4899"),
+]
+
+
+class SyntheticEnterpriseConfig(BaseModel):
+    id_ent: str
+    nom_ent: str = "Entreprise benchmark"
+    seed: int = 42
+    services_depth: int = 3
+    services_per_level: int = 3
+    postes: int = 60
+    competences_catalog: int = 200
+    competences_per_poste: int = 10
+    effectifs: int = 400
+    extra_competences_per_effectif: int = 3
+    competence_coverage: float = 0.85
+    audit_ratio: float = 0.6
+    break_ratio: float = 0.05
+    planned_exit_ratio: float = 0.08
+    retirement_ratio: float = 0.1
+
+
+SCALES: Dict[str, Dict[str, Any]] = {
+    "small": {
+        "services_depth": 2, "services_per_level": 3, "postes": 20, "competences_catalog": 80,
+        "competences_per_poste": 8, "effectifs": 100,
+    },
+    "medium": {
+        "services_depth": 3, "services_per_level": 3, "postes": 80, "competences_catalog": 300,
+        "competences_per_poste": 12, "effectifs": 600,
+    },
+    "large": {
+        "services_depth": 4, "services_per_level": 4, "postes": 250, "competences_catalog": 800,
+        "competences_per_poste": 15, "effectifs": 3000,
+    },
+    "xlarge": {
+        "services_depth": 5, "services_per_level": 4, "postes": 600, "competences_catalog": 1500,
+        "competences_per_poste": 18, "effectifs": 10000,
+    },
+}
+
+
+def config_for_scale(scale: str, seed: int = 42) -> SyntheticEnterpriseConfig:
+    s = (scale or "").strip().lower()
+    if s not in SCALES:
+        raise ValueError(f"Échelle inconnue: {scale} (attendu: {', '.join(SCALES)})")
+    return SyntheticEnterpriseConfig(id_ent=f"BENCH-{s.upper()}", nom_ent=f"Benchmark {s}", seed=seed, **SCALES[s])
+
+
+# ======================================================
+# Schéma
+# ======================================================
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_FILE.read_text(encoding="utf-8"))
+    conn.commit()
+
+
+# ======================================================
+# Purge / écriture
+# ======================================================
+_PURGE = [
+    ("tbl_effectif_client_audit_competence", "id_audit_competence"),
+    ("tbl_effectif_client_competence", "id_effectif_competence"),
+    ("tbl_effectif_client_break", "id_break"),
+    ("tbl_effectif_client", "id_effectif"),
+    ("tbl_fiche_poste_competence", "id_poste"),
+    ("tbl_fiche_poste_param_rh", "id_poste"),
+    ("tbl_fiche_poste", "id_poste"),
+    ("tbl_competence", "id_comp"),
+    ("tbl_entreprise_organigramme", "id_service"),
+    ("tbl_entreprise", "id_ent"),
+]
+
+
+def purge_enterprise(conn, id_ent: str):
+    with conn.cursor() as cur:
+        for table, col in _PURGE:
+            cur.execute(f"DELETE FROM public.{table} WHERE {col} LIKE %s", (f"{id_ent}%",))
+    conn.commit()
+
+
+def _copy(cur, table: str, columns: Sequence[str], rows: List[Sequence[Any]]) -> int:
+    if not rows:
+        return 0
+    with cur.copy(f"COPY public.{table} ({', '.join(columns)}) FROM STDIN") as cp:
+        for r in rows:
+            cp.write_row(r)
+    return len(rows)
+
+
+# ======================================================
+# Génération
+# ======================================================
+def _services(cfg: SyntheticEnterpriseConfig) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    level = [None]
+    n = 0
+    for depth in range(max(1, cfg.services_depth)):
+        nxt = []
+        for parent in level:
+            for _ in range(max(1, cfg.services_per_level)):
+                n += 1
+                sid = f"{cfg.id_ent}-S{n:04d}"
+                out.append({"id_service": sid, "id_service_parent": parent, "nom_service": f"Service {n} (niv. {depth + 1})", "depth": depth})
+                nxt.append(sid)
+        level = nxt
+    return out
+
+
+def generate_enterprise(conn, cfg: SyntheticEnterpriseConfig) -> Dict[str, int]:
+    """
+    (Re)génère l'entreprise cfg.id_ent. Retourne le nombre de lignes écrites par table.
+    """
+    rnd = random.Random(cfg.seed)
+    today = date.today()
+    ent = cfg.id_ent
+    counts: Dict[str, int] = {}
+
+    purge_enterprise(conn, ent)
+
+    services = _services(cfg)
+    service_ids = [s["id_service"] for s in services]
+
+    domaines = [d[0] for d in DOMAINES_COMPETENCE]
+    comps = []
+    for i in range(1, max(1, cfg.competences_catalog) + 1):
+        comps.append({
+            "id_comp": f"{ent}-C{i:05d}",
+            "code": f"{ent.split('-')[-1][:3]}{i:05d}",
+            "intitule": f"Compétence {i}",
+            "domaine": rnd.choice(domaines),
+        })
+    comp_ids = [c["id_comp"] for c in comps]
+
+    postes = []
+    for i in range(1, max(1, cfg.postes) + 1):
+        postes.append({
+            "id_poste": f"{ent}-P{i:04d}",
+            "id_service": rnd.choice(service_ids) if rnd.random() > 0.03 else None,
+            "codif_poste": f"PT{i:04d}",
+            "edu": rnd.choice(["", "", "3", "4", "5"]),
+            "nsf": rnd.choice(NSF_DOMAINES)[0] if rnd.random() < 0.1 else None,
+        })
+
+    poste_reqs: Dict[str, List[tuple]] = {}
+    for p in postes:
+        chosen = rnd.sample(comp_ids, min(len(comp_ids), max(1, cfg.competences_per_poste)))
+        poste_reqs[p["id_poste"]] = [(cid, rnd.choice(NIVEAUX), rnd.choice([40, 60, 70, 80, 90, 100])) for cid in chosen]
+
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO public.tbl_entreprise (id_ent, nom_ent, masque) VALUES (%s, %s, FALSE) ON CONFLICT (id_ent) DO NOTHING",
+            (ent, cfg.nom_ent),
+        )
+        for code, titre in NSF_DOMAINES:
+            cur.execute("INSERT INTO public.tbl_nsf_domaine (code, titre) VALUES (%s, %s) ON CONFLICT (code) DO NOTHING", (code, titre))
+        for i, (did, titre, court, couleur) in enumerate(DOMAINES_COMPETENCE):
+            cur.execute(
+                """
+                INSERT INTO public.tbl_domaine_competence (id_domaine_competence, titre, titre_court, couleur, ordre_affichage, masque)
+                VALUES (%s, %s, %s, %s, %s, FALSE)
+                ON CONFLICT (id_domaine_competence) DO NOTHING
+                """,
+                (did, titre, court, couleur, i + 1),
+            )
+
+        counts["services"] = _copy(
+            cur,
+            "tbl_entreprise_organigramme",
+            ["id_service", "id_ent", "nom_service", "id_service_parent", "archive"],
+            [(s["id_service"], ent, s["nom_service"], s["id_service_parent"], False) for s in services],
+        )
+        counts["competences"] = _copy(
+            cur,
+            "tbl_competence",
+            ["id_comp", "id_owner", "code", "intitule", "description", "domaine", "etat", "masque", "niveaua", "niveaub", "niveauc", "niveaud"],
+            [
+                (c["id_comp"], ent, c["code"], c["intitule"], f"Description {c['intitule']}", c["domaine"], "active", False,
+                 "Initial", "Intermédiaire", "Avancé", "Expert")
+                for c in comps
+            ],
+        )
+        counts["postes"] = _copy(
+            cur,
+            "tbl_fiche_poste",
+            ["id_poste", "id_ent", "id_service", "codif_poste", "codif_client", "intitule_poste", "actif",
+             "niveau_education_minimum", "nsf_domaine_code", "nsf_domaine_obligatoire", "nsf_groupe_obligatoire"],
+            [
+                (p["id_poste"], ent, p["id_service"], p["codif_poste"], None, f"Poste {p['codif_poste']}", True,
+                 p["edu"], p["nsf"], bool(p["nsf"]), False)
+                for p in postes
+            ],
+        )
+        counts["postes_param_rh"] = _copy(
+            cur,
+            "tbl_fiche_poste_param_rh",
+            ["id_poste", "nb_titulaires_cible", "criticite_poste", "statut_poste"],
+            [(p["id_poste"], rnd.choice([1, 1, 2, 3]), rnd.choice([1, 2, 3, 4]), "actif") for p in postes],
+        )
+        counts["postes_competences"] = _copy(
+            cur,
+            "tbl_fiche_poste_competence",
+            ["id_poste", "id_competence", "niveau_requis", "poids_criticite", "masque"],
+            [(pid, cid, niv, poids, False) for pid, reqs in poste_reqs.items() for cid, niv, poids in reqs],
+        )
+
+        effectifs = []
+        ec_rows = []
+        audit_rows = []
+        break_rows = []
+        n_ec = 0
+        for i in range(1, max(1, cfg.effectifs) + 1):
+            eid = f"{ent}-E{i:06d}"
+            poste = rnd.choice(postes)
+            sortie: Optional[date] = None
+            if rnd.random() < cfg.planned_exit_ratio:
+                sortie = today + timedelta(days=rnd.randint(10, 540))
+            retraite = today.year + rnd.randint(0, 4) if rnd.random() < cfg.retirement_ratio else None
+            effectifs.append((
+                eid, ent, poste["id_service"], poste["id_poste"], f"M{i:06d}", f"Nom{i}", f"Prénom{i}",
+                True, False, False, rnd.choice(["CDI", "CDI", "CDI", "CDD"]),
+                today - timedelta(days=rnd.randint(30, 9000)), sortie, bool(sortie),
+                "Démission" if sortie else None, retraite, rnd.choice(["3", "4", "5", "6"]),
+                rnd.choice(NSF_DOMAINES)[1],
+            ))
+
+            held = [cid for cid, _, _ in poste_reqs[poste["id_poste"]] if rnd.random() < cfg.competence_coverage]
+            held += rnd.sample(comp_ids, min(len(comp_ids), max(0, cfg.extra_competences_per_effectif)))
+            for cid in dict.fromkeys(held):
+                n_ec += 1
+                ecid = f"{ent}-EC{n_ec:08d}"
+                id_audit = None
+                date_eval = None
+                if rnd.random() < cfg.audit_ratio:
+                    id_audit = f"{ent}-AU{n_ec:08d}"
+                    date_eval = today - timedelta(days=rnd.randint(1, 900))
+                    audit_rows.append((id_audit, ecid, date_eval, round(rnd.uniform(3, 24), 1)))
+                ec_rows.append((ecid, eid, cid, rnd.choice(NIVEAUX_ACTUELS), date_eval, id_audit, True, False))
+
+            if rnd.random() < cfg.break_ratio:
+                debut = today - timedelta(days=rnd.randint(0, 30))
+                break_rows.append((f"{ent}-B{i:06d}", ent, eid, debut, debut + timedelta(days=rnd.randint(15, 120)), False))
+            if rnd.random() < cfg.break_ratio:
+                debut = today + timedelta(days=rnd.randint(30, 300))
+                break_rows.append((f"{ent}-BF{i:06d}", ent, eid, debut, debut + timedelta(days=rnd.randint(15, 90)), False))
+
+        counts["effectifs"] = _copy(
+            cur,
+            "tbl_effectif_client",
+            ["id_effectif", "id_ent", "id_service", "id_poste_actuel", "code_effectif", "nom_effectif", "prenom_effectif",
+             "statut_actif", "archive", "is_temp", "type_contrat", "date_entree_entreprise_effectif", "date_sortie_prevue",
+             "havedatefin", "motif_sortie", "retraite_estimee", "niveau_education", "domaine_education"],
+            effectifs,
+        )
+        counts["effectifs_competences"] = _copy(
+            cur,
+            "tbl_effectif_client_competence",
+            ["id_effectif_competence", "id_effectif_client", "id_comp", "niveau_actuel", "date_derniere_eval", "id_dernier_audit", "actif", "archive"],
+            ec_rows,
+        )
+        counts["audits"] = _copy(
+            cur,
+            "tbl_effectif_client_audit_competence",
+            ["id_audit_competence", "id_effectif_competence", "date_audit", "resultat_eval"],
+            audit_rows,
+        )
+        counts["breaks"] = _copy(
+            cur,
+            "tbl_effectif_client_break",
+            ["id_break", "id_ent", "id_effectif", "date_debut", "date_fin", "archive"],
+            break_rows,
+        )
+
+        # Statistiques planificateur à jour : mesures comparables d'un run à l'autre
+        for table, _ in _PURGE:
+            cur.execute(f"ANALYZE public.{table}")
+
+    conn.commit()
+    return counts
+
+
+def pick_service_for_scope(conn, id_ent: str) -> Optional[str]:
+    """
+    Service de niveau 1 avec le plus de descendants : exerce le périmètre récursif.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT id_service
+            FROM public.tbl_entreprise_organigramme
+            WHERE id_ent = %s
+              AND id_service_parent IS NULL
+            ORDER BY id_service
+            LIMIT 1
+            """,
+            (id_ent,),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
@@ -0,0 +1,371 @@
+# unified_api/loadtest/fake_services.py
+#
+# Doublures locales des services externes pour les tests de charge (jamais en production).
+#
+# Un seul serveur HTTP (préfixe de chemin par service) + un serveur SMTP minimal :
+# - /supabase : Auth (/auth/v1/user, /auth/v1/admin/...) et Storage (/storage/v1/object/...)
+# - /msauth   : jeton Microsoft (/{tenant}/oauth2/v2.0/token)
+# - /graph    : Microsoft Graph (réponses génériques)
+# - /mailjet  : /v3.1/send
+# - /lms      : API Lära (toute route POST/GET)
+# - /openai   : /v1/chat/completions, /v1/embeddings
+#
+# Auth factice : le jeton "Bearer user:<email>" (ou "user:<email>:<uuid>") est accepté tel quel,
+# l'email sert ensuite à la résolution contact / effectif / consultant comme en production.
+#
+# Latence et erreurs injectables par service (FakeServiceConfig) : latency_ms, jitter_ms,
+# error_rate (0..1), error_status.
+#
+# Usage autonome :
+#   python -m loadtest.fake_services --port 8900 --smtp-port 8925 --config loadtest/fakes.json
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+import argparse
+import json
+import random
+import socketserver
+import threading
+import time
+import uuid
+
+from pydantic import BaseModel
+
+SERVICES = ("supabase", "msauth", "graph", "mailjet", "lms", "openai", "smtp")
+
+
+class FakeServiceConfig(BaseModel):
+    latency_ms: float = 20.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+DEFAULT_CONFIGS: Dict[str, FakeServiceConfig] = {
+    "supabase": FakeServiceConfig(latency_ms=25.0, jitter_ms=15.0),
+    "msauth": FakeServiceConfig(latency_ms=80.0, jitter_ms=40.0),
+    "graph": FakeServiceConfig(latency_ms=120.0, jitter_ms=80.0),
+    "mailjet": FakeServiceConfig(latency_ms=150.0, jitter_ms=50.0),
+    "lms": FakeServiceConfig(latency_ms=200.0, jitter_ms=100.0),
+    "openai": FakeServiceConfig(latency_ms=2500.0, jitter_ms=1500.0),
+    "smtp": FakeServiceConfig(latency_ms=50.0, jitter_ms=20.0),
+}
+
+
+def load_configs(raw: Optional[Dict[str, Any]] = None) -> Dict[str, FakeServiceConfig]:
+    out = {k: v.copy() for k, v in DEFAULT_CONFIGS.items()}
+    for name, values in (raw or {}).items():
+        if name in out and isinstance(values, dict):
+            out[name] = FakeServiceConfig(**{**out[name].dict(), **values})
+    return out
+
+
+def _delay(cfg: FakeServiceConfig):
+    ms = max(0.0, cfg.latency_ms + random.uniform(-cfg.jitter_ms, cfg.jitter_ms))
+    if ms:
+        time.sleep(ms / 1000.0)
+
+
+def _should_fail(cfg: FakeServiceConfig) -> bool:
+    return cfg.error_rate > 0 and random.random() < cfg.error_rate
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def bump(self, service: str, error: bool):
+        with self.lock:
+            self.calls[service] = self.calls.get(service, 0) + 1
+            if error:
+                self.errors[service] = self.errors.get(service, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"calls": dict(self.calls), "errors": dict(self.errors)}
+
+
+# ======================================================
+# Réponses par service
+# ======================================================
+def _fake_user(auth_header: str) -> Optional[Dict[str, Any]]:
+    token = (auth_header or "").replace("Bearer", "", 1).strip()
+    if not token.startswith("user:"):
+        return None
+    parts = token.split(":")
+    email = (parts[1] if len(parts) > 1 else "").strip().lower()
+    if not email:
+        return None
+    uid = parts[2] if len(parts) > 2 and parts[2] else str(uuid.uuid5(uuid.NAMESPACE_URL, email))
+    return {"id": uid, "aud": "authenticated", "role": "authenticated", "email": email, "user_metadata": {}, "app_metadata": {}}
+
+
+def _supabase(method: str, path: str, headers, body: Dict[str, Any]) -> Tuple[int, Any]:
+    if path.startswith("/auth/v1/user"):
+        user = _fake_user(headers.get("Authorization") or "")
+        return (200, user) if user else (401, {"msg": "invalid JWT"})
+    if path.startswith("/auth/v1/admin/generate_link"):
+        link = f"http://fake.local/auth/v1/verify?token={uuid.uuid4().hex}"
+        return 200, {"action_link": link, "properties": {"action_link": link}, "email": body.get("email")}
+    if path.startswith("/auth/v1/admin/users"):
+        if method == "GET":
+            return 200, {"users": [], "aud": "authenticated"}
+        return 200, {"id": str(uuid.uuid4()), "email": body.get("email"), "user_metadata": body.get("user_metadata") or {}}
+    if path.startswith("/storage/v1/object"):
+        if method == "GET":
+            return 200, b"%PDF-1.4\n% fake\n"
+        return 200, {"Key": path.split("/storage/v1/object/", 1)[-1]}
+    return 404, {"error": "not found"}
+
+
+def _msauth(method: str, path: str, headers, body: Dict[str, Any]) -> Tuple[int, Any]:
+    return 200, {"token_type": "Bearer", "expires_in": 3599, "access_token": f"fake-{uuid.uuid4().hex}"}
+
+
+def _graph(method: str, path: str, headers, body: Dict[str, Any]) -> Tuple[int, Any]:
+    if method == "GET" and path.endswith("/content"):
+        return 200, b"fake-content"
+    if method in ("PUT", "POST", "PATCH"):
+        item_id = uuid.uuid4().hex
+        return 201, {"id": item_id, "name": path.rsplit("/", 1)[-1], "webUrl": f"http://fake.local/graph/{item_id}"}
+    if method == "DELETE":
+        return 204, None
+    return 200, {"value": [], "id": uuid.uuid4().hex}
+
+
+def _mailjet(method: str, path: str, headers, body: Dict[str, Any]) -> Tuple[int, Any]:
+    msgs = body.get("Messages") or [{}]
+    return 200, {"Messages": [{"Status": "success", "To": m.get("To") or []} for m in msgs]}
+
+
+def _lms(method: str, path: str, headers, body: Dict[str, Any]) -> Tuple[int, Any]:
+    return 200, {"ok": True, "success": True, "data": [], "id": uuid.uuid4().hex}
+
+
+def _openai(method: str, path: str, headers, body: Dict[str, Any]) -> Tuple[int, Any]:
+    if path.endswith("/embeddings"):
+        inputs = body.get("input")
+        n = len(inputs) if isinstance(inputs, list) else 1
+        return 200, {"object": "list", "data": [{"object": "embedding", "index": i, "embedding": [0.0] * 8} for i in range(n)]}
+    return 200, {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "model": body.get("model") or "fake",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{}"}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+_HANDLERS = {
+    "supabase": _supabase,
+    "msauth": _msauth,
+    "graph": _graph,
+    "mailjet": _mailjet,
+    "lms": _lms,
+    "openai": _openai,
+}
+
+
+# ======================================================
+# Serveur HTTP
+# ======================================================
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeServices/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        return
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw.decode("utf-8")) if raw and "json" in (self.headers.get("Content-Type") or "") else {}
+        except Exception:
+            body = {}
+        if not isinstance(body, dict):
+            body = {}
+
+        path = self.path.split("?", 1)[0]
+        service, _, rest = path.lstrip("/").partition("/")
+        handler = _HANDLERS.get(service)
+        if handler is None:
+            self._send(404, {"error": f"service inconnu: {service}"})
+            return
+
+        cfg = self.server.configs[service]
+        _delay(cfg)
+        if _should_fail(cfg):
+            self.server.stats.bump(service, True)
+            self._send(cfg.error_status, {"error": "fault injected"})
+            return
+
+        status, payload = handler(self.command, "/" + rest, self.headers, body)
+        self.server.stats.bump(service, status >= 400)
+        self._send(status, payload)
+
+    def _send(self, status: int, payload: Any):
+        if payload is None:
+            data, ctype = b"", "application/json"
+        elif isinstance(payload, bytes):
+            data, ctype = payload, "application/octet-stream"
+        else:
+            data, ctype = json.dumps(payload).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+
+class FakeHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, configs: Dict[str, FakeServiceConfig]):
+        super().__init__(addr, _Handler)
+        self.configs = configs
+        self.stats = _Stats()
+
+
+# ======================================================
+# Serveur SMTP minimal (pas de TLS : NOVOSKILL_SMTP_SSL=0, NOVOSKILL_SMTP_STARTTLS=0)
+# ======================================================
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+        self.wfile.flush()
+
+    def handle(self):
+        cfg = self.server.configs["smtp"]
+        self._reply("220 fake.local ESMTP")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            text = line.decode("utf-8", "replace").rstrip("\r\n")
+            if in_data:
+                if text == ".":
+                    in_data = False
+                    _delay(cfg)
+                    failed = _should_fail(cfg)
+                    self.server.stats.bump("smtp", failed)
+                    self._reply("451 fault injected" if failed else "250 OK queued")
+                continue
+            cmd = text[:4].upper()
+            if cmd in ("EHLO", "HELO"):
+                self._reply("250-fake.local")
+                self._reply("250 AUTH PLAIN LOGIN")
+            elif cmd == "AUTH":
+                self._reply("235 Authentication successful")
+            elif cmd == "DATA":
+                in_data = True
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            elif cmd == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class FakeSmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, addr, configs: Dict[str, FakeServiceConfig], stats: _Stats):
+        super().__init__(addr, _SmtpHandler)
+        self.configs = configs
+        self.stats = stats
+
+
+# ======================================================
+# Démarrage
+# ======================================================
+class FakeStack:
+    """
+    Serveurs factices démarrés dans des threads. api_env() donne l'environnement
+    à passer à l'API pour qu'elle les utilise.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, smtp_port: int = 0, configs: Optional[Dict[str, Any]] = None):
+        self.configs = load_configs(configs)
+        self.http = FakeHttpServer((host, port), self.configs)
+        self.smtp = FakeSmtpServer((host, smtp_port), self.configs, self.http.stats)
+        self.host = host
+        self._threads = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.http.server_address[1]}"
+
+    def start(self) -> "FakeStack":
+        for srv in (self.http, self.smtp):
+            t = threading.Thread(target=srv.serve_forever, daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        for srv in (self.http, self.smtp):
+            srv.shutdown()
+            srv.server_close()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.http.stats.snapshot()
+
+    def api_env(self) -> Dict[str, str]:
+        b = self.base_url
+        env = {
+            "INTEGRATION_BASE_OVERRIDES": ",".join([
+                f"graph_auth={b}/msauth",
+                f"graph={b}/graph",
+                f"mailjet={b}/mailjet",
+                f"lms={b}/lms",
+            ]),
+            "OPENAI_BASE_URL": f"{b}/openai/v1",
+            "OPENAI_API_KEY": "fake",
+            "NOVOSKILL_SMTP_HOST": self.host,
+            "NOVOSKILL_SMTP_PORT": str(self.smtp.server_address[1]),
+            "NOVOSKILL_SMTP_SSL": "0",
+            "NOVOSKILL_SMTP_STARTTLS": "0",
+            "NOVOSKILL_SMTP_USER": "fake",
+            "NOVOSKILL_SMTP_PASSWORD": "fake",
+            "SUPABASE_SERVICE_ROLE_KEY": "fake",
+        }
+        for portal in ("SKILLS", "STUDIO", "PEOPLE", "LEARN", "PARTNER"):
+            env[f"{portal}_SUPABASE_URL"] = f"{b}/supabase"
+            env[f"{portal}_SUPABASE_ANON_KEY"] = "fake"
+        return env
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Services externes factices (tests de charge).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--smtp-port", type=int, default=8925)
+    parser.add_argument("--config", default="", help="JSON {service: {latency_ms, jitter_ms, error_rate, error_status}}")
+    args = parser.parse_args(argv)
+
+    raw = None
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    stack = FakeStack(args.host, args.port, args.smtp_port, raw).start()
+    print(f"Services factices sur {stack.base_url} (SMTP {args.host}:{stack.smtp.server_address[1]})")
+    for k, v in sorted(stack.api_env().items()):
+        print(f"  {k}={v}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stack.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,351 @@
+# unified_api/loadtest/run_loadtest.py
+#
+# Test de charge de l'API complète contre des services externes factices.
+#
+# Usage (depuis unified_api/, base Postgres de test via les variables DB habituelles) :
+#   python -m loadtest.run_loadtest --vars loadtest/vars.json --portals skills,studio,people \
+#       --concurrency 30 --duration 60 --workers-list 1,2 --pool-sizes 3,5,10
+#   python -m loadtest.run_loadtest --base-url http://127.0.0.1:8000 --vars loadtest/vars.json
+#
+# Sans --base-url : démarre les services factices (loadtest.fake_services) puis uvicorn
+# pour chaque combinaison workers x DB_POOL_SIZE, et rejoue le mélange de trafic.
+# Rapport : débit, p50 / p90 / p99 par route et global, erreurs, saturation du pool
+# (échantillonnage de /metrics : in_use, waits, timeouts, attente d'acquisition).
+# Avec plusieurs workers, /metrics reflète le worker qui répond : la saturation est indicative.
+
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import pathlib
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from loadtest.fake_services import FakeStack
+from loadtest.traffic import DEFAULT_MIXES, TrafficPicker, load_mix_file
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parents[1]
+RESULTS_DIR = pathlib.Path(__file__).resolve().parent / "results"
+
+_METRIC_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+([-+0-9.eEinfNa]+)$")
+
+
+# ======================================================
+# API sous test
+# ======================================================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(env: Dict[str, str], workers: int, port: int, ready_timeout: float = 60.0) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=str(ROOT_DIR),
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + ready_timeout
+    url = f"http://127.0.0.1:{port}/presence/healthz"
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn arrêté au démarrage (code {proc.returncode})")
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return proc
+        except requests.RequestException:
+            pass
+        time.sleep(0.3)
+    stop_api(proc)
+    raise RuntimeError("API non prête dans le délai imparti")
+
+
+def stop_api(proc: subprocess.Popen):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# ======================================================
+# Échantillonnage /metrics
+# ======================================================
+def parse_metrics(text: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for line in (text or "").splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = _METRIC_RE.match(line.strip())
+        if not m:
+            continue
+        try:
+            out[m.group(1) + (m.group(2) or "")] = float(m.group(3))
+        except ValueError:
+            continue
+    return out
+
+
+class PoolSampler(threading.Thread):
+    def __init__(self, base_url: str, token: str, interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.url = base_url.rstrip("/") + "/metrics"
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._halt = threading.Event()
+
+    def run(self):
+        s = requests.Session()
+        while not self._halt.is_set():
+            try:
+                r = s.get(self.url, headers=self.headers, timeout=5)
+                if r.status_code == 200:
+                    m = parse_metrics(r.text)
+                    self.samples.append({
+                        "in_use": m.get("skillboard_db_pool_in_use", 0.0),
+                        "max": m.get("skillboard_db_pool_max", 0.0),
+                        "waits": m.get("skillboard_db_pool_waits", 0.0),
+                        "timeouts": m.get("skillboard_db_pool_timeouts", 0.0),
+                        "wait_count": m.get("skillboard_db_pool_acquire_wait_seconds_count", 0.0),
+                        "wait_sum_s": m.get("skillboard_db_pool_acquire_wait_seconds_sum", 0.0),
+                    })
+            except requests.RequestException:
+                pass
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"samples": 0}
+        first, last = self.samples[0], self.samples[-1]
+        saturated = sum(1 for s in self.samples if s["max"] and s["in_use"] >= s["max"])
+        waits = max(0.0, last["wait_count"] - first["wait_count"])
+        wait_s = max(0.0, last["wait_sum_s"] - first["wait_sum_s"])
+        return {
+            "samples": len(self.samples),
+            "pool_max": last["max"],
+            "in_use_max": max(s["in_use"] for s in self.samples),
+            "in_use_avg": round(sum(s["in_use"] for s in self.samples) / len(self.samples), 2),
+            "saturated_pct": round(saturated * 100.0 / len(self.samples), 1),
+            "acquire_waits": int(max(0.0, last["waits"] - first["waits"])),
+            "acquire_timeouts": int(max(0.0, last["timeouts"] - first["timeouts"])),
+            "acquire_wait_avg_ms": round(wait_s * 1000.0 / waits, 2) if waits else 0.0,
+        }
+
+
+# ======================================================
+# Génération de charge
+# ======================================================
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(pct / 100.0 * (len(sorted_vals) - 1)))))
+    return round(sorted_vals[k], 1)
+
+
+def _latency_summary(samples: List[float], seconds: float) -> Dict[str, Any]:
+    vals = sorted(samples)
+    return {
+        "count": len(vals),
+        "rps": round(len(vals) / seconds, 2) if seconds else 0.0,
+        "p50_ms": _percentile(vals, 50),
+        "p90_ms": _percentile(vals, 90),
+        "p99_ms": _percentile(vals, 99),
+        "max_ms": round(vals[-1], 1) if vals else 0.0,
+    }
+
+
+def run_load(
+    base_url: str,
+    picker: TrafficPicker,
+    concurrency: int,
+    duration: float,
+    ramp_up: float,
+    think_ms: float,
+    timeout: float,
+    seed: int,
+) -> Dict[str, Any]:
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[str, Dict[str, int]] = {}
+    errors: Dict[str, int] = {}
+    t_start = time.monotonic()
+    t_end = t_start + duration
+
+    def worker(idx: int):
+        rnd = random.Random(seed + idx)
+        if ramp_up > 0 and concurrency > 1:
+            time.sleep(ramp_up * idx / (concurrency - 1))
+        s = requests.Session()
+        while time.monotonic() < t_end:
+            item = picker.pick(rnd)
+            headers = {"Authorization": f"Bearer user:{item['email']}"} if item.get("email") else {}
+            t0 = time.perf_counter()
+            status: Optional[int] = None
+            err: Optional[str] = None
+            try:
+                r = s.request(item["method"], base_url + item["path"], headers=headers, json=item.get("json"), timeout=timeout)
+                _ = r.content
+                status = r.status_code
+            except requests.RequestException as e:
+                err = type(e).__name__
+            ms = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                latencies.setdefault(item["label"], []).append(ms)
+                st = statuses.setdefault(item["label"], {})
+                key = str(status) if status is not None else f"ERR:{err}"
+                st[key] = st.get(key, 0) + 1
+                if err or (status is not None and status >= 500):
+                    errors[item["label"]] = errors.get(item["label"], 0) + 1
+            if think_ms > 0:
+                time.sleep(rnd.uniform(0, 2 * think_ms) / 1000.0)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=duration + ramp_up + timeout + 30)
+    elapsed = time.monotonic() - t_start
+
+    all_samples = [ms for v in latencies.values() for ms in v]
+    routes = {}
+    for label, samples in sorted(latencies.items()):
+        routes[label] = {**_latency_summary(samples, elapsed), "statuses": statuses.get(label, {}), "errors": errors.get(label, 0)}
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "total": {**_latency_summary(all_samples, elapsed), "errors": sum(errors.values())},
+        "routes": routes,
+    }
+
+
+def _print_run(name: str, res: Dict[str, Any]):
+    tot = res["load"]["total"]
+    pool = res.get("pool") or {}
+    print(
+        f"\n[{name}] {tot['count']} requêtes en {res['load']['elapsed_s']} s : {tot['rps']} req/s, "
+        f"p50={tot['p50_ms']} p90={tot['p90_ms']} p99={tot['p99_ms']} ms, erreurs={tot['errors']}"
+    )
+    if pool.get("samples"):
+        print(
+            f"[{name}] pool max={pool['pool_max']:.0f} in_use max={pool['in_use_max']:.0f} moy={pool['in_use_avg']} "
+            f"saturé={pool['saturated_pct']} % attentes={pool['acquire_waits']} timeouts={pool['acquire_timeouts']} "
+            f"attente moy={pool['acquire_wait_avg_ms']} ms"
+        )
+    for label, r in res["load"]["routes"].items():
+        print(f"  {label:<72} n={r['count']:>6} p50={r['p50_ms']:>8} p99={r['p99_ms']:>8} err={r['errors']}")
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for item in (raw or "").split(","):
+        k, sep, v = item.strip().partition("=")
+        if sep and k.strip():
+            out[k.strip()] = float(v)
+    return out
+
+
+def _int_list(raw: str) -> List[int]:
+    return [int(x) for x in (raw or "").split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge de l'API (services externes factices).")
+    parser.add_argument("--base-url", default="", help="API déjà démarrée (sinon uvicorn est lancé localement)")
+    parser.add_argument("--vars", required=True, help="JSON des comptes / identifiants par portail")
+    parser.add_argument("--portals", default="skills,studio,people,learn,partner,forms")
+    parser.add_argument("--portal-weights", default="", help="ex. skills=3,studio=2,forms=1")
+    parser.add_argument("--mix-file", default="", help="Mélange de trafic JSON (remplace les mélanges par défaut)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60.0, help="Secondes par run")
+    parser.add_argument("--ramp-up", type=float, default=5.0)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause moyenne entre deux requêtes d'un client")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers-list", default="1", help="Nombres de workers uvicorn à essayer")
+    parser.add_argument("--pool-sizes", default="", help="Valeurs DB_POOL_SIZE à essayer (défaut: environnement)")
+    parser.add_argument("--fakes-config", default="", help="JSON latence / erreurs des services factices")
+    parser.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN", ""))
+    parser.add_argument("--output", default="", help="Rapport JSON (défaut: loadtest/results/<horodatage>.json)")
+    args = parser.parse_args(argv)
+
+    variables = json.loads(pathlib.Path(args.vars).read_text(encoding="utf-8"))
+    mixes = load_mix_file(args.mix_file) if args.mix_file else DEFAULT_MIXES
+    portals = [p.strip() for p in args.portals.split(",") if p.strip()]
+    picker = TrafficPicker(mixes, variables, portals, _parse_weights(args.portal_weights))
+    if not picker.items:
+        print("Aucune requête jouable (variables manquantes dans --vars ?).", file=sys.stderr)
+        return 2
+
+    fakes_raw = json.loads(pathlib.Path(args.fakes_config).read_text(encoding="utf-8")) if args.fakes_config else None
+    report: Dict[str, Any] = {
+        "run_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "portals": portals,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "think_ms": args.think_ms,
+        "runs": [],
+    }
+
+    if args.base_url:
+        plans = [{"name": "external", "base_url": args.base_url.rstrip("/")}]
+    else:
+        pool_sizes = _int_list(args.pool_sizes) or [int(os.getenv("DB_POOL_SIZE", "3") or 3)]
+        plans = [
+            {"name": f"workers={w} pool={p}", "workers": w, "pool_size": p}
+            for w in (_int_list(args.workers_list) or [1])
+            for p in pool_sizes
+        ]
+
+    fakes = None if args.base_url else FakeStack(configs=fakes_raw).start()
+    try:
+        for plan in plans:
+            proc = None
+            base_url = plan.get("base_url")
+            if not base_url:
+                port = _free_port()
+                env = {**fakes.api_env(), "DB_POOL_SIZE": str(plan["pool_size"])}
+                if args.metrics_token:
+                    env["METRICS_TOKEN"] = args.metrics_token
+                else:
+                    # API locale lancée par le test : /metrics ouvert sans token
+                    env["METRICS_PUBLIC"] = "1"
+                proc = start_api(env, plan["workers"], port)
+                base_url = f"http://127.0.0.1:{port}"
+            sampler = PoolSampler(base_url, args.metrics_token)
+            sampler.start()
+            try:
+                load = run_load(base_url, picker, args.concurrency, args.duration, args.ramp_up, args.think_ms, args.timeout, args.seed)
+            finally:
+                sampler.stop()
+                sampler.join(timeout=5)
+                if proc is not None:
+                    stop_api(proc)
+            res = {**{k: v for k, v in plan.items() if k != "base_url"}, "load": load, "pool": sampler.summary()}
+            if fakes is not None:
+                res["fake_services"] = fakes.stats()
+            report["runs"].append(res)
+            _print_run(plan["name"], res)
+    finally:
+        if fakes is not None:
+            fakes.stop()
+
+    output = pathlib.Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nRapport: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
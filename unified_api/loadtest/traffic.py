@@ -0,0 +1,151 @@
+# unified_api/loadtest/traffic.py
+#
+# Mélanges de trafic par portail pour les tests de charge.
+#
+# Une entrée = (poids, méthode, chemin avec variables {id_contact}, {id_owner}, ...).
+# Les variables et les emails de connexion viennent d'un fichier --vars (JSON) décrivant
+# les comptes de la base de test, ex. :
+#   {
+#     "skills":  {"email": "rh@client.test",  "id_contact": "...", "id_effectif": "..."},
+#     "studio":  {"email": "admin@owner.test", "id_owner": "...", "id_ent": "...", "id_collaborateur": "..."},
+#     "people":  {"email": "salarie@client.test", "id_effectif": "..."},
+#     "learn":   {"email": "salarie@client.test", "id_effectif": "..."},
+#     "partner": {"email": "consultant@partner.test", "id_consultant": "..."},
+#     "forms":   {"id_action_formation": "...", "id_action_formation_effectif": "..."}
+#   }
+#
+# Un mélange peut aussi être rejoué depuis un fichier JSON (load_mix_file) :
+#   [{"portal": "skills", "weight": 5, "method": "GET", "path": "/skills/..."}, ...]
+# (ex. extrait des logs d'accès de production, chemins déjà paramétrés).
+
+from typing import Any, Dict, List, Optional
+import json
+import random
+
+from pydantic import BaseModel
+
+
+class TrafficEntry(BaseModel):
+    portal: str
+    weight: float = 1.0
+    method: str = "GET"
+    path: str
+    json_body: Optional[Dict[str, Any]] = None
+
+
+def _e(portal: str, weight: float, path: str, method: str = "GET", json_body: Optional[Dict[str, Any]] = None) -> TrafficEntry:
+    return TrafficEntry(portal=portal, weight=weight, method=method, path=path, json_body=json_body)
+
+
+DEFAULT_MIXES: Dict[str, List[TrafficEntry]] = {
+    # Insights : dashboard et analyses lourdes
+    "skills": [
+        _e("skills", 10, "/skills/context/{id_contact}"),
+        _e("skills", 8, "/skills/dashboard/risk-overview/{id_contact}"),
+        _e("skills", 5, "/skills/analyse/risques/competence/{id_contact}"),
+        _e("skills", 4, "/skills/analyse/risques/projection-events/{id_contact}"),
+        _e("skills", 4, "/skills/analyse/previsions/postes-rouges/modal/{id_contact}"),
+        _e("skills", 3, "/skills/cartographie/cell/{id_contact}"),
+        _e("skills", 3, "/skills/calendrier/events/{id_contact}"),
+        _e("skills", 2, "/skills/calendrier/suggestions/{id_contact}"),
+        _e("skills", 2, "/skills/simulations/options/{id_contact}"),
+        _e("skills", 2, "/skills/collaborateurs/listes/postes/{id_contact}"),
+        _e("skills", 1, "/skills/analyse/rapport/{id_contact}"),
+    ],
+    "studio": [
+        _e("studio", 10, "/studio/context/{id_owner}"),
+        _e("studio", 6, "/studio/dashboard/overview/{id_owner}"),
+        _e("studio", 6, "/studio/collaborateurs/list/{id_owner}"),
+        _e("studio", 4, "/studio/collaborateurs/detail/{id_owner}/{id_collaborateur}"),
+        _e("studio", 4, "/studio/catalog/competences/{id_owner}"),
+        _e("studio", 3, "/studio/catalog/postes/{id_owner}"),
+        _e("studio", 3, "/studio/clients/{id_owner}"),
+        _e("studio", 2, "/studio/clients/{id_owner}/{id_ent}/dashboard/risk-overview"),
+        _e("studio", 2, "/studio/calendrier/events/{id_owner}"),
+        _e("studio", 1, "/studio/catalog/competences/{id_owner}/cartographie"),
+    ],
+    "people": [
+        _e("people", 10, "/people/context/{id_effectif}"),
+        _e("people", 8, "/people/dashboard/{id_effectif}"),
+        _e("people", 4, "/people/competences/{id_effectif}"),
+        _e("people", 3, "/people/parcours/{id_effectif}"),
+        _e("people", 3, "/people/entretiens/{id_effectif}"),
+        _e("people", 2, "/people/calendrier/{id_effectif}"),
+        _e("people", 2, "/people/informations/{id_effectif}"),
+    ],
+    "learn": [
+        _e("learn", 10, "/learn/context/{id_effectif}"),
+        _e("learn", 6, "/learn/formations/{id_effectif}"),
+        _e("learn", 4, "/learn/competences/{id_effectif}"),
+        _e("learn", 2, "/learn/formations/{id_effectif}/referentiels"),
+        _e("learn", 1, "/learn/formations/{id_effectif}/lms/remote"),
+    ],
+    "partner": [
+        _e("partner", 10, "/partner/context/{id_consultant}"),
+        _e("partner", 4, "/partner/profile/{id_consultant}"),
+    ],
+    # Formulaires publics de formation (pics en fin de session)
+    "forms": [
+        _e("forms", 6, "/presence/init?id_action_formation={id_action_formation}"),
+        _e("forms", 6, "/satisfaction_stagiaire/context/{id_action_formation_effectif}"),
+        _e("forms", 1, "/presence/healthz"),
+    ],
+}
+
+
+def load_mix_file(path: str) -> Dict[str, List[TrafficEntry]]:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    out: Dict[str, List[TrafficEntry]] = {}
+    for item in raw or []:
+        e = TrafficEntry(**item)
+        out.setdefault(e.portal, []).append(e)
+    return out
+
+
+def fill_path(path: str, values: Dict[str, Any]) -> Optional[str]:
+    """
+    Remplace les variables du chemin. None si une variable manque (entrée ignorée).
+    """
+    try:
+        return path.format(**{k: v for k, v in (values or {}).items() if v is not None})
+    except (KeyError, IndexError):
+        return None
+
+
+class TrafficPicker:
+    """
+    Tirage pondéré des requêtes sur les portails retenus (poids de portail optionnels).
+    """
+
+    def __init__(
+        self,
+        mixes: Dict[str, List[TrafficEntry]],
+        variables: Dict[str, Dict[str, Any]],
+        portals: List[str],
+        portal_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.items: List[Dict[str, Any]] = []
+        weights: List[float] = []
+        for portal in portals:
+            entries = mixes.get(portal) or []
+            values = variables.get(portal) or {}
+            total = sum(e.weight for e in entries) or 1.0
+            pw = float((portal_weights or {}).get(portal, 1.0))
+            for e in entries:
+                path = fill_path(e.path, values)
+                if path is None:
+                    continue
+                self.items.append({
+                    "portal": portal,
+                    "method": e.method.upper(),
+                    "path": path,
+                    "label": f"{e.method.upper()} {e.path}",
+                    "json": e.json_body,
+                    "email": values.get("email"),
+                })
+                weights.append(pw * e.weight / total)
+        self.weights = weights
+
+    def pick(self, rnd: random.Random) -> Dict[str, Any]:
+        return rnd.choices(self.items, weights=self.weights, k=1)[0]